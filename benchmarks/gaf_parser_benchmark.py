@@ -0,0 +1,143 @@
+"""Measures the throughput of the GAF parsers on a synthetic GAF 2.1 file.
+
+Usage (from the root of the repository):
+
+    python3 -m benchmarks.gaf_parser_benchmark [--lines 1000000] [--repeat 3]
+
+The file is written to a temporary directory, both plain and gzipped. Each parser reads it while accessing the fields
+that the GAF import uses. Besides gaf.parse_gaf and Biopython's gafiterator, the script runs the previous import path
+(gafiterator on utils.open_file_read) and a parser yielding records that split multi-valued columns only on access."""
+
+import os
+import gzip
+import time
+import random
+import shutil
+import argparse
+import tempfile
+from typing import Iterator, Callable
+from Bio.UniProt import GOA
+from pychado import utils
+from pychado.io import gaf
+
+
+# Fields of a GAF record read by GAFImportClient for every line
+IMPORTED_FIELDS = ["DB_Object_ID", "GO_ID", "Qualifier", "DB:Reference", "Evidence", "With", "Date", "Assigned_By",
+                   "Synonym", "DB_Object_Name", "DB_Object_Symbol"]
+
+
+class LazyGAFRecord(dict):
+    """Dictionary of the columns of a GAF line that splits multi-valued columns on first access"""
+    __slots__ = ["columns"]
+
+    multi_valued_fields = {GOA.GAF20FIELDS[index]: index for index in gaf.GAF_MULTI_VALUED_COLUMNS}
+    single_valued_fields = {field: index for index, field in enumerate(GOA.GAF20FIELDS)
+                            if index not in gaf.GAF_MULTI_VALUED_COLUMNS}
+
+    def __init__(self, columns: list):
+        super().__init__()
+        self.columns = columns
+
+    def __missing__(self, key: str):
+        if key in self.multi_valued_fields:
+            value = self.columns[self.multi_valued_fields[key]].split("|")
+        else:
+            value = self.columns[self.single_valued_fields[key]]
+        self[key] = value
+        return value
+
+
+def parse_gaf_lazily(filename: str) -> Iterator[LazyGAFRecord]:
+    """Iterates over the lines of a GAF file and yields records that split multi-valued columns on access"""
+    with gaf.open_gaf_file(filename) as file_handle:
+        for line in file_handle:
+            if line[0] == "!":
+                gaf.check_gaf_version(line)
+                continue
+            columns = line.rstrip("\n").split("\t")
+            if len(columns) == 1:
+                continue
+            yield LazyGAFRecord(columns)
+
+
+def parse_gaf_previously(filename: str) -> Iterator[dict]:
+    """Iterates over the lines of a GAF file like the import did before gaf.parse_gaf was introduced"""
+    file_handle = utils.open_file_read(filename)
+    yield from GOA.gafiterator(file_handle)
+    utils.close(file_handle)
+
+
+def create_gaf_file(filename: str, number_of_lines: int) -> None:
+    """Writes a synthetic GAF 2.1 file resembling a UniProt-GOA file"""
+    generator = random.Random(1)
+    with open(filename, "w") as file_handle:
+        writer = gaf.GAFWriter(file_handle, "2.1")
+        writer.write_header("gaf_parser_benchmark")
+        for index in range(number_of_lines):
+            accession = "A0A" + str(index // 4).zfill(7)
+            writer.write_record({
+                "DB": "UniProtKB", "DB_Object_ID": accession, "DB_Object_Symbol": "gene" + str(index // 4),
+                "Qualifier": ["NOT"] if generator.random() < 0.05 else [], "GO_ID": "GO:" + str(index % 50000).zfill(7),
+                "DB:Reference": ["GO_REF:0000002"] + (["PMID:" + str(index)] if index % 3 == 0 else []),
+                "Evidence": generator.choice(["IEA", "ISS", "IDA", "TAS"]),
+                "With": ["InterPro:IPR" + str(index % 30000).zfill(6)] if index % 2 else [],
+                "Aspect": generator.choice(["F", "P", "C"]), "DB_Object_Name": "Uncharacterized protein",
+                "Synonym": [accession + "_PLAF7", "PF3D7_" + str(index // 4).zfill(7)],
+                "DB_Object_Type": "protein", "Taxon_ID": ["taxon:36329"], "Date": "20200101",
+                "Assigned_By": "InterPro", "Annotation_Extension": [], "Gene_Product_Form_ID": ""})
+        writer.flush()
+
+
+def consume(records: Iterator[dict]) -> int:
+    """Accesses the fields the import uses for every record and returns the number of records"""
+    number_of_records = 0
+    for record in records:
+        for field in IMPORTED_FIELDS:
+            record[field]
+        number_of_records += 1
+    return number_of_records
+
+
+def measure(parse_function: Callable, filename: str, repeat: int) -> float:
+    """Returns the best throughput of several runs, in lines per second"""
+    best_time = None
+    number_of_records = 0
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        number_of_records = consume(parse_function(filename))
+        run_time = time.perf_counter() - start_time
+        best_time = run_time if best_time is None else min(best_time, run_time)
+    return number_of_records / best_time
+
+
+def main():
+    """Runs the benchmark"""
+    parser = argparse.ArgumentParser(description="Measures the throughput of the GAF parsers")
+    parser.add_argument("--lines", type=int, default=1000000, help="number of lines of the synthetic GAF file")
+    parser.add_argument("--repeat", type=int, default=3, help="number of runs, of which the best is reported")
+    arguments = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    try:
+        plain_filename = os.path.join(directory, "benchmark.gaf")
+        gzipped_filename = plain_filename + ".gz"
+        create_gaf_file(plain_filename, arguments.lines)
+        with open(plain_filename, "rb") as plain_file, gzip.open(gzipped_filename, "wb") as gzipped_file:
+            shutil.copyfileobj(plain_file, gzipped_file)
+
+        for label, filename in [("plain", plain_filename), ("gzip", gzipped_filename)]:
+            print("Parsing throughput, {0} file with {1} lines ({2:.0f} MB), best of {3} runs:".format(
+                label, arguments.lines, os.path.getsize(filename) / 2 ** 20, arguments.repeat))
+            for parser_label, parse_function in [
+                    ("previous import", parse_gaf_previously),
+                    ("gafiterator", gaf.parse_gaf_with_biopython),
+                    ("parse_gaf", gaf.parse_gaf),
+                    ("lazily split records", parse_gaf_lazily)]:
+                print("  {0:<25} {1:>10,.0f} lines/s".format(
+                    parser_label, measure(parse_function, filename, arguments.repeat)))
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""Measures the throughput of the GAF writer on synthetic annotations.
+
+Usage (from the root of the repository):
+
+    python3 -m benchmarks.gaf_writer_benchmark [--lines 1000000] [--repeat 3]
+
+The records are written to os.devnull, so only formatting and buffering are measured. For comparison, the script also
+runs the per-record formatting of the exporter before GAFWriter was introduced, and checks that its GAF 1.0 output is
+identical to that of GAFWriter."""
+
+import io
+import os
+import time
+import random
+import argparse
+from typing import List, Union, Callable
+from Bio.UniProt import GOA
+from pychado import utils
+from pychado.io import gaf
+
+
+def create_gaf_records(number_of_records: int, fields: List[str]) -> List[dict]:
+    """Creates synthetic GAF records with the given columns, resembling those created by the exporter"""
+    generator = random.Random(1)
+    records = []
+    for index in range(number_of_records):
+        record = {key: None for key in fields}
+        record.update({
+            "DB": "GeneDB", "DB_Object_ID": "PF3D7_" + str(index // 5).zfill(7),
+            "DB_Object_Symbol": "gene" + str(index),
+            "Qualifier": ["NOT"] if generator.random() < 0.05 else [], "GO_ID": "GO:" + str(index % 50000).zfill(7),
+            "DB:Reference": ["PMID:" + str(generator.randint(1, 10 ** 8))] + (["GO_REF:0000002"] if index % 3 else []),
+            "Evidence": generator.choice(["IEA", "ISS", "IDA", "TAS"]),
+            "With": ["InterPro:IPR" + str(index % 30000).zfill(6)] if index % 2 else [],
+            "Aspect": generator.choice(["F", "P", "C"]), "DB_Object_Name": "conserved protein, unknown function",
+            "Synonym": ["PF3D7_" + str(index // 5).zfill(7) + ".1", "MAL" + str(index // 5)],
+            "DB_Object_Type": "gene", "Taxon_ID": "taxon:36329", "Date": "20200101", "Assigned_By": "GeneDB"})
+        records.append({key: record[key] for key in fields})
+    return records
+
+
+def write_records_per_line(file_handle, records: List[dict]) -> None:
+    """Writes records like the exporter did before GAFWriter was introduced: one write call per record"""
+    for record in records:
+        file_handle.write("\t".join([stringify_gaf_attribute(value) for value in record.values()]) + "\n")
+
+
+def stringify_gaf_attribute(attribute: Union[str, List[str]]) -> str:
+    """Converts a GAF attribute from a list to a string, separated by pipes"""
+    if isinstance(attribute, str):
+        return attribute
+    elif isinstance(attribute, list):
+        return utils.list_to_string(attribute, "|")
+    else:
+        return ""
+
+
+def write_records_with_writer(version: str) -> Callable:
+    """Returns a function writing records with a GAFWriter of a given version"""
+    def write_records(file_handle, records: List[dict]) -> None:
+        gaf.GAFWriter(file_handle, version).write_records(records)
+    return write_records
+
+
+def measure(write_function: Callable, records: List[dict], repeat: int) -> float:
+    """Returns the best throughput of several runs, in lines per second"""
+    best_time = None
+    for _ in range(repeat):
+        with open(os.devnull, "w") as file_handle:
+            start_time = time.perf_counter()
+            write_function(file_handle, records)
+            run_time = time.perf_counter() - start_time
+        best_time = run_time if best_time is None else min(best_time, run_time)
+    return len(records) / best_time
+
+
+def main():
+    """Runs the benchmark"""
+    parser = argparse.ArgumentParser(description="Measures the throughput of the GAF writer")
+    parser.add_argument("--lines", type=int, default=1000000, help="number of synthetic annotations")
+    parser.add_argument("--repeat", type=int, default=3, help="number of runs, of which the best is reported")
+    arguments = parser.parse_args()
+
+    gaf10_records = create_gaf_records(arguments.lines, GOA.GAF10FIELDS)
+    gaf20_records = create_gaf_records(arguments.lines, GOA.GAF20FIELDS)
+
+    # The output of the previous exporter must be identical to the GAF 1.0 output of the writer
+    sample = gaf10_records[:1000]
+    previous_output = io.StringIO()
+    write_records_per_line(previous_output, sample)
+    writer_output = io.StringIO()
+    write_records_with_writer("1.0")(writer_output, sample)
+    print("GAF 1.0 output identical to previous exporter: " + str(previous_output.getvalue()
+                                                                 == writer_output.getvalue()))
+
+    print("Write-stage throughput, {0} synthetic annotations, best of {1} runs:".format(arguments.lines,
+                                                                                     arguments.repeat))
+    for label, write_function, records in [
+            ("previous exporter (1.0)", write_records_per_line, gaf10_records),
+            ("GAFWriter 1.0", write_records_with_writer("1.0"), gaf10_records),
+            ("GAFWriter 2.1", write_records_with_writer("2.1"), gaf20_records),
+            ("GAFWriter 2.2", write_records_with_writer("2.2"), gaf20_records)]:
+        print("  {0:<25} {1:>10,.0f} lines/s".format(label, measure(write_function, records, arguments.repeat)))
+
+
+if __name__ == "__main__":
+    main()
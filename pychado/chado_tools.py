@@ -96,7 +96,8 @@ def import_commands() -> dict:
         "ontology": "import an ontology into the CHADO database",
         "fasta": "import sequences from a FASTA file into the CHADO database",
         "gff": "import genomic data from a GFF3 file into the CHADO database",
-        "gaf": "import gene annotation data from a GAF file into the CHADO database"
+        "gaf": "import gene annotation data from a GAF file into the CHADO database",
+        "gpad": "import gene annotation data from GPAD/GPI files into the CHADO database"
     }
 
 
@@ -105,14 +106,20 @@ def export_commands() -> dict:
     return {
         "fasta": "export genome/protein sequences from the CHADO database to a FASTA file",
         "gff": "export genomic data from the CHADO database to a GFF3 file",
-        "gaf": "export gene annotation data from the CHADO database to a GAF file"
+        "gaf": "export gene annotation data from the CHADO database to a GAF file",
+        "gpad": "export gene annotation data from the CHADO database to a GPAD file",
+        "gpi": "export annotated gene products from the CHADO database to a GPI file"
     }
 
 
 def execute_commands() -> dict:
     """Lists the available sub-commands of the 'chado execute' command with corresponding descriptions"""
     return {
-        "audit_backup": "backs up the audit tables to a separate schema"
+        "audit_backup": "backs up the audit tables to a separate schema",
+        "pack_residues": "moves the residues of the top-level sequences of an organism into a packed side table",
+        "unpack_residues": "moves packed residues of the top-level sequences of an organism back into the "
+                           "'feature' table",
+        "cvtermpath": "computes the transitive closure of the relationships between the terms of a vocabulary"
     }
 
 
@@ -142,7 +149,10 @@ def parse_arguments(input_arguments: list) -> argparse.Namespace:
         add_arguments_by_command(command, sub)
 
     # Parse the actual arguments
-    return parser.parse_args(input_arguments[1:])
+    arguments = parser.parse_args(input_arguments[1:])
+    if input_arguments[1:3] == ["import", "ontology"]:
+        check_import_ontology_arguments(parser, arguments)
+    return arguments
 
 
 def add_general_arguments(parser: argparse.ArgumentParser):
@@ -275,6 +285,10 @@ def add_execute_arguments_by_command(command: str, parser: argparse.ArgumentPars
     """Defines formal arguments for a specified sub-command of 'chado execute'"""
     if command == "audit_backup":
         add_execute_backup_arguments(parser)
+    elif command in ["pack_residues", "unpack_residues"]:
+        add_execute_packing_arguments(parser)
+    elif command == "cvtermpath":
+        add_execute_cvtermpath_arguments(parser)
     else:
         print("Command '" + parser.prog + "' is not available.")
 
@@ -285,6 +299,17 @@ def add_execute_backup_arguments(parser: argparse.ArgumentParser):
                                                       "format 'YYYYMMDD'")
 
 
+def add_execute_packing_arguments(parser: argparse.ArgumentParser):
+    """Defines formal arguments for the 'chado execute pack_residues/unpack_residues' sub-commands"""
+    parser.add_argument("-a", "--abbreviation", required=True, dest="organism",
+                        help="abbreviation/short name of the organism")
+
+
+def add_execute_cvtermpath_arguments(parser: argparse.ArgumentParser):
+    """Defines formal arguments for the 'chado execute cvtermpath' sub-command"""
+    parser.add_argument("--vocabulary", required=True, help="name of the controlled vocabulary (CV)")
+
+
 def add_extract_arguments(parser: argparse.ArgumentParser):
     """Defines formal arguments for the 'chado extract' sub-command"""
     parser.epilog = "For detailed usage information type '" + parser.prog + " <command> -h'"
@@ -429,6 +454,8 @@ def add_import_arguments_by_command(command: str, parser: argparse.ArgumentParse
         add_import_fasta_arguments(parser)
     elif command == "gaf":
         add_import_gaf_arguments(parser)
+    elif command == "gpad":
+        add_import_gpad_arguments(parser)
     else:
         print("Command '" + parser.prog + "' is not available.")
 
@@ -438,10 +465,39 @@ def add_import_ontology_arguments(parser: argparse.ArgumentParser):
     group = parser.add_mutually_exclusive_group(required=True)
     group.add_argument("-f", "--input_file", default="", help="file containing CV terms")
     group.add_argument("-u", "--input_url", default="", help="URL to a file containing CV terms")
-    parser.add_argument("-A", "--database_authority", required=True,
-                        help="database authority of the terms in the file, e.g. 'GO'")
+    group.add_argument("--manifest", default="",
+                       help="YAML file listing several ontologies to import, each with 'database_authority', "
+                            "'file' or 'url', and optionally 'format' (implies --bulk)")
+    parser.add_argument("-A", "--database_authority", default="",
+                        help="database authority of the terms in the file, e.g. 'GO' (required unless --manifest "
+                             "is given)")
     parser.add_argument("-F", "--format", default="obo", choices=["obo", "owl"],
                         help="format of the file (default: obo)")
+    parser.add_argument("--bulk", action="store_true",
+                        help="compare the terms with a snapshot of the database and write all changes in batches")
+    parser.add_argument("--streaming", action="store_true",
+                        help="read OBO/OWL files with a streaming parser that only retains the terms of the database "
+                             "authority (implies --bulk)")
+    parser.add_argument("--processes", type=int, help="number of parallel processes parsing the files of a manifest "
+                                                      "(default: number of CPUs)")
+    parser.add_argument("--cache_directory", default="",
+                        help="directory in which downloaded files are cached; a file is only downloaded again if it "
+                             "has changed on the server")
+    parser.add_argument("--force", action="store_true",
+                        help="import the ontology even if its version ('data-version') has already been imported")
+    parser.add_argument("--dry_run", action="store_true",
+                        help="compute the changes without writing them to the database, and report them in JSON "
+                             "format together with the run times of parsing, snapshot and diff (implies --bulk)")
+    parser.add_argument("--report_file", default="",
+                        help="file into which the report of a dry run is written (default: stdout)")
+
+
+def check_import_ontology_arguments(parser: argparse.ArgumentParser, arguments: argparse.Namespace):
+    """Checks combinations of arguments for the 'chado import ontology' sub-command that argparse cannot express"""
+    if arguments.manifest and arguments.dry_run:
+        parser.error("argument --dry_run: not allowed with argument --manifest")
+    if not arguments.manifest and not arguments.database_authority:
+        parser.error("argument -A/--database_authority is required unless --manifest is given")
 
 
 def add_import_gff_arguments(parser: argparse.ArgumentParser):
@@ -479,6 +535,27 @@ def add_import_gaf_arguments(parser: argparse.ArgumentParser):
     parser.add_argument("-L", "--annotation_level", choices=["default", "gene", "transcript", "protein"],
                         default="default", help="level to which GO terms are related in the database (default: "
                                                 "same level as in the input file)")
+    parser.add_argument("--batch_size", type=int, default=0,
+                        help="number of features whose GAF records are grouped and imported together "
+                             "(default: 0, i.e. import record by record)")
+    parser.add_argument("--cache_directory", default="",
+                        help="directory in which the lookup tables of the ontologies are cached between runs")
+
+
+def add_import_gpad_arguments(parser: argparse.ArgumentParser):
+    """Defines formal arguments for the 'chado import gpad' sub-command"""
+    parser.add_argument("-f", "--input_file", required=True, help="GPAD input file")
+    parser.add_argument("--gpi_file", help="GPI input file describing the gene products referenced in the GPAD file")
+    parser.add_argument("-a", "--abbreviation", required=True, dest="organism",
+                        help="abbreviation/short name of the organism")
+    parser.add_argument("-L", "--annotation_level", choices=["default", "gene", "transcript", "protein"],
+                        default="default", help="level to which GO terms are related in the database (default: "
+                                                "same level as in the input file)")
+    parser.add_argument("--batch_size", type=int, default=0,
+                        help="number of features whose GPAD records are grouped and imported together "
+                             "(default: 0, i.e. import record by record)")
+    parser.add_argument("--cache_directory", default="",
+                        help="directory in which the lookup tables of the ontologies are cached between runs")
 
 
 def add_export_arguments(parser: argparse.ArgumentParser):
@@ -500,19 +577,47 @@ def add_export_arguments_by_command(command: str, parser: argparse.ArgumentParse
         add_export_gff_arguments(parser)
     elif command == "gaf":
         add_export_gaf_arguments(parser)
+    elif command in ["gpad", "gpi"]:
+        add_export_gpad_arguments(parser, command)
     else:
         print("Command '" + parser.prog + "' is not available.")
 
 
 def add_export_fasta_arguments(parser: argparse.ArgumentParser):
     """Defines formal arguments for the 'chado export fasta' sub-command"""
-    parser.add_argument("-f", "--output_file", required=True, help="FASTA output file")
-    parser.add_argument("-a", "--abbreviation", required=True, dest="organism",
-                        help="abbreviation/short name of the organism")
-    parser.add_argument("-t", "--sequence_type", required=True, choices=["contigs", "genes", "proteins"],
-                        help="type of the sequences to be exported")
+    parser.add_argument("-f", "--output_file", required=True,
+                        help="FASTA output file (the organism and/or sequence type are inserted into the file name "
+                             "if several are exported)")
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument("-a", "--abbreviation", dest="organism", help="abbreviation/short name of the organism")
+    group.add_argument("--all_organisms", action="store_true", help="export sequences of all organisms")
+    parser.add_argument("-t", "--sequence_type", required=True, type=fasta_sequence_types,
+                        help="type of the sequences to be exported, or a comma-separated list of types "
+                             "(choose from 'contigs', 'genes', 'proteins')")
     parser.add_argument("-r", "--release", help="name of the FASTA release")
     parser.add_argument("--include_obsolete", action="store_true", help="export all features, including obsoletes")
+    parser.add_argument("--processes", type=int, help="number of parallel processes used with --all_organisms "
+                                                      "(default: number of CPUs)")
+    parser.add_argument("--cache_directory", help="directory for a local cache of top-level sequences, from "
+                                                  "which gene sequences are extracted (default: no cache)")
+    parser.add_argument("--cache_size", type=int, default=1024,
+                        help="maximum size of the sequence cache in MB (default: 1024)")
+
+
+def fasta_sequence_types(value: str) -> str:
+    """Checks that a (comma-separated list of) sequence type(s) for FASTA export is valid"""
+    for sequence_type in value.split(","):
+        if sequence_type.strip() not in ["contigs", "genes", "proteins"]:
+            raise argparse.ArgumentTypeError("invalid sequence type: '" + sequence_type + "'")
+    return value
+
+
+def comma_separated_list(value: str) -> list:
+    """Splits a comma-separated list into its non-empty elements"""
+    elements = [element.strip() for element in value.split(",") if element.strip()]
+    if not elements:
+        raise argparse.ArgumentTypeError("empty list: '" + value + "'")
+    return elements
 
 
 def add_export_gff_arguments(parser: argparse.ArgumentParser):
@@ -527,7 +632,28 @@ def add_export_gff_arguments(parser: argparse.ArgumentParser):
 
 def add_export_gaf_arguments(parser: argparse.ArgumentParser):
     """Defines formal arguments for the 'chado export gff' sub-command"""
-    parser.add_argument("-f", "--output_file", required=True, help="GAF output file")
+    parser.add_argument("-f", "--output_file", required=True,
+                        help="GAF output file (the organism is inserted into the file name if several are exported)")
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument("-a", "--abbreviation", dest="organism", help="abbreviation/short name of the organism")
+    group.add_argument("--organisms", type=comma_separated_list,
+                       help="comma-separated list of abbreviations/short names of organisms")
+    group.add_argument("--all_organisms", action="store_true", help="export annotations of all organisms")
+    parser.add_argument("-A", "--database_authority", required=True,
+                        help="database from which the file is created, e.g. 'UniProtKB'")
+    parser.add_argument("-L", "--annotation_level", choices=["default", "gene", "transcript", "protein"],
+                        default="default", help="level to which GO terms are related in the output file (default: "
+                                                "same level as in the database)")
+    parser.add_argument("--include_obsolete", action="store_true", help="export all features, including obsoletes")
+    parser.add_argument("--gaf_version", choices=["1.0", "2.1", "2.2"], default="1.0",
+                        help="version of the GAF output format (default: 1.0)")
+    parser.add_argument("--processes", type=int, help="number of parallel processes used with --organisms or "
+                                                      "--all_organisms (default: number of CPUs)")
+
+
+def add_export_gpad_arguments(parser: argparse.ArgumentParser, command: str):
+    """Defines formal arguments for the 'chado export gpad' and 'chado export gpi' sub-commands"""
+    parser.add_argument("-f", "--output_file", required=True, help=command.upper() + " output file")
     parser.add_argument("-a", "--abbreviation", required=True, dest="organism",
                         help="abbreviation/short name of the organism")
     parser.add_argument("-A", "--database_authority", required=True,
@@ -0,0 +1,205 @@
+import io
+import array
+import collections
+from typing import List, Tuple, Iterator
+import sqlalchemy.orm
+from . import iobase
+from .. import utils
+from ..orm import cv
+
+# Number of paths transferred to the database with a single COPY statement
+COPY_CHUNK_SIZE = 100000
+
+
+def build_adjacency(number_of_nodes: int, edges: List[Tuple[int, int, int]]) -> Tuple[array.array, array.array,
+                                                                                     array.array]:
+    """Converts a list of (subject, object, type) edges between integer-indexed nodes into adjacency arrays, with the
+    objects and types of the edges of node i located at positions offsets[i] to offsets[i+1]"""
+    offsets = array.array("q", [0] * (number_of_nodes + 1))
+    for subject_index, _, _ in edges:
+        offsets[subject_index + 1] += 1
+    for index in range(number_of_nodes):
+        offsets[index + 1] += offsets[index]
+    objects = array.array("q", [0] * len(edges))
+    types = array.array("q", [0] * len(edges))
+    positions = array.array("q", offsets[:number_of_nodes])
+    for subject_index, object_index, type_index in edges:
+        objects[positions[subject_index]] = object_index
+        types[positions[subject_index]] = type_index
+        positions[subject_index] += 1
+    return offsets, objects, types
+
+
+def compose_path_types(first_type: int, second_type: int, transparent_type: int) -> int:
+    """Determines the type of a path consisting of two consecutive paths; the transparent type (is_a) adopts the type
+    of the other path, and paths of two different other types cannot be composed (-1)"""
+    if first_type == transparent_type or first_type == second_type:
+        return second_type
+    if second_type == transparent_type:
+        return first_type
+    return -1
+
+
+def compute_transitive_closure(number_of_nodes: int, edges: List[Tuple[int, int, int]], number_of_types: int,
+                               transparent_type=-1) -> Iterator[Tuple[int, int, int, int]]:
+    """Computes all paths between integer-indexed nodes, and yields them as (subject, object, type, distance) tuples
+    with the minimum distance per subject, object and type"""
+    edges = [edge for edge in edges if edge[0] != edge[1]]
+    offsets, objects, types = build_adjacency(number_of_nodes, edges)
+    child_offsets, children, _ = build_adjacency(number_of_nodes, [(obj, subj, 0) for subj, obj, _ in edges])
+
+    # Process the nodes of the DAG such that all parents of a node are processed before the node itself, and discard
+    # the paths of a node once they have been extended to all its children
+    pending_parents = array.array("q", [offsets[index + 1] - offsets[index] for index in range(number_of_nodes)])
+    pending_children = array.array("q", [child_offsets[index + 1] - child_offsets[index]
+                                         for index in range(number_of_nodes)])
+    ready_nodes = collections.deque(index for index in range(number_of_nodes) if not pending_parents[index])
+    node_paths = {}
+    processed = 0
+    while ready_nodes:
+        node = ready_nodes.popleft()
+        processed += 1
+        paths = {}
+        for position in range(offsets[node], offsets[node + 1]):
+            parent, edge_type = objects[position], types[position]
+            paths[parent * number_of_types + edge_type] = 1
+            for key, distance in node_paths[parent].items():
+                ancestor, path_type = divmod(key, number_of_types)
+                path_type = compose_path_types(edge_type, path_type, transparent_type)
+                if path_type >= 0 and paths.get(ancestor * number_of_types + path_type, distance + 2) > distance + 1:
+                    paths[ancestor * number_of_types + path_type] = distance + 1
+            pending_children[parent] -= 1
+            if not pending_children[parent]:
+                del node_paths[parent]
+        for key, distance in paths.items():
+            ancestor, path_type = divmod(key, number_of_types)
+            yield node, ancestor, path_type, distance
+        if pending_children[node]:
+            node_paths[node] = paths
+        for position in range(child_offsets[node], child_offsets[node + 1]):
+            pending_parents[children[position]] -= 1
+            if not pending_parents[children[position]]:
+                ready_nodes.append(children[position])
+
+    # Nodes within or below a cycle are handled by a breadth-first search
+    if processed < number_of_nodes:
+        for node in range(number_of_nodes):
+            if pending_parents[node]:
+                yield from search_paths(node, offsets, objects, types, transparent_type)
+
+
+def search_paths(node: int, offsets: array.array, objects: array.array, types: array.array,
+                 transparent_type=-1) -> Iterator[Tuple[int, int, int, int]]:
+    """Yields all paths starting at a given node as (subject, object, type, distance) tuples with minimum distance,
+    using a breadth-first search over the adjacency arrays"""
+    visited = set()
+    queue = collections.deque((objects[position], types[position], 1)
+                              for position in range(offsets[node], offsets[node + 1]))
+    while queue:
+        ancestor, path_type, distance = queue.popleft()
+        if (ancestor, path_type) in visited:
+            continue
+        visited.add((ancestor, path_type))
+        if ancestor != node:
+            yield node, ancestor, path_type, distance
+        for position in range(offsets[ancestor], offsets[ancestor + 1]):
+            next_type = compose_path_types(path_type, types[position], transparent_type)
+            if next_type >= 0 and (objects[position], next_type) not in visited:
+                queue.append((objects[position], next_type, distance + 1))
+
+
+class CvTermPathClient(iobase.ChadoClient):
+    """Class for filling the 'cvtermpath' table with the transitive closure of the relationships of a vocabulary"""
+
+    def __init__(self, uri: str, verbose=False, test_environment=False):
+        """Constructor"""
+
+        # Connect to database
+        self.test_environment = test_environment
+        if self.test_environment:
+            self.printer = utils.VerbosePrinter(verbose)
+        else:
+            super().__init__(uri, verbose)
+
+        # Load essentials
+        if not self.test_environment:
+            self._load_essentials()
+
+    def __del__(self):
+        """Destructor - disconnect from database"""
+        if not self.test_environment:
+            super().__del__()
+
+    def _load_essentials(self) -> None:
+        """Loads essential database entries"""
+        self._is_a_term = self._load_cvterm_from_cv("is_a", "relationship")
+
+    def compute(self, vocabulary: str) -> None:
+        """Computes all paths between the terms of a vocabulary, and updates the 'cvtermpath' table accordingly"""
+        cv_entry = self.query_first(cv.Cv, name=vocabulary)
+        if not cv_entry:
+            raise iobase.DatabaseError("CV '" + vocabulary + "' not present in database")
+        cvterm_ids = [cvterm_id for cvterm_id, in self.session.query(cv.CvTerm.cvterm_id).filter(
+            cv.CvTerm.cv_id == cv_entry.cv_id)]
+        relationships = self._load_relationships(cv_entry.cv_id)
+        existing_paths = self._load_paths(cv_entry.cv_id)
+
+        # Compare the computed paths with the existing ones, such that only the differences are written
+        new_paths = []
+        for path in self._compute_paths(cvterm_ids, relationships):
+            if existing_paths.pop(path, None) is None:
+                new_paths.append(path)
+        self._delete_paths(list(existing_paths.values()))
+        self._copy_paths(new_paths, cv_entry.cv_id)
+        self.session.commit()
+        self.printer.print("Inserted " + str(len(new_paths)) + " and deleted " + str(len(existing_paths))
+                           + " paths of vocabulary '" + vocabulary + "'")
+
+    def _load_relationships(self, cv_id: int) -> List[Tuple[int, int, int]]:
+        """Loads all relationships between terms of a vocabulary as (subject, object, type) tuples"""
+        object_term = sqlalchemy.orm.aliased(cv.CvTerm)
+        return self.session.query(cv.CvTermRelationship.subject_id, cv.CvTermRelationship.object_id,
+                                  cv.CvTermRelationship.type_id)\
+            .join(cv.CvTerm, cv.CvTermRelationship.subject_id == cv.CvTerm.cvterm_id)\
+            .join(object_term, cv.CvTermRelationship.object_id == object_term.cvterm_id)\
+            .filter(cv.CvTerm.cv_id == cv_id)\
+            .filter(object_term.cv_id == cv_id)\
+            .all()
+
+    def _load_paths(self, cv_id: int) -> dict:
+        """Loads the existing paths of a vocabulary, keyed by (subject, object, type, distance)"""
+        query = self.session.query(cv.CvTermPath.subject_id, cv.CvTermPath.object_id, cv.CvTermPath.type_id,
+                                   cv.CvTermPath.pathdistance, cv.CvTermPath.cvtermpath_id)\
+            .filter(cv.CvTermPath.cv_id == cv_id)
+        return {(subject_id, object_id, type_id, distance): cvtermpath_id
+                for subject_id, object_id, type_id, distance, cvtermpath_id in query}
+
+    def _compute_paths(self, cvterm_ids: List[int], relationships: List[Tuple[int, int, int]]) \
+            -> Iterator[Tuple[int, int, int, int]]:
+        """Computes the transitive closure of the relationships between CV terms, and yields the paths as
+        (subject, object, type, distance) tuples of database IDs"""
+        node_indices = {cvterm_id: index for index, cvterm_id in enumerate(cvterm_ids)}
+        type_ids = sorted(set(type_id for _, _, type_id in relationships) | {self._is_a_term.cvterm_id})
+        type_indices = {type_id: index for index, type_id in enumerate(type_ids)}
+        edges = [(node_indices[subject_id], node_indices[object_id], type_indices[type_id])
+                 for subject_id, object_id, type_id in relationships]
+        for subject_index, object_index, type_index, distance in compute_transitive_closure(
+                len(cvterm_ids), edges, len(type_ids), type_indices[self._is_a_term.cvterm_id]):
+            yield cvterm_ids[subject_index], cvterm_ids[object_index], type_ids[type_index], distance
+
+    def _delete_paths(self, cvtermpath_ids: List[int]) -> None:
+        """Deletes paths with a single DELETE statement"""
+        if cvtermpath_ids:
+            cursor = self.session.connection().connection.cursor()
+            cursor.execute("DELETE FROM " + cv.CvTermPath.__table__.fullname + " WHERE cvtermpath_id = ANY(%s)",
+                           (cvtermpath_ids,))
+
+    def _copy_paths(self, paths: List[Tuple[int, int, int, int]], cv_id: int) -> None:
+        """Inserts paths into the 'cvtermpath' table with COPY statements"""
+        cursor = self.session.connection().connection.cursor()
+        statement = "COPY " + cv.CvTermPath.__table__.fullname \
+                    + " (subject_id, object_id, type_id, pathdistance, cv_id) FROM STDIN"
+        for chunk in utils.split_into_chunks(paths, COPY_CHUNK_SIZE):
+            buffer = io.StringIO("".join("\t".join(str(value) for value in path) + "\t" + str(cv_id) + "\n"
+                                         for path in chunk))
+            cursor.copy_expert(statement, buffer)
@@ -70,7 +70,7 @@ class EssentialsClient(iobase.ChadoClient):
 
         # non-relationship types
         for term in ["comment", "is_anonymous", "is_transitive", "is_anti_symmetric", "is_reflexive", "is_symmetric",
-                     "is_cyclic"]:
+                     "is_cyclic", "data_version"]:
 
             new_dbxref = general.DbxRef(db_id=propertytype_db.db_id, accession=term)
             dbxref = self._handle_dbxref(new_dbxref, propertytype_db.name)
@@ -1,11 +1,46 @@
 import os
+import mmap
+import tempfile
+import collections
+import multiprocessing
 import urllib.parse
-from typing import Union, List
+from typing import Union, List, Dict, Iterator
+import sqlalchemy.orm
+import sqlalchemy.orm.attributes
 from Bio import SeqIO, Seq
-from . import iobase
+from . import iobase, packing
 from .. import utils
 from ..orm import cv, organism, sequence
 
+# Lightweight FASTA record, exposing the same attributes as a SeqRecord that are used by the import
+FastaRecord = collections.namedtuple("FastaRecord", ["id", "description", "seq"])
+
+
+def parse_fasta(filename: str) -> Iterator[FastaRecord]:
+    """Iterates over the entries of a (potentially gzipped) FASTA file and yields lightweight records"""
+    header = None
+    lines = []
+    with utils.open_file_read(filename) as file_handle:
+        for line in file_handle:
+            if line.startswith(">"):
+                if header is not None:
+                    yield create_fasta_record(header, lines)
+                header = line[1:].strip()
+                lines = []
+            elif header is not None:
+                lines.append(line.strip())
+        if header is not None:
+            yield create_fasta_record(header, lines)
+
+
+def create_fasta_record(header: str, lines: List[str]) -> FastaRecord:
+    """Creates a FASTA record from a header line and the lines of the sequence"""
+    identifier = header.split(None, 1)[0] if header else ""
+    residues = "".join(lines)
+    if " " in residues:
+        residues = residues.replace(" ", "")
+    return FastaRecord(id=identifier, description=header, seq=residues)
+
 
 class FastaImportClient(iobase.ChadoClient):
     """Class for importing genomic data from FASTA files into Chado"""
@@ -45,16 +80,21 @@ class FastaImportClient(iobase.ChadoClient):
             raise iobase.InputFileError("Input file '" + filename + "' does not exist.")
 
         # Loop over all entries in the FASTA file
-        for record in SeqIO.parse(filename, "fasta"):
+        feature_ids = []
+        for record in parse_fasta(filename):
 
             # Insert or update entries in the 'feature' table
             feature_entry = self._handle_sequence(record, default_organism, default_type)
             self._mark_as_top_level_sequence(feature_entry)
+            feature_ids.append(feature_entry.feature_id)
+
+        # Delete packed copies of residues, which are superseded by the imported ones
+        packing.delete_packed_residues(self.session, feature_ids)
 
         # Commit changes
         self.session.commit()
 
-    def _handle_sequence(self, fasta_record: SeqIO.SeqRecord, organism_entry: organism.Organism,
+    def _handle_sequence(self, fasta_record: FastaRecord, organism_entry: organism.Organism,
                          default_type_entry: cv.CvTerm) -> sequence.Feature:
         """Inserts or updates an entry in the 'feature' table and returns it"""
 
@@ -85,14 +125,14 @@ class FastaImportClient(iobase.ChadoClient):
         return featureprop_entry
 
     @staticmethod
-    def _create_feature(fasta_record: SeqIO.SeqRecord, organism_id: int, type_id: int) -> sequence.Feature:
+    def _create_feature(fasta_record: FastaRecord, organism_id: int, type_id: int) -> sequence.Feature:
         """Creates a feature object from a FASTA record"""
         residues = str(fasta_record.seq)
         return sequence.Feature(organism_id=organism_id, type_id=type_id, uniquename=fasta_record.id,
-                                residues=residues, seqlen=len(residues))
+                                residues=residues, seqlen=len(residues), md5checksum=utils.md5_checksum(residues))
 
     @staticmethod
-    def _extract_type(fasta_record: SeqIO.SeqRecord) -> Union[None, str]:
+    def _extract_type(fasta_record: FastaRecord) -> Union[None, str]:
         """Extracts the feature type from a FASTA record"""
         attributes = fasta_record.description.split('|')
         key_value_attributes = dict(attribute.split("=", 1) for attribute in attributes if "=" in attribute)
@@ -102,6 +142,161 @@ class FastaImportClient(iobase.ChadoClient):
         return None
 
 
+def split_sequence_types(sequence_type: str) -> List[str]:
+    """Splits a comma-separated list of sequence types, removing duplicates"""
+    sequence_types = []
+    for single_type in sequence_type.split(","):
+        single_type = single_type.strip()
+        if single_type and single_type not in sequence_types:
+            sequence_types.append(single_type)
+    return sequence_types
+
+
+def export_organism(uri: str, verbose: bool, filename: str, organism_name: str, sequence_type: str, release: str,
+                    include_obsolete_features: bool, cache_directory=None, cache_size=0) -> None:
+    """Exports the sequences of a single organism from Chado to FASTA files"""
+    client = FastaExportClient(uri, verbose)
+    if cache_directory:
+        client.use_sequence_cache(cache_directory, cache_size)
+    client.export(filename, organism_name, sequence_type, release, include_obsolete_features)
+
+
+def export_all_organisms(uri: str, verbose: bool, filename: str, sequence_type: str, release: str,
+                         include_obsolete_features=False, processes=None, cache_directory=None, cache_size=0) -> None:
+    """Exports the sequences of all organisms from Chado to FASTA files, using a pool of worker processes"""
+    client = FastaExportClient(uri, verbose)
+    organism_names = client._load_organism_names()
+    del client
+    arguments = [(uri, verbose, utils.insert_into_filename(filename, organism_name), organism_name, sequence_type,
+                  release, include_obsolete_features, cache_directory, cache_size)
+                 for organism_name in organism_names]
+    with multiprocessing.Pool(processes) as pool:
+        pool.starmap(export_organism, arguments)
+
+
+class SequenceCache(object):
+    """Class caching sequences of features in memory-mapped files on local disk. If the total size of the cache
+    exceeds the given limit, the least recently used files are evicted and unmapped. The cache directory can be
+    shared by concurrent processes."""
+
+    extension = ".seq"
+
+    def __init__(self, directory: str, max_size: int):
+        """Constructor"""
+        self.directory = directory
+        self.max_size = max_size
+        self.mapped_sequences = collections.OrderedDict()                   # type: Dict[str, mmap.mmap]
+        self.mapped_size = 0
+        os.makedirs(self.directory, exist_ok=True)
+
+    def __del__(self):
+        """Destructor - close all memory maps"""
+        self.close()
+
+    def close(self) -> None:
+        """Closes all memory maps"""
+        for mapped_sequence in self.mapped_sequences.values():
+            mapped_sequence.close()
+        self.mapped_sequences.clear()
+        self.mapped_size = 0
+
+    def get(self, feature_entry: sequence.Feature) -> Union[None, mmap.mmap]:
+        """Returns the memory-mapped sequence of a feature, writing it to the cache first if necessary"""
+        key = self.cache_key(feature_entry)
+        if key is None:
+            return None
+        if key in self.mapped_sequences:
+            self.mapped_sequences.move_to_end(key)
+            return self.mapped_sequences[key]
+
+        # Map the cache file; if it does not exist (anymore), e.g. because another process evicted it, write it anew
+        filename = os.path.join(self.directory, key + self.extension)
+        mapped_sequence = self._map(filename)
+        is_new_file = mapped_sequence is None
+        if is_new_file:
+            residues = feature_entry.residues
+            if not residues:
+                return None
+            mapped_sequence = self._store(filename, residues)
+
+        self.mapped_sequences[key] = mapped_sequence
+        self.mapped_size += len(mapped_sequence)
+        self._unmap()
+        if is_new_file:
+            self._evict()
+        return mapped_sequence
+
+    @staticmethod
+    def cache_key(feature_entry: sequence.Feature) -> Union[None, str]:
+        """Creates a key for a feature from the organism, the feature ID and the checksum of the residues. If the
+        feature has no checksum, it is computed from the residues; returns None if these are not available."""
+        checksum = feature_entry.md5checksum
+        if not checksum:
+            if not feature_entry.residues:
+                return None
+            checksum = utils.md5_checksum(feature_entry.residues)
+        return "_".join([str(feature_entry.organism_id), str(feature_entry.feature_id), checksum.strip()])
+
+    @staticmethod
+    def _map(filename: str) -> Union[None, mmap.mmap]:
+        """Maps an existing cache file into memory and marks it as recently used. Returns None if the file does not
+        exist. Once mapped, the sequence remains accessible even if the file is removed by another process."""
+        try:
+            with open(filename, "rb") as f:
+                mapped_sequence = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except FileNotFoundError:
+            return None
+        try:
+            os.utime(filename)
+        except FileNotFoundError:
+            pass
+        return mapped_sequence
+
+    def _store(self, filename: str, residues: str) -> mmap.mmap:
+        """Writes a sequence to a cache file and maps it into memory. The file is written under a temporary name and
+        renamed when complete, so that concurrent processes never see a partially written file."""
+        file_descriptor, temporary_filename = tempfile.mkstemp(dir=self.directory)
+        with os.fdopen(file_descriptor, "wb") as f:
+            f.write(residues.encode("ascii"))
+            f.flush()
+            mapped_sequence = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        os.replace(temporary_filename, filename)
+        return mapped_sequence
+
+    def _unmap(self) -> None:
+        """Closes the least recently used memory maps until their total size is within the limit. The most recently
+        used map is always kept open."""
+        while self.mapped_size > self.max_size and len(self.mapped_sequences) > 1:
+            (_, mapped_sequence) = self.mapped_sequences.popitem(last=False)
+            self.mapped_size -= len(mapped_sequence)
+            mapped_sequence.close()
+
+    def _evict(self) -> None:
+        """Removes the least recently used cache files until the total size is within the limit"""
+        cached_files = []
+        total_size = 0
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(self.extension):
+                try:
+                    status = entry.stat()
+                except FileNotFoundError:
+                    continue
+                cached_files.append((status.st_mtime, status.st_size, entry.path))
+                total_size += status.st_size
+        cached_files.sort()
+        open_files = [os.path.join(self.directory, key + self.extension) for key in self.mapped_sequences]
+        for _, size, path in cached_files:
+            if total_size <= self.max_size:
+                break
+            if path in open_files:
+                continue
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total_size -= size
+
+
 class FastaExportClient(iobase.ChadoClient):
     """Class for exporting genomic data from Chado to FASTA files"""
 
@@ -109,6 +304,7 @@ class FastaExportClient(iobase.ChadoClient):
         """Constructor"""
 
         # Connect to database
+        self.sequence_cache = None                                          # type: Union[None, SequenceCache]
         self.test_environment = test_environment
         if not self.test_environment:
             super().__init__(uri, verbose)
@@ -119,9 +315,15 @@ class FastaExportClient(iobase.ChadoClient):
 
     def __del__(self):
         """Destructor - disconnect from database"""
+        if self.sequence_cache:
+            self.sequence_cache.close()
         if not self.test_environment:
             super().__del__()
 
+    def use_sequence_cache(self, directory: str, max_size: int) -> None:
+        """Enables a local cache of memory-mapped top-level sequences, from which gene sequences are sliced"""
+        self.sequence_cache = SequenceCache(directory, max_size)
+
     def _load_essentials(self) -> None:
         """Loads essential database entries"""
         self._sequence_terms = self._load_terms_from_cv_dict(
@@ -132,20 +334,58 @@ class FastaExportClient(iobase.ChadoClient):
 
     def export(self, filename: str, organism_name: str, sequence_type: str, release: str,
                include_obsolete_features=False):
-        """Exports sequences from Chado to a FASTA file"""
+        """Exports sequences from Chado to a FASTA file. If several comma-separated sequence types are requested,
+        one file is written per type, sharing a single pass over the organism's features."""
 
-        # Load dependencies and features of interest
+        # Load dependencies and features shared by all sequence types
+        sequence_types = split_sequence_types(sequence_type)
         organism_entry = self._load_organism(organism_name)
         genome_version = self._extract_genome_version(organism_entry)
-        feature_entries = self._extract_features_by_type(organism_entry, sequence_type)
-        srcfeature_entries = self._extract_srcfeatures_by_type(organism_entry, sequence_type)
+        top_level_entries = []
+        if "contigs" in sequence_types or "genes" in sequence_types:
+            load_residues = "contigs" in sequence_types or not self.sequence_cache
+            top_level_entries = self._extract_top_level_features(organism_entry, load_residues)
+
+        # Loop over all sequence types of interest
+        for single_type in sequence_types:
+            records = self._create_fasta_records(organism_entry, single_type, top_level_entries, genome_version,
+                                                 release, include_obsolete_features)
+
+            # Write all FASTA records to file
+            if len(sequence_types) > 1:
+                SeqIO.write(records, utils.insert_into_filename(filename, single_type), "fasta")
+            else:
+                SeqIO.write(records, filename, "fasta")
+
+    def _create_fasta_records(self, organism_entry: organism.Organism, sequence_type: str,
+                              top_level_entries: List[sequence.Feature], genome_version: str, release: str,
+                              include_obsolete_features: bool) -> List[SeqIO.SeqRecord]:
+        """Creates sorted FASTA records for all features of a given sequence type"""
+
+        # Proteins are extracted from a single projected query
+        if sequence_type == "proteins":
+            return self._create_protein_fasta_records(organism_entry, genome_version, release,
+                                                      include_obsolete_features)
+
+        # Load features of interest
+        if sequence_type == "contigs":
+            feature_entries = top_level_entries
+        else:
+            feature_entries = self._extract_features_by_type(organism_entry, sequence_type)
+        if sequence_type == "genes":
+            srcfeature_entries = top_level_entries
+        else:
+            srcfeature_entries = []
+        type_entries = {}                                                   # type: Dict[int, cv.CvTerm]
         records = []
 
         # Loop over all features of interest
         for feature_entry in feature_entries:
 
             # Get feature type
-            type_entry = self.query_first(cv.CvTerm, cvterm_id=feature_entry.type_id)
+            if feature_entry.type_id not in type_entries:
+                type_entries[feature_entry.type_id] = self.query_first(cv.CvTerm, cvterm_id=feature_entry.type_id)
+            type_entry = type_entries[feature_entry.type_id]
 
             # Create FASTA record
             residues = self._extract_residues_by_type(feature_entry, srcfeature_entries, sequence_type)
@@ -155,9 +395,42 @@ class FastaExportClient(iobase.ChadoClient):
                                                    genome_version, release)
                 records.append(record)
 
-        # Write all FASTA records to file
         records.sort(key=self._sort_record_key)
-        SeqIO.write(records, filename, "fasta")
+        return records
+
+    def _create_protein_fasta_records(self, organism_entry: organism.Organism, genome_version: str, release: str,
+                                      include_obsolete_features: bool) -> List[SeqIO.SeqRecord]:
+        """Creates sorted FASTA records for all proteins of an organism. The parts of the header that are the same
+        for all proteins are only computed once."""
+
+        # Precompute header attributes
+        organism_pair = self._organism_key_value_pair(organism_entry)
+        trailing_pairs = []
+        if genome_version:
+            trailing_pairs.append(self._genome_version_key_value_pair(genome_version))
+        if release:
+            trailing_pairs.append(self._release_key_value_pair(release))
+        type_pairs = {}                                                     # type: Dict[str, str]
+        records = []
+
+        # Loop over all proteins
+        query = self.query_protein_sequences(organism_entry.organism_id, self._sequence_terms["gene"].cvterm_id,
+                                             self._part_of_term.cvterm_id, self._derives_from_term.cvterm_id)
+        for uniquename, name, type_name, residues, is_obsolete in query:
+            if not self._are_residues_valid(residues, "proteins") or (is_obsolete and not include_obsolete_features):
+                continue
+            if type_name not in type_pairs:
+                type_pairs[type_name] = self._type_name_key_value_pair(type_name)
+            attributes_as_list = ["", organism_pair, type_pairs[type_name]]
+            if name:
+                attributes_as_list.append(self._feature_name_key_value_pair(name))
+            attributes_as_list.extend(trailing_pairs)
+            attributes_as_string = " | ".join(attributes_as_list).strip()
+            records.append(SeqIO.SeqRecord(Seq.Seq(residues), id=uniquename, name=uniquename,
+                                           description=attributes_as_string))
+
+        records.sort(key=self._sort_record_key)
+        return records
 
     @staticmethod
     def _sort_record_key(record: SeqIO.SeqRecord):
@@ -173,14 +446,28 @@ class FastaExportClient(iobase.ChadoClient):
                                  description=attributes)
         return record
 
-    def _extract_srcfeatures_by_type(self, organism_entry: organism.Organism, sequence_type: str
-                                     ) -> List[sequence.Feature]:
-        """Extract features from the database"""
-        srcfeature_entries = []
-        if sequence_type == "genes":
-            srcfeature_entries = self.query_features_by_property_type(organism_entry.organism_id,
-                                                                      self._top_level_term.cvterm_id).all()
-        return srcfeature_entries
+    def _extract_top_level_features(self, organism_entry: organism.Organism, load_residues=True
+                                    ) -> List[sequence.Feature]:
+        """Extract top-level features from the database. If residues are not loaded immediately, they are only
+        loaded on first access."""
+        query = self.query_features_by_property_type(organism_entry.organism_id, self._top_level_term.cvterm_id)
+        if not load_residues:
+            return query.options(sqlalchemy.orm.defer(sequence.Feature.residues)).all()
+        feature_entries = query.all()
+        self._restore_packed_residues(feature_entries)
+        return feature_entries
+
+    def _restore_packed_residues(self, feature_entries: List[sequence.Feature]) -> None:
+        """Fills in the residues of features that are stored in packed form in a side table"""
+        packed_feature_ids = [feature_entry.feature_id for feature_entry in feature_entries
+                              if feature_entry.residues is None and feature_entry.seqlen]
+        if not packed_feature_ids:
+            return
+        all_residues = packing.load_packed_residues(self.session, packed_feature_ids)
+        for feature_entry in feature_entries:
+            if feature_entry.feature_id in all_residues:
+                sqlalchemy.orm.attributes.set_committed_value(feature_entry, "residues",
+                                                              all_residues[feature_entry.feature_id])
 
     def _extract_features_by_type(self, organism_entry: organism.Organism, sequence_type: str
                                   ) -> List[sequence.Feature]:
@@ -240,11 +527,7 @@ class FastaExportClient(iobase.ChadoClient):
             return None
 
         # Extract the nucleotide sequence
-        matching_entry = matching_entries[0]
-        if len(matching_entry.residues) >= featureloc_entry.fmax + 1:
-            residues = matching_entry.residues[featureloc_entry.fmin:featureloc_entry.fmax].upper()
-        else:
-            residues = None
+        residues = self._slice_residues(matching_entries[0], featureloc_entry.fmin, featureloc_entry.fmax)
 
         # Compute the complementary sequence, if necessary
         if residues and featureloc_entry.strand < 0:
@@ -252,6 +535,19 @@ class FastaExportClient(iobase.ChadoClient):
             residues = str(sequence_object.reverse_complement())
         return residues
 
+    def _slice_residues(self, srcfeature_entry: sequence.Feature, fmin: int, fmax: int) -> Union[None, str]:
+        """Extracts a part of the residues of a feature, either from the sequence cache or from the feature itself"""
+        if self.sequence_cache:
+            mapped_residues = self.sequence_cache.get(srcfeature_entry)
+            if mapped_residues is None and srcfeature_entry.seqlen:
+                self._restore_packed_residues([srcfeature_entry])
+                mapped_residues = self.sequence_cache.get(srcfeature_entry)
+            if mapped_residues is not None and len(mapped_residues) >= fmax + 1:
+                return mapped_residues[fmin:fmax].decode("ascii").upper()
+        elif srcfeature_entry.residues and len(srcfeature_entry.residues) >= fmax + 1:
+            return srcfeature_entry.residues[fmin:fmax].upper()
+        return None
+
     def _extract_genome_version(self, organism_entry: organism.Organism) -> Union[None, str]:
         """Extracts the version of a genome from the database"""
         version_cvterm = self._load_cvterm("version")
@@ -301,9 +597,13 @@ class FastaExportClient(iobase.ChadoClient):
     @staticmethod
     def _type_key_value_pair(type_entry: cv.CvTerm):
         """Creates a key-value pair for the FASTA header with the type of the sequence"""
+        return FastaExportClient._type_name_key_value_pair(type_entry.name)
+
+    @staticmethod
+    def _type_name_key_value_pair(type_name: str):
+        """Creates a key-value pair for the FASTA header with the name of the type of the sequence"""
         type_key = "sequence_type"
-        type_name = urllib.parse.quote(type_entry.name)
-        type_pair = "=".join([type_key, type_name])
+        type_pair = "=".join([type_key, urllib.parse.quote(type_name)])
         return type_pair
 
     @staticmethod
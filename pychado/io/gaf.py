@@ -1,10 +1,215 @@
-from typing import List, Set, Dict, Union
+import collections
+import datetime
+import gzip
+import itertools
+import multiprocessing
+import operator
+import time
+from typing import List, Set, Dict, Tuple, Iterable, Iterator, Union
 from Bio.UniProt import GOA
 from . import iobase, ontology
 from .. import utils
 from ..orm import general, cv, organism, pub, sequence
 
 
+# Columns of a GAF file that can contain several values, separated by pipes
+GAF_MULTI_VALUED_COLUMNS = [3, 5, 7, 10, 12]
+
+
+def parse_gaf(filename: str) -> Iterator[dict]:
+    """Iterates over the lines of a (potentially gzipped) GAF file of version 1.0 or 2.x and yields dictionaries
+    like Bio.UniProt.GOA.gafiterator"""
+    fields = GOA.GAF20FIELDS
+    with open_gaf_file(filename) as file_handle:
+        for line in file_handle:
+            if line[0] == "!":
+                check_gaf_version(line)
+                continue
+            columns = line.rstrip("\n").split("\t")
+            if len(columns) == 1:
+                continue
+            for index in GAF_MULTI_VALUED_COLUMNS:
+                columns[index] = columns[index].split("|")
+            yield dict(zip(fields, columns))
+
+
+def open_gaf_file(filename: str):
+    """Opens a (potentially gzipped) GAF file for read access; gzipped files are decompressed in this process"""
+    if filename and filename.endswith(".gz"):
+        return gzip.open(filename, "rt")
+    return utils.open_file_read(filename)
+
+
+def parse_gaf_with_biopython(filename: str) -> Iterator[dict]:
+    """Iterates over the lines of a (potentially gzipped) GAF file with Biopython and yields dictionaries"""
+    with open_gaf_file(filename) as file_handle:
+        yield from GOA.gafiterator(file_handle)
+
+
+def check_gaf_version(header_line: str) -> None:
+    """Checks that the version given in a header line of a GAF file is supported"""
+    if header_line.startswith("!gaf-version:"):
+        version = header_line.split(":", 1)[1].strip()
+        if version.split(".")[0] not in ["1", "2"]:
+            raise ValueError("Unknown GAF version: '" + version + "'")
+
+
+class GAFWriter(object):
+    """Streaming writer for GAF files of version 1.0, 2.1 or 2.2, which collects formatted lines in a buffer and
+    writes them to file in chunks"""
+
+    file_format = "gaf"
+    versions = {"1.0": GOA.GAF10FIELDS, "2.1": GOA.GAF20FIELDS, "2.2": GOA.GAF20FIELDS}
+    default_version = "1.0"
+
+    # Versions with only the version line in the header, and versions requiring a relation in the 'Qualifier' column
+    plain_header_versions = ["1.0"]
+    relation_versions = ["2.2"]
+
+    # Default relations between gene products and GO terms in the 'Qualifier' column, by aspect
+    default_relations = {"F": "enables", "P": "involved_in", "C": "located_in"}
+
+    def __init__(self, file_handle, version=None, buffer_size=10000):
+        """Constructor"""
+        version = version or self.default_version
+        if version not in self.versions:
+            raise ValueError("Unsupported " + self.file_format.upper() + " version: '" + version + "'")
+        self.file_handle = file_handle
+        self.version = version
+        self.fields = self.versions[version]
+        self.buffer_size = buffer_size
+        self._buffer = []                                           # type: List[str]
+        self._select_columns = operator.itemgetter(*self.fields)
+        self._qualifier_index = self.fields.index("Qualifier") if version in self.relation_versions else None
+
+    def write_header(self, generated_by: str) -> None:
+        """Writes the header of a file"""
+        header = ["!" + self.file_format + "-version: " + self.version]
+        if self.version not in self.plain_header_versions:
+            header.append("!generated-by: " + generated_by)
+            header.append("!date-generated: " + datetime.date.today().isoformat())
+        self.file_handle.write("\n".join(header) + "\n")
+
+    def write_record(self, gaf_record: dict) -> None:
+        """Adds a record to the buffer, and writes the buffer to file when it is full"""
+        self._buffer.append(self.format_record(gaf_record))
+        if len(self._buffer) >= self.buffer_size:
+            self.flush()
+
+    def write_records(self, gaf_records: Iterable[dict]) -> None:
+        """Writes a stream of records to file"""
+        for gaf_record in gaf_records:
+            self.write_record(gaf_record)
+        self.flush()
+
+    def flush(self) -> None:
+        """Writes all buffered lines to file"""
+        if self._buffer:
+            self.file_handle.write("".join(self._buffer))
+            self._buffer.clear()
+
+    def format_record(self, gaf_record: dict) -> str:
+        """Converts a record into a tab-separated line with the columns of the file format version"""
+        try:
+            values = self._select_columns(gaf_record)
+        except KeyError:
+            values = tuple(gaf_record.get(field) for field in self.fields)
+        if self._qualifier_index is not None:
+            values = list(values)
+            values[self._qualifier_index] = self.format_relation(gaf_record)
+        return "\t".join([value if value.__class__ is str else ("|".join(value) if value else "")
+                          for value in values]) + "\n"
+
+    @staticmethod
+    def format_column(value: Union[None, str, List[str]]) -> str:
+        """Converts the value of a GAF column into a string; lists are separated by pipes"""
+        if value.__class__ is str:
+            return value
+        elif value:
+            return "|".join(value)
+        else:
+            return ""
+
+    def format_relation(self, gaf_record: dict) -> str:
+        """Creates the 'Qualifier' column of a record, which must contain a relation between gene product and GO
+        term"""
+        qualifiers = gaf_record.get("Qualifier")
+        if not qualifiers:
+            return self.default_relations.get(gaf_record.get("Aspect"), "")
+        if isinstance(qualifiers, str):
+            qualifiers = qualifiers.split("|")
+        if any(qualifier != "NOT" for qualifier in qualifiers):
+            return "|".join(qualifiers)
+        return "|".join(qualifiers + [self.default_relations.get(gaf_record.get("Aspect"), "")])
+
+
+class AnnotationLevelIndex(object):
+    """Index of the 'part_of' and 'derives_from' relationships between the features of an organism, used to map
+    genes, transcripts and polypeptides onto each other"""
+
+    def __init__(self, relationships: Iterable[tuple]):
+        """Constructor - groups (subject_id, subject_uniquename, object_id, object_uniquename, type_id) tuples by
+        relationship type and subject or object, respectively"""
+        self._parents = {}                                          # type: Dict[Tuple[int, int], List[int]]
+        self._children = {}                                         # type: Dict[Tuple[int, int], List[int]]
+        uniquenames = {}
+        for subject_id, subject_uniquename, object_id, object_uniquename, type_id in relationships:
+            uniquenames[subject_id] = subject_uniquename
+            uniquenames[object_id] = object_uniquename
+            self._parents.setdefault((type_id, subject_id), []).append(object_id)
+            self._children.setdefault((type_id, object_id), []).append(subject_id)
+        for related_ids in itertools.chain(self._parents.values(), self._children.values()):
+            related_ids.sort(key=uniquenames.get)
+
+    def parent(self, feature_id: Union[None, int], type_id: int) -> Union[None, int]:
+        """Returns the ID of the first parent of a feature (sorted by uniquename) for a given relationship type"""
+        related_ids = self._parents.get((type_id, feature_id))
+        return related_ids[0] if related_ids else None
+
+    def child(self, feature_id: Union[None, int], type_id: int) -> Union[None, int]:
+        """Returns the ID of the first child of a feature (sorted by uniquename) for a given relationship type"""
+        related_ids = self._children.get((type_id, feature_id))
+        return related_ids[0] if related_ids else None
+
+
+class FeatureCvTermIndex(object):
+    """Index of the existing 'feature_cvterm' entries of an organism for one ontology, used to check for the
+    existence of an annotation without querying the database"""
+
+    def __init__(self, entries: Iterable[sequence.FeatureCvTerm]):
+        """Constructor - indexes entries by (feature_id, cvterm_id, pub_id, rank) and by (feature_id, cvterm_id)"""
+        self._entries = {}          # type: Dict[Tuple[int, int, int, int], sequence.FeatureCvTerm]
+        self._terms = {}            # type: Dict[Tuple[int, int], sequence.FeatureCvTerm]
+        for entry in entries:
+            self.add(entry)
+
+    @staticmethod
+    def key(entry: sequence.FeatureCvTerm) -> Tuple[int, int, int, int]:
+        """Returns the unique key of a feature_cvterm entry"""
+        return entry.feature_id, entry.cvterm_id, entry.pub_id, entry.rank or 0
+
+    def __contains__(self, key: Tuple[int, int, int, int]) -> bool:
+        """Checks if an entry with a given (feature_id, cvterm_id, pub_id, rank) key exists"""
+        return key in self._entries
+
+    def __len__(self) -> int:
+        """Returns the number of indexed entries"""
+        return len(self._entries)
+
+    def add(self, entry: sequence.FeatureCvTerm) -> None:
+        """Adds an entry to the index"""
+        self._entries.setdefault(self.key(entry), entry)
+        self._terms.setdefault((entry.feature_id, entry.cvterm_id), entry)
+
+    def find(self, new_entry: sequence.FeatureCvTerm) -> Union[None, sequence.FeatureCvTerm]:
+        """Returns the existing entry with the same key as a new entry, or else the first existing entry linking
+        the same feature and CV term"""
+        existing_entry = self._entries.get(self.key(new_entry))
+        if existing_entry is None:
+            existing_entry = self._terms.get((new_entry.feature_id, new_entry.cvterm_id))
+        return existing_entry
+
+
 class GAFClient(iobase.ChadoClient):
 
     def __init__(self, uri: str, verbose=False, test_environment=False):
@@ -17,6 +222,11 @@ class GAFClient(iobase.ChadoClient):
         else:
             super().__init__(uri, verbose)
 
+        # Annotation level indices, feature types and feature entries loaded from the database
+        self._annotation_level_indices = {}                         # type: Dict[int, AnnotationLevelIndex]
+        self._feature_type_names = {}                               # type: Dict[int, str]
+        self._feature_entries = {}                                  # type: Dict[int, sequence.Feature]
+
         # Load essentials
         if not self.test_environment:
             self._load_essentials()
@@ -40,9 +250,11 @@ class GAFClient(iobase.ChadoClient):
         self._product_db = self._load_db("PRODUCT")
 
     def _extract_feature_type(self, feature_entry: sequence.Feature) -> str:
-        """Extracts the type of a feature by a database query"""
-        cvterm_entry = self.query_first(cv.CvTerm, cvterm_id=feature_entry.type_id)
-        return cvterm_entry.name
+        """Extracts the type of a feature by a database query, unless done before for the same type"""
+        if feature_entry.type_id not in self._feature_type_names:
+            cvterm_entry = self.query_first(cv.CvTerm, cvterm_id=feature_entry.type_id)
+            self._feature_type_names[feature_entry.type_id] = cvterm_entry.name
+        return self._feature_type_names[feature_entry.type_id]
 
     def _is_featuretype_valid(self, feature_entry: sequence.Feature) -> bool:
         """Checks if a feature has a valid type"""
@@ -55,12 +267,8 @@ class GAFClient(iobase.ChadoClient):
     def _extract_requested_feature(self, feature_entry: sequence.Feature, annotation_level: str
                                    ) -> sequence.Feature:
         """Extracts a gene, transcript or protein entry from the database, depending on the desired annotation level"""
-        if annotation_level == "gene":
-            requested_entry = self._extract_gene_of_feature(feature_entry)
-        elif annotation_level == "transcript":
-            requested_entry = self._extract_transcript_of_feature(feature_entry)
-        elif annotation_level == "protein":
-            requested_entry = self._extract_polypeptide_of_feature(feature_entry)
+        if annotation_level in self._annotation_levels():
+            requested_entry = self._extract_related_feature(feature_entry, annotation_level)
         else:
             requested_entry = feature_entry
         if not requested_entry:
@@ -71,55 +279,58 @@ class GAFClient(iobase.ChadoClient):
 
     def _extract_gene_of_feature(self, feature_entry: sequence.Feature) -> Union[None, sequence.Feature]:
         """Extracts the gene entry for a given feature, which can be a gene, transcript or polypeptide"""
-        featuretype = self._extract_feature_type(feature_entry)
-        if featuretype.lower() in self._gene_types():
-            gene_entry = feature_entry
-        elif featuretype.lower() in self._transcript_types():
-            gene_entry = self.query_parent_features(feature_entry.feature_id, [self._part_of_term.cvterm_id]).first()
-        elif featuretype.lower() in self._protein_types():
-            transcript_entry = self.query_parent_features(
-                feature_entry.feature_id, [self._derives_from_term.cvterm_id]).first()
-            if transcript_entry:
-                gene_entry = self.query_parent_features(
-                    transcript_entry.feature_id, [self._part_of_term.cvterm_id]).first()
-            else:
-                gene_entry = None
-        else:
-            gene_entry = None
-        return gene_entry
+        return self._extract_related_feature(feature_entry, "gene")
 
-    def _extract_transcript_of_feature(self, feature_entry: sequence.Feature) -> Union[None, sequence.Feature]:
-        """Extracts the transcript entry for a given feature, which can be a gene, transcript or polypeptide"""
-        featuretype = self._extract_feature_type(feature_entry)
-        if featuretype.lower() in self._gene_types():
-            transcript_entry = self.query_child_features(feature_entry.feature_id, self._part_of_term.cvterm_id).first()
-        elif featuretype.lower() in self._transcript_types():
-            transcript_entry = feature_entry
-        elif featuretype.lower() in self._protein_types():
-            transcript_entry = self.query_parent_features(
-                feature_entry.feature_id, [self._derives_from_term.cvterm_id]).first()
-        else:
-            transcript_entry = None
-        return transcript_entry
-
-    def _extract_polypeptide_of_feature(self, feature_entry: sequence.Feature) -> Union[None, sequence.Feature]:
-        """Extracts the polypeptide entry for a given feature, which can be a gene, transcript or polypeptide"""
+    def _extract_related_feature(self, feature_entry: sequence.Feature, annotation_level: str
+                                 ) -> Union[None, sequence.Feature]:
+        """Extracts the gene, transcript or polypeptide entry for a given feature, which can be a gene, transcript or
+        polypeptide"""
+        annotation_level_index = self._load_annotation_level_index(feature_entry.organism_id)
         featuretype = self._extract_feature_type(feature_entry)
+        related_id = self._find_related_feature_id(annotation_level_index, feature_entry.feature_id, featuretype,
+                                                   annotation_level)
+        if related_id is None:
+            return None
+        if related_id == feature_entry.feature_id:
+            return feature_entry
+        return self._load_feature_by_id(related_id)
+
+    def _load_feature_by_id(self, feature_id: int) -> sequence.Feature:
+        """Loads a feature entry from the database, unless done before"""
+        if feature_id not in self._feature_entries:
+            self._feature_entries[feature_id] = self.query_first(sequence.Feature, feature_id=feature_id)
+        return self._feature_entries[feature_id]
+
+    def _load_annotation_level_index(self, organism_id: int) -> AnnotationLevelIndex:
+        """Loads the relationships between genes, transcripts and polypeptides of an organism by a database query,
+        unless done before"""
+        if organism_id not in self._annotation_level_indices:
+            relationships = self.query_feature_relationships_by_organism(
+                organism_id, [self._part_of_term.cvterm_id, self._derives_from_term.cvterm_id]).all()
+            self._annotation_level_indices[organism_id] = AnnotationLevelIndex(relationships)
+        return self._annotation_level_indices[organism_id]
+
+    def _find_related_feature_id(self, annotation_level_index: AnnotationLevelIndex, feature_id: int,
+                                 featuretype: str, annotation_level: str) -> Union[None, int]:
+        """Finds the ID of the gene, transcript or polypeptide associated with a feature, which can be a gene,
+        transcript or polypeptide"""
+        part_of_id = self._part_of_term.cvterm_id
+        derives_from_id = self._derives_from_term.cvterm_id
         if featuretype.lower() in self._gene_types():
-            transcript_entry = self.query_child_features(feature_entry.feature_id, self._part_of_term.cvterm_id).first()
-            if transcript_entry:
-                polypeptide_entry = self.query_child_features(
-                    transcript_entry.feature_id, self._derives_from_term.cvterm_id).first()
-            else:
-                polypeptide_entry = None
+            gene_id = feature_id
+            transcript_id = annotation_level_index.child(gene_id, part_of_id)
+            polypeptide_id = annotation_level_index.child(transcript_id, derives_from_id)
         elif featuretype.lower() in self._transcript_types():
-            polypeptide_entry = self.query_child_features(
-                feature_entry.feature_id, self._derives_from_term.cvterm_id).first()
+            transcript_id = feature_id
+            gene_id = annotation_level_index.parent(transcript_id, part_of_id)
+            polypeptide_id = annotation_level_index.child(transcript_id, derives_from_id)
         elif featuretype.lower() in self._protein_types():
-            polypeptide_entry = feature_entry
+            polypeptide_id = feature_id
+            transcript_id = annotation_level_index.parent(polypeptide_id, derives_from_id)
+            gene_id = annotation_level_index.parent(transcript_id, part_of_id)
         else:
-            polypeptide_entry = None
-        return polypeptide_entry
+            return None
+        return {"gene": gene_id, "transcript": transcript_id, "protein": polypeptide_id}.get(annotation_level)
 
     def _convert_evidence_code(self, abbreviation: str) -> str:
         """Converts the abbreviation for an evidence code into the spelled-out version, if applicable"""
@@ -206,6 +417,11 @@ class GAFClient(iobase.ChadoClient):
         """Yields the default value for the GAF DB:Reference column"""
         return "GO_REF:0000002"
 
+    @staticmethod
+    def _annotation_levels() -> List[str]:
+        """Lists the annotation levels to which GO terms can be related"""
+        return ["gene", "transcript", "protein"]
+
     @staticmethod
     def _gene_types() -> List[str]:
         """Lists considered gene types"""
@@ -225,22 +441,65 @@ class GAFClient(iobase.ChadoClient):
 class GAFImportClient(GAFClient):
     """Class for importing genomic data from GAF files into Chado"""
 
-    def load(self, filename: str, organism_name: str, annotation_level: str):
+    def __init__(self, uri: str, verbose=False, test_environment=False):
+        """Constructor"""
+        super().__init__(uri, verbose, test_environment)
+
+        # Ontology terms loaded from the database, keyed by database authority and accession
+        self._ontology_terms = {}                   # type: Dict[str, Union[None, Tuple[general.Db, dict]]]
+
+        # Directory in which the lookup tables of the ontologies are cached
+        self._cache_directory = ""
+
+        # Entries of the 'db', 'cv', 'dbxref' and 'cvterm' tables, keyed by their natural keys
+        self._dimension_entries = {}
+
+        # Existing 'feature_cvterm' entries, keyed by organism and database authority of the ontology
+        self._feature_cvterm_indices = {}           # type: Dict[Tuple[int, int], FeatureCvTermIndex]
+
+        # Counters for ontologies and ontology terms that are not present in the database
+        self._unresolved_ontologies = collections.Counter()
+        self._unresolved_ontology_terms = collections.Counter()
+
+    def load(self, filename: str, organism_name: str, annotation_level: str, batch_size=0, use_biopython=False,
+             cache_directory=""):
         """Import data from a GAF file into a Chado database"""
+        if use_biopython:
+            gaf_records = parse_gaf_with_biopython(filename)
+        else:
+            gaf_records = parse_gaf(filename)
+        self._load_gaf_records(gaf_records, organism_name, annotation_level, batch_size, cache_directory)
+
+    def _load_gaf_records(self, gaf_records: Iterable[dict], organism_name: str, annotation_level: str,
+                          batch_size=0, cache_directory="") -> None:
+        """Imports a stream of GAF records into a Chado database"""
 
         # Load dependencies
+        self._cache_directory = cache_directory
         default_organism = self._load_organism(organism_name)
         features_with_product = set()
-
-        # Loop over all records in the GAF file
-        with open(filename) as f:
-            for gaf_record in GOA.gafiterator(f):
+        self._dimension_entries.clear()
+        self._feature_cvterm_indices.clear()
+        self._unresolved_ontologies.clear()
+        self._unresolved_ontology_terms.clear()
+        self._annotation_level_indices.clear()
+        self._feature_entries.clear()
+
+        # Loop over all records
+        if batch_size:
+            for grouped_gaf_records in self._group_gaf_records(gaf_records, batch_size):
+
+                # Import the records of a batch of features into the database
+                self._load_gaf_batch(grouped_gaf_records, default_organism, annotation_level, features_with_product)
+        else:
+            for gaf_record in gaf_records:
 
                 # Import this record into the database
                 self._load_gaf_record(gaf_record, default_organism, annotation_level, features_with_product)
 
         # Commit changes
         self.session.commit()
+        self._print_unresolved_terms()
 
     def _load_gaf_record(self, gaf_record: dict, organism_entry: organism.Organism, annotation_level: str,
                          features_with_product: Set[str]) -> None:
@@ -276,6 +535,101 @@ class GAFImportClient(GAFClient):
         # Update/insert feature_cvterm_pub entries
         self._handle_publications(gaf_record, feature_cvterm_entry, requested_feature_entry)
 
+    @staticmethod
+    def _group_gaf_records(gaf_records: Iterable[dict], batch_size: int) -> Iterator[Dict[str, List[dict]]]:
+        """Groups GAF records by DB_Object_ID and yields them in batches of a given number of features"""
+        grouped_gaf_records = {}
+        for gaf_record in gaf_records:
+            feature_name = gaf_record["DB_Object_ID"].strip()
+            if not feature_name:
+                continue
+            if feature_name not in grouped_gaf_records and len(grouped_gaf_records) >= batch_size:
+                yield grouped_gaf_records
+                grouped_gaf_records = {}
+            grouped_gaf_records.setdefault(feature_name, []).append(gaf_record)
+        if grouped_gaf_records:
+            yield grouped_gaf_records
+
+    def _load_gaf_batch(self, grouped_gaf_records: Dict[str, List[dict]], organism_entry: organism.Organism,
+                        annotation_level: str, features_with_product: Set[str]) -> None:
+        """Imports data from the GAF records of a batch of features into a Chado database. Existing entries are
+        loaded for all features of the batch at once and reconciled in memory."""
+
+        # Get the feature entries
+        feature_entries = self._load_features(list(grouped_gaf_records.keys()), organism_entry)
+        requested_feature_entries = {}
+        for feature_name, gaf_records in grouped_gaf_records.items():
+            if feature_name not in feature_entries:
+                continue
+            requested_feature_entry = self._extract_requested_feature(feature_entries[feature_name],
+                                                                      annotation_level)
+            gene_feature_entry = self._extract_gene_of_feature(requested_feature_entry)
+            requested_feature_entries[feature_name] = requested_feature_entry
+
+            # Update/insert gene name and synonym(s)
+            for gaf_record in gaf_records:
+                self._handle_name(gaf_record, gene_feature_entry)
+            self._handle_synonyms(self._merge_synonyms(gaf_records), gene_feature_entry)
+
+        # Update/insert feature_cvterm entries for gene products and ontology terms
+        annotations = []
+        for feature_name, requested_feature_entry in requested_feature_entries.items():
+            for gaf_record in grouped_gaf_records[feature_name]:
+                if requested_feature_entry.uniquename not in features_with_product:
+                    self._handle_product_term(gaf_record, requested_feature_entry)
+                    features_with_product.add(requested_feature_entry.uniquename)
+                feature_cvterm_entry = self._handle_ontology_term(gaf_record, requested_feature_entry)
+                if feature_cvterm_entry:
+                    annotations.append((gaf_record, feature_cvterm_entry, requested_feature_entry))
+
+        # Extract existing properties, cross references and publications for all feature_cvterms of the batch
+        feature_cvterm_ids = list({feature_cvterm_entry.feature_cvterm_id for _, feature_cvterm_entry, _
+                                   in annotations})
+        existing_feature_cvtermprops = self._query_entries_by_key(
+            sequence.FeatureCvTermProp, "feature_cvterm_id", feature_cvterm_ids)
+        existing_feature_cvterm_dbxrefs = self._query_entries_by_key(
+            sequence.FeatureCvTermDbxRef, "feature_cvterm_id", feature_cvterm_ids)
+        existing_feature_cvterm_pubs = self._query_entries_by_key(
+            sequence.FeatureCvTermPub, "feature_cvterm_id", feature_cvterm_ids)
+
+        # Update/insert feature_cvtermprop, feature_cvterm_dbxref and feature_cvterm_pub entries
+        for gaf_record, feature_cvterm_entry, requested_feature_entry in annotations:
+            feature_cvterm_id = feature_cvterm_entry.feature_cvterm_id
+            self._add_new_entries(existing_feature_cvtermprops[feature_cvterm_id], self._handle_properties(
+                gaf_record, feature_cvterm_entry, requested_feature_entry,
+                existing_feature_cvtermprops[feature_cvterm_id]))
+            self._add_new_entries(existing_feature_cvterm_dbxrefs[feature_cvterm_id], self._handle_crossrefs(
+                gaf_record, feature_cvterm_entry, requested_feature_entry,
+                existing_feature_cvterm_dbxrefs[feature_cvterm_id]))
+            self._add_new_entries(existing_feature_cvterm_pubs[feature_cvterm_id], self._handle_publications(
+                gaf_record, feature_cvterm_entry, requested_feature_entry,
+                existing_feature_cvterm_pubs[feature_cvterm_id]))
+
+    def _load_features(self, feature_names: List[str], organism_entry: organism.Organism
+                       ) -> Dict[str, sequence.Feature]:
+        """Loads feature entries with given uniquenames from the database"""
+        feature_entries = self.session.query(sequence.Feature)\
+            .filter(sequence.Feature.organism_id == organism_entry.organism_id)\
+            .filter(sequence.Feature.uniquename.in_(feature_names)).all()
+        return {feature_entry.uniquename: feature_entry for feature_entry in feature_entries}
+
+    @staticmethod
+    def _add_new_entries(existing_entries: list, entries: list) -> None:
+        """Adds newly inserted entries to a list of existing entries, so that subsequent records can match them"""
+        for entry in entries:
+            if entry is not None and entry not in existing_entries:
+                existing_entries.append(entry)
+
+    @staticmethod
+    def _merge_synonyms(gaf_records: List[dict]) -> dict:
+        """Combines the synonyms of several GAF records for the same feature, removing duplicates"""
+        synonyms = []
+        for gaf_record in gaf_records:
+            for synonym in gaf_record["Synonym"]:
+                if synonym not in synonyms:
+                    synonyms.append(synonym)
+        return {"Synonym": synonyms}
+
     def _load_feature(self, gaf_record: dict, organism_entry: organism.Organism) -> Union[None, sequence.Feature]:
         """Loads a feature entry from the database"""
         feature_name = gaf_record["DB_Object_ID"].strip()
@@ -331,23 +685,15 @@ class GAFImportClient(GAFClient):
         (db_authority, accession, version) = ontology.split_dbxref(ontology_term)
         publication = self._extract_primary_publication(gaf_record)
 
-        # Get entry from 'db' table
-        db_entry = self.query_first(general.Db, name=db_authority)
-        if not db_entry:
-            self.printer.print("WARNING: Ontology '" + db_authority + "' not present in database.")
+        # Look up the CV term among the terms of the ontology
+        ontology_terms = self._load_ontology_terms(db_authority)
+        if not ontology_terms:
+            self._unresolved_ontologies[db_authority] += 1
             return None
-
-        # Get entry from 'dbxref' table
-        dbxref_entry = self.query_first(general.DbxRef, db_id=db_entry.db_id, accession=accession)
-        if not dbxref_entry:
-            self.printer.print("WARNING: Ontology term '" + ontology_term + "' not present in database.")
-            return None
-
-        # Get entry from 'cvterm' table
-        cvterm_entry = self.query_first(cv.CvTerm, dbxref_id=dbxref_entry.dbxref_id)
+        (db_entry, cvterms) = ontology_terms
+        cvterm_entry = cvterms.get(accession)
         if not cvterm_entry:
-            self.printer.print("WARNING: CV term for ontology term '" + ontology_term
-                               + "' not present in database.")
+            self._unresolved_ontology_terms[ontology_term] += 1
             return None
 
         # Insert/update entry in the 'pub' table
@@ -357,19 +703,42 @@ class GAFImportClient(GAFClient):
         else:
             pub_entry = self._default_pub
 
-        # Extract existing ontology terms for this feature from the database
-        existing_feature_cvterms = self.query_feature_cvterm_by_ontology(
-            feature_entry.feature_id, db_entry.db_id).all()
-
         # Insert/update entry in the 'feature_cvterm' table
         new_feature_cvterm_entry = sequence.FeatureCvTerm(feature_id=feature_entry.feature_id,
                                                           cvterm_id=cvterm_entry.cvterm_id,
                                                           pub_id=pub_entry.pub_id,
                                                           is_not=("NOT" in gaf_record["Qualifier"]))
-        feature_cvterm_entry = self._handle_feature_cvterm(new_feature_cvterm_entry, existing_feature_cvterms,
-                                                           cvterm_entry.name, feature_entry.uniquename)
+        feature_cvterm_index = self._load_feature_cvterm_index(feature_entry.organism_id, db_entry.db_id)
+        feature_cvterm_entry = self._handle_indexed_feature_cvterm(new_feature_cvterm_entry, feature_cvterm_index,
+                                                                   cvterm_entry.name, feature_entry.uniquename)
         return feature_cvterm_entry
 
+    def _load_ontology_terms(self, db_authority: str) -> Union[None, Tuple[general.Db, Dict[str, tuple]]]:
+        """Loads the CV terms of an ontology from the lookup tables and groups them by accession, unless done
+        before"""
+        if db_authority not in self._ontology_terms:
+            db_entry = self.query_first(general.Db, name=db_authority)
+            if db_entry:
+                cvterms = self._load_ontology_lookup(db_authorities=[db_authority],
+                                                     cache_directory=self._cache_directory).terms_of_db(db_authority)
+                self._ontology_terms[db_authority] = (db_entry, cvterms)
+            else:
+                self._ontology_terms[db_authority] = None
+        return self._ontology_terms[db_authority]
+
+    def _print_unresolved_terms(self) -> None:
+        """Prints a summary of the ontologies and ontology terms of the GAF file that are not present in the
+        database"""
+        for db_authority, count in sorted(self._unresolved_ontologies.items()):
+            print("WARNING: Ontology '" + db_authority + "' not present in database. Skipped "
+                  + str(count) + " records.")
+        if self._unresolved_ontology_terms:
+            print("WARNING: " + str(len(self._unresolved_ontology_terms)) + " ontology terms not present in "
+                  + "database. Skipped " + str(sum(self._unresolved_ontology_terms.values())) + " records.")
+        for ontology_term, count in sorted(self._unresolved_ontology_terms.items()):
+            self.printer.print("Ontology term '" + ontology_term + "' not present in database ("
+                               + str(count) + " records)")
+
     def _handle_product_term(self, gaf_record: dict, feature_entry: sequence.Feature
                              ) -> Union[None, sequence.FeatureCvTerm]:
         """Inserts or updates an entry in the 'feature_cvterm' table and returns it"""
@@ -380,21 +749,11 @@ class GAFImportClient(GAFClient):
             return None
         publication = self._extract_primary_publication(gaf_record)
 
-        # Insert/update entry in the 'db' table
-        new_db_entry = general.Db(name="PRODUCT")
-        db_entry = self._handle_db(new_db_entry)
-
-        # Insert/update entry in the 'dbxref' table
-        new_dbxref_entry = general.DbxRef(db_id=db_entry.db_id, accession=product)
-        dbxref_entry = self._handle_dbxref(new_dbxref_entry, db_entry.name)
-
-        # Insert/update entry in the 'cv' table
-        new_cv_entry = cv.Cv(name="genedb_products")
-        cv_entry = self._handle_cv(new_cv_entry)
-
-        # Insert/update entry in the 'cvterm' table
-        new_cvterm_entry = cv.CvTerm(cv_id=cv_entry.cv_id, dbxref_id=dbxref_entry.dbxref_id, name=product)
-        cvterm_entry = self._handle_cvterm(new_cvterm_entry, cv_entry.name)
+        # Insert/update entries in the 'db', 'dbxref', 'cv' and 'cvterm' tables
+        db_entry = self._handle_cached_db("PRODUCT")
+        dbxref_entry = self._handle_cached_dbxref(db_entry, product)
+        cv_entry = self._handle_cached_cv("genedb_products")
+        cvterm_entry = self._handle_cached_cvterm(cv_entry, dbxref_entry, product)
 
         # Insert/update entry in the 'pub' table
         if publication:
@@ -403,25 +762,82 @@ class GAFImportClient(GAFClient):
         else:
             pub_entry = self._default_pub
 
-        # Extract existing product terms for this feature from the database
-        existing_feature_cvterms = self.query_feature_cvterm_by_ontology(
-            feature_entry.feature_id, db_entry.db_id).all()
-
         # Insert/update entry in the 'feature_cvterm' table
         new_feature_cvterm_entry = sequence.FeatureCvTerm(feature_id=feature_entry.feature_id,
                                                           cvterm_id=cvterm_entry.cvterm_id,
                                                           pub_id=pub_entry.pub_id)
-        feature_cvterm_entry = self._handle_feature_cvterm(new_feature_cvterm_entry, existing_feature_cvterms,
-                                                           cvterm_entry.name, feature_entry.uniquename)
+        feature_cvterm_index = self._load_feature_cvterm_index(feature_entry.organism_id, db_entry.db_id)
+        feature_cvterm_entry = self._handle_indexed_feature_cvterm(new_feature_cvterm_entry, feature_cvterm_index,
+                                                                   cvterm_entry.name, feature_entry.uniquename)
         return feature_cvterm_entry
 
+    def _load_feature_cvterm_index(self, organism_id: int, db_id: int) -> FeatureCvTermIndex:
+        """Loads the existing 'feature_cvterm' entries of an organism for an ontology in one query and indexes them,
+        unless done before during this import"""
+        key = (organism_id, db_id)
+        if key not in self._feature_cvterm_indices:
+            entries = self.query_feature_cvterm_by_ontology_and_organism(organism_id, db_id).all()
+            self._feature_cvterm_indices[key] = FeatureCvTermIndex(entries)
+        return self._feature_cvterm_indices[key]
+
+    def _handle_indexed_feature_cvterm(self, new_entry: sequence.FeatureCvTerm, index: FeatureCvTermIndex,
+                                       term="", feature_name="") -> sequence.FeatureCvTerm:
+        """Inserts or updates an entry in the 'feature_cvterm' table, looking up existing entries in an index, and
+        returns it"""
+        existing_entry = index.find(new_entry)
+        if existing_entry is not None:
+
+            # Check if the entries in database and file have the same properties, and update if not
+            if self.update_feature_cvterm_properties(existing_entry, new_entry):
+                self.printer.print("Updated CV term '" + term + "' for feature '" + feature_name + "'")
+            return existing_entry
+
+        # Insert new feature_cvterm entry and keep the index in sync
+        self.add_and_flush(new_entry)
+        index.add(new_entry)
+        self.printer.print("Inserted CV term '" + term + "' for feature '" + feature_name + "'")
+        return new_entry
+
+    def _handle_cached_db(self, name: str) -> general.Db:
+        """Inserts or updates an entry in the 'db' table and returns it, unless done before during this import"""
+        key = ("db", name)
+        if key not in self._dimension_entries:
+            self._dimension_entries[key] = self._handle_db(general.Db(name=name))
+        return self._dimension_entries[key]
+
+    def _handle_cached_dbxref(self, db_entry: general.Db, accession: str, version="") -> general.DbxRef:
+        """Inserts or updates an entry in the 'dbxref' table and returns it, unless done before during this import"""
+        key = ("dbxref", db_entry.db_id, accession)
+        if key not in self._dimension_entries:
+            new_dbxref_entry = general.DbxRef(db_id=db_entry.db_id, accession=accession, version=version)
+            self._dimension_entries[key] = self._handle_dbxref(new_dbxref_entry, db_entry.name)
+        return self._dimension_entries[key]
+
+    def _handle_cached_cv(self, name: str) -> cv.Cv:
+        """Inserts or updates an entry in the 'cv' table and returns it, unless done before during this import"""
+        key = ("cv", name)
+        if key not in self._dimension_entries:
+            self._dimension_entries[key] = self._handle_cv(cv.Cv(name=name))
+        return self._dimension_entries[key]
+
+    def _handle_cached_cvterm(self, cv_entry: cv.Cv, dbxref_entry: general.DbxRef, name: str) -> cv.CvTerm:
+        """Inserts or updates an entry in the 'cvterm' table and returns it, unless done before during this import"""
+        key = ("cvterm", dbxref_entry.dbxref_id)
+        if key not in self._dimension_entries:
+            new_cvterm_entry = cv.CvTerm(cv_id=cv_entry.cv_id, dbxref_id=dbxref_entry.dbxref_id, name=name)
+            self._dimension_entries[key] = self._handle_cvterm(new_cvterm_entry, cv_entry.name)
+        return self._dimension_entries[key]
+
     def _handle_properties(self, gaf_record: dict, feature_cvterm_entry: sequence.FeatureCvTerm,
-                           feature_entry: sequence.Feature) -> List[sequence.FeatureCvTermProp]:
+                           feature_entry: sequence.Feature,
+                           existing_feature_cvtermprops: List[sequence.FeatureCvTermProp] = None
+                           ) -> List[sequence.FeatureCvTermProp]:
         """Inserts or updates entries in the 'feature_cvtermprop' table and returns them"""
 
-        # Extract existing properties for this feature_cvterm from the database
-        existing_feature_cvtermprops = self.query_all(sequence.FeatureCvTermProp,
-                                                      feature_cvterm_id=feature_cvterm_entry.feature_cvterm_id)
+        # Extract existing properties for this feature_cvterm from the database, if not provided
+        if existing_feature_cvtermprops is None:
+            existing_feature_cvtermprops = self.query_all(sequence.FeatureCvTermProp,
+                                                          feature_cvterm_id=feature_cvterm_entry.feature_cvterm_id)
 
         # Insert/update entry for 'date'
         date = gaf_record["Date"].strip()
@@ -449,12 +865,15 @@ class GAFImportClient(GAFClient):
         return [date_feature_cvtermprop_entry, evidence_feature_cvtermprop_entry, assigned_by_feature_cvtermprop_entry]
 
     def _handle_crossrefs(self, gaf_record: dict, feature_cvterm_entry: sequence.FeatureCvTerm,
-                          feature_entry: sequence.Feature) -> List[sequence.FeatureCvTermDbxRef]:
+                          feature_entry: sequence.Feature,
+                          existing_feature_cvterm_dbxrefs: List[sequence.FeatureCvTermDbxRef] = None
+                          ) -> List[sequence.FeatureCvTermDbxRef]:
         """Inserts or updates an entry in the 'feature_cvterm_dbxref' table and returns it"""
 
-        # Extract existing cross references for this feature_cvterm from the database
-        existing_feature_cvterm_dbxrefs = self.query_all(sequence.FeatureCvTermDbxRef,
-                                                         feature_cvterm_id=feature_cvterm_entry.feature_cvterm_id)
+        # Extract existing cross references for this feature_cvterm from the database, if not provided
+        if existing_feature_cvterm_dbxrefs is None:
+            existing_feature_cvterm_dbxrefs = self.query_all(
+                sequence.FeatureCvTermDbxRef, feature_cvterm_id=feature_cvterm_entry.feature_cvterm_id)
         all_feature_cvterm_dbxrefs = []
 
         # Loop over all cross references of the given GAF record
@@ -464,13 +883,9 @@ class GAFImportClient(GAFClient):
             # Split database cross reference (dbxref) into db, accession, version
             (db_authority, accession, version) = ontology.split_dbxref(crossref)
 
-            # Insert/update entry in the 'db' table
-            new_db_entry = general.Db(name=db_authority)
-            db_entry = self._handle_db(new_db_entry)
-
-            # Insert/update entry in the 'dbxref' table
-            new_dbxref_entry = general.DbxRef(db_id=db_entry.db_id, accession=accession, version=version)
-            dbxref_entry = self._handle_dbxref(new_dbxref_entry, db_authority)
+            # Insert/update entries in the 'db' and 'dbxref' tables
+            db_entry = self._handle_cached_db(db_authority)
+            dbxref_entry = self._handle_cached_dbxref(db_entry, accession, version)
 
             # Insert/update entry in the 'feature_cvterm_dbxref' table
             new_feature_cvterm_dbxref_entry = sequence.FeatureCvTermDbxRef(
@@ -482,12 +897,15 @@ class GAFImportClient(GAFClient):
         return all_feature_cvterm_dbxrefs
 
     def _handle_publications(self, gaf_record: dict, feature_cvterm_entry: sequence.FeatureCvTerm,
-                             feature_entry: sequence.Feature) -> List[sequence.FeatureCvTermPub]:
+                             feature_entry: sequence.Feature,
+                             existing_feature_cvterm_pubs: List[sequence.FeatureCvTermPub] = None
+                             ) -> List[sequence.FeatureCvTermPub]:
         """Inserts or updates entries in the 'feature_cvterm_pub' table and returns them"""
 
-        # Extract existing publications for this feature_cvterm from the database
-        existing_feature_cvterm_pubs = self.query_all(sequence.FeatureCvTermPub,
-                                                      feature_cvterm_id=feature_cvterm_entry.feature_cvterm_id)
+        # Extract existing publications for this feature_cvterm from the database, if not provided
+        if existing_feature_cvterm_pubs is None:
+            existing_feature_cvterm_pubs = self.query_all(sequence.FeatureCvTermPub,
+                                                          feature_cvterm_id=feature_cvterm_entry.feature_cvterm_id)
         all_feature_cvterm_pubs = []
 
         # Loop over all publications of the given GAF record
@@ -551,99 +969,91 @@ class GAFExportClient(GAFClient):
     """Class for exporting gene annotation data from Chado to GAF files"""
 
     def export(self, gaf_filename: str, organism_name: str, database_authority: str, annotation_level: str,
-               include_obsolete_features=False) -> None:
+               include_obsolete_features=False, gaf_version="1.0") -> None:
 
         # Load dependencies
         organism_entry = self._load_organism(organism_name)
         taxon_id = self._extract_taxon_id(organism_entry)
+        self._annotation_level_indices.clear()
+        self._feature_entries.clear()
 
         # Open GAF file and write header
         with utils.open_file_write(gaf_filename) as gaf_handle:
-            self._write_gaf_header(gaf_handle)
-
-            # Get all feature_cvterms associated with GO terms
-            go_feature_cvterm_entries = self.query_feature_cvterm_by_ontology_and_organism(
-                organism_entry.organism_id, self._go_db.db_id).order_by(
-                sequence.Feature.uniquename, general.DbxRef.accession).all()
+            writer = GAFWriter(gaf_handle, gaf_version)
+            writer.write_header(database_authority)
 
-            # Loop over all feature_cvterms
-            for go_feature_cvterm_entry in go_feature_cvterm_entries:
-
-                # Create a GFF record for this feature_cvterm
-                go_feature_entry = self.query_first(sequence.Feature, feature_id=go_feature_cvterm_entry.feature_id)
-                if self._is_featuretype_valid(go_feature_entry) \
-                        and (include_obsolete_features or not go_feature_entry.is_obsolete):
-                    self._export_gaf_record(go_feature_entry, go_feature_cvterm_entry, database_authority, taxon_id,
-                                            annotation_level, gaf_handle)
+            # Create and write a GAF record for each feature_cvterm associated with a GO term
+            writer.write_records(self._create_gaf_records(organism_entry, database_authority, taxon_id,
+                                                          annotation_level, include_obsolete_features))
 
         # Information
         self.printer.print("Exported GAF data for organism " + organism_name + " to " + gaf_filename + ".")
 
-    @staticmethod
-    def _write_gaf_header(file_handle):
-        """Prints the header of a GAF file"""
-        file_handle.write("!gaf-version: 1.0\n")
-
-    def _export_gaf_record(self, feature_entry: sequence.Feature, feature_cvterm_entry: sequence.FeatureCvTerm,
-                           database_authority: str, taxon_id: str, annotation_level: str, file_handle):
-        """Exports a GAF record for a given feature and GO term"""
+    def _create_gaf_records(self, organism_entry: organism.Organism, database_authority: str, taxon_id: str,
+                            annotation_level: str, include_obsolete_features: bool) -> Iterator[dict]:
+        """Creates GAF records for all GO terms associated with features of an organism. Related information is
+        loaded with one database query per table and grouped by feature_cvterm_id or feature_id."""
+
+        # Load all features of the organism and the relationships between them
+        organism_id = organism_entry.organism_id
+        features = {feature.feature_id: feature for feature in self.query_features_by_organism(organism_id).all()}
+        annotation_level_index = self._load_annotation_level_index(organism_id)
+
+        # Load information related to features and feature_cvterms
+        properties = self._extract_all_feature_cvterm_properties(organism_id)
+        dbxrefs = self._extract_all_feature_cvterm_dbxrefs(organism_id)
+        secondary_publications = self._extract_all_feature_cvterm_secondary_publications(organism_id)
+        synonyms = {feature_id: GAFWriter.format_column(names)
+                    for feature_id, names in self._extract_all_feature_synonyms(organism_id).items()}
+        product_names = self._extract_all_product_names(organism_id)
+        valid_featuretypes = set(self._gene_types() + self._transcript_types() + self._protein_types())
+
+        # Loop over all feature_cvterms associated with GO terms
+        go_annotations = self.query_feature_cvterm_annotations_by_organism(organism_id, self._go_db.db_id)\
+            .order_by(sequence.Feature.uniquename, general.DbxRef.accession).all()
+        for go_annotation in go_annotations:
+            go_feature = features[go_annotation.feature_id]
+            if go_feature.type.lower() not in valid_featuretypes \
+                    or (go_feature.is_obsolete and not include_obsolete_features):
+                continue
 
-        try:
-            # Create GAF record
-            requested_feature = self._extract_requested_feature(feature_entry, annotation_level)
-            gene_feature = self._extract_gene_of_feature(requested_feature)
-            gaf_record = self._create_gaf_record(feature_cvterm_entry, requested_feature, database_authority, taxon_id)
-
-            # Query various tables to gather information related to the feature_cvterm
-            go_id = self._extract_feature_cvterm_ontology_term(feature_cvterm_entry)
-            go_namespace = self._extract_go_namespace(feature_cvterm_entry)
-            feature_cvterm_properties = self._extract_feature_cvterm_properties(feature_cvterm_entry)
-            feature_cvterm_dbxrefs = self._extract_feature_cvterm_dbxrefs(feature_cvterm_entry)
-            feature_cvterm_publications = self._extract_feature_cvterm_publications(feature_cvterm_entry)
-            featuretype = self._extract_feature_type(requested_feature)
-            gene_name = self._extract_feature_name(gene_feature)
-            gene_synonyms = self._extract_feature_synonyms(gene_feature)
-            product_name = self._extract_product_name(feature_entry)
-
-            # Add attributes to the GAF record
-            self._add_gaf_go_id(gaf_record, go_id)
-            self._add_gaf_aspect(gaf_record, go_namespace)
-            self._add_gaf_annotation_date(gaf_record, feature_cvterm_properties)
-            self._add_gaf_evidence_code(gaf_record, feature_cvterm_properties)
-            self._add_gaf_assigning_db(gaf_record, feature_cvterm_properties)
-            self._add_gaf_withfrom_info(gaf_record, feature_cvterm_dbxrefs)
-            self._add_gaf_db_references(gaf_record, feature_cvterm_publications, feature_cvterm_dbxrefs)
-            self._add_gaf_object_type(gaf_record, featuretype)
-            self._add_gaf_object_symbol(gaf_record, gene_name)
-            self._add_gaf_synonyms(gaf_record, gene_synonyms)
-            self._add_gaf_object_name(gaf_record, product_name)
-
-            # Write the generated GAF record to file
-            self._print_gaf_record(file_handle, gaf_record)
-
-        except iobase.DatabaseError as err:
-            self.printer.print(err.args)
-
-    def _print_gaf_record(self, file_handle, gaf_record: dict):
-        """Prints a GAF record to file"""
-        line = "\t".join([self._stringify_gaf_attribute(value) for value in gaf_record.values()])
-        file_handle.write(line + "\n")
+            try:
+                # Create GAF record
+                requested_feature = self._find_requested_feature(go_feature, annotation_level, features,
+                                                                 annotation_level_index)
+                gene_feature = self._find_related_feature(requested_feature, "gene", features,
+                                                          annotation_level_index)
+                gaf_record = self._create_gaf_record(go_annotation, requested_feature, database_authority, taxon_id)
+
+                # Gather information related to the feature_cvterm
+                go_id = ontology.create_dbxref(go_annotation.db, go_annotation.accession)
+                feature_cvterm_properties = properties.get(go_annotation.feature_cvterm_id, {})
+                feature_cvterm_dbxrefs = dbxrefs.get(go_annotation.feature_cvterm_id, [])
+                feature_cvterm_publications = [go_annotation.pub] \
+                    + secondary_publications.get(go_annotation.feature_cvterm_id, [])
+                gene_synonyms = synonyms.get(gene_feature.feature_id, "") if gene_feature else ""
+
+                # Add attributes to the GAF record
+                self._add_gaf_go_id(gaf_record, go_id)
+                self._add_gaf_aspect(gaf_record, go_annotation.namespace)
+                self._add_gaf_annotation_date(gaf_record, feature_cvterm_properties)
+                self._add_gaf_evidence_code(gaf_record, feature_cvterm_properties)
+                self._add_gaf_assigning_db(gaf_record, feature_cvterm_properties)
+                self._add_gaf_withfrom_info(gaf_record, feature_cvterm_dbxrefs)
+                self._add_gaf_db_references(gaf_record, feature_cvterm_publications, feature_cvterm_dbxrefs)
+                self._add_gaf_object_type(gaf_record, requested_feature.type)
+                self._add_gaf_object_symbol(gaf_record, self._extract_feature_name(gene_feature))
+                self._add_gaf_synonyms(gaf_record, gene_synonyms)
+                self._add_gaf_object_name(gaf_record, product_names.get(go_feature.feature_id, ""))
+                yield gaf_record
+
+            except iobase.DatabaseError as err:
+                self.printer.print(err.args)
 
     @staticmethod
-    def _stringify_gaf_attribute(attribute: Union[str, List[str]]) -> str:
-        """Converts a GAF attribute from a list to a string, separated by pipes"""
-        if isinstance(attribute, str):
-            return attribute
-        elif isinstance(attribute, list):
-            return utils.list_to_string(attribute, "|")
-        else:
-            return ""
-
-    @staticmethod
-    def _create_gaf_record(feature_cvterm_entry: sequence.FeatureCvTerm, feature_entry: sequence.Feature,
-                           database_authority: str, taxon_id: str) -> dict:
+    def _create_gaf_record(feature_cvterm_entry, feature_entry, database_authority: str, taxon_id: str) -> dict:
         """Creates a GAF record"""
-        gaf_record = {key: None for key in GOA.GAF10FIELDS}
+        gaf_record = {key: None for key in GOA.GAF20FIELDS}
         gaf_record["DB"] = database_authority
         gaf_record["DB_Object_ID"] = feature_entry.uniquename
         gaf_record["Taxon_ID"] = taxon_id
@@ -660,69 +1070,78 @@ class GAFExportClient(GAFClient):
             taxon_id = "taxon:" + organismprop_entry.value
         return taxon_id
 
-    def _extract_feature_cvterm_ontology_term(self, feature_cvterm_entry: sequence.FeatureCvTerm) -> str:
-        """Extracts the ontology term associated with a feature_cvterm by a database query"""
-        db_and_accession = self.query_feature_cvterm_ontology_terms(
-            feature_cvterm_entry.feature_cvterm_id, self._go_db.db_id).first()
-        ontology_term = ""
-        if db_and_accession:
-            ontology_term = ontology.create_dbxref(db_and_accession[0], db_and_accession[1])
-        return ontology_term
-
-    def _extract_feature_cvterm_properties(self, feature_cvterm_entry: sequence.FeatureCvTerm) -> Dict[str, str]:
-        """Extracts properties associated with a feature_cvterm by a database query"""
-        properties = {}
-        for property_type, property_value in self.query_feature_cvterm_properties(
-                feature_cvterm_entry.feature_cvterm_id).all():
-            properties[property_type] = property_value
+    def _find_requested_feature(self, feature, annotation_level: str, features: dict,
+                                annotation_level_index: AnnotationLevelIndex):
+        """Finds the gene, transcript or protein of a feature in preloaded relationships, depending on the desired
+        annotation level"""
+        if annotation_level in self._annotation_levels():
+            requested_feature = self._find_related_feature(feature, annotation_level, features,
+                                                           annotation_level_index)
+        else:
+            requested_feature = feature
+        if not requested_feature:
+            self.printer.print("WARNING: No " + annotation_level + " associated with feature '"
+                               + feature.uniquename + "' available in the database.")
+            requested_feature = feature
+        return requested_feature
+
+    def _find_related_feature(self, feature, annotation_level: str, features: dict,
+                              annotation_level_index: AnnotationLevelIndex):
+        """Finds the gene, transcript or polypeptide of a feature, which can be a gene, transcript or polypeptide, in
+        preloaded relationships"""
+        related_id = self._find_related_feature_id(annotation_level_index, feature.feature_id, feature.type,
+                                                   annotation_level)
+        return features.get(related_id)
+
+    def _extract_all_feature_cvterm_properties(self, organism_id: int) -> Dict[int, Dict[str, str]]:
+        """Extracts properties associated with all GO feature_cvterms of an organism by a database query"""
+        properties = collections.defaultdict(dict)
+        for feature_cvterm_id, property_type, property_value in self.query_feature_cvterm_properties_by_organism(
+                organism_id, self._go_db.db_id).all():
+            properties[feature_cvterm_id][property_type] = property_value
         return properties
 
-    def _extract_feature_cvterm_dbxrefs(self, feature_cvterm_entry: sequence.FeatureCvTerm) -> List[str]:
-        """Extracts database cross references associated with a feature_cvterm by a database query"""
-        cross_references = []
-        for db_authority, accession in self.query_feature_cvterm_dbxrefs(feature_cvterm_entry.feature_cvterm_id).all():
-            crossref = ontology.create_dbxref(db_authority, accession)
-            cross_references.append(crossref)
+    def _extract_all_feature_cvterm_dbxrefs(self, organism_id: int) -> Dict[int, List[str]]:
+        """Extracts database cross references associated with all GO feature_cvterms of an organism by a database
+        query"""
+        cross_references = collections.defaultdict(list)
+        for feature_cvterm_id, db_authority, accession in self.query_feature_cvterm_dbxrefs_by_organism(
+                organism_id, self._go_db.db_id).all():
+            cross_references[feature_cvterm_id].append(ontology.create_dbxref(db_authority, accession))
         return cross_references
 
-    def _extract_feature_cvterm_publications(self, feature_cvterm_entry: sequence.FeatureCvTerm) -> List[str]:
-        """Extracts publications associated with a feature_cvterm by a database query"""
-        publications = []
-        for publication, in self.query_feature_cvterm_pubs(feature_cvterm_entry.feature_cvterm_id).all():
-            publications.append(publication)
-        for publication, in self.query_feature_cvterm_secondary_pubs(feature_cvterm_entry.feature_cvterm_id).all():
-            publications.append(publication)
+    def _extract_all_feature_cvterm_secondary_publications(self, organism_id: int) -> Dict[int, List[str]]:
+        """Extracts secondary publications associated with all GO feature_cvterms of an organism by a database
+        query"""
+        publications = collections.defaultdict(list)
+        for feature_cvterm_id, publication in self.query_feature_cvterm_secondary_pubs_by_organism(
+                organism_id, self._go_db.db_id).all():
+            publications[feature_cvterm_id].append(publication)
         return publications
 
-    def _extract_go_namespace(self, feature_cvterm_entry: sequence.FeatureCvTerm) -> str:
-        """Extracts the namespace of a feature_cvterm by a database query"""
-        return self.query_cvterm_namespace(feature_cvterm_entry.cvterm_id).scalar()
+    def _extract_all_feature_synonyms(self, organism_id: int) -> Dict[int, List[str]]:
+        """Extracts synonyms of all features of an organism by a database query"""
+        synonyms = collections.defaultdict(list)
+        for feature_id, synonym_name in self.query_feature_synonyms_by_organism(organism_id).all():
+            synonyms[feature_id].append(synonym_name)
+        return synonyms
+
+    def _extract_all_product_names(self, organism_id: int) -> Dict[int, str]:
+        """Extracts the gene products of all features of an organism by a database query"""
+        product_names = {}
+        for feature_id, name in self.query_feature_cvterm_names_by_organism(organism_id,
+                                                                            self._product_db.db_id).all():
+            product_names.setdefault(feature_id, name)
+        return product_names
 
     @staticmethod
-    def _extract_feature_name(feature_entry: sequence.Feature) -> str:
+    def _extract_feature_name(feature_entry) -> str:
         """Extracts the name of a given feature"""
         name = ""
         if feature_entry:
             name = feature_entry.name or feature_entry.uniquename
         return name
 
-    def _extract_feature_synonyms(self, feature_entry: sequence.Feature) -> List[str]:
-        """Extracts synonyms of a feature by a database query"""
-        synonyms = []
-        if feature_entry:
-            for synonym_type, synonym_name in self.query_feature_synonyms(feature_entry.feature_id).all():
-                synonyms.append(synonym_name)
-        return synonyms
-
-    def _extract_product_name(self, feature_entry: sequence.Feature) -> str:
-        """Extracts the gene product of a feature by a database query"""
-        name = ""
-        product_feature_cvterm = self.query_feature_cvterm_by_ontology(
-            feature_entry.feature_id, self._product_db.db_id).first()
-        if product_feature_cvterm:
-            name = self.query_first(cv.CvTerm, cvterm_id=product_feature_cvterm.cvterm_id).name
-        return name
-
     @staticmethod
     def _add_gaf_go_id(gaf_record: dict, go_id: str) -> None:
         """Adds the GO term to a GAF record"""
@@ -809,6 +1228,51 @@ class GAFExportClient(GAFClient):
         gaf_record["DB_Object_Symbol"] = gene_name
 
     @staticmethod
-    def _add_gaf_synonyms(gaf_record: dict, synonyms: List[str]) -> None:
+    def _add_gaf_synonyms(gaf_record: dict, synonyms: Union[str, List[str]]) -> None:
         """Adds gene synonyms to a GAF record"""
         gaf_record["Synonym"] = synonyms
+
+
+# Client of a worker process exporting several organisms; created once per process by _initialise_export_worker
+_worker_client = None                                                       # type: Union[None, GAFExportClient]
+
+
+def _initialise_export_worker(uri: str, verbose: bool) -> None:
+    """Creates the client of a worker process, which connects to the database and loads the essential entries once
+    for all organisms exported by this process"""
+    global _worker_client
+    _worker_client = GAFExportClient(uri, verbose)
+
+
+def _export_organism_in_worker(arguments: tuple) -> Tuple[str, float, str]:
+    """Exports the gene annotation data of a single organism with the client of a worker process, and returns the
+    organism name, the run time and an error message, if any"""
+    organism_name = arguments[1]
+    start_time = time.time()
+    error_message = ""
+    try:
+        _worker_client.export(*arguments)
+    except iobase.DatabaseError as err:
+        _worker_client.session.rollback()
+        error_message = str(err)
+    return organism_name, time.time() - start_time, error_message
+
+
+def export_organisms(uri: str, verbose: bool, filename: str, organism_names: List[str], database_authority: str,
+                     annotation_level: str, include_obsolete_features=False, gaf_version="1.0",
+                     processes=None) -> None:
+    """Exports the gene annotation data of several organisms (default: all) from Chado to GAF files, one file per
+    organism, using a pool of worker processes"""
+    if not organism_names:
+        client = GAFExportClient(uri, verbose)
+        organism_names = client._load_organism_names()
+        del client
+    arguments = [(utils.insert_into_filename(filename, organism_name), organism_name, database_authority,
+                  annotation_level, include_obsolete_features, gaf_version)
+                 for organism_name in organism_names]
+    with multiprocessing.Pool(processes, _initialise_export_worker, (uri, verbose)) as pool:
+        for organism_name, run_time, error_message in pool.imap(_export_organism_in_worker, arguments):
+            if error_message:
+                print("Export of GAF data for organism " + organism_name + " failed: " + error_message)
+            else:
+                print("Exported GAF data for organism {0} in {1:.2f} s".format(organism_name, run_time))
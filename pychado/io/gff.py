@@ -652,10 +652,12 @@ class GFFImportClient(iobase.ChadoClient, GFFClient):
         name = self._extract_gff_name(gff_record)
         residues = self._extract_gff_translation(gff_record)
         seqlen = self._extract_gff_size(gff_record)
+        md5checksum = None
         if residues is not None:
             seqlen = len(residues)
+            md5checksum = utils.md5_checksum(residues)
         return sequence.Feature(organism_id=organism_id, type_id=type_id, uniquename=gff_record.id, name=name,
-                                residues=residues, seqlen=seqlen)
+                                residues=residues, seqlen=seqlen, md5checksum=md5checksum)
 
     def _create_featureloc(self, gff_record: gffutils.Feature, feature_id: int, srcfeature_id: int
                            ) -> sequence.FeatureLoc:
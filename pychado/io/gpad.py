@@ -0,0 +1,244 @@
+import collections
+from typing import List, Dict, Tuple, Iterable, Iterator
+from Bio.UniProt import GOA
+from . import gaf
+from .. import utils
+
+
+# Columns of GPAD 1.1 and GPI 1.2 files
+GPAD11FIELDS = ["DB", "DB_Object_ID", "Qualifier", "GO_ID", "DB:Reference", "Evidence", "With",
+                "Interacting_Taxon_ID", "Date", "Assigned_By", "Annotation_Extension", "Annotation_Properties"]
+GPI12FIELDS = ["DB", "DB_Object_ID", "DB_Object_Symbol", "DB_Object_Name", "Synonym", "DB_Object_Type", "Taxon_ID",
+               "Parent_Object_ID", "DB_Xref", "Properties"]
+
+# Columns of GPAD and GPI files that can contain several values, separated by pipes
+GPAD_MULTI_VALUED_COLUMNS = [2, 4, 6, 11]
+GPI_MULTI_VALUED_COLUMNS = [4, 8, 9]
+
+# Default ECO terms for GO evidence codes
+EVIDENCE_CODES_TO_ECO_TERMS = {
+    "EXP": "ECO:0000269",
+    "IDA": "ECO:0000314",
+    "IPI": "ECO:0000353",
+    "IMP": "ECO:0000315",
+    "IGI": "ECO:0000316",
+    "IEP": "ECO:0000270",
+    "HTP": "ECO:0006056",
+    "HDA": "ECO:0007005",
+    "HMP": "ECO:0007001",
+    "HGI": "ECO:0007003",
+    "HEP": "ECO:0007007",
+    "ISS": "ECO:0000250",
+    "ISO": "ECO:0000266",
+    "ISA": "ECO:0000247",
+    "ISM": "ECO:0000255",
+    "IGC": "ECO:0000317",
+    "IBA": "ECO:0000318",
+    "IBD": "ECO:0000319",
+    "IKR": "ECO:0000320",
+    "IRD": "ECO:0000321",
+    "RCA": "ECO:0000245",
+    "TAS": "ECO:0000304",
+    "NAS": "ECO:0000303",
+    "IC": "ECO:0000305",
+    "ND": "ECO:0000307",
+    "IEA": "ECO:0000501",
+    "NR": "ECO:0000000"
+}
+ECO_TERMS_TO_EVIDENCE_CODES = {eco_term: code for code, eco_term in EVIDENCE_CODES_TO_ECO_TERMS.items()}
+
+
+def parse_gpad(filename: str) -> Iterator[dict]:
+    """Iterates over the lines of a (potentially gzipped) GPAD file of version 1.x and yields dictionaries"""
+    yield from parse_annotation_file(filename, "gpad", GPAD11FIELDS, GPAD_MULTI_VALUED_COLUMNS)
+
+
+def parse_gpi(filename: str) -> Iterator[dict]:
+    """Iterates over the lines of a (potentially gzipped) GPI file of version 1.x and yields dictionaries"""
+    yield from parse_annotation_file(filename, "gpi", GPI12FIELDS, GPI_MULTI_VALUED_COLUMNS)
+
+
+def parse_annotation_file(filename: str, file_format: str, fields: List[str], multi_valued_columns: List[int]) \
+        -> Iterator[dict]:
+    """Iterates over the lines of a tab-separated GPAD or GPI file and yields dictionaries; missing trailing
+    columns are filled with empty values"""
+    number_of_fields = len(fields)
+    with gaf.open_gaf_file(filename) as file_handle:
+        for line in file_handle:
+            if line[0] == "!":
+                check_version(line, file_format)
+                continue
+            columns = line.rstrip("\n").split("\t")
+            if len(columns) == 1:
+                continue
+            if len(columns) < number_of_fields:
+                columns.extend([""] * (number_of_fields - len(columns)))
+            for index in multi_valued_columns:
+                columns[index] = columns[index].split("|") if columns[index] else []
+            yield dict(zip(fields, columns))
+
+
+def check_version(header_line: str, file_format: str) -> None:
+    """Checks that the version given in a header line of a GPAD or GPI file is supported"""
+    if header_line.startswith("!" + file_format + "-version:"):
+        version = header_line.split(":", 1)[1].strip()
+        if version.split(".")[0] != "1":
+            raise ValueError("Unknown " + file_format.upper() + " version: '" + version + "'")
+
+
+def parse_properties(properties: List[str]) -> Dict[str, str]:
+    """Converts the 'key=value' pairs of a properties column into a dictionary"""
+    parsed_properties = {}
+    for item in properties:
+        key, separator, value = item.partition("=")
+        if separator:
+            parsed_properties.setdefault(key.strip(), value.strip())
+    return parsed_properties
+
+
+class GPADWriter(gaf.GAFWriter):
+    """Streaming writer for GPAD files of version 1.1"""
+
+    file_format = "gpad"
+    versions = {"1.1": GPAD11FIELDS}
+    default_version = "1.1"
+    plain_header_versions = []
+    relation_versions = ["1.1"]
+
+
+class GPIWriter(gaf.GAFWriter):
+    """Streaming writer for GPI files of version 1.2"""
+
+    file_format = "gpi"
+    versions = {"1.2": GPI12FIELDS}
+    default_version = "1.2"
+    plain_header_versions = []
+    relation_versions = []
+
+
+class GPADImportClient(gaf.GAFImportClient):
+    """Class for importing gene annotation data from GPAD/GPI files into Chado"""
+
+    def __init__(self, uri: str, verbose=False, test_environment=False):
+        """Constructor"""
+        super().__init__(uri, verbose, test_environment)
+
+        # Counter for ECO terms without a corresponding GO evidence code
+        self._unmapped_evidence_terms = collections.Counter()
+
+    def load(self, gpad_filename: str, gpi_filename: str, organism_name: str, annotation_level: str,
+             batch_size=0, cache_directory="") -> None:
+        """Import data from a GPAD file and the associated GPI file into a Chado database"""
+        entities = self._load_gpi_entities(gpi_filename)
+        gaf_records = self._convert_gpad_records(parse_gpad(gpad_filename), entities)
+        self._load_gaf_records(gaf_records, organism_name, annotation_level, batch_size, cache_directory)
+
+    @staticmethod
+    def _load_gpi_entities(gpi_filename: str) -> Dict[Tuple[str, str], dict]:
+        """Loads all entities of a GPI file in one go, keyed by database authority and object ID"""
+        entities = {}
+        if gpi_filename:
+            for gpi_record in parse_gpi(gpi_filename):
+                entities.setdefault((gpi_record["DB"], gpi_record["DB_Object_ID"]), gpi_record)
+        return entities
+
+    def _convert_gpad_records(self, gpad_records: Iterable[dict], entities: Dict[Tuple[str, str], dict]) \
+            -> Iterator[dict]:
+        """Converts GPAD records into GAF records, adding the information of the referenced GPI entities. Records
+        with an evidence that cannot be expressed as GO evidence code are skipped."""
+        self._unmapped_evidence_terms.clear()
+        for gpad_record in gpad_records:
+            entity = entities.get((gpad_record["DB"], gpad_record["DB_Object_ID"]))
+            if entity is None and entities:
+                self.printer.print("No GPI entry for object '" + gpad_record["DB_Object_ID"] + "'")
+            gaf_record = self._create_gaf_record_from_gpad(gpad_record, entity or {})
+            if not gaf_record["Evidence"]:
+                self._unmapped_evidence_terms[gpad_record["Evidence"].strip()] += 1
+                continue
+            yield gaf_record
+        self._print_unmapped_evidence_terms()
+
+    def _print_unmapped_evidence_terms(self) -> None:
+        """Prints a summary of the ECO terms of the GPAD file that could not be converted into GO evidence codes"""
+        if self._unmapped_evidence_terms:
+            print("WARNING: " + str(len(self._unmapped_evidence_terms)) + " ECO terms without corresponding GO "
+                  + "evidence code. Skipped " + str(sum(self._unmapped_evidence_terms.values())) + " records.")
+        for eco_term, count in sorted(self._unmapped_evidence_terms.items()):
+            self.printer.print("No GO evidence code for ECO term '" + eco_term + "' (" + str(count) + " records)")
+
+    def _create_gaf_record_from_gpad(self, gpad_record: dict, entity: dict) -> dict:
+        """Creates a GAF record from a GPAD record and the corresponding GPI entity"""
+        gaf_record = {key: gpad_record.get(key, "") for key in GOA.GAF20FIELDS}
+        gaf_record["Evidence"] = self._extract_evidence_code(gpad_record)
+        gaf_record["DB_Object_Symbol"] = entity.get("DB_Object_Symbol", "")
+        gaf_record["DB_Object_Name"] = entity.get("DB_Object_Name", "")
+        gaf_record["Synonym"] = entity.get("Synonym", [])
+        gaf_record["DB_Object_Type"] = entity.get("DB_Object_Type", "")
+        gaf_record["Taxon_ID"] = entity.get("Taxon_ID", "")
+        return gaf_record
+
+    @staticmethod
+    def _extract_evidence_code(gpad_record: dict) -> str:
+        """Extracts the GO evidence code of a GPAD record, either from the annotation properties or by converting
+        the ECO term. Returns an empty string if the ECO term has no corresponding GO evidence code."""
+        properties = parse_properties(gpad_record["Annotation_Properties"])
+        if "go_evidence" in properties:
+            return properties["go_evidence"]
+        eco_term = gpad_record["Evidence"].strip()
+        return ECO_TERMS_TO_EVIDENCE_CODES.get(eco_term, "")
+
+
+class GPADExportClient(gaf.GAFExportClient):
+    """Class for exporting gene annotation data from Chado to GPAD/GPI files"""
+
+    def export_gpad(self, gpad_filename: str, organism_name: str, database_authority: str, annotation_level: str,
+                    include_obsolete_features=False) -> None:
+        """Exports the GO annotations of an organism to a GPAD file"""
+        gaf_records = self._create_gaf_records_of_organism(organism_name, database_authority, annotation_level,
+                                                           include_obsolete_features)
+        with utils.open_file_write(gpad_filename) as gpad_handle:
+            writer = GPADWriter(gpad_handle)
+            writer.write_header(database_authority)
+            writer.write_records(self._create_gpad_record(gaf_record) for gaf_record in gaf_records)
+        self.printer.print("Exported GPAD data for organism " + organism_name + " to " + gpad_filename + ".")
+
+    def export_gpi(self, gpi_filename: str, organism_name: str, database_authority: str, annotation_level: str,
+                   include_obsolete_features=False) -> None:
+        """Exports the annotated gene products of an organism to a GPI file"""
+        gaf_records = self._create_gaf_records_of_organism(organism_name, database_authority, annotation_level,
+                                                           include_obsolete_features)
+        with utils.open_file_write(gpi_filename) as gpi_handle:
+            writer = GPIWriter(gpi_handle)
+            writer.write_header(database_authority)
+            writer.write_records(self._create_gpi_records(gaf_records))
+        self.printer.print("Exported GPI data for organism " + organism_name + " to " + gpi_filename + ".")
+
+    def _create_gaf_records_of_organism(self, organism_name: str, database_authority: str, annotation_level: str,
+                                        include_obsolete_features: bool) -> Iterator[dict]:
+        """Loads the dependencies and creates GAF records for all GO terms associated with features of an
+        organism"""
+        organism_entry = self._load_organism(organism_name)
+        taxon_id = self._extract_taxon_id(organism_entry)
+        self._annotation_level_indices.clear()
+        self._feature_entries.clear()
+        return self._create_gaf_records(organism_entry, database_authority, taxon_id, annotation_level,
+                                        include_obsolete_features)
+
+    @staticmethod
+    def _create_gpad_record(gaf_record: dict) -> dict:
+        """Converts a GAF record into a GPAD record"""
+        gpad_record = {key: gaf_record.get(key) for key in GPAD11FIELDS}
+        gpad_record["Evidence"] = EVIDENCE_CODES_TO_ECO_TERMS.get(gaf_record["Evidence"], "")
+        gpad_record["Annotation_Properties"] = "go_evidence=" + gaf_record["Evidence"]
+        gpad_record["Aspect"] = gaf_record["Aspect"]
+        return gpad_record
+
+    @staticmethod
+    def _create_gpi_records(gaf_records: Iterable[dict]) -> Iterator[dict]:
+        """Creates a GPI record for each distinct gene product referenced by a stream of GAF records"""
+        exported_objects = set()
+        for gaf_record in gaf_records:
+            if gaf_record["DB_Object_ID"] in exported_objects:
+                continue
+            exported_objects.add(gaf_record["DB_Object_ID"])
+            yield {key: gaf_record.get(key) for key in GPI12FIELDS}
@@ -1,5 +1,7 @@
+import collections
 from typing import List, Dict
 import sqlalchemy.orm
+from . import lookup
 from .. import utils, ddl
 from ..orm import general, cv, pub, organism, sequence
 
@@ -59,6 +61,14 @@ class IOClient(ddl.DatabaseAccessClient):
             entry = self.insert_into_table(table, **kwargs)
         return entry
 
+    def _query_entries_by_key(self, table, key: str, values: List[int]) -> Dict[int, list]:
+        """Loads all entries of a table with a key matching one of the given values, grouped by that key"""
+        entries = collections.defaultdict(list)
+        if values:
+            for entry in self.session.query(table).filter(getattr(table, key).in_(values)).all():
+                entries[getattr(entry, key)].append(entry)
+        return entries
+
 
 class ChadoClient(IOClient):
     """Class for import/export operations on Chado databases"""
@@ -152,14 +162,35 @@ class ChadoClient(IOClient):
     def query_protein_features(self, organism_id: int, gene_type_id: int, part_of_id: int, derives_from_id: int
                                ) -> sqlalchemy.orm.Query:
         """Creates a query to select protein features of a given organism"""
-        transcript_feature = sqlalchemy.orm.aliased(sequence.Feature, name="transcript_feature")
         protein_feature = sqlalchemy.orm.aliased(sequence.Feature, name="protein_feature")
+        return self._filter_protein_features(self.session.query(protein_feature), protein_feature, organism_id,
+                                             gene_type_id, part_of_id, derives_from_id)
+
+    def query_protein_sequences(self, organism_id: int, gene_type_id: int, part_of_id: int, derives_from_id: int
+                                ) -> sqlalchemy.orm.Query:
+        """Creates a query to select uniquename, name, type, residues and obsolete flag of the protein features of
+        a given organism"""
+        protein_feature = sqlalchemy.orm.aliased(sequence.Feature, name="protein_feature")
+        protein_type = sqlalchemy.orm.aliased(cv.CvTerm, name="protein_type")
+        query = self.session.query(protein_feature.uniquename, protein_feature.name,
+                                   protein_type.name.label("type_name"), protein_feature.residues,
+                                   protein_feature.is_obsolete)
+        return self._filter_protein_features(query, protein_feature, organism_id, gene_type_id, part_of_id,
+                                             derives_from_id)\
+            .join(protein_type, protein_type.cvterm_id == protein_feature.type_id)
+
+    @staticmethod
+    def _filter_protein_features(query: sqlalchemy.orm.Query, protein_feature, organism_id: int, gene_type_id: int,
+                                 part_of_id: int, derives_from_id: int) -> sqlalchemy.orm.Query:
+        """Restricts a query to protein features of a given organism, i.e. features derived from a transcript
+        that is part of a gene"""
+        transcript_feature = sqlalchemy.orm.aliased(sequence.Feature, name="transcript_feature")
         gene_feature = sqlalchemy.orm.aliased(sequence.Feature, name="gene_feature")
         transcript_gene_relationship = sqlalchemy.orm.aliased(
             sequence.FeatureRelationship, name="transcript_gene_relationship")
         protein_transcript_relationship = sqlalchemy.orm.aliased(
             sequence.FeatureRelationship, name="protein_transcript_relationship")
-        return self.session.query(protein_feature)\
+        return query\
             .join(protein_transcript_relationship,
                   protein_transcript_relationship.subject_id == protein_feature.feature_id)\
             .join(transcript_feature, protein_transcript_relationship.object)\
@@ -257,6 +288,117 @@ class ChadoClient(IOClient):
             .join(cv.Cv, cv.CvTerm.cv)\
             .filter(cv.CvTerm.cvterm_id == cvterm_id)
 
+    def query_cvterms_by_db(self, db_id: int) -> sqlalchemy.orm.Query:
+        """Creates a query to select accession, ID and name of all CV terms of a given database authority"""
+        return self.session.query(general.DbxRef.accession, cv.CvTerm.cvterm_id, cv.CvTerm.name)\
+            .select_from(cv.CvTerm)\
+            .join(general.DbxRef, cv.CvTerm.dbxref)\
+            .filter(general.DbxRef.db_id == db_id)
+
+    def query_features_by_organism(self, organism_id: int) -> sqlalchemy.orm.Query:
+        """Creates a query to select ID, uniquename, name, type and obsolete flag of all features of a given
+        organism"""
+        return self.session.query(sequence.Feature.feature_id, sequence.Feature.uniquename, sequence.Feature.name,
+                                  cv.CvTerm.name.label("type"), sequence.Feature.is_obsolete)\
+            .select_from(sequence.Feature)\
+            .join(cv.CvTerm, sequence.Feature.type)\
+            .filter(sequence.Feature.organism_id == organism_id)
+
+    def query_feature_relationships_by_organism(self, organism_id: int, type_ids: List[int]
+                                                ) -> sqlalchemy.orm.Query:
+        """Creates a query to select relationships of specific types between features of a given organism"""
+        subject_feature = sqlalchemy.orm.aliased(sequence.Feature, name="subject_feature")
+        object_feature = sqlalchemy.orm.aliased(sequence.Feature, name="object_feature")
+        return self.session.query(sequence.FeatureRelationship.subject_id,
+                                  subject_feature.uniquename.label("subject_uniquename"),
+                                  sequence.FeatureRelationship.object_id,
+                                  object_feature.uniquename.label("object_uniquename"),
+                                  sequence.FeatureRelationship.type_id)\
+            .select_from(sequence.FeatureRelationship)\
+            .join(subject_feature, sequence.FeatureRelationship.subject)\
+            .join(object_feature, sequence.FeatureRelationship.object)\
+            .filter(subject_feature.organism_id == organism_id)\
+            .filter(object_feature.organism_id == organism_id)\
+            .filter(sequence.FeatureRelationship.type_id.in_(type_ids))
+
+    def query_feature_synonyms_by_organism(self, organism_id: int) -> sqlalchemy.orm.Query:
+        """Creates a query to select synonyms associated with features of a given organism"""
+        return self.session.query(sequence.FeatureSynonym.feature_id, sequence.Synonym.name.label("synonym"))\
+            .select_from(sequence.FeatureSynonym)\
+            .join(sequence.Synonym, sequence.FeatureSynonym.synonym)\
+            .join(sequence.Feature, sequence.FeatureSynonym.feature)\
+            .filter(sequence.Feature.organism_id == organism_id)\
+            .order_by(sequence.FeatureSynonym.feature_synonym_id)
+
+    def query_feature_cvterm_annotations_by_organism(self, organism_id: int, ontology_id: int
+                                                     ) -> sqlalchemy.orm.Query:
+        """Creates a query to select ontology terms, namespaces and primary publications of all feature_cvterms
+        associated with features of a given organism"""
+        return self.session.query(sequence.FeatureCvTerm.feature_cvterm_id, sequence.FeatureCvTerm.feature_id,
+                                  sequence.FeatureCvTerm.is_not, general.Db.name.label("db"),
+                                  general.DbxRef.accession, cv.Cv.name.label("namespace"),
+                                  pub.Pub.uniquename.label("pub"))\
+            .select_from(sequence.FeatureCvTerm)\
+            .join(sequence.Feature, sequence.FeatureCvTerm.feature)\
+            .join(cv.CvTerm, sequence.FeatureCvTerm.cvterm)\
+            .join(cv.Cv, cv.CvTerm.cv)\
+            .join(general.DbxRef, cv.CvTerm.dbxref)\
+            .join(general.Db, general.DbxRef.db)\
+            .join(pub.Pub, sequence.FeatureCvTerm.pub)\
+            .filter(sequence.Feature.organism_id == organism_id)\
+            .filter(general.Db.db_id == ontology_id)
+
+    def query_feature_cvterm_names_by_organism(self, organism_id: int, ontology_id: int) -> sqlalchemy.orm.Query:
+        """Creates a query to select the names of ontology terms associated with features of a given organism"""
+        return self.session.query(sequence.FeatureCvTerm.feature_id, cv.CvTerm.name)\
+            .select_from(sequence.FeatureCvTerm)\
+            .join(sequence.Feature, sequence.FeatureCvTerm.feature)\
+            .join(cv.CvTerm, sequence.FeatureCvTerm.cvterm)\
+            .join(general.DbxRef, cv.CvTerm.dbxref)\
+            .filter(sequence.Feature.organism_id == organism_id)\
+            .filter(general.DbxRef.db_id == ontology_id)\
+            .order_by(sequence.FeatureCvTerm.feature_cvterm_id)
+
+    def query_feature_cvterm_properties_by_organism(self, organism_id: int, ontology_id: int
+                                                    ) -> sqlalchemy.orm.Query:
+        """Creates a query to select key-value pairs from the 'feature_cvtermprop' table for all feature_cvterms
+        of a given organism and ontology"""
+        return self.session.query(sequence.FeatureCvTermProp.feature_cvterm_id, cv.CvTerm.name,
+                                  sequence.FeatureCvTermProp.value)\
+            .select_from(sequence.FeatureCvTermProp)\
+            .join(cv.CvTerm, sequence.FeatureCvTermProp.type)\
+            .filter(sequence.FeatureCvTermProp.feature_cvterm_id.in_(
+                self._feature_cvterm_ids_by_organism(organism_id, ontology_id)))\
+            .order_by(sequence.FeatureCvTermProp.feature_cvtermprop_id)
+
+    def query_feature_cvterm_secondary_pubs_by_organism(self, organism_id: int, ontology_id: int
+                                                        ) -> sqlalchemy.orm.Query:
+        """Creates a query to select entries from the 'pub' table associated with all feature_cvterms of a given
+        organism and ontology"""
+        return self.session.query(sequence.FeatureCvTermPub.feature_cvterm_id, pub.Pub.uniquename)\
+            .select_from(sequence.FeatureCvTermPub)\
+            .join(pub.Pub, sequence.FeatureCvTermPub.pub)\
+            .filter(sequence.FeatureCvTermPub.feature_cvterm_id.in_(
+                self._feature_cvterm_ids_by_organism(organism_id, ontology_id)))\
+            .order_by(sequence.FeatureCvTermPub.feature_cvterm_pub_id)
+
+    def query_feature_cvterm_dbxrefs_by_organism(self, organism_id: int, ontology_id: int
+                                                 ) -> sqlalchemy.orm.Query:
+        """Creates a query to select dbxrefs associated with all feature_cvterms of a given organism and ontology"""
+        return self.session.query(sequence.FeatureCvTermDbxRef.feature_cvterm_id, general.Db.name,
+                                  general.DbxRef.accession)\
+            .select_from(sequence.FeatureCvTermDbxRef)\
+            .join(general.DbxRef, sequence.FeatureCvTermDbxRef.dbxref)\
+            .join(general.Db, general.DbxRef.db)\
+            .filter(sequence.FeatureCvTermDbxRef.feature_cvterm_id.in_(
+                self._feature_cvterm_ids_by_organism(organism_id, ontology_id)))\
+            .order_by(sequence.FeatureCvTermDbxRef.feature_cvterm_dbxref_id)
+
+    def _feature_cvterm_ids_by_organism(self, organism_id: int, ontology_id: int) -> sqlalchemy.orm.Query:
+        """Creates a subquery to select the IDs of all feature_cvterms of a given organism and ontology"""
+        return self.query_feature_cvterm_by_ontology_and_organism(organism_id, ontology_id)\
+            .with_entities(sequence.FeatureCvTerm.feature_cvterm_id).subquery()
+
     def _load_db(self, name: str) -> general.Db:
         """Loads a specific DB"""
         db_entry = self.query_first(general.Db, name=name)
@@ -313,6 +455,12 @@ class ChadoClient(IOClient):
                 raise DatabaseError("CV term '" + term + "' not present in database")
         return cvterm_entries_dict
 
+    def _load_ontology_lookup(self, vocabularies: List[str] = (), db_authorities: List[str] = (), cache_directory=""
+                              ) -> lookup.OntologyLookup:
+        """Loads lookup tables for the CV terms of given vocabularies and/or database authorities, which are built
+        once per process and optionally cached in a directory"""
+        return lookup.load_lookup(self.session, self.uri, vocabularies, db_authorities, cache_directory)
+
     @staticmethod
     def _extract_cvterm_ids_from_dict(cvterm_dict: Dict[str, cv.CvTerm], terms: List[str]) -> List[int]:
         """Extracts the IDs of CV terms from a given dictionary"""
@@ -338,6 +486,15 @@ class ChadoClient(IOClient):
             raise DatabaseError("Organism '" + organism_name + "' not present in database")
         return organism_entry
 
+    def _load_organism_names(self) -> List[str]:
+        """Returns the abbreviations of all organisms present in the database"""
+        all_organism_names = []
+        for organism_name, in self.session.query(organism.Organism.abbreviation).order_by(
+                organism.Organism.abbreviation):
+            if organism_name:
+                all_organism_names.append(organism_name)
+        return all_organism_names
+
     def _load_feature_names(self, organism_entry: organism.Organism) -> List[str]:
         """Returns the IDs of all features for a given organism present in the database"""
         all_feature_names = []
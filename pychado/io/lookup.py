@@ -0,0 +1,174 @@
+import os
+import pickle
+import hashlib
+import tempfile
+import collections
+from typing import List, Dict, Tuple, Iterable, Union
+import sqlalchemy.orm
+from ..orm import general, cv
+
+# A CV term as stored in the lookup tables
+LookupTerm = collections.namedtuple("LookupTerm", ["cvterm_id", "name", "vocabulary", "db_authority", "accession"])
+
+# Lookup tables built in the current process, keyed by database and scope
+_lookups = {}                       # type: Dict[tuple, Tuple[tuple, OntologyLookup]]
+
+
+class OntologyLookup(object):
+    """Class holding lookup tables for the CV terms of one or more vocabularies and/or database authorities"""
+
+    def __init__(self, terms: Iterable[LookupTerm], relationships: Iterable[Tuple[int, int, int]]):
+        """Constructor"""
+        self._terms = {}                            # type: Dict[int, LookupTerm]
+        self._names = {}                            # type: Dict[Tuple[str, str], LookupTerm]
+        self._accessions = {}                       # type: Dict[str, Dict[str, LookupTerm]]
+        self._parents = collections.defaultdict(list)           # type: Dict[int, List[Tuple[int, int]]]
+        self._children = collections.defaultdict(list)          # type: Dict[int, List[Tuple[int, int]]]
+        for term in terms:
+            self._terms[term.cvterm_id] = term
+            self._names[(term.vocabulary, term.name)] = term
+            self._accessions.setdefault(term.db_authority, {})[term.accession] = term
+        for subject_id, object_id, type_id in relationships:
+            self._parents[subject_id].append((object_id, type_id))
+            self._children[object_id].append((subject_id, type_id))
+
+    def __len__(self) -> int:
+        """Returns the number of CV terms"""
+        return len(self._terms)
+
+    def term(self, cvterm_id: int) -> Union[None, LookupTerm]:
+        """Returns the CV term with a given ID"""
+        return self._terms.get(cvterm_id)
+
+    def term_id(self, name: str, vocabulary: str) -> Union[None, int]:
+        """Returns the ID of the CV term with a given name in a given vocabulary"""
+        term = self._names.get((vocabulary, name))
+        return term.cvterm_id if term else None
+
+    def accession_id(self, db_authority: str, accession: str) -> Union[None, int]:
+        """Returns the ID of the CV term with a given accession of a given database authority"""
+        term = self._accessions.get(db_authority, {}).get(accession)
+        return term.cvterm_id if term else None
+
+    def terms_of_db(self, db_authority: str) -> Dict[str, LookupTerm]:
+        """Returns all CV terms of a given database authority, keyed by accession"""
+        return self._accessions.get(db_authority, {})
+
+    def parents(self, cvterm_id: int) -> List[Tuple[int, int]]:
+        """Returns the IDs of the objects and types of all relationships of a given subject"""
+        return self._parents.get(cvterm_id, [])
+
+    def children(self, cvterm_id: int) -> List[Tuple[int, int]]:
+        """Returns the IDs of the subjects and types of all relationships of a given object"""
+        return self._children.get(cvterm_id, [])
+
+
+def load_lookup(session: sqlalchemy.orm.Session, uri: str, vocabularies: Iterable[str] = (),
+                db_authorities: Iterable[str] = (), cache_directory="") -> OntologyLookup:
+    """Returns lookup tables for the CV terms of the given vocabularies and database authorities. The tables are
+    built once per process, and optionally cached on disk. They are rebuilt if the number or the maximum ID of the CV
+    terms or relationships in scope has changed."""
+    vocabularies = tuple(sorted(set(vocabularies)))
+    db_authorities = tuple(sorted(set(db_authorities)))
+    key = (uri, vocabularies, db_authorities)
+    signature = query_lookup_signature(session, vocabularies, db_authorities)
+    if key in _lookups and _lookups[key][0] == signature:
+        return _lookups[key][1]
+
+    cache_file = ""
+    lookup = None
+    if cache_directory:
+        cache_file = os.path.join(cache_directory, "lookup_" + hashlib.sha256(repr(key).encode()).hexdigest()
+                                  + ".pickle")
+        lookup = read_lookup_cache(cache_file, signature)
+    if lookup is None:
+        lookup = build_lookup(session, vocabularies, db_authorities)
+        if cache_file:
+            write_lookup_cache(cache_file, signature, lookup)
+    _lookups[key] = (signature, lookup)
+    return lookup
+
+
+def build_lookup(session: sqlalchemy.orm.Session, vocabularies: Iterable[str], db_authorities: Iterable[str]
+                 ) -> OntologyLookup:
+    """Builds lookup tables for the CV terms of the given vocabularies and database authorities"""
+    term_query = session.query(cv.CvTerm.cvterm_id, cv.CvTerm.name, cv.Cv.name, general.Db.name,
+                               general.DbxRef.accession)\
+        .select_from(cv.CvTerm)\
+        .join(cv.Cv, cv.CvTerm.cv)\
+        .join(general.DbxRef, cv.CvTerm.dbxref)\
+        .join(general.Db, general.DbxRef.db)\
+        .filter(_scope_filter(vocabularies, db_authorities))\
+        .order_by(cv.CvTerm.is_obsolete.desc())
+    terms = [LookupTerm(*row) for row in term_query]
+    cvterm_ids = set(term.cvterm_id for term in terms)
+    relationships = [(subject_id, object_id, type_id) for subject_id, object_id, type_id
+                     in _query_relationships(session, vocabularies, db_authorities)
+                     if object_id in cvterm_ids]
+    return OntologyLookup(terms, relationships)
+
+
+def query_lookup_signature(session: sqlalchemy.orm.Session, vocabularies: Iterable[str],
+                           db_authorities: Iterable[str]) -> tuple:
+    """Queries the number and the maximum ID of the CV terms and relationships in the scope of lookup tables"""
+    term_signature = session.query(sqlalchemy.func.count(cv.CvTerm.cvterm_id),
+                                   sqlalchemy.func.max(cv.CvTerm.cvterm_id))\
+        .select_from(cv.CvTerm)\
+        .join(cv.Cv, cv.CvTerm.cv)\
+        .join(general.DbxRef, cv.CvTerm.dbxref)\
+        .join(general.Db, general.DbxRef.db)\
+        .filter(_scope_filter(vocabularies, db_authorities))\
+        .one()
+    relationship_signature = session.query(
+        sqlalchemy.func.count(cv.CvTermRelationship.cvterm_relationship_id),
+        sqlalchemy.func.max(cv.CvTermRelationship.cvterm_relationship_id))\
+        .select_from(cv.CvTermRelationship)\
+        .join(cv.CvTerm, cv.CvTermRelationship.subject_id == cv.CvTerm.cvterm_id)\
+        .join(cv.Cv, cv.CvTerm.cv)\
+        .join(general.DbxRef, cv.CvTerm.dbxref)\
+        .join(general.Db, general.DbxRef.db)\
+        .filter(_scope_filter(vocabularies, db_authorities))\
+        .one()
+    return tuple(term_signature) + tuple(relationship_signature)
+
+
+def _query_relationships(session: sqlalchemy.orm.Session, vocabularies: Iterable[str], db_authorities: Iterable[str]
+                         ) -> sqlalchemy.orm.Query:
+    """Creates a query to select subject, object and type of all relationships with a subject in scope"""
+    return session.query(cv.CvTermRelationship.subject_id, cv.CvTermRelationship.object_id,
+                         cv.CvTermRelationship.type_id)\
+        .select_from(cv.CvTermRelationship)\
+        .join(cv.CvTerm, cv.CvTermRelationship.subject_id == cv.CvTerm.cvterm_id)\
+        .join(cv.Cv, cv.CvTerm.cv)\
+        .join(general.DbxRef, cv.CvTerm.dbxref)\
+        .join(general.Db, general.DbxRef.db)\
+        .filter(_scope_filter(vocabularies, db_authorities))
+
+
+def _scope_filter(vocabularies: Iterable[str], db_authorities: Iterable[str]):
+    """Creates a filter selecting the CV terms of the given vocabularies and database authorities"""
+    return sqlalchemy.or_(cv.Cv.name.in_(list(vocabularies)), general.Db.name.in_(list(db_authorities)))
+
+
+def read_lookup_cache(filename: str, signature: tuple) -> Union[None, OntologyLookup]:
+    """Reads lookup tables from a cache file, if the file exists and matches the given signature"""
+    if not os.path.isfile(filename):
+        return None
+    try:
+        with open(filename, "rb") as cache:
+            (cached_signature, lookup) = pickle.load(cache)
+    except (OSError, EOFError, ValueError, TypeError, AttributeError, pickle.UnpicklingError):
+        return None
+    if cached_signature != signature or not isinstance(lookup, OntologyLookup):
+        return None
+    return lookup
+
+
+def write_lookup_cache(filename: str, signature: tuple, lookup: OntologyLookup) -> None:
+    """Writes lookup tables to a cache file"""
+    directory = os.path.dirname(filename)
+    os.makedirs(directory, exist_ok=True)
+    (file_descriptor, temporary_file) = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    with os.fdopen(file_descriptor, "wb") as cache:
+        pickle.dump((signature, lookup), cache, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(temporary_file, filename)
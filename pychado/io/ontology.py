@@ -1,10 +1,155 @@
+import sys
 import copy
-from typing import List, Dict
+import json
+import time
+import collections
+import multiprocessing
+import xml.etree.ElementTree
+from typing import List, Dict, Set, Tuple, Iterator
+import yaml
+import sqlalchemy.orm
+import psycopg2.extras
+import psycopg2.extensions
 import pronto
 from .. import utils
 from ..io import iobase
 from ..orm import general, cv
 
+# Compact, parser-independent representation of an ontology term
+OntologyTerm = collections.namedtuple("OntologyTerm", ["id", "name", "namespace", "definition", "comment", "synonyms",
+                                                       "xrefs", "relationships", "is_obsolete"])
+
+# Ontology listed in a manifest for the import of several ontologies
+ManifestEntry = collections.namedtuple("ManifestEntry", ["database_authority", "file", "url", "format"])
+
+# Maximum number of rows per multi-row statement in bulk imports
+BULK_CHUNK_SIZE = 5000
+
+# Tags for synonyms in OBO files, with the default scope of the synonyms
+OBO_SYNONYM_TAGS = {"synonym": "RELATED", "exact_synonym": "EXACT", "broad_synonym": "BROAD",
+                    "narrow_synonym": "NARROW", "related_synonym": "RELATED"}
+OBO_SYNONYM_SCOPES = ["EXACT", "BROAD", "NARROW", "RELATED"]
+
+# Escape sequences in OBO files that don't simply stand for the escaped character
+OBO_ESCAPE_SEQUENCES = {"n": "\n", "t": "\t", "W": " "}
+
+# XML namespaces of OWL files
+OWL_NAMESPACE = "{http://www.w3.org/2002/07/owl#}"
+RDF_NAMESPACE = "{http://www.w3.org/1999/02/22-rdf-syntax-ns#}"
+RDFS_NAMESPACE = "{http://www.w3.org/2000/01/rdf-schema#}"
+OBO_IN_OWL_NAMESPACE = "{http://www.geneontology.org/formats/oboInOwl#}"
+
+# Annotation properties of classes in OWL files, with the scope of the synonyms
+OWL_SYNONYM_PROPERTIES = {"hasExactSynonym": "EXACT", "hasBroadSynonym": "BROAD", "hasNarrowSynonym": "NARROW",
+                          "hasRelatedSynonym": "RELATED", "hasSynonym": "RELATED"}
+OWL_DEFINITION_PROPERTY = "IAO_0000115"
+
+
+class DbxRefRecord(object):
+    """In-memory representation of an entry of the dbxref table during a bulk import"""
+
+    def __init__(self, db: str, accession: str, version: str, dbxref_id=None):
+        self.dbxref_id = dbxref_id
+        self.db = db
+        self.accession = accession
+        self.version = version
+        self.original_version = version
+        self.cvterm = None
+
+    def __str__(self) -> str:
+        return create_dbxref(self.db, self.accession, self.version)
+
+    def is_modified(self) -> bool:
+        """Checks if the version of a dbxref present in the database has been changed"""
+        return self.dbxref_id is not None and self.version != self.original_version
+
+
+class CvTermRecord(object):
+    """In-memory representation of an entry of the cvterm table during a bulk import"""
+
+    def __init__(self, cv_name: str, dbxref: DbxRefRecord, name: str, definition=None, is_obsolete=0,
+                 is_relationshiptype=0, cvterm_id=None):
+        self.cvterm_id = cvterm_id
+        self.cv = cv_name
+        self.dbxref = dbxref
+        self.name = name
+        self.definition = definition
+        self.is_obsolete = is_obsolete
+        self.is_relationshiptype = is_relationshiptype
+        self.original = None
+        if cvterm_id is not None:
+            self.original = self.properties()
+        if dbxref is not None:
+            dbxref.cvterm = self
+
+    def properties(self) -> Tuple[str, str, str, int]:
+        """Returns the properties of a CV term that can be changed by an import"""
+        return self.cv, self.name, self.definition, self.is_obsolete
+
+    def key(self) -> Tuple[str, str, int]:
+        """Returns the combination of properties that must be unique for all CV terms"""
+        return self.cv, self.name, self.is_obsolete
+
+    def identifier(self) -> str:
+        """Returns the dbxref of a CV term, or its ID for CV terms of other database authorities, whose dbxrefs are
+        not part of the snapshot"""
+        if self.dbxref is None:
+            return "cvterm_id:" + str(self.cvterm_id)
+        return str(self.dbxref)
+
+    def original_key(self) -> Tuple[str, str, int]:
+        """Returns the combination of unique properties of a CV term as present in the database"""
+        if self.original is None:
+            return None
+        return self.original[0], self.original[1], self.original[3]
+
+    def is_modified(self) -> bool:
+        """Checks if the properties of a CV term present in the database have been changed"""
+        return self.original is not None and self.properties() != self.original
+
+
+class OntologySnapshot(object):
+    """Copy of the database entries affected by the import of an ontology"""
+
+    def __init__(self, default_db: str):
+        self.default_db = default_db
+        self.db_ids = {}                                                # type: Dict[str, int]
+        self.cv_ids = {}                                                # type: Dict[str, int]
+        self.dbxrefs = {}                                       # type: Dict[Tuple[str, str], List[DbxRefRecord]]
+        self.cvterms = []                                               # type: List[CvTermRecord]
+        self.foreign_cvterms = {}                                       # type: Dict[tuple, CvTermRecord]
+        self.comments = collections.defaultdict(list)                   # type: Dict[int, List[tuple]]
+        self.synonyms = collections.defaultdict(list)                   # type: Dict[int, List[tuple]]
+        self.crossrefs = collections.defaultdict(list)                  # type: Dict[int, List[tuple]]
+        self.relationships = collections.defaultdict(list)              # type: Dict[int, List[tuple]]
+
+    def add_dbxref(self, dbxref_record: DbxRefRecord) -> None:
+        """Adds a database cross reference to the snapshot"""
+        self.dbxrefs.setdefault((dbxref_record.db, dbxref_record.accession), []).append(dbxref_record)
+
+
+class OntologyChanges(object):
+    """Inserts, updates and deletions that bring the database in line with an ontology file"""
+
+    def __init__(self):
+        self.db_inserts = []                                            # type: List[str]
+        self.cv_inserts = []                                            # type: List[str]
+        self.dbxref_inserts = []                                        # type: List[DbxRefRecord]
+        self.dbxref_updates = []                                        # type: List[DbxRefRecord]
+        self.cvterm_inserts = []                                        # type: List[CvTermRecord]
+        self.cvterm_updates = []                                        # type: List[CvTermRecord]
+        self.cvterm_obsoletions = []                                    # type: List[CvTermRecord]
+        self.comment_inserts = []                                       # type: List[tuple]
+        self.comment_updates = []                                       # type: List[tuple]
+        self.comment_deletes = []                                       # type: List[tuple]
+        self.synonym_inserts = []                                       # type: List[tuple]
+        self.synonym_updates = []                                       # type: List[tuple]
+        self.synonym_deletes = []                                       # type: List[tuple]
+        self.crossref_inserts = []                                      # type: List[tuple]
+        self.crossref_deletes = []                                      # type: List[tuple]
+        self.relationship_inserts = []                                  # type: List[tuple]
+        self.relationship_deletes = []                                  # type: List[tuple]
+
 
 class OntologyClient(iobase.IOClient):
 
@@ -42,12 +187,103 @@ class OntologyClient(iobase.IOClient):
         self._comment_term = self._load_comment_term()
         self._relationship_terms = self._load_relationship_terms()
         self._synonym_type_terms = self._load_synonym_type_terms()
+        self._data_version_term = self._load_data_version_term()
 
-    def load(self, filename: str, file_format: str, db_authority: str):
+    def load(self, filename: str, file_format: str, db_authority: str, bulk=False, streaming=False, force=False,
+             dry_run=False, report_file=""):
         """Loads CV terms from a file into a database"""
 
-        # Parse the file
+        # Only report the changes, if requested
+        data_version = read_data_version(filename, file_format)
+        if dry_run:
+            self._dry_run(filename, file_format, db_authority, streaming, data_version, report_file)
+            return
+
+        # Skip the import if the version of the ontology has already been loaded
+        if data_version and not force and data_version == self._load_data_version(db_authority):
+            print("Ontology version '" + data_version + "' of database authority " + db_authority
+                  + " has already been imported.")
+            return
+
+        # Parse the file and insert, update and/or delete entries in various tables
         self.printer.print("Parsing ontology file ...")
+        if streaming and file_format == "obo":
+            self._load_obo_file(filename, db_authority)
+        elif streaming and file_format == "owl":
+            self._load_owl_file(filename, db_authority)
+        else:
+            self._load_pronto_ontology(filename, file_format, db_authority, bulk)
+        self._store_data_version(db_authority, data_version)
+
+        # Commit changes
+        self.session.commit()
+        self._print_statistics()
+
+    def _dry_run(self, filename: str, file_format: str, db_authority: str, streaming: bool, data_version: str,
+                 report_file: str) -> None:
+        """Computes the changes an import of CV terms from a file would apply to the database, and writes them to a
+        JSON report together with the run times of the individual phases. Nothing is written to the database."""
+        timings = {}                                                                # type: Dict[str, float]
+
+        # Progress messages go to stderr if the report is written to stdout, so that the report remains valid JSON
+        printer_file = self.printer.file
+        if not report_file:
+            self.printer.file = sys.stderr
+        try:
+            self.printer.print("Parsing ontology file ...")
+            start_time = time.time()
+            (default_namespace, terms, typedefs) = read_ontology_file(filename, file_format, db_authority, streaming)
+            timings["parse"] = time.time() - start_time
+            self.printer.print("Retrieved " + str(len(terms)) + " terms for database authority " + db_authority)
+            (snapshot, changes) = self._diff_terms(terms, typedefs, default_namespace, db_authority, timings)
+            self._count_changes(changes)
+            report = {
+                "file": filename,
+                "database_authority": db_authority,
+                "data_version": data_version,
+                "imported_data_version": self._load_data_version(db_authority),
+                "timings": {phase: round(run_time, 3) for phase, run_time in timings.items()},
+                "statistics": self._statistics(),
+                "changes": self._report_changes(changes, snapshot)
+            }
+        finally:
+            self.printer.file = printer_file
+            self.session.rollback()
+
+        file_handle = utils.open_file_write(report_file)
+        json.dump(report, file_handle, indent=4)
+        file_handle.write("\n")
+        utils.close(file_handle)
+        if report_file:
+            self._print_statistics("Dry run: no changes have been written to the database.")
+
+    def _load_obo_file(self, filename: str, db_authority: str) -> None:
+        """Loads CV terms from an OBO file, parsed with a streaming reader, into the database in bulk"""
+        (default_namespace, terms, typedefs) = read_obo_file(filename, db_authority)
+        self.printer.print("Retrieved " + str(len(terms)) + " terms for database authority " + db_authority)
+        self._load_terms_in_bulk(terms, typedefs, default_namespace, db_authority)
+
+    def _load_owl_file(self, filename: str, db_authority: str) -> None:
+        """Loads CV terms from an OWL file, parsed with a streaming reader, into the database in bulk"""
+        (default_namespace, terms, typedefs) = read_owl_file(filename, db_authority)
+        self.printer.print("Retrieved " + str(len(terms)) + " terms for database authority " + db_authority)
+        self._load_terms_in_bulk(terms, typedefs, default_namespace, db_authority)
+
+    def _load_parsed_files(self, db_authority: str, parsed_files: List[Tuple[str, List[OntologyTerm], List[str]]]) \
+            -> None:
+        """Loads the terms of a database authority, read from one or several files, into the database in bulk"""
+        default_namespace = parsed_files[0][0]
+        terms = {}                                                                  # type: Dict[str, OntologyTerm]
+        typedefs = []
+        for namespace, file_terms, file_typedefs in parsed_files:
+            for term in file_terms:
+                terms.setdefault(term.id, term._replace(namespace=term.namespace or namespace))
+            typedefs.extend(typedef for typedef in file_typedefs if typedef not in typedefs)
+        self.printer.print("Retrieved " + str(len(terms)) + " terms for database authority " + db_authority)
+        self._load_terms_in_bulk(list(terms.values()), typedefs, default_namespace, db_authority)
+
+    def _load_pronto_ontology(self, filename: str, file_format: str, db_authority: str, bulk: bool) -> None:
+        """Loads CV terms from an OBO/OWL file, parsed with pronto, into the database"""
         ontology = parse_ontology(filename, file_format)                            # type: pronto.Ontology
 
         # Filter content: Only retain the terms stemming from the database authority of interest
@@ -55,6 +291,18 @@ class OntologyClient(iobase.IOClient):
         ontology_terms = filter_ontology_by_db(ontology, db_authority)              # type: Dict[str, pronto.Term]
         self.printer.print("Retrieved " + str(len(ontology_terms)) + " terms for database authority " + db_authority)
 
+        # Insert, update and/or delete entries in various tables
+        if bulk:
+            terms = [convert_term(term) for term in ontology_terms.values()]
+            typedefs = [typedef.obo_name for typedef in ontology.typedefs]
+            self._load_terms_in_bulk(terms, typedefs, default_namespace, db_authority)
+        else:
+            self._load_terms(ontology, ontology_terms, default_namespace, db_authority)
+
+    def _load_terms(self, ontology: pronto.Ontology, ontology_terms: Dict[str, pronto.Term], default_namespace: str,
+                    db_authority: str) -> None:
+        """Loads CV terms into the database one by one"""
+
         # Find/create parent vocabulary and db of ontology terms in file; load dependencies
         default_db_entry = self._handle_db(db_authority)
         default_cv_entry = self._handle_cv(pronto.Term(""), default_namespace)
@@ -66,7 +314,7 @@ class OntologyClient(iobase.IOClient):
         for typedef in ontology.typedefs:                                           # type: pronto.Relationship
             self._handle_typedef(typedef, default_db_entry, default_cv_entry)
 
-        # First loop over all terms retrieved from the file: handle vocabulary, dbxref, CV terms, synonyms, comments
+        # First loop over all terms retrieved from the file: handle vocabulary, dbxref, CV terms, comments
         for term in ontology_terms.values():                                        # type: pronto.Term
 
             # Insert, update and/or delete entries in various tables
@@ -74,25 +322,25 @@ class OntologyClient(iobase.IOClient):
             dbxref_entry = self._handle_dbxref(term, default_db_entry)
             cvterm_entry = self._handle_cvterms(ontology_terms, default_db_entry, dbxref_entry, cv_entry.cv_id)
             self._handle_comments(term, cvterm_entry)
-            self._handle_synonyms(term, cvterm_entry)
 
             # Save CV term in global container
             all_cvterm_entries[term.id] = cvterm_entry
 
-        # Second loop over all terms retrieved from file: cross references and relationships
+        # Handle synonyms and cross references in batches of terms
+        terms_and_entries = [(term, all_cvterm_entries[term.id]) for term in ontology_terms.values()]
+        for batch in utils.split_into_chunks(terms_and_entries, BULK_CHUNK_SIZE):
+            self._handle_synonyms_in_batch(batch)
+            self._handle_cross_references_in_batch(batch)
+
+        # Second loop over all terms retrieved from file: relationships
         for term in ontology_terms.values():                                        # type: pronto.Term
 
             # Insert, update and/or delete entries in various tables
-            self._handle_cross_references(term, all_cvterm_entries[term.id])
             self._handle_relationships(term, all_cvterm_entries[term.id], all_cvterm_entries)
 
         # Mark obsolete CV terms
         self._mark_obsolete_terms(ontology_terms, default_db_entry)
 
-        # Commit changes
-        self.session.commit()
-        self._print_statistics()
-
     def _load_synonym_type_terms(self) -> Dict[str, cv.CvTerm]:
         """Loads CV terms describing tyoes of synonyms"""
         synonym_type_cv = self.query_table(cv.Cv, name="synonym_type").first()
@@ -126,6 +374,37 @@ class OntologyClient(iobase.IOClient):
                 raise iobase.DatabaseError("CV term for relationship '" + term + "' not present in database")
         return relationship_cvterms_dict
 
+    def _load_data_version_term(self) -> cv.CvTerm:
+        """Loads the CV term describing the version of an imported ontology; databases set up with an earlier version
+        of the essentials lack this term, in which case versions are not recorded"""
+        property_type_cv = self.query_table(cv.Cv, name="cvterm_property_type").first()
+        if not property_type_cv:
+            return None
+        return self.query_table(cv.CvTerm, name="data_version", cv_id=property_type_cv.cv_id).first()
+
+    def _load_data_version(self, db_authority: str) -> str:
+        """Returns the version of the ontology last imported for a database authority, as recorded in the dbprop
+        table"""
+        if not self._data_version_term:
+            return ""
+        dbprop_entry = self.query_table(general.DbProp, type_id=self._data_version_term.cvterm_id).join(general.Db)\
+            .filter(general.Db.name == db_authority).first()                       # type: general.DbProp
+        return dbprop_entry.value if dbprop_entry and dbprop_entry.value else ""
+
+    def _store_data_version(self, db_authority: str, data_version: str) -> None:
+        """Records the version of the ontology imported for a database authority in the dbprop table"""
+        if not self._data_version_term or not data_version:
+            return
+        db_entry = self._handle_db(db_authority)
+        dbprop_entry = self.query_table(general.DbProp, db_id=db_entry.db_id,
+                                        type_id=self._data_version_term.cvterm_id).first()     # type: general.DbProp
+        if not dbprop_entry:
+            self.add_and_flush(general.DbProp(db_id=db_entry.db_id, type_id=self._data_version_term.cvterm_id,
+                                         value=data_version))
+        elif dbprop_entry.value != data_version:
+            dbprop_entry.value = data_version
+        self.printer.print("Recorded ontology version '" + data_version + "' of database authority " + db_authority)
+
     def _handle_db(self, db_authority: str) -> general.Db:
         """Returns an entry from the db table"""
         db_entry = self.query_table(general.Db, name=db_authority).first()         # type: general.Db
@@ -143,10 +422,12 @@ class OntologyClient(iobase.IOClient):
         namespace = default_namespace
         if "namespace" in term.other:
             namespace = term.other["namespace"][0]
+        return self._handle_namespace(namespace)
+
+    def _handle_namespace(self, namespace: str) -> cv.Cv:
+        """Returns the entry of a controlled vocabulary from the cv table, and creates it if not yet available"""
         if not namespace:
             raise iobase.InputFileError("Namespace missing in input file")
-
-        # Get the corresponding CV in the database - create it, if not yet available
         cv_entry = self.query_table(cv.Cv, name=namespace).first()                 # type: cv.Cv
         if not cv_entry:
             cv_entry = cv.Cv(name=namespace)
@@ -292,19 +573,23 @@ class OntologyClient(iobase.IOClient):
 
     def _handle_typedef(self, typedef: pronto.Relationship, default_db: general.Db, default_cv: cv.Cv):
         """Inserts CV terms for relationship ontology terms (so-called "typedefs")"""
+        return self._handle_typedef_name(typedef.obo_name, default_db, default_cv)
+
+    def _handle_typedef_name(self, name: str, default_db: general.Db, default_cv: cv.Cv) -> cv.CvTerm:
+        """Inserts a CV term for a relationship ontology term with a given name, if not yet available"""
 
         # Check if a relationship CV term with this name already exists
-        cvterm_entry = self.query_table(cv.CvTerm, name=typedef.obo_name, is_relationshiptype=1).first()
+        cvterm_entry = self.query_table(cv.CvTerm, name=name, is_relationshiptype=1).first()
         if not cvterm_entry:
 
             # Create dbxref
-            dbxref = create_dbxref(default_db.name, typedef.obo_name)
-            term = pronto.Term(dbxref, typedef.obo_name)
+            dbxref = create_dbxref(default_db.name, name)
+            term = pronto.Term(dbxref, name)
             dbxref_entry = self._handle_dbxref(term, default_db)
 
             # Create CV term
             cvterm_entry = cv.CvTerm(cv_id=default_cv.cv_id, dbxref_id=dbxref_entry.dbxref_id,
-                                     name=typedef.obo_name, is_relationshiptype=1)
+                                     name=name, is_relationshiptype=1)
             self.add_and_flush(cvterm_entry)
             self._cvterm_inserts += 1
             self.printer.print("Inserted CV term '" + cvterm_entry.name + "' for dbxref " + dbxref)
@@ -362,107 +647,199 @@ class OntologyClient(iobase.IOClient):
 
     def _handle_synonyms(self, term: pronto.Term, cvterm_entry: cv.CvTerm) -> List[cv.CvTermSynonym]:
         """Inserts, updates or deletes synonyms to a CV term in the cvtermsynonym table"""
+        return self._handle_synonyms_in_batch([(term, cvterm_entry)])[cvterm_entry.cvterm_id]
+
+    def _handle_synonyms_in_batch(self, terms: List[Tuple[pronto.Term, cv.CvTerm]]
+                                  ) -> Dict[int, List[cv.CvTermSynonym]]:
+        """Inserts, updates or deletes synonyms to a batch of CV terms in the cvtermsynonym table, and returns the
+        synonyms of each CV term"""
+
+        # Get existing synonyms of all CV terms of the batch with a single query
+        cvterm_entries = {cvterm_entry.cvterm_id: cvterm_entry for _, cvterm_entry in terms}
+        existing_synonyms = self._query_entries_by_key(cv.CvTermSynonym, "cvterm_id", list(cvterm_entries))
+        edited_entries = {cvterm_id: [] for cvterm_id in cvterm_entries}
+        new_rows = {}                                                               # type: Dict[Tuple[int, str], dict]
+        deleted_entries = []
+
+        # Loop over all terms of the batch and the synonyms in the input file
+        for term, cvterm_entry in terms:
+            existing_entries = {entry.synonym: entry for entry in existing_synonyms[cvterm_entry.cvterm_id]}
+            handled_synonyms = set()
+            for synonym in term.synonyms:                                           # type: pronto.Synonym
+
+                # Extract synonym type
+                synonym_type = synonym.scope.lower()
+                if synonym_type not in self._synonym_type_terms:
+                    self.printer.print("WARNING: synonym type '" + synonym_type + "' not present in database!")
+                    continue
+                if synonym.desc in handled_synonyms:
+                    continue
+                handled_synonyms.add(synonym.desc)
+                type_id = self._synonym_type_terms[synonym_type].cvterm_id
+
+                # Check if the synonym is already present in the database
+                cvtermsynonym_entry = existing_entries.get(synonym.desc)
+                if cvtermsynonym_entry:
+
+                    # Check if the synonyms in database and file have identical properties
+                    if cvtermsynonym_entry.type_id != type_id:
+
+                        # Update synonym (type)
+                        cvtermsynonym_entry.type_id = type_id
+                        self.printer.print("Updated synonym '" + cvtermsynonym_entry.synonym + "' for CV term '"
+                                           + cvterm_entry.name + "'")
+                        self._synonym_updates += 1
+                    edited_entries[cvterm_entry.cvterm_id].append(cvtermsynonym_entry)
+                else:
+                    new_rows[(cvterm_entry.cvterm_id, synonym.desc)] = {
+                        "cvterm_id": cvterm_entry.cvterm_id, "synonym": synonym.desc, "type_id": type_id}
 
-        # Get existing and new synonyms, i.e. synonyms present in database and in input file
-        existing_synonyms = self.query_table(cv.CvTermSynonym, cvterm_id=cvterm_entry.cvterm_id).all()
-        new_synonyms = extract_synonyms(term)
-        edited_entries = []
-
-        # Loop over all synonyms in input file
-        for synonym in term.synonyms:                                               # type: pronto.Synonym
-
-            # Extract synonym type
-            if synonym.scope.lower() not in self._synonym_type_terms:
-                synonym_type_term = ""
-                self.printer.print("WARNING: synonym type '" + synonym.scope.lower() + "' not present in database!")
-            else:
-                synonym_type_term = self._synonym_type_terms[synonym.scope.lower()]
-
-            # Check if the synonym is already present in the database
-            matching_synonyms = utils.filter_objects(existing_synonyms,
-                                                     synonym=synonym.desc)          # type: List[cv.CvTermSynonym]
-            if matching_synonyms:
-
-                # Check if the synonyms in database and file have identical properties (len(matching_synonyms) = 1)
-                cvtermsynonym_entry = matching_synonyms[0]                          # type: cv.CvTermSynonym
-                if cvtermsynonym_entry.type_id != synonym_type_term.cvterm_id:
-
-                    # Update synonym (type)
-                    cvtermsynonym_entry.type_id = synonym_type_term.cvterm_id
-                    self.printer.print("Updated synonym '" + cvtermsynonym_entry.synonym + "' for CV term '"
-                                       + cvterm_entry.name + "'")
-                    self._synonym_updates += 1
-            else:
-
-                # Insert synonym
-                cvtermsynonym_entry = cv.CvTermSynonym(cvterm_id=cvterm_entry.cvterm_id, synonym=synonym.desc,
-                                                       type_id=synonym_type_term.cvterm_id)
-                self.add_and_flush(cvtermsynonym_entry)
-                self.printer.print("Inserted synonym '" + cvtermsynonym_entry.synonym + "' for CV term '"
-                                   + cvterm_entry.name + "'")
-                self._synonym_inserts += 1
-
-            edited_entries.append(cvtermsynonym_entry)
+            # Collect synonyms not present in file
+            new_synonyms = extract_synonyms(term)
+            for cvtermsynonym_entry in existing_entries.values():                   # type: cv.CvTermSynonym
+                if not cvtermsynonym_entry.synonym or cvtermsynonym_entry.synonym not in new_synonyms:
+                    deleted_entries.append(cvtermsynonym_entry)
 
         # Delete synonyms not present in file
-        for cvtermsynonym_entry in existing_synonyms:                               # type: cv.CvTermSynonym
-            if not cvtermsynonym_entry.synonym or cvtermsynonym_entry.synonym not in new_synonyms:
-
-                # Delete synonym
-                self.session.delete(cvtermsynonym_entry)
-                self.printer.print("Deleted synonym '" + cvtermsynonym_entry.synonym + "' for CV term '"
-                                   + cvterm_entry.name + "'")
-                self._synonym_deletes += 1
-
+        self.session.flush()
+        self._delete_entries_in_bulk(cv.CvTermSynonym, "cvtermsynonym_id", deleted_entries)
+        for cvtermsynonym_entry in deleted_entries:                                 # type: cv.CvTermSynonym
+            self.printer.print("Deleted synonym '" + cvtermsynonym_entry.synonym + "' for CV term '"
+                               + cvterm_entries[cvtermsynonym_entry.cvterm_id].name + "'")
+            self._synonym_deletes += 1
+
+        # Insert new synonyms
+        for cvtermsynonym_id, cvterm_id, synonym in self._insert_in_bulk(
+                cv.CvTermSynonym, list(new_rows.values()), cv.CvTermSynonym.cvtermsynonym_id,
+                cv.CvTermSynonym.cvterm_id, cv.CvTermSynonym.synonym):
+            edited_entries[cvterm_id].append(cv.CvTermSynonym(cvtermsynonym_id=cvtermsynonym_id,
+                                                              **new_rows[(cvterm_id, synonym)]))
+            self.printer.print("Inserted synonym '" + synonym + "' for CV term '" + cvterm_entries[cvterm_id].name
+                               + "'")
+            self._synonym_inserts += 1
         return edited_entries
 
     def _handle_cross_references(self, term: pronto.Term, cvterm_entry: cv.CvTerm) -> List[cv.CvTermDbxRef]:
         """Inserts, updates or deletes database cross references to a CV term in the cvterm_dbxref table"""
+        return self._handle_cross_references_in_batch([(term, cvterm_entry)])[cvterm_entry.cvterm_id]
+
+    def _handle_cross_references_in_batch(self, terms: List[Tuple[pronto.Term, cv.CvTerm]]
+                                          ) -> Dict[int, List[cv.CvTermDbxRef]]:
+        """Inserts, updates or deletes database cross references to a batch of CV terms in the cvterm_dbxref table,
+        and returns the cross references of each CV term"""
+
+        # Get existing cross references of all CV terms of the batch, and the referenced dbxrefs
+        cvterm_entries = {cvterm_entry.cvterm_id: cvterm_entry for _, cvterm_entry in terms}
+        existing_crossrefs = self._query_entries_by_key(cv.CvTermDbxRef, "cvterm_id", list(cvterm_entries))
+        new_crossrefs = {cvterm_entry.cvterm_id: extract_cross_references(term) for term, cvterm_entry in terms}
+        dbxref_ids = self._handle_referenced_dbxrefs(
+            set(crossref for crossrefs in new_crossrefs.values() for crossref in crossrefs))
+        edited_entries = {cvterm_id: [] for cvterm_id in cvterm_entries}
+        new_rows = []
+        deleted_entries = []
+
+        # Loop over all terms of the batch and the cross references in the input file
+        for cvterm_id, crossrefs in new_crossrefs.items():
+            existing_entries = {entry.dbxref_id: entry for entry in existing_crossrefs[cvterm_id]}
+            handled_dbxref_ids = set()
+            for crossref in crossrefs:
+                dbxref_id = dbxref_ids[crossref]
+                if dbxref_id in handled_dbxref_ids:
+                    continue
+                handled_dbxref_ids.add(dbxref_id)
 
-        # Get existing cross references, i.e. cross references present in database
-        existing_crossrefs = self.query_table(cv.CvTermDbxRef, cvterm_id=cvterm_entry.cvterm_id).all()
-        edited_entries = []
-
-        # Get cross references present in the file and loop over them
-        new_crossrefs = extract_cross_references(term)
-        for crossref in new_crossrefs:
-
-            # Obtain the corresponding entry from the dbxref table, insert if not existing
-            db_authority = split_dbxref(crossref)[0]
-            corresponding_db_entry = self._handle_db(db_authority)
-            corresponding_dbxref_entry = self._handle_dbxref(pronto.Term(crossref), corresponding_db_entry)
-
-            # Check if the cross reference is already present in the database
-            matching_crossrefs = utils.filter_objects(
-                existing_crossrefs, dbxref_id=corresponding_dbxref_entry.dbxref_id)  # type: List[cv.CvTermDbxRef]
-            if matching_crossrefs:
-
-                # Save the existing cross reference
-                edited_entries.append(matching_crossrefs[0])
-            else:
+                # Check if the cross reference is already present in the database
+                if dbxref_id in existing_entries:
+                    edited_entries[cvterm_id].append(existing_entries[dbxref_id])
+                else:
+                    new_rows.append({"cvterm_id": cvterm_id, "dbxref_id": dbxref_id, "is_for_definition": 0})
 
-                # Insert cross reference
-                cvterm_dbxref_entry = cv.CvTermDbxRef(cvterm_id=cvterm_entry.cvterm_id,
-                                                      dbxref_id=corresponding_dbxref_entry.dbxref_id,
-                                                      is_for_definition=0)
-                self.add_and_flush(cvterm_dbxref_entry)
-                self.printer.print("Inserted cross reference '" + crossref + "' for CV term '"
-                                   + cvterm_entry.name + "'")
-                self._crossref_inserts += 1
-                edited_entries.append(cvterm_dbxref_entry)
+            # Collect cross references not present in file
+            for dbxref_id, cvterm_dbxref_entry in existing_entries.items():
+                if dbxref_id not in handled_dbxref_ids:
+                    deleted_entries.append(cvterm_dbxref_entry)
 
         # Delete cross references not present in file
-        for cvterm_dbxref_entry in existing_crossrefs:                              # type: cv.CvTermDbxRef
-            matching_crossrefs = utils.filter_objects(edited_entries, dbxref_id=cvterm_dbxref_entry.dbxref_id)
-            if not matching_crossrefs:
+        self.session.flush()
+        self._delete_entries_in_bulk(cv.CvTermDbxRef, "cvterm_dbxref_id", deleted_entries)
+        for cvterm_dbxref_entry in deleted_entries:                                 # type: cv.CvTermDbxRef
+            self.printer.print("Deleted cross reference with dbxref-ID " + str(cvterm_dbxref_entry.dbxref_id)
+                               + " for CV term '" + cvterm_entries[cvterm_dbxref_entry.cvterm_id].name + "'")
+            self._crossref_deletes += 1
+
+        # Insert new cross references
+        for cvterm_dbxref_id, cvterm_id, dbxref_id in self._insert_in_bulk(
+                cv.CvTermDbxRef, new_rows, cv.CvTermDbxRef.cvterm_dbxref_id, cv.CvTermDbxRef.cvterm_id,
+                cv.CvTermDbxRef.dbxref_id):
+            edited_entries[cvterm_id].append(cv.CvTermDbxRef(cvterm_dbxref_id=cvterm_dbxref_id, cvterm_id=cvterm_id,
+                                                             dbxref_id=dbxref_id, is_for_definition=0))
+            self.printer.print("Inserted cross reference with dbxref-ID " + str(dbxref_id) + " for CV term '"
+                               + cvterm_entries[cvterm_id].name + "'")
+            self._crossref_inserts += 1
+        return edited_entries
+
+    def _handle_referenced_dbxrefs(self, crossrefs: Set[str]) -> Dict[str, int]:
+        """Resolves database cross references to the IDs of entries in the dbxref table, which are loaded with a few
+        queries into a map keyed by db and accession. Missing dbs and dbxrefs are inserted, and versions updated."""
+        split_crossrefs = {crossref: split_dbxref(crossref) for crossref in crossrefs}
+
+        # Load or insert the referenced dbs
+        db_names = sorted(set(db_authority for db_authority, _, _ in split_crossrefs.values()))
+        db_ids = {}
+        for chunk in utils.split_into_chunks(db_names, BULK_CHUNK_SIZE):
+            db_ids.update({name: db_id for db_id, name in self.session.query(general.Db.db_id, general.Db.name)
+                           .filter(general.Db.name.in_(chunk))})
+        for db_id, name in self._insert_in_bulk(general.Db, [{"name": name} for name in db_names if name not in db_ids],
+                                                general.Db.db_id, general.Db.name):
+            db_ids[name] = db_id
+            self.printer.print("Inserted DB '" + name + "'")
+            self._db_inserts += 1
 
-                # Delete cross reference
-                self.session.delete(cvterm_dbxref_entry)
-                self.printer.print("Deleted cross reference with dbxref-ID " + str(cvterm_dbxref_entry.dbxref_id)
-                                   + " for CV term '" + cvterm_entry.name + "'")
-                self._crossref_deletes += 1
+        # Load the referenced dbxrefs, keyed by db and accession
+        accessions = collections.defaultdict(set)                                   # type: Dict[int, Set[str]]
+        for db_authority, accession, _ in split_crossrefs.values():
+            accessions[db_ids[db_authority]].add(accession)
+        dbxref_entries = collections.defaultdict(list)              # type: Dict[Tuple[int, str], List[general.DbxRef]]
+        for db_id, db_accessions in accessions.items():
+            for chunk in utils.split_into_chunks(sorted(db_accessions), BULK_CHUNK_SIZE):
+                for dbxref_entry in self.query_table(general.DbxRef, db_id=db_id)\
+                        .filter(general.DbxRef.accession.in_(chunk)).order_by(general.DbxRef.dbxref_id):
+                    dbxref_entries[(db_id, dbxref_entry.accession)].append(dbxref_entry)
+
+        # Resolve the cross references, updating versions and collecting dbxrefs that need to be inserted
+        dbxref_ids = {}
+        new_rows = {}                                                               # type: Dict[Tuple[int, str], dict]
+        new_crossrefs = {}                                                          # type: Dict[Tuple[int, str], str]
+        for crossref, (db_authority, accession, version) in sorted(split_crossrefs.items()):
+            key = (db_ids[db_authority], accession)
+            if key not in dbxref_entries:
+                if key not in new_rows:
+                    new_rows[key] = {"db_id": key[0], "accession": accession, "version": version}
+                    new_crossrefs[key] = crossref
+                continue
+            dbxref_entry = next((entry for entry in dbxref_entries[key] if entry.version == version), None)
+            if not dbxref_entry:
 
-        return edited_entries
+                # Update dbxref (version)
+                dbxref_entry = dbxref_entries[key][0]
+                dbxref_entry.version = version
+                self.printer.print("Updated dbxref '" + crossref + "'")
+                self._dbxref_updates += 1
+            dbxref_ids[crossref] = dbxref_entry.dbxref_id
+
+        # Insert the missing dbxrefs
+        self.session.flush()
+        inserted_ids = {}
+        for dbxref_id, db_id, accession in self._insert_in_bulk(general.DbxRef, list(new_rows.values()),
+                                                                general.DbxRef.dbxref_id, general.DbxRef.db_id,
+                                                                general.DbxRef.accession):
+            inserted_ids[(db_id, accession)] = dbxref_id
+            self.printer.print("Inserted dbxref '" + new_crossrefs[(db_id, accession)] + "'")
+            self._dbxref_inserts += 1
+        for crossref, (db_authority, accession, _) in split_crossrefs.items():
+            if crossref not in dbxref_ids:
+                dbxref_ids[crossref] = inserted_ids[(db_ids[db_authority], accession)]
+        return dbxref_ids
 
     def _handle_relationships(self, term: pronto.Term, subject_cvterm_entry: cv.CvTerm,
                               all_cvterm_entries: Dict[str, cv.CvTerm]) -> List[cv.CvTermRelationship]:
@@ -529,47 +906,623 @@ class OntologyClient(iobase.IOClient):
         return edited_entries
 
     def _mark_obsolete_terms(self, ontology_terms: Dict[str, pronto.Term], default_db: general.Db) -> List[cv.CvTerm]:
-        """Marks obsolete CV terms in the database"""
-
-        # Loop over all dbxref entries in the database
-        existing_entries = self.query_table(general.DbxRef, db_id=default_db.db_id).all()
+        """Marks CV terms of a database authority that are not present in the file as obsolete. The affected CV terms
+        are found with an anti-join against a temporary table of the accessions in the file, and updated in bulk."""
+
+        # Write all pending changes, and find the CV terms whose dbxrefs don't appear in the file
+        self.session.flush()
+        cursor = self._cursor()
+        cursor.execute("CREATE TEMPORARY TABLE ontology_accessions (accession TEXT NOT NULL, version TEXT NOT NULL) "
+                       "ON COMMIT DROP")
+        try:
+            accessions = [split_dbxref(term_id)[1:] for term_id in ontology_terms]
+            psycopg2.extras.execute_values(cursor, "INSERT INTO ontology_accessions (accession, version) VALUES %s",
+                                           accessions, page_size=BULK_CHUNK_SIZE)
+            cursor.execute("SELECT t.cvterm_id, t.cv_id, t.name, t.is_obsolete FROM " + cv.CvTerm.__table__.fullname
+                           + " AS t JOIN " + general.DbxRef.__table__.fullname + " AS x ON t.dbxref_id = x.dbxref_id "
+                           "WHERE x.db_id = %s AND t.is_relationshiptype = 0 AND NOT EXISTS (SELECT 1 FROM "
+                           "ontology_accessions AS a WHERE a.accession = x.accession AND a.version = "
+                           "coalesce(x.version, '')) ORDER BY t.cvterm_id", (default_db.db_id,))
+            candidates = cursor.fetchall()
+        finally:
+            # A failed transaction discards the table on rollback; otherwise it is dropped right away
+            if cursor.connection.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_INERROR:
+                cursor.execute("DROP TABLE IF EXISTS ontology_accessions")
+
+        # Assign a free combination of name and is_obsolete to all CV terms in a single pass over the occupied ones
+        marked_rows = self._assign_obsolete_keys(candidates)
+        for row in marked_rows:
+            self.printer.print("Marked CV term '" + row["name"] + "' as obsolete")
+        self._cvterm_deletes += len(marked_rows)
+
+        # Update the CV terms; entries are first moved out of the way, as they might take over each other's keys
+        self._update_in_bulk(cv.CvTerm, "cvterm_id", [
+            {"cvterm_id": row["cvterm_id"], "is_obsolete": -row["cvterm_id"]} for row in marked_rows])
+        self._update_in_bulk(cv.CvTerm, "cvterm_id", marked_rows)
+        self.session.expire_all()
         marked_entries = []
-        for dbxref_entry in existing_entries:                                       # type: general.DbxRef
-
-            # Check if the dbxref is also present in the input file
-            dbxref = create_dbxref(default_db.name, dbxref_entry.accession, dbxref_entry.version)
-            if dbxref not in ontology_terms:
-
-                # Find the corresponding CV term in the database
-                cvterm_entry = self.query_table(cv.CvTerm, dbxref_id=dbxref_entry.dbxref_id,
-                                                is_relationshiptype=0).first()      # type: cv.CvTerm
-                if not cvterm_entry:
-                    continue
-
-                # Mark the CV term as obsolete, if necessary
-                if self._mark_cvterm_as_obsolete(cvterm_entry):
-                    self.printer.print("Marked CV term '" + cvterm_entry.name + "' as obsolete")
-                    marked_entries.append(cvterm_entry)
-                    self._cvterm_deletes += 1
-
+        for chunk in utils.split_into_chunks([row["cvterm_id"] for row in marked_rows], BULK_CHUNK_SIZE):
+            marked_entries.extend(self.query_table(cv.CvTerm).filter(cv.CvTerm.cvterm_id.in_(chunk))
+                                  .order_by(cv.CvTerm.cvterm_id).all())
         return marked_entries
 
-    def _print_statistics(self):
+    def _assign_obsolete_keys(self, candidates: List[Tuple[int, int, str, int]]) -> List[dict]:
+        """Computes the name and the lowest free value of 'is_obsolete' for CV terms to be marked as obsolete, and
+        returns those that change"""
+        target_names = {name if "obsolete" in name.lower() else "obsolete " + name for _, _, name, _ in candidates}
+        occupied_keys = {}                                                          # type: Dict[tuple, int]
+        for chunk in utils.split_into_chunks(sorted(target_names), BULK_CHUNK_SIZE):
+            for cvterm_id, cv_id, name, is_obsolete in self.session.query(
+                    cv.CvTerm.cvterm_id, cv.CvTerm.cv_id, cv.CvTerm.name, cv.CvTerm.is_obsolete)\
+                    .filter(cv.CvTerm.name.in_(chunk)):
+                occupied_keys[(cv_id, name, is_obsolete)] = cvterm_id
+        marked_rows = []
+        for cvterm_id, cv_id, name, is_obsolete in candidates:
+            occupied_keys.pop((cv_id, name, is_obsolete), None)
+            new_name = name if "obsolete" in name.lower() else "obsolete " + name
+            new_is_obsolete = 1
+            while (cv_id, new_name, new_is_obsolete) in occupied_keys:
+                new_is_obsolete += 1
+            occupied_keys[(cv_id, new_name, new_is_obsolete)] = cvterm_id
+            if (new_name, new_is_obsolete) != (name, is_obsolete):
+                marked_rows.append({"cvterm_id": cvterm_id, "name": new_name, "is_obsolete": new_is_obsolete})
+        return marked_rows
+
+    def _load_terms_in_bulk(self, terms: List[OntologyTerm], typedefs: List[str], default_namespace: str,
+                            db_authority: str) -> None:
+        """Loads CV terms into the database by merging them with a snapshot of the existing entries. All changes are
+        computed in memory and applied with batched statements."""
+        (snapshot, changes) = self._diff_terms(terms, typedefs, default_namespace, db_authority, {})
+        self._apply_changes(changes, snapshot)
+        self._count_changes(changes)
+
+    def _diff_terms(self, terms: List[OntologyTerm], typedefs: List[str], default_namespace: str, db_authority: str,
+                    timings: Dict[str, float]) -> Tuple[OntologySnapshot, OntologyChanges]:
+        """Loads a snapshot of the existing entries and computes the differences to the CV terms, recording the run
+        times of both phases"""
+
+        # Find/create parent vocabulary and db of ontology terms in file; handle typedefs
+        start_time = time.time()
+        default_db_entry = self._handle_db(db_authority)
+        default_cv_entry = self._handle_namespace(default_namespace)
+        for typedef in typedefs:
+            self._handle_typedef_name(typedef, default_db_entry, default_cv_entry)
+
+        # Load the existing entries and compute the differences to the file
+        snapshot = self._load_snapshot(terms, default_namespace, default_db_entry)
+        timings["snapshot"] = time.time() - start_time
+        start_time = time.time()
+        changes = self._compute_changes(terms, snapshot, default_namespace)
+        timings["diff"] = time.time() - start_time
+        return snapshot, changes
+
+    def _load_snapshot(self, terms: List[OntologyTerm], default_namespace: str, default_db: general.Db) \
+            -> OntologySnapshot:
+        """Loads all database entries that can be affected by the import of an ontology with a few bulk queries"""
+        self.printer.print("Loading existing entries from database ...")
+        snapshot = OntologySnapshot(default_db.name)
+
+        # Databases and vocabularies
+        snapshot.db_ids = {name: db_id for db_id, name in self.session.query(general.Db.db_id, general.Db.name)}
+        snapshot.cv_ids = {name: cv_id for cv_id, name in self.session.query(cv.Cv.cv_id, cv.Cv.name)}
+        cv_names = {cv_id: name for name, cv_id in snapshot.cv_ids.items()}
+
+        # Database cross references of the database authority, and those of other databases referenced in the file
+        for dbxref_id, accession, version in self.session.query(
+                general.DbxRef.dbxref_id, general.DbxRef.accession, general.DbxRef.version)\
+                .filter(general.DbxRef.db_id == default_db.db_id).order_by(general.DbxRef.dbxref_id):
+            snapshot.add_dbxref(DbxRefRecord(default_db.name, accession, version, dbxref_id))
+        referenced_accessions = {}                                                  # type: Dict[str, Set[str]]
+        for term in terms:
+            for crossref in term.xrefs:
+                (db_authority, accession, version) = split_dbxref(crossref)
+                if db_authority != default_db.name and db_authority in snapshot.db_ids:
+                    referenced_accessions.setdefault(db_authority, set()).add(accession)
+        for db_authority, accessions in referenced_accessions.items():
+            for chunk in utils.split_into_chunks(sorted(accessions), BULK_CHUNK_SIZE):
+                for dbxref_id, accession, version in self.session.query(
+                        general.DbxRef.dbxref_id, general.DbxRef.accession, general.DbxRef.version)\
+                        .filter(general.DbxRef.db_id == snapshot.db_ids[db_authority])\
+                        .filter(general.DbxRef.accession.in_(chunk)).order_by(general.DbxRef.dbxref_id):
+                    snapshot.add_dbxref(DbxRefRecord(db_authority, accession, version, dbxref_id))
+
+        # CV terms of the database authority
+        cvterm_columns = [cv.CvTerm.cvterm_id, cv.CvTerm.cv_id, cv.CvTerm.dbxref_id, cv.CvTerm.name,
+                          cv.CvTerm.definition, cv.CvTerm.is_obsolete, cv.CvTerm.is_relationshiptype]
+        dbxrefs_by_id = {record.dbxref_id: record for records in snapshot.dbxrefs.values() for record in records}
+        for cvterm_id, cv_id, dbxref_id, name, definition, is_obsolete, is_relationshiptype in self.session.query(
+                *cvterm_columns).join(general.DbxRef, cv.CvTerm.dbxref_id == general.DbxRef.dbxref_id)\
+                .filter(general.DbxRef.db_id == default_db.db_id).order_by(cv.CvTerm.cvterm_id):
+            snapshot.cvterms.append(CvTermRecord(cv_names[cv_id], dbxrefs_by_id[dbxref_id], name, definition,
+                                                 is_obsolete, is_relationshiptype, cvterm_id))
+
+        # CV terms of other databases in the affected vocabularies, which might block names
+        namespaces = {term.namespace or default_namespace for term in terms}
+        namespaces.update(record.cv for record in snapshot.cvterms)
+        cv_ids = sorted(snapshot.cv_ids[namespace] for namespace in namespaces if namespace in snapshot.cv_ids)
+        for chunk in utils.split_into_chunks(cv_ids, BULK_CHUNK_SIZE):
+            for cvterm_id, cv_id, dbxref_id, name, definition, is_obsolete, is_relationshiptype in self.session.query(
+                    *cvterm_columns).join(general.DbxRef, cv.CvTerm.dbxref_id == general.DbxRef.dbxref_id)\
+                    .filter(cv.CvTerm.cv_id.in_(chunk)).filter(general.DbxRef.db_id != default_db.db_id):
+                record = CvTermRecord(cv_names[cv_id], None, name, definition, is_obsolete, is_relationshiptype,
+                                      cvterm_id)
+                snapshot.foreign_cvterms[record.key()] = record
+
+        # Comments, synonyms, cross references and relationships of the CV terms of the database authority
+        for cvtermprop_id, cvterm_id, value in self._query_by_db(
+                default_db.db_id, cv.CvTermProp.cvterm_id, cv.CvTermProp.cvtermprop_id, cv.CvTermProp.cvterm_id,
+                cv.CvTermProp.value).filter(cv.CvTermProp.type_id == self._comment_term.cvterm_id):
+            snapshot.comments[cvterm_id].append((cvtermprop_id, value))
+        for cvtermsynonym_id, cvterm_id, synonym, type_id in self._query_by_db(
+                default_db.db_id, cv.CvTermSynonym.cvterm_id, cv.CvTermSynonym.cvtermsynonym_id,
+                cv.CvTermSynonym.cvterm_id, cv.CvTermSynonym.synonym, cv.CvTermSynonym.type_id):
+            snapshot.synonyms[cvterm_id].append((cvtermsynonym_id, synonym, type_id))
+        for cvterm_dbxref_id, cvterm_id, dbxref_id in self._query_by_db(
+                default_db.db_id, cv.CvTermDbxRef.cvterm_id, cv.CvTermDbxRef.cvterm_dbxref_id,
+                cv.CvTermDbxRef.cvterm_id, cv.CvTermDbxRef.dbxref_id):
+            snapshot.crossrefs[cvterm_id].append((cvterm_dbxref_id, dbxref_id))
+        for cvterm_relationship_id, subject_id, object_id, type_id in self._query_by_db(
+                default_db.db_id, cv.CvTermRelationship.subject_id, cv.CvTermRelationship.cvterm_relationship_id,
+                cv.CvTermRelationship.subject_id, cv.CvTermRelationship.object_id, cv.CvTermRelationship.type_id):
+            snapshot.relationships[subject_id].append((cvterm_relationship_id, object_id, type_id))
+        return snapshot
+
+    def _query_by_db(self, db_id: int, cvterm_id_column, *columns) -> sqlalchemy.orm.Query:
+        """Creates a query for columns of a table referencing CV terms, restricted to CV terms of a given database,
+        ordered by primary key"""
+        return self.session.query(*columns)\
+            .join(cv.CvTerm, cvterm_id_column == cv.CvTerm.cvterm_id)\
+            .join(general.DbxRef, cv.CvTerm.dbxref_id == general.DbxRef.dbxref_id)\
+            .filter(general.DbxRef.db_id == db_id).order_by(columns[0])
+
+    def _compute_changes(self, terms: List[OntologyTerm], snapshot: OntologySnapshot, default_namespace: str) \
+            -> OntologyChanges:
+        """Computes the inserts, updates and deletions that bring the database in line with the ontology terms"""
+        changes = OntologyChanges()
+        cvterm_records = {}                                                         # type: Dict[str, CvTermRecord]
+
+        # First loop over all terms: vocabularies, dbxrefs and CV terms
+        for term in terms:
+            namespace = term.namespace or default_namespace
+            if not namespace:
+                raise iobase.InputFileError("Namespace missing in input file")
+            if namespace not in snapshot.cv_ids:
+                snapshot.cv_ids[namespace] = None
+                changes.cv_inserts.append(namespace)
+            (db_authority, accession, version) = split_dbxref(term.id)
+            dbxref_record = self._merge_dbxref(db_authority, accession, version, snapshot, changes)
+            cvterm_record = dbxref_record.cvterm
+            if cvterm_record is None:
+                cvterm_record = CvTermRecord(namespace, dbxref_record, term.name)
+                changes.cvterm_inserts.append(cvterm_record)
+            cvterm_record.cv = namespace
+            cvterm_record.name = term.name
+            cvterm_record.definition = term.definition
+            cvterm_record.is_obsolete = int(term.is_obsolete)
+            cvterm_records[term.id] = cvterm_record
+
+        # Make sure all CV terms fulfill the UNIQUE constraints; mark CV terms not present in the file as obsolete
+        marked_records = self._assign_cvterm_keys(list(cvterm_records.values()), snapshot)
+        for cvterm_record in cvterm_records.values():
+            if cvterm_record.is_modified():
+                changes.cvterm_updates.append(cvterm_record)
+        for cvterm_record in marked_records:
+            if cvterm_record.is_modified():
+                changes.cvterm_obsoletions.append(cvterm_record)
+
+        # Second loop over all terms: comments, synonyms, cross references and relationships
+        for term in terms:
+            cvterm_record = cvterm_records[term.id]
+            self._merge_comments(term, cvterm_record, snapshot, changes)
+            self._merge_synonyms(term, cvterm_record, snapshot, changes)
+            self._merge_cross_references(term, cvterm_record, snapshot, changes)
+            self._merge_relationships(term, cvterm_record, cvterm_records, snapshot, changes)
+
+        changes.dbxref_updates = [record for record in changes.dbxref_updates if record.is_modified()]
+        return changes
+
+    @staticmethod
+    def _merge_dbxref(db_authority: str, accession: str, version: str, snapshot: OntologySnapshot,
+                      changes: OntologyChanges) -> DbxRefRecord:
+        """Finds a database cross reference in the snapshot, or updates/creates it"""
+
+        # Insert the db, if necessary
+        if db_authority not in snapshot.db_ids:
+            snapshot.db_ids[db_authority] = None
+            changes.db_inserts.append(db_authority)
+
+        # Check if the dbxref is already present in the database, and update its version if necessary
+        existing_dbxref_records = snapshot.dbxrefs.setdefault((db_authority, accession), [])
+        for dbxref_record in existing_dbxref_records:
+            if dbxref_record.version == version:
+                return dbxref_record
+        if existing_dbxref_records:
+            dbxref_record = existing_dbxref_records[0]
+            if dbxref_record.dbxref_id is not None and not dbxref_record.is_modified():
+                changes.dbxref_updates.append(dbxref_record)
+            dbxref_record.version = version
+        else:
+            dbxref_record = DbxRefRecord(db_authority, accession, version)
+            existing_dbxref_records.append(dbxref_record)
+            changes.dbxref_inserts.append(dbxref_record)
+        return dbxref_record
+
+    @staticmethod
+    def _assign_cvterm_keys(cvterm_records: List[CvTermRecord], snapshot: OntologySnapshot) -> List[CvTermRecord]:
+        """Assigns a unique combination of vocabulary, name and is_obsolete to all CV terms of the file, and marks
+        CV terms that are not present in the file or that block names as obsolete"""
+
+        # Collect the CV terms of the database authority that are not present in the file
+        file_records = set(cvterm_records)
+        missing_records = [record for record in snapshot.cvterms if record not in file_records]
+        marked_records = [record for record in missing_records if not record.is_relationshiptype]
+        occupied_keys = dict(snapshot.foreign_cvterms)                            # type: Dict[tuple, CvTermRecord]
+        for record in missing_records:
+            if record.is_relationshiptype:
+                occupied_keys[record.key()] = record
+
+        # Current CV terms take their names; CV terms that are not present in the file make way for them
+        for record in cvterm_records:
+            if record.is_obsolete:
+                continue
+            blocking_record = occupied_keys.get(record.key())
+            if blocking_record in file_records:
+                raise iobase.DatabaseError("CV term '" + record.name + "' is not unique in vocabulary '"
+                                           + record.cv + "'")
+            elif blocking_record:
+                marked_records.append(blocking_record)
+            occupied_keys[record.key()] = record
+
+        # Obsolete CV terms keep their current value of 'is_obsolete', if possible, or take the lowest free value
+        obsolete_records = [record for record in cvterm_records if record.is_obsolete] + marked_records
+        pending_records = []
+        for record in obsolete_records:
+            if "obsolete" not in record.name.lower():
+                record.name = "obsolete " + record.name
+            original_key = record.original_key()
+            if original_key and original_key[2] and original_key[:2] == record.key()[:2] \
+                    and original_key not in occupied_keys:
+                record.is_obsolete = original_key[2]
+                occupied_keys[original_key] = record
+            else:
+                pending_records.append(record)
+        for record in pending_records:
+            record.is_obsolete = 1
+            while record.key() in occupied_keys:
+                record.is_obsolete += 1
+            occupied_keys[record.key()] = record
+        return marked_records
+
+    def _merge_comments(self, term: OntologyTerm, cvterm_record: CvTermRecord, snapshot: OntologySnapshot,
+                        changes: OntologyChanges) -> None:
+        """Computes the comments to a CV term that need to be inserted, updated or deleted"""
+        existing_comments = snapshot.comments.get(cvterm_record.cvterm_id, [])
+        updated_comment_id = None
+        if term.comment:
+            for cvtermprop_id, value in existing_comments:
+                if value == term.comment:
+                    break
+            else:
+                if existing_comments:
+                    updated_comment_id = existing_comments[0][0]
+                    changes.comment_updates.append((updated_comment_id, cvterm_record, term.comment))
+                else:
+                    changes.comment_inserts.append((cvterm_record, term.comment))
+        for cvtermprop_id, value in existing_comments:
+            if cvtermprop_id != updated_comment_id and (not value or value != term.comment):
+                changes.comment_deletes.append((cvtermprop_id, cvterm_record, value))
+
+    def _merge_synonyms(self, term: OntologyTerm, cvterm_record: CvTermRecord, snapshot: OntologySnapshot,
+                        changes: OntologyChanges) -> None:
+        """Computes the synonyms of a CV term that need to be inserted, updated or deleted"""
+        existing_synonyms = {}                                                      # type: Dict[str, tuple]
+        for cvtermsynonym_id, synonym, type_id in snapshot.synonyms.get(cvterm_record.cvterm_id, []):
+            existing_synonyms.setdefault(synonym, (cvtermsynonym_id, type_id))
+        new_synonyms = set()
+        for synonym, scope in term.synonyms:
+            if synonym in new_synonyms:
+                continue
+            new_synonyms.add(synonym)
+            if scope.lower() not in self._synonym_type_terms:
+                self.printer.print("WARNING: synonym type '" + scope.lower() + "' not present in database!")
+                continue
+            synonym_type_term = self._synonym_type_terms[scope.lower()]
+            if synonym in existing_synonyms:
+                (cvtermsynonym_id, type_id) = existing_synonyms[synonym]
+                if type_id != synonym_type_term.cvterm_id:
+                    changes.synonym_updates.append((cvtermsynonym_id, cvterm_record, synonym, synonym_type_term))
+            else:
+                changes.synonym_inserts.append((cvterm_record, synonym, synonym_type_term))
+        for cvtermsynonym_id, synonym, type_id in snapshot.synonyms.get(cvterm_record.cvterm_id, []):
+            if not synonym or synonym not in new_synonyms:
+                changes.synonym_deletes.append((cvtermsynonym_id, cvterm_record, synonym))
+
+    def _merge_cross_references(self, term: OntologyTerm, cvterm_record: CvTermRecord, snapshot: OntologySnapshot,
+                                changes: OntologyChanges) -> None:
+        """Computes the database cross references of a CV term that need to be inserted or deleted"""
+        existing_dbxref_ids = {dbxref_id for _, dbxref_id in snapshot.crossrefs.get(cvterm_record.cvterm_id, [])}
+        retained_dbxref_ids = set()
+        inserted_records = set()
+        for crossref in term.xrefs:
+            (db_authority, accession, version) = split_dbxref(crossref)
+            dbxref_record = self._merge_dbxref(db_authority, accession, version, snapshot, changes)
+            if dbxref_record.dbxref_id in existing_dbxref_ids:
+                retained_dbxref_ids.add(dbxref_record.dbxref_id)
+            elif dbxref_record not in inserted_records:
+                inserted_records.add(dbxref_record)
+                changes.crossref_inserts.append((cvterm_record, dbxref_record))
+        for cvterm_dbxref_id, dbxref_id in snapshot.crossrefs.get(cvterm_record.cvterm_id, []):
+            if dbxref_id not in retained_dbxref_ids:
+                changes.crossref_deletes.append((cvterm_dbxref_id, cvterm_record, dbxref_id))
+
+    def _merge_relationships(self, term: OntologyTerm, subject_record: CvTermRecord,
+                             cvterm_records: Dict[str, CvTermRecord], snapshot: OntologySnapshot,
+                             changes: OntologyChanges) -> None:
+        """Computes the relationships of a CV term that need to be inserted or deleted"""
+        subject_db_authority = split_dbxref(term.id)[0]
+        existing_relationships = snapshot.relationships.get(subject_record.cvterm_id, [])
+        existing_keys = {(type_id, object_id) for _, object_id, type_id in existing_relationships}
+        retained_keys = set()
+        inserted_keys = set()
+        for relationship_name, object_id in term.relationships:
+            if relationship_name not in self._relationship_terms:
+                if relationship_name != "can_be":
+                    self.printer.print("WARNING: Relationship term '" + relationship_name + "' not present in database")
+                continue
+            type_cvterm = self._relationship_terms[relationship_name]                # type: cv.CvTerm
+            if split_dbxref(object_id)[0] != subject_db_authority:
+                continue
+            if object_id not in cvterm_records:
+                self.printer.print("WARNING: CV term for dbxref '" + object_id + "' not present in database")
+                continue
+            object_record = cvterm_records[object_id]
+            if (type_cvterm.cvterm_id, object_record.cvterm_id) in existing_keys:
+                retained_keys.add((type_cvterm.cvterm_id, object_record.cvterm_id))
+            elif (type_cvterm.cvterm_id, object_record) not in inserted_keys:
+                inserted_keys.add((type_cvterm.cvterm_id, object_record))
+                changes.relationship_inserts.append((subject_record, type_cvterm, object_record))
+        for cvterm_relationship_id, object_id, type_id in existing_relationships:
+            if (type_id, object_id) not in retained_keys:
+                changes.relationship_deletes.append((cvterm_relationship_id, subject_record, object_id, type_id))
+
+    def _apply_changes(self, changes: OntologyChanges, snapshot: OntologySnapshot) -> None:
+        """Writes the changes computed for an ontology to the database with batched statements"""
+
+        # Databases and vocabularies
+        for db_id, name in self._insert_in_bulk(general.Db, [{"name": name} for name in changes.db_inserts],
+                                                general.Db.db_id, general.Db.name):
+            snapshot.db_ids[name] = db_id
+        for cv_id, name in self._insert_in_bulk(cv.Cv, [{"name": name} for name in changes.cv_inserts],
+                                                cv.Cv.cv_id, cv.Cv.name):
+            snapshot.cv_ids[name] = cv_id
+
+        # Database cross references
+        self._update_in_bulk(general.DbxRef, "dbxref_id", [
+            {"dbxref_id": record.dbxref_id, "version": record.version} for record in changes.dbxref_updates])
+        inserted_dbxref_ids = {}
+        for dbxref_id, db_id, accession, version in self._insert_in_bulk(general.DbxRef, [
+                {"db_id": snapshot.db_ids[record.db], "accession": record.accession, "version": record.version}
+                for record in changes.dbxref_inserts], general.DbxRef.dbxref_id, general.DbxRef.db_id,
+                general.DbxRef.accession, general.DbxRef.version):
+            inserted_dbxref_ids[(db_id, accession, version)] = dbxref_id
+        for record in changes.dbxref_inserts:
+            record.dbxref_id = inserted_dbxref_ids[(snapshot.db_ids[record.db], record.accession, record.version)]
+
+        # CV terms. Entries whose current name is taken over by another entry are first moved out of the way.
+        updated_records = changes.cvterm_updates + changes.cvterm_obsoletions
+        claimed_keys = {record.key() for record in updated_records + changes.cvterm_inserts}
+        self._update_in_bulk(cv.CvTerm, "cvterm_id", [
+            {"cvterm_id": record.cvterm_id, "is_obsolete": -record.cvterm_id} for record in updated_records
+            if record.original_key() != record.key() and record.original_key() in claimed_keys])
+        self._update_in_bulk(cv.CvTerm, "cvterm_id", [
+            {"cvterm_id": record.cvterm_id, "cv_id": snapshot.cv_ids[record.cv], "name": record.name,
+             "definition": record.definition, "is_obsolete": record.is_obsolete} for record in updated_records])
+        inserted_cvterm_ids = {}
+        for cvterm_id, dbxref_id in self._insert_in_bulk(cv.CvTerm, [
+                {"cv_id": snapshot.cv_ids[record.cv], "dbxref_id": record.dbxref.dbxref_id, "name": record.name,
+                 "definition": record.definition, "is_obsolete": record.is_obsolete}
+                for record in changes.cvterm_inserts], cv.CvTerm.cvterm_id, cv.CvTerm.dbxref_id):
+            inserted_cvterm_ids[dbxref_id] = cvterm_id
+        for record in changes.cvterm_inserts:
+            record.cvterm_id = inserted_cvterm_ids[record.dbxref.dbxref_id]
+
+        # Comments, synonyms, cross references and relationships
+        self._delete_in_bulk(cv.CvTermProp, "cvtermprop_id", [entry[0] for entry in changes.comment_deletes])
+        self._update_in_bulk(cv.CvTermProp, "cvtermprop_id", [
+            {"cvtermprop_id": cvtermprop_id, "value": value} for cvtermprop_id, _, value in changes.comment_updates])
+        self._insert_in_bulk(cv.CvTermProp, [
+            {"cvterm_id": record.cvterm_id, "type_id": self._comment_term.cvterm_id, "value": value}
+            for record, value in changes.comment_inserts])
+        self._delete_in_bulk(cv.CvTermSynonym, "cvtermsynonym_id", [entry[0] for entry in changes.synonym_deletes])
+        self._update_in_bulk(cv.CvTermSynonym, "cvtermsynonym_id", [
+            {"cvtermsynonym_id": cvtermsynonym_id, "type_id": type_term.cvterm_id}
+            for cvtermsynonym_id, _, _, type_term in changes.synonym_updates])
+        self._insert_in_bulk(cv.CvTermSynonym, [
+            {"cvterm_id": record.cvterm_id, "synonym": synonym, "type_id": type_term.cvterm_id}
+            for record, synonym, type_term in changes.synonym_inserts])
+        self._delete_in_bulk(cv.CvTermDbxRef, "cvterm_dbxref_id", [entry[0] for entry in changes.crossref_deletes])
+        self._insert_in_bulk(cv.CvTermDbxRef, [
+            {"cvterm_id": record.cvterm_id, "dbxref_id": dbxref_record.dbxref_id, "is_for_definition": 0}
+            for record, dbxref_record in changes.crossref_inserts])
+        self._delete_in_bulk(cv.CvTermRelationship, "cvterm_relationship_id",
+                             [entry[0] for entry in changes.relationship_deletes])
+        self._insert_in_bulk(cv.CvTermRelationship, [
+            {"subject_id": subject_record.cvterm_id, "type_id": type_cvterm.cvterm_id,
+             "object_id": object_record.cvterm_id}
+            for subject_record, type_cvterm, object_record in changes.relationship_inserts])
+
+    def _insert_in_bulk(self, table, rows: List[dict], *returning_columns) -> list:
+        """Inserts entries into a table with multi-row INSERT statements, and returns the requested columns"""
+        if not rows:
+            return []
+        columns = list(rows[0])
+        statement = "INSERT INTO " + table.__table__.fullname + " (" + ", ".join(columns) + ") VALUES %s"
+        if returning_columns:
+            statement += " RETURNING " + ", ".join(column.name for column in returning_columns)
+        values = [tuple(row[column] for column in columns) for row in rows]
+        results = psycopg2.extras.execute_values(self._cursor(), statement, values, page_size=BULK_CHUNK_SIZE,
+                                                 fetch=bool(returning_columns))
+        return results or []
+
+    def _update_in_bulk(self, table, key: str, rows: List[dict]) -> None:
+        """Updates entries of a table, identified by a key column, with multi-row UPDATE statements"""
+        if not rows:
+            return
+        columns = list(rows[0])
+        assignments = [column + " = v." + column for column in columns if column != key]
+        statement = "UPDATE " + table.__table__.fullname + " AS t SET " + ", ".join(assignments) \
+                    + " FROM (VALUES %s) AS v (" + ", ".join(columns) + ") WHERE t." + key + " = v." + key
+        column_types = [table.__table__.columns[column].type.compile(dialect=self.engine.dialect)
+                        for column in columns]
+        template = "(" + ", ".join("%s::" + column_type for column_type in column_types) + ")"
+        values = [tuple(row[column] for column in columns) for row in rows]
+        psycopg2.extras.execute_values(self._cursor(), statement, values, template=template,
+                                       page_size=BULK_CHUNK_SIZE)
+
+    def _delete_in_bulk(self, table, key: str, ids: List[int]) -> None:
+        """Deletes entries of a table, identified by a key column, with a single DELETE statement"""
+        if ids:
+            statement = "DELETE FROM " + table.__table__.fullname + " WHERE " + key + " = ANY(%s)"
+            self._cursor().execute(statement, (ids,))
+
+    def _delete_entries_in_bulk(self, table, key: str, entries: list) -> None:
+        """Deletes entries that have been loaded into the session with a single DELETE statement, and removes them
+        from the session"""
+        self._delete_in_bulk(table, key, [getattr(entry, key) for entry in entries])
+        for entry in entries:
+            self.session.expunge(entry)
+
+    def _cursor(self):
+        """Returns a cursor of the database connection used by the current transaction of the session"""
+        return self.session.connection().connection.cursor()
+
+    def _count_changes(self, changes: OntologyChanges) -> None:
+        """Adds the changes applied during a bulk import to the statistics, and reports them in verbose mode"""
+        for name in changes.db_inserts:
+            self.printer.print("Inserted DB '" + name + "'")
+        for name in changes.cv_inserts:
+            self.printer.print("Inserted CV '" + name + "'")
+        for record in changes.dbxref_updates:
+            self.printer.print("Updated dbxref '" + str(record) + "'")
+        for record in changes.dbxref_inserts:
+            self.printer.print("Inserted dbxref '" + str(record) + "'")
+        for record in changes.cvterm_updates:
+            self.printer.print("Updated CV term '" + record.name + "' for dbxref " + record.identifier())
+        for record in changes.cvterm_inserts:
+            self.printer.print("Inserted CV term '" + record.name + "' for dbxref " + record.identifier())
+        for record in changes.cvterm_obsoletions:
+            self.printer.print("Marked CV term '" + record.name + "' (" + record.identifier() + ") as obsolete")
+        for _, record, value in changes.comment_updates:
+            self.printer.print("Updated comment '" + value + "' for CV term '" + record.name + "'")
+        for record, value in changes.comment_inserts:
+            self.printer.print("Inserted comment '" + value + "' for CV term '" + record.name + "'")
+        for _, record, value in changes.comment_deletes:
+            self.printer.print("Deleted comment '" + value + "' for CV term '" + record.name + "'")
+        for _, record, synonym, _ in changes.synonym_updates:
+            self.printer.print("Updated synonym '" + synonym + "' for CV term '" + record.name + "'")
+        for record, synonym, _ in changes.synonym_inserts:
+            self.printer.print("Inserted synonym '" + synonym + "' for CV term '" + record.name + "'")
+        for _, record, synonym in changes.synonym_deletes:
+            self.printer.print("Deleted synonym '" + synonym + "' for CV term '" + record.name + "'")
+        for record, dbxref_record in changes.crossref_inserts:
+            self.printer.print("Inserted cross reference '" + str(dbxref_record) + "' for CV term '"
+                               + record.name + "'")
+        for _, record, dbxref_id in changes.crossref_deletes:
+            self.printer.print("Deleted cross reference with dbxref-ID " + str(dbxref_id) + " for CV term '"
+                               + record.name + "'")
+        for subject_record, type_cvterm, object_record in changes.relationship_inserts:
+            self.printer.print("Inserted relationship: '" + subject_record.name + "', '" + type_cvterm.name
+                               + "', '" + object_record.name + "'")
+        for _, subject_record, _, _ in changes.relationship_deletes:
+            self.printer.print("Deleted relationship for CV term '" + subject_record.name + "'")
+
+        self._db_inserts += len(changes.db_inserts)
+        self._cv_inserts += len(changes.cv_inserts)
+        self._dbxref_inserts += len(changes.dbxref_inserts)
+        self._dbxref_updates += len(changes.dbxref_updates)
+        self._cvterm_inserts += len(changes.cvterm_inserts)
+        self._cvterm_updates += len(changes.cvterm_updates)
+        self._cvterm_deletes += len(changes.cvterm_obsoletions)
+        self._comment_inserts += len(changes.comment_inserts)
+        self._comment_updates += len(changes.comment_updates)
+        self._comment_deletes += len(changes.comment_deletes)
+        self._synonym_inserts += len(changes.synonym_inserts)
+        self._synonym_updates += len(changes.synonym_updates)
+        self._synonym_deletes += len(changes.synonym_deletes)
+        self._crossref_inserts += len(changes.crossref_inserts)
+        self._crossref_deletes += len(changes.crossref_deletes)
+        self._relationship_inserts += len(changes.relationship_inserts)
+        self._relationship_deletes += len(changes.relationship_deletes)
+
+    def _report_changes(self, changes: OntologyChanges, snapshot: OntologySnapshot) -> Dict[str, Dict[str, list]]:
+        """Lists the CV terms, synonyms, cross references and relationships affected by the changes to the database"""
+        cvterm_names = {record.cvterm_id: record.identifier() for record in snapshot.cvterms}
+        dbxref_names = {record.dbxref_id: str(record) for records in snapshot.dbxrefs.values() for record in records}
+        missing_dbxref_ids = sorted({dbxref_id for _, _, dbxref_id in changes.crossref_deletes} - set(dbxref_names))
+        for chunk in utils.split_into_chunks(missing_dbxref_ids, BULK_CHUNK_SIZE):
+            for dbxref_id, db_authority, accession, version in self.session.query(
+                    general.DbxRef.dbxref_id, general.Db.name, general.DbxRef.accession, general.DbxRef.version)\
+                    .join(general.Db, general.DbxRef.db_id == general.Db.db_id)\
+                    .filter(general.DbxRef.dbxref_id.in_(chunk)):
+                dbxref_names[dbxref_id] = create_dbxref(db_authority, accession, version)
+        type_names = {cvterm.cvterm_id: name for name, cvterm in self._relationship_terms.items()}
+        obsoleted_records = [record for record in changes.cvterm_updates
+                             if record.is_obsolete and not record.original[3]] + changes.cvterm_obsoletions
+        return {
+            "cvterms": {
+                "inserted": [{"id": record.identifier(), "name": record.name} for record in changes.cvterm_inserts],
+                "renamed": [{"id": record.identifier(), "old_name": record.original[1], "new_name": record.name}
+                            for record in changes.cvterm_updates
+                            if record.name != record.original[1] and not record.is_obsolete],
+                "obsoleted": [{"id": record.identifier(), "name": record.original[1]} for record in obsoleted_records]
+            },
+            "synonyms": {
+                "inserted": [{"term": record.identifier(), "synonym": synonym}
+                             for record, synonym, _ in changes.synonym_inserts],
+                "updated": [{"term": record.identifier(), "synonym": synonym}
+                            for _, record, synonym, _ in changes.synonym_updates],
+                "deleted": [{"term": record.identifier(), "synonym": synonym}
+                            for _, record, synonym in changes.synonym_deletes]
+            },
+            "cross_references": {
+                "inserted": [{"term": record.identifier(), "dbxref": str(dbxref_record)}
+                             for record, dbxref_record in changes.crossref_inserts],
+                "deleted": [{"term": record.identifier(), "dbxref": dbxref_names.get(dbxref_id, dbxref_id)}
+                            for _, record, dbxref_id in changes.crossref_deletes]
+            },
+            "relationships": {
+                "inserted": [{"subject": subject_record.identifier(), "type": type_cvterm.name,
+                              "object": object_record.identifier()}
+                             for subject_record, type_cvterm, object_record in changes.relationship_inserts],
+                "deleted": [{"subject": subject_record.identifier(), "type": type_names.get(type_id, type_id),
+                             "object": cvterm_names.get(object_id, object_id)}
+                            for _, subject_record, object_id, type_id in changes.relationship_deletes]
+            }
+        }
+
+    def _statistics(self) -> Dict[str, Dict[str, int]]:
+        """Returns a summary of the changes applied to the database, by table"""
+        return {
+            "DBs": {"insertions": self._db_inserts},
+            "CVs": {"insertions": self._cv_inserts},
+            "dbxrefs": {"insertions": self._dbxref_inserts, "updates": self._dbxref_updates},
+            "CV terms": {"insertions": self._cvterm_inserts, "updates": self._cvterm_updates,
+                         "marked as obsolete": self._cvterm_deletes},
+            "comments": {"insertions": self._comment_inserts, "updates": self._comment_updates,
+                         "deletions": self._comment_deletes},
+            "synonyms": {"insertions": self._synonym_inserts, "updates": self._synonym_updates,
+                         "deletions": self._synonym_deletes},
+            "cross references": {"insertions": self._crossref_inserts, "updates": self._crossref_updates,
+                                 "deletions": self._crossref_deletes},
+            "relationships": {"insertions": self._relationship_inserts, "updates": self._relationship_updates,
+                              "deletions": self._relationship_deletes}
+        }
+
+    def _print_statistics(self, message="Successfully imported an ontology into the database."):
         """Prints a summary of the changes applied to the database"""
-        print("Successfully imported an ontology into the database.")
-        print("DBs: " + str(self._db_inserts) + " insertions")
-        print("CVs: " + str(self._cv_inserts) + " insertions")
-        print("dbxrefs: " + str(self._dbxref_inserts) + " insertions, " + str(self._dbxref_updates) + " updates")
-        print("CV terms: " + str(self._cvterm_inserts) + " insertions, " + str(self._cvterm_updates)
-              + " updates, " + str(self._cvterm_deletes) + " marked as obsolete")
-        print("comments: " + str(self._comment_inserts) + " insertions, " + str(self._comment_updates)
-              + " updates, " + str(self._comment_deletes) + " deletions")
-        print("synonyms: " + str(self._synonym_inserts) + " insertions, " + str(self._synonym_updates)
-              + " updates, " + str(self._synonym_deletes) + " deletions")
-        print("cross references: " + str(self._crossref_inserts) + " insertions, " + str(self._crossref_updates)
-              + " updates, " + str(self._crossref_deletes) + " deletions")
-        print("relationships: " + str(self._relationship_inserts) + " insertions, " + str(self._relationship_updates)
-              + " updates, " + str(self._relationship_deletes) + " deletions")
+        print(message)
+        for table, counts in self._statistics().items():
+            print(table + ": " + ", ".join(str(count) + " " + action for action, count in counts.items()))
 
     def _initiate_global_arrays(self, default_db_id: int, comment_id: int) -> (
             List[cv.Cv], List[general.DbxRef], List[cv.CvTerm], List[cv.CvTermProp], List[cv.CvTermSynonym],
@@ -587,6 +1540,120 @@ class OntologyClient(iobase.IOClient):
         return all_cvs, all_dbxrefs, all_cvterms, all_comments, all_synonyms, all_crossrefs, all_relationships
 
 
+def read_manifest(filename: str) -> List[ManifestEntry]:
+    """Reads a YAML file listing ontologies to import, each with database authority, file or URL, and format"""
+    stream = utils.open_file_read(filename)
+    data = yaml.load(stream, Loader=yaml.BaseLoader)
+    utils.close(stream)
+    if not isinstance(data, list):
+        raise iobase.InputFileError("Manifest '" + filename + "' does not contain a list of ontologies")
+    entries = []
+    for item in data:
+        if not isinstance(item, dict) or not item.get("database_authority") \
+                or bool(item.get("file")) == bool(item.get("url")):
+            raise iobase.InputFileError("Each ontology in manifest '" + filename + "' requires a "
+                                        "'database_authority' and either a 'file' or a 'url'")
+        file_format = item.get("format", "obo")
+        if file_format not in ["obo", "owl"]:
+            raise iobase.InputFileError("Unknown ontology format '" + file_format + "' in manifest")
+        entries.append(ManifestEntry(item["database_authority"], item.get("file", ""), item.get("url", ""),
+                                     file_format))
+    return entries
+
+
+def read_ontology_file(filename: str, file_format: str, db_authority: str, streaming=False) \
+        -> Tuple[str, List[OntologyTerm], List[str]]:
+    """Reads an OBO/OWL file, and returns the default namespace, the terms stemming from a given database authority
+    and the names of all typedefs"""
+    if streaming and file_format == "obo":
+        return read_obo_file(filename, db_authority)
+    if streaming and file_format == "owl":
+        return read_owl_file(filename, db_authority)
+    ontology = parse_ontology(filename, file_format)
+    terms = [convert_term(term) for term in filter_ontology_by_db(ontology, db_authority).values()]
+    typedefs = [typedef.obo_name for typedef in ontology.typedefs]
+    return get_default_namespace(ontology), terms, typedefs
+
+
+def _read_manifest_entry_in_worker(arguments: Tuple[ManifestEntry, bool, str, str]) \
+        -> Tuple[ManifestEntry, tuple, str, float, str]:
+    """Reads the ontology file of a manifest entry in a worker process, and returns the entry, the parsed content,
+    the version of the ontology, the run time and an error message, if any. The content is None if the version
+    matches the one that was imported before."""
+    entry, streaming, cache_directory, imported_version = arguments
+    start_time = time.time()
+    try:
+        if entry.file:
+            filename = entry.file
+        elif cache_directory:
+            filename = utils.download_file_with_cache(entry.url, cache_directory)
+        else:
+            filename = utils.download_file(entry.url)
+        data_version = read_data_version(filename, entry.format)
+        if data_version and data_version == imported_version:
+            return entry, None, data_version, time.time() - start_time, ""
+        content = read_ontology_file(filename, entry.format, entry.database_authority, streaming)
+    except (iobase.InputFileError, OSError, ValueError, xml.etree.ElementTree.ParseError) as err:
+        return entry, (), "", time.time() - start_time, str(err)
+    return entry, content, data_version, time.time() - start_time, ""
+
+
+def load_manifest(uri: str, verbose: bool, manifest_filename: str, streaming=False, processes=None,
+                  cache_directory=None, force=False) -> Set[str]:
+    """Imports all ontologies listed in a manifest. The files are parsed by a pool of worker processes, while a
+    single client merges the terms into the database, one database authority at a time, once all files of that
+    authority have been parsed. Returns the database authorities whose import failed."""
+    entries = read_manifest(manifest_filename)
+    pending_files = collections.Counter(entry.database_authority for entry in entries)
+    parsed_files = collections.defaultdict(list)             # type: Dict[str, List[Tuple[str, list, List[str]]]]
+    failed_authorities = set()
+    client = OntologyClient(uri, verbose)
+
+    # Versions are only tracked for database authorities whose terms stem from a single file
+    imported_versions = {}
+    if not force:
+        imported_versions = {db_authority: client._load_data_version(db_authority)
+                             for db_authority, count in pending_files.items() if count == 1}
+    with multiprocessing.Pool(processes) as pool:
+        for entry, content, data_version, run_time, error_message in pool.imap_unordered(
+                _read_manifest_entry_in_worker,
+                [(entry, streaming, cache_directory, imported_versions.get(entry.database_authority, ""))
+                 for entry in entries]):
+            db_authority = entry.database_authority
+            pending_files[db_authority] -= 1
+            if error_message:
+                print("Parsing of ontology file " + (entry.file or entry.url) + " failed: " + error_message)
+                failed_authorities.add(db_authority)
+                parsed_files.pop(db_authority, None)
+                continue
+            if content is None:
+                print("Ontology version '" + data_version + "' of database authority " + db_authority
+                      + " has already been imported.")
+                continue
+            print("Parsed ontology file {0} in {1:.2f} s".format(entry.file or entry.url, run_time))
+            parsed_files[db_authority].append(content)
+            if pending_files[db_authority]:
+                continue
+            authority_files = parsed_files.pop(db_authority)
+            if db_authority in failed_authorities:
+                continue
+            try:
+                client._load_parsed_files(db_authority, authority_files)
+                if len(authority_files) == 1:
+                    client._store_data_version(db_authority, data_version)
+                client.session.commit()
+            except (iobase.DatabaseError, iobase.InputFileError) as err:
+                client.session.rollback()
+                print("Import of ontology terms for database authority " + db_authority + " failed: " + str(err))
+                failed_authorities.add(db_authority)
+    if failed_authorities:
+        client._print_statistics("Imported ontologies into the database, except for database authorities "
+                                 + ", ".join(sorted(failed_authorities)) + ".")
+    else:
+        client._print_statistics("Successfully imported all ontologies of the manifest into the database.")
+    return failed_authorities
+
+
 def parse_ontology(filename: str, file_format="obo") -> pronto.Ontology:
     """Function parsing an OBO/OWL file"""
     if file_format == "owl":
@@ -595,6 +1662,250 @@ def parse_ontology(filename: str, file_format="obo") -> pronto.Ontology:
         return pronto.Ontology(filename, parser="OboParser")
 
 
+def read_data_version(filename: str, file_format: str) -> str:
+    """Reads the version of an ontology from the header of an OBO file ('data-version') or from the ontology element
+    of an OWL file ('versionIRI' or 'versionInfo'), without parsing the terms"""
+    if file_format == "obo":
+        stanzas = iterate_obo_stanzas(filename)
+        try:
+            (stanza, tag_values) = next(stanzas, ("", []))
+        finally:
+            stanzas.close()
+        return next((parse_obo_value(value) for tag, value in tag_values if tag == "data-version" and not stanza), "")
+    with utils.open_file_read(filename) as file_handle:
+        for event, element in xml.etree.ElementTree.iterparse(file_handle):
+            if element.tag == OWL_NAMESPACE + "versionIRI":
+                return element.get(RDF_NAMESPACE + "resource", "")
+            if element.tag == OWL_NAMESPACE + "versionInfo":
+                return (element.text or "").strip()
+            if element.tag == OWL_NAMESPACE + "Ontology":
+                break
+    return ""
+
+
+def read_obo_file(filename: str, db_authority: str) -> Tuple[str, List[OntologyTerm], List[str]]:
+    """Reads an OBO file with a streaming parser, and returns the default namespace, the terms stemming from a given
+    database authority and the names of all typedefs"""
+    default_namespace = ""
+    terms = []
+    typedefs = []
+    for stanza, tag_values in iterate_obo_stanzas(filename, db_authority):
+        if stanza == "":
+            default_namespace = next((value for tag, value in tag_values if tag == "default-namespace"), "")
+        elif stanza == "Term":
+            term = create_term_from_obo(tag_values)
+            if term.id.startswith(db_authority + ":"):
+                terms.append(term)
+        elif stanza == "Typedef":
+            typedefs.extend(parse_obo_value(value) for tag, value in tag_values if tag == "id")
+    return default_namespace, terms, typedefs
+
+
+def iterate_obo_stanzas(filename: str, db_authority="") -> Iterator[Tuple[str, List[Tuple[str, str]]]]:
+    """Iterates over the stanzas of a (potentially gzipped) OBO file and yields their types and tag-value pairs.
+    The header is yielded as stanza with empty type. Terms of other database authorities are skipped."""
+    id_prefix = db_authority + ":"
+    stanza = ""
+    tag_values = []
+    skipped = False
+    with utils.open_file_read(filename) as file_handle:
+        for line in file_handle:
+            if line[0] == "[":
+                if not skipped:
+                    yield stanza, tag_values
+                stanza = line.strip()[1:-1]
+                tag_values = []
+                skipped = False
+            elif skipped or line[0] in " \t\r\n!":
+                continue
+            else:
+                tag, separator, value = line.partition(":")
+                if not separator:
+                    continue
+                tag = tag.strip()
+                value = value.strip()
+                if db_authority and stanza == "Term" and tag == "id" and not value.startswith(id_prefix):
+                    skipped = True
+                    continue
+                tag_values.append((tag, value))
+    if not skipped:
+        yield stanza, tag_values
+
+
+def read_owl_file(filename: str, db_authority: str) -> Tuple[str, List[OntologyTerm], List[str]]:
+    """Reads an OWL (RDF/XML) file with a streaming parser, and returns the default namespace, the terms stemming
+    from a given database authority and the names of all object properties (typedefs). Each top-level element is
+    discarded once it has been read, so that the memory usage does not grow with the size of the file."""
+    default_namespace = ""
+    terms = []
+    property_names = {}                                                             # type: Dict[str, str]
+    id_prefix = db_authority + ":"
+    depth = 0
+    root = None
+    with utils.open_file_read(filename) as file_handle:
+        for event, element in xml.etree.ElementTree.iterparse(file_handle, events=("start", "end")):
+            if event == "start":
+                if root is None:
+                    root = element
+                depth += 1
+                continue
+            depth -= 1
+            if depth != 1:
+                continue
+            if element.tag == OWL_NAMESPACE + "Ontology":
+                default_namespace = _find_owl_text(element, OBO_IN_OWL_NAMESPACE + "default-namespace")
+            elif element.tag == OWL_NAMESPACE + "Class" and element.get(RDF_NAMESPACE + "about"):
+                term_id = convert_owl_iri(element.get(RDF_NAMESPACE + "about"))
+                if term_id.startswith(id_prefix):
+                    terms.append(create_term_from_owl(term_id, element))
+            elif element.tag == OWL_NAMESPACE + "ObjectProperty" and element.get(RDF_NAMESPACE + "about"):
+                property_id = convert_owl_iri(element.get(RDF_NAMESPACE + "about"))
+                property_names[property_id] = _find_owl_text(element, OBO_IN_OWL_NAMESPACE + "shorthand") \
+                    or _find_owl_text(element, OBO_IN_OWL_NAMESPACE + "id") or property_id
+            root.clear()
+
+    # Relationships refer to object properties, which may be declared anywhere in the file
+    terms = [term._replace(relationships=[(property_names.get(name, name), object_id)
+                                          for name, object_id in term.relationships])
+             for term in terms]
+    return default_namespace, terms, list(property_names.values())
+
+
+def create_term_from_owl(term_id: str, element: xml.etree.ElementTree.Element) -> OntologyTerm:
+    """Creates the compact representation of an ontology term from an OWL class element"""
+    name, namespace, definition, comment, is_obsolete = "", "", None, "", False
+    synonyms, alternative_ids, xrefs, relationships = [], [], [], []
+    for child in element:
+        namespace_uri, _, tag = child.tag.rpartition("}")
+        text = (child.text or "").strip()
+        resource = child.get(RDF_NAMESPACE + "resource")
+        if tag == "label" and not name:
+            name = text
+        elif tag == "hasOBONamespace":
+            namespace = text
+        elif tag == OWL_DEFINITION_PROPERTY:
+            definition = text or None
+        elif tag == "comment" and namespace_uri + "}" == RDFS_NAMESPACE:
+            comment = text
+        elif tag == "deprecated":
+            is_obsolete = text.lower() == "true"
+        elif tag in OWL_SYNONYM_PROPERTIES and text:
+            synonyms.append((text, OWL_SYNONYM_PROPERTIES[tag]))
+        elif tag == "hasAlternativeId" and text:
+            alternative_ids.append(text)
+        elif tag == "hasDbXref" and text:
+            xrefs.append(text.split()[0])
+        elif tag == "subClassOf" and resource:
+            relationships.append(("is_a", convert_owl_iri(resource)))
+        elif tag == "subClassOf":
+            restriction = child.find(OWL_NAMESPACE + "Restriction")
+            if restriction is not None:
+                on_property = restriction.find(OWL_NAMESPACE + "onProperty")
+                some_values_from = restriction.find(OWL_NAMESPACE + "someValuesFrom")
+                if on_property is not None and some_values_from is not None \
+                        and some_values_from.get(RDF_NAMESPACE + "resource"):
+                    relationships.append((convert_owl_iri(on_property.get(RDF_NAMESPACE + "resource", "")),
+                                          convert_owl_iri(some_values_from.get(RDF_NAMESPACE + "resource"))))
+    return OntologyTerm(term_id, name, namespace, definition, comment, synonyms, alternative_ids + xrefs,
+                        relationships, is_obsolete)
+
+
+def convert_owl_iri(iri: str) -> str:
+    """Converts the IRI of an OWL entity into an OBO-style identifier, e.g. '.../obo/GO_0005575' into 'GO:0005575'"""
+    if "#" in iri:
+        return iri.rsplit("#", 1)[-1]
+    return iri.rsplit("/", 1)[-1].replace("_", ":", 1)
+
+
+def _find_owl_text(element: xml.etree.ElementTree.Element, tag: str) -> str:
+    """Returns the text of the first child of an OWL element with a given tag"""
+    child = element.find(tag)
+    if child is None or not child.text:
+        return ""
+    return child.text.strip()
+
+
+def create_term_from_obo(tag_values: List[Tuple[str, str]]) -> OntologyTerm:
+    """Creates the compact representation of an ontology term from the tag-value pairs of an OBO stanza"""
+    term_id, name, namespace, definition, comment, is_obsolete = "", "", "", None, "", False
+    synonyms, alternative_ids, xrefs, parents, relationships = [], [], [], [], []
+    for tag, value in tag_values:
+        if tag == "id":
+            term_id = value
+        elif tag == "name":
+            name = parse_obo_value(value)
+        elif tag == "namespace":
+            namespace = parse_obo_value(value)
+        elif tag == "def":
+            definition = parse_obo_quoted_string(value)[0] or None
+        elif tag == "comment":
+            comment = parse_obo_value(value)
+        elif tag == "is_obsolete":
+            is_obsolete = parse_obo_value(value).lower() == "true"
+        elif tag in OBO_SYNONYM_TAGS:
+            (synonym, remainder) = parse_obo_quoted_string(value)
+            scope = remainder.split(" ", 1)[0]
+            if scope not in OBO_SYNONYM_SCOPES:
+                scope = OBO_SYNONYM_TAGS[tag]
+            synonyms.append((synonym, scope))
+        elif tag == "alt_id" and value:
+            alternative_ids.append(value.split()[0])
+        elif tag == "xref" and value:
+            xrefs.append(value.split()[0])
+        elif tag == "is_a" and value:
+            parents.append(("is_a", value.split()[0]))
+        elif tag == "relationship":
+            tokens = value.split()
+            if len(tokens) > 1:
+                relationships.append((tokens[0], tokens[1]))
+    return OntologyTerm(term_id, name, namespace, definition, comment, synonyms, alternative_ids + xrefs,
+                        parents + relationships, is_obsolete)
+
+
+def parse_obo_value(value: str) -> str:
+    """Extracts the value of an OBO tag-value pair, removing a trailing comment and resolving escape sequences"""
+    if "\\" not in value and "!" not in value:
+        return value
+    characters = []
+    index = 0
+    while index < len(value):
+        character = value[index]
+        if character == "\\" and index + 1 < len(value):
+            characters.append(OBO_ESCAPE_SEQUENCES.get(value[index + 1], value[index + 1]))
+            index += 2
+            continue
+        if character == "!":
+            break
+        characters.append(character)
+        index += 1
+    return "".join(characters).strip()
+
+
+def parse_obo_quoted_string(value: str) -> Tuple[str, str]:
+    """Extracts the quoted string at the start of the value of an OBO tag-value pair, resolving escape sequences,
+    and returns it together with the remainder of the value"""
+    if not value.startswith('"'):
+        return parse_obo_value(value), ""
+    if "\\" not in value:
+        end = value.find('"', 1)
+        if end < 0:
+            return value[1:], ""
+        return value[1:end], value[end + 1:].strip()
+    characters = []
+    index = 1
+    while index < len(value):
+        character = value[index]
+        if character == "\\" and index + 1 < len(value):
+            characters.append(OBO_ESCAPE_SEQUENCES.get(value[index + 1], value[index + 1]))
+            index += 2
+            continue
+        if character == '"':
+            return "".join(characters), value[index + 1:].strip()
+        characters.append(character)
+        index += 1
+    return "".join(characters), ""
+
+
 def get_default_namespace(ontology: pronto.Ontology) -> str:
     """Retrieves the default namespace of a given ontology"""
     default_namespace = ""
@@ -613,6 +1924,22 @@ def filter_ontology_by_db(ontology: pronto.Ontology, db_authority: str) -> Dict[
     return filtered_terms
 
 
+def convert_term(term: pronto.Term) -> OntologyTerm:
+    """Converts an ontology term parsed by pronto into its compact representation"""
+    namespace = ""
+    if "namespace" in term.other:
+        namespace = term.other["namespace"][0]
+    definition = None
+    if term.desc:
+        definition = str(term.desc)
+    is_obsolete = "is_obsolete" in term.other and term.other["is_obsolete"][0].lower() == "true"
+    synonyms = [(synonym.desc, synonym.scope) for synonym in term.synonyms]
+    relationships = [(relationship.obo_name, object_term.id)
+                     for relationship, object_terms in term.relations.items() for object_term in object_terms]
+    return OntologyTerm(term.id, term.name, namespace, definition, extract_comment(term), synonyms,
+                        extract_cross_references(term), relationships, is_obsolete)
+
+
 def extract_comment(term: pronto.Term) -> str:
     """Extracts comments from an ontology term"""
     comment = ""
@@ -0,0 +1,226 @@
+import re
+import itertools
+import collections
+from typing import List, Dict, Tuple, Iterable
+import sqlalchemy.orm
+import sqlalchemy.orm.attributes
+import sqlalchemy.dialects.postgresql
+from . import iobase
+from .. import utils
+from ..orm import sequence
+
+# Nucleotides are packed with 2 bits each (A=0, C=1, G=2, T=3), i.e. 4 nucleotides per byte with the first nucleotide
+# in the most significant bits. Other characters (e.g. 'N') and lower case letters are stored separately as runs.
+PACKED_ALPHABET = "ACGT"
+PACKED_GROUPS = ["".join(group) for group in itertools.product(PACKED_ALPHABET, repeat=4)]
+PACKED_GROUP_CODES = {group: code for code, group in enumerate(PACKED_GROUPS)}
+
+PackedResidues = collections.namedtuple("PackedResidues", ["packed", "seqlen", "exception_starts",
+                                                           "exception_residues", "lowercase_starts", "lowercase_ends"])
+
+# Side table holding packed residues; created by ResiduePackingClient.create_storage()
+packed_residues_table = sqlalchemy.Table(
+    "feature_packedresidues", sqlalchemy.MetaData(schema="public"),
+    sqlalchemy.Column("feature_id", sqlalchemy.BIGINT, primary_key=True),
+    sqlalchemy.Column("packed", sqlalchemy.dialects.postgresql.BYTEA, nullable=False),
+    sqlalchemy.Column("seqlen", sqlalchemy.BIGINT, nullable=False),
+    sqlalchemy.Column("exception_starts", sqlalchemy.dialects.postgresql.ARRAY(sqlalchemy.BIGINT), nullable=False),
+    sqlalchemy.Column("exception_residues", sqlalchemy.dialects.postgresql.ARRAY(sqlalchemy.TEXT), nullable=False),
+    sqlalchemy.Column("lowercase_starts", sqlalchemy.dialects.postgresql.ARRAY(sqlalchemy.BIGINT), nullable=False),
+    sqlalchemy.Column("lowercase_ends", sqlalchemy.dialects.postgresql.ARRAY(sqlalchemy.BIGINT), nullable=False))
+
+
+def pack_residues(residues: str) -> PackedResidues:
+    """Packs a sequence of nucleotides into 2 bits per residue"""
+    try:
+        residues.encode("ascii")
+    except UnicodeEncodeError:
+        raise ValueError("Residues contain non-ASCII characters")
+    uppercase_residues = residues.upper()
+    lowercase_runs = [match.span() for match in re.finditer("[a-z]+", residues)]
+    exception_runs = [(match.start(), match.group()) for match in re.finditer("[^ACGT]+", uppercase_residues)]
+    nucleotides = re.sub("[^ACGT]", "A", uppercase_residues)
+    nucleotides += "A" * (-len(nucleotides) % 4)
+    packed = bytes(map(PACKED_GROUP_CODES.__getitem__, re.findall("....", nucleotides)))
+    return PackedResidues(packed=packed, seqlen=len(residues),
+                          exception_starts=[start for start, _ in exception_runs],
+                          exception_residues=[run for _, run in exception_runs],
+                          lowercase_starts=[start for start, _ in lowercase_runs],
+                          lowercase_ends=[end for _, end in lowercase_runs])
+
+
+def unpack_residues(packed_residues: PackedResidues) -> str:
+    """Restores a sequence of nucleotides from its packed form"""
+    residues = "".join(map(PACKED_GROUPS.__getitem__, packed_residues.packed))[:packed_residues.seqlen]
+    residues = overlay_runs(residues, zip(packed_residues.exception_starts, packed_residues.exception_residues))
+    residues = overlay_runs(residues, [(start, residues[start:end].lower()) for start, end
+                                       in zip(packed_residues.lowercase_starts, packed_residues.lowercase_ends)])
+    return residues
+
+
+def overlay_runs(residues: str, runs: Iterable[Tuple[int, str]]) -> str:
+    """Replaces parts of a sequence by the given runs of residues"""
+    pieces = []
+    position = 0
+    for start, run in sorted(runs):
+        pieces.append(residues[position:start])
+        pieces.append(run)
+        position = start + len(run)
+    if not pieces:
+        return residues
+    pieces.append(residues[position:])
+    return "".join(pieces)
+
+
+def packed_residues_exist(session: sqlalchemy.orm.Session) -> bool:
+    """Checks if the side table for packed residues exists in a database"""
+    return session.get_bind().dialect.has_table(session.connection(), packed_residues_table.name,
+                                                schema=packed_residues_table.schema)
+
+
+def load_packed_residues(session: sqlalchemy.orm.Session, feature_ids: List[int]) -> Dict[int, str]:
+    """Loads the packed residues of given features from the database and unpacks them"""
+    if not feature_ids or not packed_residues_exist(session):
+        return {}
+    all_residues = {}
+    query = sqlalchemy.select([packed_residues_table]).where(packed_residues_table.c.feature_id.in_(feature_ids))
+    for row in session.execute(query):
+        all_residues[row.feature_id] = unpack_residues(PackedResidues(
+            packed=bytes(row.packed), seqlen=row.seqlen, exception_starts=row.exception_starts,
+            exception_residues=row.exception_residues, lowercase_starts=row.lowercase_starts,
+            lowercase_ends=row.lowercase_ends))
+    return all_residues
+
+
+def delete_packed_residues(session: sqlalchemy.orm.Session, feature_ids: List[int]) -> None:
+    """Deletes the packed residues of given features from the database, e.g. because new residues supersede them"""
+    if not feature_ids or not packed_residues_exist(session):
+        return
+    session.execute(packed_residues_table.delete().where(packed_residues_table.c.feature_id.in_(feature_ids)))
+
+
+class ResiduePackingClient(iobase.ChadoClient):
+    """Class for moving residues of top-level sequences between the 'feature' table and a packed side table"""
+
+    def __init__(self, uri: str, verbose=False, test_environment=False):
+        """Constructor"""
+
+        # Connect to database
+        self.test_environment = test_environment
+        if self.test_environment:
+            self.printer = utils.VerbosePrinter(verbose)
+        else:
+            super().__init__(uri, verbose)
+
+        # Load essentials
+        if not self.test_environment:
+            self._load_essentials()
+
+    def __del__(self):
+        """Destructor - disconnect from database"""
+        if not self.test_environment:
+            super().__del__()
+
+    def _load_essentials(self) -> None:
+        """Loads essential database entries"""
+        self._top_level_term = self._load_cvterm("top_level_seq")
+
+    def pack(self, organism_name: str) -> None:
+        """Moves the residues of all top-level sequences of an organism into the packed side table"""
+        self.create_storage()
+        organism_entry = self._load_organism(organism_name)
+        feature_entries = self.query_features_by_property_type(organism_entry.organism_id,
+                                                               self._top_level_term.cvterm_id).all()
+        packed_features = 0
+        for feature_entry in feature_entries:
+            if feature_entry.residues:
+                self._pack_feature_residues(feature_entry)
+                packed_features += 1
+        self.session.commit()
+        self.printer.print("Packed residues of " + str(packed_features) + " sequences")
+
+    def unpack(self, organism_name: str) -> None:
+        """Moves the residues of all top-level sequences of an organism back into the 'feature' table"""
+        organism_entry = self._load_organism(organism_name)
+        feature_entries = self.query_features_by_property_type(organism_entry.organism_id,
+                                                               self._top_level_term.cvterm_id).all()
+        feature_ids = [entry.feature_id for entry in feature_entries]
+        all_residues = load_packed_residues(self.session, feature_ids)
+
+        # Residues imported after packing supersede the packed copy, which is just deleted
+        unpacked_feature_ids = set(feature_id for feature_id, in self.session.query(sequence.Feature.feature_id)
+                                   .filter(sequence.Feature.feature_id.in_(feature_ids))
+                                   .filter(sequence.Feature.residues.is_(None)))
+        unpacked_features = 0
+        for feature_entry in feature_entries:
+            if feature_entry.feature_id in all_residues and feature_entry.feature_id in unpacked_feature_ids:
+                feature_entry.residues = all_residues[feature_entry.feature_id]
+                sqlalchemy.orm.attributes.flag_modified(feature_entry, "residues")
+                unpacked_features += 1
+        delete_packed_residues(self.session, list(all_residues))
+        self.session.commit()
+        self.printer.print("Unpacked residues of " + str(unpacked_features) + " sequences")
+
+    def _pack_feature_residues(self, feature_entry: sequence.Feature) -> None:
+        """Replaces the residues of a feature by an entry in the packed side table"""
+        packed_residues = pack_residues(feature_entry.residues)
+        self.session.execute(packed_residues_table.delete().where(
+            packed_residues_table.c.feature_id == feature_entry.feature_id))
+        self.session.execute(packed_residues_table.insert().values(feature_id=feature_entry.feature_id,
+                                                                   **packed_residues._asdict()))
+        if feature_entry.seqlen is None:
+            feature_entry.seqlen = packed_residues.seqlen
+        feature_entry.residues = None
+
+    def create_storage(self) -> None:
+        """Creates the side table for packed residues, a function for unpacking them in SQL, and a view combining
+        plain and packed residues, if not yet present"""
+        for statement in [self.packed_residues_table_definition(), self.unpack_function_definition(),
+                          self.residues_view_definition()]:
+            self.session.execute(sqlalchemy.schema.DDL(statement))
+
+    @staticmethod
+    def packed_residues_table_definition() -> str:
+        return "CREATE TABLE IF NOT EXISTS public.feature_packedresidues (\n" \
+               "\tfeature_id BIGINT NOT NULL PRIMARY KEY REFERENCES public.feature (feature_id) " \
+               "ON UPDATE CASCADE ON DELETE CASCADE,\n" \
+               "\tpacked BYTEA NOT NULL,\n" \
+               "\tseqlen BIGINT NOT NULL,\n" \
+               "\texception_starts BIGINT[] NOT NULL,\n" \
+               "\texception_residues TEXT[] NOT NULL,\n" \
+               "\tlowercase_starts BIGINT[] NOT NULL,\n" \
+               "\tlowercase_ends BIGINT[] NOT NULL)"
+
+    @staticmethod
+    def unpack_function_definition() -> str:
+        return "CREATE OR REPLACE FUNCTION public.unpack_residues(packed BYTEA, seqlen BIGINT, " \
+               "exception_starts BIGINT[], exception_residues TEXT[], lowercase_starts BIGINT[], " \
+               "lowercase_ends BIGINT[])\n" \
+               "RETURNS TEXT\nLANGUAGE plpgsql IMMUTABLE\nAS $function$\nDECLARE\n" \
+               "\tunpacked TEXT;\n" \
+               "\ti INTEGER;\n" \
+               "BEGIN\n" \
+               "\tSELECT string_agg(substr('" + "".join(PACKED_GROUPS) + "', " \
+               "get_byte(packed, byte_index) * 4 + 1, 4), '' ORDER BY byte_index) INTO unpacked " \
+               "FROM generate_series(0, length(packed) - 1) AS byte_index;\n" \
+               "\tunpacked := left(coalesce(unpacked, ''), CAST(seqlen AS INTEGER));\n" \
+               "\tFOR i IN 1..coalesce(array_length(exception_starts, 1), 0) LOOP\n" \
+               "\t\tunpacked := overlay(unpacked PLACING exception_residues[i] " \
+               "FROM CAST(exception_starts[i] + 1 AS INTEGER));\n" \
+               "\tEND LOOP;\n" \
+               "\tFOR i IN 1..coalesce(array_length(lowercase_starts, 1), 0) LOOP\n" \
+               "\t\tunpacked := overlay(unpacked PLACING lower(substr(unpacked, " \
+               "CAST(lowercase_starts[i] + 1 AS INTEGER), CAST(lowercase_ends[i] - lowercase_starts[i] AS INTEGER))) " \
+               "FROM CAST(lowercase_starts[i] + 1 AS INTEGER));\n" \
+               "\tEND LOOP;\n" \
+               "\tRETURN unpacked;\n" \
+               "END;\n$function$"
+
+    @staticmethod
+    def residues_view_definition() -> str:
+        return "CREATE OR REPLACE VIEW public.feature_residues AS\n" \
+               "SELECT feature.feature_id, COALESCE(feature.residues, public.unpack_residues(packed.packed, " \
+               "packed.seqlen, packed.exception_starts, packed.exception_residues, packed.lowercase_starts, " \
+               "packed.lowercase_ends)) AS residues\n" \
+               "FROM public.feature LEFT JOIN public.feature_packedresidues AS packed " \
+               "ON packed.feature_id = feature.feature_id"
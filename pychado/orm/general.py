@@ -29,6 +29,40 @@ class Db(base.PublicBase):
             .format(self.db_id, self.name, self.description, self.urlprefix, self.url)
 
 
+class DbProp(base.PublicBase):
+    """Class for the CHADO 'dbprop' table"""
+    # Columns
+    dbprop_id = sqlalchemy.Column(sqlalchemy.BIGINT, nullable=False, primary_key=True, autoincrement=True)
+    db_id = sqlalchemy.Column(sqlalchemy.BIGINT, sqlalchemy.ForeignKey(
+        Db.db_id, onupdate="CASCADE", ondelete="CASCADE"), nullable=False)
+    type_id = sqlalchemy.Column(sqlalchemy.BIGINT, sqlalchemy.ForeignKey(
+        "public.cvterm.cvterm_id", onupdate="CASCADE", ondelete="CASCADE"), nullable=False)
+    value = sqlalchemy.Column(sqlalchemy.TEXT, nullable=True)
+    rank = sqlalchemy.Column(sqlalchemy.INTEGER, nullable=False, server_default="0")
+
+    # Constraints
+    __tablename__ = "dbprop"
+    __table_args__ = (sqlalchemy.UniqueConstraint(db_id, type_id, rank, name="dbprop_c1"),
+                      sqlalchemy.Index("dbprop_idx1", db_id),
+                      sqlalchemy.Index("dbprop_idx2", type_id))
+
+    # Relationships
+    # The 'cvterm' table is referenced by name, since the CV module depends on the General module
+    db = sqlalchemy.orm.relationship(Db, foreign_keys=db_id, backref="dbprop_db")
+    type = sqlalchemy.orm.relationship("CvTerm", foreign_keys=type_id, backref="dbprop_type")
+
+    # Initialisation
+    def __init__(self, db_id, type_id, value=None, rank=0, dbprop_id=None):
+        for key, value in locals().items():
+            if key != self:
+                setattr(self, key, value)
+
+    # Representation
+    def __repr__(self):
+        return "<general.DbProp(dbprop_id={0}, db_id={1}, type_id={2}, value='{3}', rank={4})>".format(
+            self.dbprop_id, self.db_id, self.type_id, self.value, self.rank)
+
+
 class DbxRef(base.PublicBase):
     """Class for the CHADO 'dbxref' table"""
     # Columns
@@ -1,5 +1,7 @@
+import sys
+import contextlib
 from . import utils, dbutils, queries, ddl
-from .io import direct, essentials, ontology, fasta, gff, gaf
+from .io import direct, essentials, ontology, fasta, gff, gaf, gpad, packing, cvtermpath
 
 
 def check_access(connection_uri: str, task: str) -> bool:
@@ -120,6 +122,15 @@ def run_execute_command(specifier: str, arguments, uri: str) -> None:
     if specifier == "audit_backup":
         client = ddl.AuditBackupSchemaSetupClient(uri)
         client.execute_backup_function(arguments.date)
+    elif specifier == "pack_residues":
+        client = packing.ResiduePackingClient(uri, arguments.verbose)
+        client.pack(arguments.organism)
+    elif specifier == "unpack_residues":
+        client = packing.ResiduePackingClient(uri, arguments.verbose)
+        client.unpack(arguments.organism)
+    elif specifier == "cvtermpath":
+        client = cvtermpath.CvTermPathClient(uri, arguments.verbose)
+        client.compute(arguments.vocabulary)
     else:
         print("Functionality 'execute " + specifier + "' is not yet implemented.")
 
@@ -182,14 +193,24 @@ def run_import_command(specifier: str, arguments, uri: str) -> None:
     if hasattr(arguments, "input_file") and arguments.input_file:
         file = arguments.input_file
     elif hasattr(arguments, "input_url") and arguments.input_url:
-        file = utils.download_file(arguments.input_url)
+        # The report of a dry run may be written to stdout; messages about the download then go to stderr
+        with contextlib.redirect_stdout(sys.stderr if getattr(arguments, "dry_run", False)
+                                        and not arguments.report_file else sys.stdout):
+            if hasattr(arguments, "cache_directory") and arguments.cache_directory:
+                file = utils.download_file_with_cache(arguments.input_url, arguments.cache_directory)
+            else:
+                file = utils.download_file(arguments.input_url)
 
     if specifier == "essentials":
         client = essentials.EssentialsClient(uri, arguments.verbose)
         client.load()
+    elif specifier == "ontology" and arguments.manifest:
+        ontology.load_manifest(uri, arguments.verbose, arguments.manifest, arguments.streaming, arguments.processes,
+                               arguments.cache_directory, arguments.force)
     elif specifier == "ontology":
         client = ontology.OntologyClient(uri, arguments.verbose)
-        client.load(file, arguments.format, arguments.database_authority)
+        client.load(file, arguments.format, arguments.database_authority, arguments.bulk, arguments.streaming,
+                    arguments.force, arguments.dry_run, arguments.report_file)
     elif specifier == "gff":
         client = gff.GFFImportClient(uri, arguments.verbose)
         client.load(file, arguments.organism, arguments.fasta, arguments.sequence_type, arguments.fresh_load,
@@ -199,24 +220,47 @@ def run_import_command(specifier: str, arguments, uri: str) -> None:
         client.load(file, arguments.organism, arguments.sequence_type)
     elif specifier == "gaf":
         client = gaf.GAFImportClient(uri, arguments.verbose)
-        client.load(file, arguments.organism, arguments.annotation_level)
+        client.load(file, arguments.organism, arguments.annotation_level, arguments.batch_size,
+                    cache_directory=arguments.cache_directory)
+    elif specifier == "gpad":
+        client = gpad.GPADImportClient(uri, arguments.verbose)
+        client.load(file, arguments.gpi_file, arguments.organism, arguments.annotation_level, arguments.batch_size,
+                    arguments.cache_directory)
     else:
         print("Functionality 'import " + specifier + "' is not yet implemented.")
 
 
 def run_export_command(specifier: str, arguments, uri: str) -> None:
     """Exports data from a database to a file"""
-    if specifier == "fasta":
+    if specifier == "fasta" and arguments.all_organisms:
+        fasta.export_all_organisms(uri, arguments.verbose, arguments.output_file, arguments.sequence_type,
+                                   arguments.release, arguments.include_obsolete, arguments.processes,
+                                   arguments.cache_directory, arguments.cache_size * 1024 * 1024)
+    elif specifier == "fasta":
         client = fasta.FastaExportClient(uri, arguments.verbose)
+        if arguments.cache_directory:
+            client.use_sequence_cache(arguments.cache_directory, arguments.cache_size * 1024 * 1024)
         client.export(arguments.output_file, arguments.organism, arguments.sequence_type, arguments.release,
                       arguments.include_obsolete)
     elif specifier == "gff":
         client = gff.GFFExportClient(uri, arguments.verbose)
         client.export(arguments.output_file, arguments.organism, arguments.export_fasta, arguments.fasta_file,
                       arguments.include_obsolete)
+    elif specifier == "gaf" and (arguments.organisms or arguments.all_organisms):
+        gaf.export_organisms(uri, arguments.verbose, arguments.output_file, arguments.organisms,
+                             arguments.database_authority, arguments.annotation_level, arguments.include_obsolete,
+                             arguments.gaf_version, arguments.processes)
     elif specifier == "gaf":
         client = gaf.GAFExportClient(uri, arguments.verbose)
         client.export(arguments.output_file, arguments.organism, arguments.database_authority,
-                      arguments.annotation_level, arguments.include_obsolete)
+                      arguments.annotation_level, arguments.include_obsolete, arguments.gaf_version)
+    elif specifier == "gpad":
+        client = gpad.GPADExportClient(uri, arguments.verbose)
+        client.export_gpad(arguments.output_file, arguments.organism, arguments.database_authority,
+                           arguments.annotation_level, arguments.include_obsolete)
+    elif specifier == "gpi":
+        client = gpad.GPADExportClient(uri, arguments.verbose)
+        client.export_gpi(arguments.output_file, arguments.organism, arguments.database_authority,
+                          arguments.annotation_level, arguments.include_obsolete)
     else:
         print("Functionality 'export " + specifier + "' is not yet implemented.")
@@ -1,4 +1,6 @@
 import unittest
+import unittest.mock
+import argparse
 from .. import chado_tools
 
 
@@ -54,24 +56,30 @@ class TestCommands(unittest.TestCase):
 
     def test_import_commands(self):
         commands = chado_tools.import_commands()
-        self.assertEqual(len(commands), 5)
+        self.assertEqual(len(commands), 6)
         self.assertIn("essentials", commands)
         self.assertIn("ontology", commands)
         self.assertIn("gff", commands)
         self.assertIn("fasta", commands)
         self.assertIn("gaf", commands)
+        self.assertIn("gpad", commands)
 
     def test_export_commands(self):
         commands = chado_tools.export_commands()
-        self.assertEqual(len(commands), 3)
+        self.assertEqual(len(commands), 5)
         self.assertIn("fasta", commands)
         self.assertIn("gff", commands)
         self.assertIn("gaf", commands)
+        self.assertIn("gpad", commands)
+        self.assertIn("gpi", commands)
 
     def test_execute_commands(self):
         commands = chado_tools.execute_commands()
-        self.assertEqual(len(commands), 1)
+        self.assertEqual(len(commands), 4)
         self.assertIn("audit_backup", commands)
+        self.assertIn("pack_residues", commands)
+        self.assertIn("unpack_residues", commands)
+        self.assertIn("cvtermpath", commands)
 
 
 class TestArguments(unittest.TestCase):
@@ -191,6 +199,21 @@ class TestArguments(unittest.TestCase):
         self.assertEqual(parsed_args["date"], "testdate")
         self.assertEqual(parsed_args["dbname"], "testdb")
 
+    def test_execute_pack_residues_args(self):
+        # Tests if the command line arguments for the subcommands 'chado execute (un)pack_residues' are parsed correctly
+        for command in ["pack_residues", "unpack_residues"]:
+            args = ["chado", "execute", command, "-a", "testorganism", "testdb"]
+            parsed_args = vars(chado_tools.parse_arguments(args))
+            self.assertEqual(parsed_args["organism"], "testorganism")
+            self.assertEqual(parsed_args["dbname"], "testdb")
+
+    def test_execute_cvtermpath_args(self):
+        # Tests if the command line arguments for the subcommand 'chado execute cvtermpath' are parsed correctly
+        args = ["chado", "execute", "cvtermpath", "--vocabulary", "testcv", "testdb"]
+        parsed_args = vars(chado_tools.parse_arguments(args))
+        self.assertEqual(parsed_args["vocabulary"], "testcv")
+        self.assertEqual(parsed_args["dbname"], "testdb")
+
     def test_extract_annotation_updates_args(self):
         # Tests if the command line arguments for the subcommand 'chado extract annotation_updates' are parsed correctly
         args = ["chado", "extract", "annotation_updates", "-H", "-d", ";", "-o", "testfile", "-F", "json", "-a",
@@ -298,12 +321,15 @@ class TestArguments(unittest.TestCase):
 
     def test_import_ontology_args(self):
         # Tests if the command line arguments for the subcommand 'chado import ontology' are parsed correctly
-        args = ["chado", "import", "ontology", "-f", "testfile", "-A", "testauthority", "-F", "owl", "testdb"]
+        args = ["chado", "import", "ontology", "-f", "testfile", "-A", "testauthority", "-F", "owl", "--bulk",
+                "--streaming", "testdb"]
         parsed_args = vars(chado_tools.parse_arguments(args))
         self.assertEqual(parsed_args["input_file"], "testfile")
         self.assertEqual(parsed_args["input_url"], "")
         self.assertEqual(parsed_args["database_authority"], "testauthority")
         self.assertEqual(parsed_args["format"], "owl")
+        self.assertTrue(parsed_args["bulk"])
+        self.assertTrue(parsed_args["streaming"])
         self.assertEqual(parsed_args["dbname"], "testdb")
 
         # Test the default values / alternatives
@@ -311,7 +337,37 @@ class TestArguments(unittest.TestCase):
         parsed_args = vars(chado_tools.parse_arguments(args))
         self.assertEqual(parsed_args["input_file"], "")
         self.assertEqual(parsed_args["input_url"], "testurl")
+        self.assertEqual(parsed_args["manifest"], "")
         self.assertEqual(parsed_args["format"], "obo")
+        self.assertFalse(parsed_args["bulk"])
+        self.assertFalse(parsed_args["streaming"])
+        self.assertIsNone(parsed_args["processes"])
+        self.assertEqual(parsed_args["cache_directory"], "")
+        self.assertFalse(parsed_args["force"])
+        self.assertFalse(parsed_args["dry_run"])
+        self.assertEqual(parsed_args["report_file"], "")
+
+        args = ["chado", "import", "ontology", "-f", "testfile", "-A", "testauthority", "--dry_run", "--report_file",
+                "testreport", "testdb"]
+        parsed_args = vars(chado_tools.parse_arguments(args))
+        self.assertTrue(parsed_args["dry_run"])
+        self.assertEqual(parsed_args["report_file"], "testreport")
+
+        args = ["chado", "import", "ontology", "--manifest", "testmanifest", "--processes", "4", "--cache_directory",
+                "testcache", "--force", "testdb"]
+        parsed_args = vars(chado_tools.parse_arguments(args))
+        self.assertEqual(parsed_args["manifest"], "testmanifest")
+        self.assertEqual(parsed_args["database_authority"], "")
+        self.assertEqual(parsed_args["processes"], 4)
+        self.assertEqual(parsed_args["cache_directory"], "testcache")
+        self.assertTrue(parsed_args["force"])
+
+        # Test invalid combinations of arguments
+        for args in [["chado", "import", "ontology", "-f", "testfile", "testdb"],
+                     ["chado", "import", "ontology", "--manifest", "testmanifest", "--dry_run", "testdb"]]:
+            with unittest.mock.patch("sys.stderr"), self.assertRaises(SystemExit) as context:
+                chado_tools.parse_arguments(args)
+            self.assertEqual(context.exception.code, 2)
 
     def test_import_gff_args(self):
         # Tests if the command line arguments for the subcommand 'chado import gff' are parsed correctly
@@ -353,6 +409,27 @@ class TestArguments(unittest.TestCase):
         self.assertEqual(parsed_args["input_file"], "testfile")
         self.assertEqual(parsed_args["organism"], "testorganism")
         self.assertEqual(parsed_args["annotation_level"], "protein")
+        self.assertEqual(parsed_args["batch_size"], 0)
+        self.assertEqual(parsed_args["cache_directory"], "")
+        self.assertEqual(parsed_args["dbname"], "testdb")
+
+        args = ["chado", "import", "gaf", "-f", "testfile", "-a", "testorganism", "--batch_size", "1000",
+                "--cache_directory", "testcache", "testdb"]
+        parsed_args = vars(chado_tools.parse_arguments(args))
+        self.assertEqual(parsed_args["batch_size"], 1000)
+        self.assertEqual(parsed_args["cache_directory"], "testcache")
+
+    def test_import_gpad_args(self):
+        # Tests if the command line arguments for the subcommand 'chado import gpad' are parsed correctly
+        args = ["chado", "import", "gpad", "-f", "testfile", "--gpi_file", "testgpi", "-a", "testorganism",
+                "-L", "protein", "--batch_size", "1000", "--cache_directory", "testcache", "testdb"]
+        parsed_args = vars(chado_tools.parse_arguments(args))
+        self.assertEqual(parsed_args["input_file"], "testfile")
+        self.assertEqual(parsed_args["gpi_file"], "testgpi")
+        self.assertEqual(parsed_args["organism"], "testorganism")
+        self.assertEqual(parsed_args["annotation_level"], "protein")
+        self.assertEqual(parsed_args["batch_size"], 1000)
+        self.assertEqual(parsed_args["cache_directory"], "testcache")
         self.assertEqual(parsed_args["dbname"], "testdb")
 
     def test_export_fasta_args(self):
@@ -366,6 +443,25 @@ class TestArguments(unittest.TestCase):
         self.assertEqual(parsed_args["release"], "testrelease")
         self.assertFalse(parsed_args["include_obsolete"])
         self.assertEqual(parsed_args["dbname"], "testdb")
+        self.assertFalse(parsed_args["all_organisms"])
+        self.assertIsNone(parsed_args["processes"])
+        self.assertIsNone(parsed_args["cache_directory"])
+        self.assertEqual(parsed_args["cache_size"], 1024)
+
+        args = ["chado", "export", "fasta", "-f", "testfile", "--all_organisms", "-t", "contigs,genes,proteins",
+                "--processes", "4", "testdb"]
+        parsed_args = vars(chado_tools.parse_arguments(args))
+        self.assertIsNone(parsed_args["organism"])
+        self.assertTrue(parsed_args["all_organisms"])
+        self.assertEqual(parsed_args["sequence_type"], "contigs,genes,proteins")
+        self.assertEqual(parsed_args["processes"], 4)
+
+    def test_fasta_sequence_types(self):
+        # Tests the validation of sequence types for the FASTA export
+        self.assertEqual(chado_tools.fasta_sequence_types("genes"), "genes")
+        self.assertEqual(chado_tools.fasta_sequence_types("contigs,proteins"), "contigs,proteins")
+        with self.assertRaises(argparse.ArgumentTypeError):
+            chado_tools.fasta_sequence_types("genes,transcripts")
 
     def test_export_gff_args(self):
         # Tests if the command line arguments for the subcommand 'chado export gff' are parsed correctly
@@ -382,14 +478,46 @@ class TestArguments(unittest.TestCase):
     def test_export_gaf_args(self):
         # Tests if the command line arguments for the subcommand 'chado export gaf' are parsed correctly
         args = ["chado", "export", "gaf", "-f", "testfile", "-a", "testorganism", "-A", "testauthority",
-                "-L", "protein", "testdb"]
+                "-L", "protein", "--gaf_version", "2.2", "testdb"]
         parsed_args = vars(chado_tools.parse_arguments(args))
         self.assertEqual(parsed_args["output_file"], "testfile")
         self.assertEqual(parsed_args["organism"], "testorganism")
         self.assertEqual(parsed_args["database_authority"], "testauthority")
         self.assertEqual(parsed_args["annotation_level"], "protein")
         self.assertFalse(parsed_args["include_obsolete"])
+        self.assertEqual(parsed_args["gaf_version"], "2.2")
         self.assertEqual(parsed_args["dbname"], "testdb")
+        self.assertIsNone(parsed_args["organisms"])
+        self.assertFalse(parsed_args["all_organisms"])
+        self.assertIsNone(parsed_args["processes"])
+
+        args = ["chado", "export", "gaf", "-f", "testfile", "--organisms", "org1, org2", "-A", "testauthority",
+                "--processes", "4", "testdb"]
+        parsed_args = vars(chado_tools.parse_arguments(args))
+        self.assertIsNone(parsed_args["organism"])
+        self.assertEqual(parsed_args["organisms"], ["org1", "org2"])
+        self.assertFalse(parsed_args["all_organisms"])
+        self.assertEqual(parsed_args["processes"], 4)
+
+    def test_export_gpad_args(self):
+        # Tests if the command line arguments for the subcommands 'chado export gpad/gpi' are parsed correctly
+        for command in ["gpad", "gpi"]:
+            args = ["chado", "export", command, "-f", "testfile", "-a", "testorganism", "-A", "testauthority",
+                    "-L", "protein", "--include_obsolete", "testdb"]
+            parsed_args = vars(chado_tools.parse_arguments(args))
+            self.assertEqual(parsed_args["output_file"], "testfile")
+            self.assertEqual(parsed_args["organism"], "testorganism")
+            self.assertEqual(parsed_args["database_authority"], "testauthority")
+            self.assertEqual(parsed_args["annotation_level"], "protein")
+            self.assertTrue(parsed_args["include_obsolete"])
+            self.assertEqual(parsed_args["dbname"], "testdb")
+
+    def test_comma_separated_list(self):
+        # Tests the splitting of comma-separated lists of command line arguments
+        self.assertEqual(chado_tools.comma_separated_list("org1"), ["org1"])
+        self.assertEqual(chado_tools.comma_separated_list("org1, org2,"), ["org1", "org2"])
+        with self.assertRaises(argparse.ArgumentTypeError):
+            chado_tools.comma_separated_list(" , ")
 
 
 if __name__ == '__main__':
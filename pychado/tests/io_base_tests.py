@@ -227,6 +227,21 @@ class TestChadoClient(unittest.TestCase):
         self.assertIn("transcript_gene_relationship.type_id = 55", compiled_query)
         self.assertIn("gene_feature.type_id = 222", compiled_query)
 
+    def test_query_protein_sequences(self):
+        # Tests the function that creates a projected query against the feature and cvterm tables
+        query = self.client.query_protein_sequences(12, 222, 55, 66)
+        compiled_query = str(query.statement.compile(compile_kwargs={"literal_binds": True}))
+        self.assertIn("SELECT protein_feature.uniquename, protein_feature.name, protein_type.name AS type_name, "
+                      "protein_feature.residues, protein_feature.is_obsolete", compiled_query)
+        self.assertIn("FROM public.feature AS protein_feature "
+                      "JOIN public.feature_relationship AS protein_transcript_relationship", compiled_query)
+        self.assertIn("JOIN public.cvterm AS protein_type "
+                      "ON protein_type.cvterm_id = protein_feature.type_id", compiled_query)
+        self.assertIn("protein_feature.organism_id = 12", compiled_query)
+        self.assertIn("protein_transcript_relationship.type_id = 66", compiled_query)
+        self.assertIn("transcript_gene_relationship.type_id = 55", compiled_query)
+        self.assertIn("gene_feature.type_id = 222", compiled_query)
+
     def test_query_feature_properties(self):
         # Tests the function that creates a query against the featureprop and cvterm tables
         query = self.client.query_feature_properties(44)
@@ -332,6 +347,88 @@ class TestChadoClient(unittest.TestCase):
         self.assertIn("FROM public.cvterm JOIN public.cv ON public.cv.cv_id = public.cvterm.cv_id", compiled_query)
         self.assertIn("WHERE public.cvterm.cvterm_id = 44", compiled_query)
 
+    def test_query_cvterms_by_db(self):
+        # Tests the function that creates a query against the cvterm and dbxref tables
+        query = self.client.query_cvterms_by_db(44)
+        compiled_query = str(query.statement.compile(compile_kwargs={"literal_binds": True}))
+        self.assertIn("SELECT public.dbxref.accession, public.cvterm.cvterm_id, public.cvterm.name", compiled_query)
+        self.assertIn("FROM public.cvterm JOIN public.dbxref ON public.dbxref.dbxref_id = public.cvterm.dbxref_id",
+                      compiled_query)
+        self.assertIn("WHERE public.dbxref.db_id = 44", compiled_query)
+
+    def test_query_features_by_organism(self):
+        # Tests the function that creates a query against the feature and cvterm tables
+        query = self.client.query_features_by_organism(12)
+        compiled_query = str(query.statement.compile(compile_kwargs={"literal_binds": True}))
+        self.assertIn("SELECT public.feature.feature_id, public.feature.uniquename, public.feature.name, "
+                      "public.cvterm.name AS type, public.feature.is_obsolete", compiled_query)
+        self.assertIn("FROM public.feature JOIN public.cvterm ON public.cvterm.cvterm_id = public.feature.type_id",
+                      compiled_query)
+        self.assertIn("WHERE public.feature.organism_id = 12", compiled_query)
+
+    def test_query_feature_relationships_by_organism(self):
+        # Tests the function that creates a query against the feature_relationship and feature tables
+        query = self.client.query_feature_relationships_by_organism(12, [33, 44])
+        compiled_query = str(query.statement.compile(compile_kwargs={"literal_binds": True}))
+        self.assertIn("SELECT public.feature_relationship.subject_id, "
+                      "subject_feature.uniquename AS subject_uniquename, "
+                      "public.feature_relationship.object_id, object_feature.uniquename AS object_uniquename, "
+                      "public.feature_relationship.type_id", compiled_query)
+        self.assertIn("FROM public.feature_relationship JOIN public.feature AS subject_feature "
+                      "ON subject_feature.feature_id = public.feature_relationship.subject_id "
+                      "JOIN public.feature AS object_feature "
+                      "ON object_feature.feature_id = public.feature_relationship.object_id", compiled_query)
+        self.assertIn("WHERE subject_feature.organism_id = 12 AND object_feature.organism_id = 12 "
+                      "AND public.feature_relationship.type_id IN (33, 44)", compiled_query)
+
+    def test_query_feature_cvterm_annotations_by_organism(self):
+        # Tests the function that creates a query against the feature_cvterm, feature, cvterm, cv, dbxref, db and
+        # pub tables
+        query = self.client.query_feature_cvterm_annotations_by_organism(12, 44)
+        compiled_query = str(query.statement.compile(compile_kwargs={"literal_binds": True}))
+        self.assertIn("SELECT public.feature_cvterm.feature_cvterm_id, public.feature_cvterm.feature_id, "
+                      "public.feature_cvterm.is_not, public.db.name AS db, public.dbxref.accession, "
+                      "public.cv.name AS namespace, public.pub.uniquename AS pub", compiled_query)
+        self.assertIn("JOIN public.pub ON public.pub.pub_id = public.feature_cvterm.pub_id", compiled_query)
+        self.assertIn("WHERE public.feature.organism_id = 12 AND public.db.db_id = 44", compiled_query)
+
+    def test_query_feature_cvterm_properties_by_organism(self):
+        # Tests the function that creates a query against the feature_cvtermprop and cvterm tables, restricted to
+        # the feature_cvterms of an organism
+        query = self.client.query_feature_cvterm_properties_by_organism(12, 44)
+        compiled_query = str(query.statement.compile(compile_kwargs={"literal_binds": True}))
+        self.assertIn("SELECT public.feature_cvtermprop.feature_cvterm_id, public.cvterm.name, "
+                      "public.feature_cvtermprop.value", compiled_query)
+        self.assertIn("WHERE public.feature_cvtermprop.feature_cvterm_id IN "
+                      "(SELECT public.feature_cvterm.feature_cvterm_id", compiled_query)
+        self.assertIn("WHERE public.feature.organism_id = 12 AND public.dbxref.db_id = 44", compiled_query)
+
+    def test_query_feature_cvterm_by_organism_results(self):
+        # Tests that the organism-wide feature_cvterm queries return the expected rows
+        feature_cvterm = sequence.FeatureCvTerm(feature_id=self.default_feature.feature_id,
+                                                cvterm_id=self.default_cvterm.cvterm_id,
+                                                pub_id=self.default_pub.pub_id)
+        self.client.add_and_flush(feature_cvterm)
+        self.client.add_and_flush(sequence.FeatureCvTermProp(feature_cvterm_id=feature_cvterm.feature_cvterm_id,
+                                                             type_id=self.default_cvterm.cvterm_id, value="v1"))
+        self.client.add_and_flush(sequence.FeatureCvTermDbxRef(feature_cvterm_id=feature_cvterm.feature_cvterm_id,
+                                                               dbxref_id=self.default_dbxref.dbxref_id))
+        organism_id = self.default_organism.organism_id
+        db_id = self.default_db.db_id
+
+        annotations = self.client.query_feature_cvterm_annotations_by_organism(organism_id, db_id).all()
+        self.assertEqual(len(annotations), 1)
+        self.assertEqual(annotations[0].feature_cvterm_id, feature_cvterm.feature_cvterm_id)
+        self.assertEqual(annotations[0].namespace, self.default_cv.name)
+        self.assertEqual(annotations[0].pub, self.default_pub.uniquename)
+        properties = self.client.query_feature_cvterm_properties_by_organism(organism_id, db_id).all()
+        self.assertEqual(properties, [(feature_cvterm.feature_cvterm_id, self.default_cvterm.name, "v1")])
+        dbxrefs = self.client.query_feature_cvterm_dbxrefs_by_organism(organism_id, db_id).all()
+        self.assertEqual(dbxrefs, [(feature_cvterm.feature_cvterm_id, self.default_db.name,
+                                    self.default_dbxref.accession)])
+        self.assertEqual(self.client.query_feature_cvterm_secondary_pubs_by_organism(organism_id, db_id).all(), [])
+        self.assertEqual(self.client.query_feature_cvterm_dbxrefs_by_organism(organism_id + 1, db_id).all(), [])
+
     def insert_default_entries(self):
         # Inserts CV terms needed as basis for virtually all tests
         default_db = general.Db(name="defaultdb")
@@ -437,6 +534,12 @@ class TestChadoClient(unittest.TestCase):
         all_uniquenames = self.client._load_feature_names(self.default_organism)
         self.assertIn("testname", all_uniquenames)
 
+    def test_load_organism_names(self):
+        # Tests the function loading the abbreviations of all organisms from a database
+        all_organism_names = self.client._load_organism_names()
+        self.assertIn(self.default_organism.abbreviation, all_organism_names)
+        self.assertEqual(all_organism_names, sorted(all_organism_names))
+
     def test_handle_organism(self):
         # Tests the function importing an organism to the database
         # Insert an organism and check this is successful
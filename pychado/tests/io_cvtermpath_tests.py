@@ -0,0 +1,101 @@
+import unittest
+from .. import dbutils, utils
+from ..io import iobase, cvtermpath, essentials
+from ..orm import base, general, cv
+
+
+class TestTransitiveClosure(unittest.TestCase):
+    """Tests the computation of the transitive closure of relationships between integer-indexed nodes"""
+
+    def test_build_adjacency(self):
+        # Tests the conversion of an edge list into adjacency arrays
+        offsets, objects, types = cvtermpath.build_adjacency(4, [(2, 0, 1), (1, 0, 0), (2, 1, 0)])
+        self.assertEqual(list(offsets), [0, 0, 1, 3, 3])
+        self.assertEqual(list(objects), [0, 0, 1])
+        self.assertEqual(list(types), [0, 1, 0])
+
+    def test_compose_path_types(self):
+        # Tests the type of a path composed of two paths, with type 0 being transparent
+        self.assertEqual(cvtermpath.compose_path_types(0, 0, 0), 0)
+        self.assertEqual(cvtermpath.compose_path_types(0, 1, 0), 1)
+        self.assertEqual(cvtermpath.compose_path_types(1, 0, 0), 1)
+        self.assertEqual(cvtermpath.compose_path_types(1, 1, 0), 1)
+        self.assertEqual(cvtermpath.compose_path_types(1, 2, 0), -1)
+        self.assertEqual(cvtermpath.compose_path_types(1, 2, -1), -1)
+
+    def test_compute_transitive_closure(self):
+        # Tests the paths of a DAG with 'is_a' (0), 'part_of' (1) and 'regulates' (2) edges
+        edges = [(1, 0, 0), (2, 1, 0), (3, 1, 1), (4, 2, 0), (4, 3, 0), (5, 4, 2), (4, 0, 1)]
+        paths = set(cvtermpath.compute_transitive_closure(6, edges, 3, 0))
+        self.assertEqual(paths, {(1, 0, 0, 1), (2, 1, 0, 1), (2, 0, 0, 2), (3, 1, 1, 1), (3, 0, 1, 2),
+                                 (4, 2, 0, 1), (4, 1, 0, 2), (4, 0, 0, 3), (4, 3, 0, 1), (4, 1, 1, 2), (4, 0, 1, 1),
+                                 (5, 4, 2, 1), (5, 2, 2, 2), (5, 1, 2, 3), (5, 0, 2, 4), (5, 3, 2, 2)})
+
+    def test_compute_transitive_closure_with_cycle(self):
+        # Tests that cycles and the nodes below them are handled
+        edges = [(1, 0, 0), (2, 1, 0), (1, 2, 0), (3, 2, 0), (3, 3, 0)]
+        paths = set(cvtermpath.compute_transitive_closure(4, edges, 1, 0))
+        self.assertEqual(paths, {(1, 0, 0, 1), (1, 2, 0, 1), (2, 1, 0, 1), (2, 0, 0, 2), (3, 2, 0, 1),
+                                 (3, 1, 0, 2), (3, 0, 0, 3)})
+
+
+class TestCvTermPathClient(unittest.TestCase):
+    """Tests filling the 'cvtermpath' table of a database"""
+
+    connection_parameters = utils.parse_yaml(dbutils.default_configuration_file())
+    connection_uri = dbutils.random_database_uri(connection_parameters)
+
+    @classmethod
+    def setUpClass(cls):
+        # Creates a database, establishes a connection, creates tables and populates them with essential entries
+        dbutils.create_database(cls.connection_uri)
+        schema_metadata = base.PublicBase.metadata
+        essentials_client = essentials.EssentialsClient(cls.connection_uri)
+        schema_metadata.create_all(essentials_client.engine, tables=schema_metadata.sorted_tables)
+        essentials_client.load()
+        cls.client = cvtermpath.CvTermPathClient(cls.connection_uri)
+
+    @classmethod
+    def tearDownClass(cls):
+        # Drops the database
+        del cls.client
+        dbutils.drop_database(cls.connection_uri, True)
+
+    def test_compute(self):
+        # Tests that the paths of a vocabulary are inserted, and updated after a change of the relationships
+        db_entry = self.client.find_or_insert(general.Db, name="testdb")
+        cv_entry = self.client.find_or_insert(cv.Cv, name="testcv")
+        cvterm_ids = []
+        for accession in ["root", "middle", "leaf"]:
+            dbxref_entry = self.client.find_or_insert(general.DbxRef, db_id=db_entry.db_id, accession=accession)
+            cvterm_entry = self.client.find_or_insert(cv.CvTerm, cv_id=cv_entry.cv_id, name=accession,
+                                                      dbxref_id=dbxref_entry.dbxref_id)
+            cvterm_ids.append(cvterm_entry.cvterm_id)
+        is_a_id = self.client._is_a_term.cvterm_id
+        self.client.find_or_insert(cv.CvTermRelationship, subject_id=cvterm_ids[1], object_id=cvterm_ids[0],
+                                   type_id=is_a_id)
+        leaf_relationship = self.client.find_or_insert(cv.CvTermRelationship, subject_id=cvterm_ids[2],
+                                                       object_id=cvterm_ids[1], type_id=is_a_id)
+        self.client.session.commit()
+
+        self.client.compute("testcv")
+        paths = self.client.query_all(cv.CvTermPath, cv_id=cv_entry.cv_id)
+        self.assertEqual(set((path.subject_id, path.object_id, path.type_id, path.pathdistance) for path in paths),
+                         {(cvterm_ids[1], cvterm_ids[0], is_a_id, 1), (cvterm_ids[2], cvterm_ids[1], is_a_id, 1),
+                          (cvterm_ids[2], cvterm_ids[0], is_a_id, 2)})
+        root_path_id = [path.cvtermpath_id for path in paths if path.subject_id == cvterm_ids[1]][0]
+
+        leaf_relationship.object_id = cvterm_ids[0]
+        self.client.session.commit()
+        self.client.compute("testcv")
+        paths = self.client.query_all(cv.CvTermPath, cv_id=cv_entry.cv_id)
+        self.assertEqual(set((path.subject_id, path.object_id, path.type_id, path.pathdistance) for path in paths),
+                         {(cvterm_ids[1], cvterm_ids[0], is_a_id, 1), (cvterm_ids[2], cvterm_ids[0], is_a_id, 1)})
+        self.assertIn(root_path_id, [path.cvtermpath_id for path in paths])
+
+        with self.assertRaises(iobase.DatabaseError):
+            self.client.compute("nonexistent_cv")
+
+
+if __name__ == '__main__':
+    unittest.main(buffer=True)
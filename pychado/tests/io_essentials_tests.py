@@ -78,6 +78,8 @@ class TestEssentials(unittest.TestCase):
         self.assertIsNotNone(symmetric_cvterm.cvterm_id)
         self.assertEqual(symmetric_cvterm.cv_id, property_type_cv.cv_id)
         self.assertEqual(symmetric_cvterm.is_relationshiptype, 0)
+        data_version_cvterm = self.client.query_first(cv.CvTerm, name="data_version")      # type: cv.CvTerm
+        self.assertEqual(data_version_cvterm.cv_id, property_type_cv.cv_id)
         disjoint_cvterm = self.client.query_first(cv.CvTerm, name="disjoint_from")          # type: cv.CvTerm
         self.assertIsNotNone(disjoint_cvterm.cvterm_id)
         self.assertEqual(disjoint_cvterm.cv_id, property_type_cv.cv_id)
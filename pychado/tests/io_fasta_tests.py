@@ -1,9 +1,54 @@
+import os
+import gzip
+import shutil
+import tempfile
+import multiprocessing
 import unittest.mock
 from Bio import SeqIO, Seq
-from ..io import fasta
+from .. import utils
+from ..io import fasta, packing
 from ..orm import cv, organism, sequence
 
 
+class TestFastaParser(unittest.TestCase):
+    """Tests the lightweight FASTA parser"""
+
+    modules_dir = os.path.dirname(os.path.abspath(fasta.__file__))
+    data_dir = os.path.abspath(os.path.join(modules_dir, '..', 'tests', 'data'))
+
+    def test_parse_fasta(self):
+        # Tests that the parser yields the same records as Biopython
+        filename = os.path.join(self.data_dir, "fasta_only.fa")
+        records = list(fasta.parse_fasta(filename))
+        reference_records = list(SeqIO.parse(filename, "fasta"))
+        self.assertEqual(len(records), len(reference_records))
+        for record, reference_record in zip(records, reference_records):
+            self.assertEqual(record.id, reference_record.id)
+            self.assertEqual(record.description, reference_record.description)
+            self.assertEqual(record.seq, str(reference_record.seq))
+
+    def test_parse_fasta_gzipped(self):
+        # Tests that the parser reads gzipped input
+        filename = tempfile.mkstemp(suffix=".fa.gz")[1]
+        with gzip.open(filename, "wt") as f:
+            f.write(">seq1 first | SO=contig\nACGT\nAC\n>seq2\n\nTTT\n")
+        records = list(fasta.parse_fasta(filename))
+        os.remove(filename)
+        self.assertEqual(len(records), 2)
+        self.assertEqual(records[0], fasta.FastaRecord(id="seq1", description="seq1 first | SO=contig", seq="ACGTAC"))
+        self.assertEqual(records[1], fasta.FastaRecord(id="seq2", description="seq2", seq="TTT"))
+
+    def test_create_fasta_record(self):
+        # Tests the function creating a lightweight FASTA record
+        record = fasta.create_fasta_record("testid testdescription", ["ACG T", "GG"])
+        self.assertEqual(record.id, "testid")
+        self.assertEqual(record.description, "testid testdescription")
+        self.assertEqual(record.seq, "ACGTGG")
+        record = fasta.create_fasta_record("", [])
+        self.assertEqual(record.id, "")
+        self.assertEqual(record.seq, "")
+
+
 class TestFastaImport(unittest.TestCase):
     """Tests various functions used to load a FASTA file into a database"""
 
@@ -21,8 +66,8 @@ class TestFastaImport(unittest.TestCase):
 
     def setUp(self):
         # Create a default FASTA record
-        self.default_fasta_record = SeqIO.SeqRecord(seq="ACTGAAC", id="testid", name="testname",
-                                                    description="sequence_name | organism=testorganism | SO=chromosome")
+        self.default_fasta_record = fasta.FastaRecord(
+            seq="ACTGAAC", id="testid", description="sequence_name | organism=testorganism | SO=chromosome")
 
     @unittest.mock.patch("pychado.io.fasta.FastaImportClient._handle_feature")
     @unittest.mock.patch("pychado.io.fasta.FastaImportClient._create_feature")
@@ -73,13 +118,16 @@ class TestFastaImport(unittest.TestCase):
         self.assertEqual(feature_entry.uniquename, "testid")
         self.assertEqual(feature_entry.residues, "ACTGAAC")
         self.assertEqual(feature_entry.seqlen, 7)
+        self.assertEqual(feature_entry.md5checksum, utils.md5_checksum("ACTGAAC"))
 
     def test_extract_type(self):
         # Tests the function extracting the sequence type from a FASTA record
         sequence_type = self.client._extract_type(self.default_fasta_record)
         self.assertEqual(sequence_type, "chromosome")
-        self.default_fasta_record.description = ""
-        sequence_type = self.client._extract_type(self.default_fasta_record)
+        lightweight_record = fasta.FastaRecord(id="testid", description="testid | SO=contig", seq="ACGT")
+        sequence_type = self.client._extract_type(lightweight_record)
+        self.assertEqual(sequence_type, "contig")
+        sequence_type = self.client._extract_type(self.default_fasta_record._replace(description=""))
         self.assertIsNone(sequence_type)
 
 
@@ -156,6 +204,26 @@ class TestFastaExport(unittest.TestCase):
         residues = self.client._extract_nucleotide_sequence(feature_entry, srcfeature_entries)
         self.assertIsNone(residues)
 
+    def test_slice_residues_with_cache(self):
+        # Tests the extraction of a part of a sequence from the memory-mapped sequence cache
+        cache_directory = tempfile.mkdtemp()
+        client = fasta.FastaExportClient("testuri", test_environment=True)
+        client.use_sequence_cache(cache_directory, 1000)
+        srcfeature_entry = sequence.Feature(organism_id=1, type_id=2, uniquename="chr", residues="acTGGTAA",
+                                            md5checksum="abc", feature_id=34)
+
+        residues = client._slice_residues(srcfeature_entry, 1, 4)
+        self.assertEqual(residues, "CTG")
+        self.assertTrue(os.path.exists(os.path.join(cache_directory, "1_34_abc.seq")))
+        srcfeature_entry.residues = "XXXXXXXX"
+        residues = client._slice_residues(srcfeature_entry, 0, 2)
+        self.assertEqual(residues, "AC")
+        residues = client._slice_residues(srcfeature_entry, 1, 300)
+        self.assertIsNone(residues)
+        client.sequence_cache.close()
+        shutil.rmtree(cache_directory)
+
+
     @unittest.mock.patch("pychado.io.fasta.FastaExportClient.query_first")
     @unittest.mock.patch("pychado.io.fasta.FastaExportClient._load_cvterm")
     def test_extract_genome_version(self, mock_load: unittest.mock.Mock, mock_query: unittest.mock.Mock):
@@ -193,17 +261,171 @@ class TestFastaExport(unittest.TestCase):
         mock_sequence.assert_called_with("AGCT")
         mock_record.assert_called_with("seq", id="test", name="test", description="desc")
 
+    @unittest.mock.patch("pychado.io.fasta.FastaExportClient._restore_packed_residues")
     @unittest.mock.patch("pychado.io.fasta.FastaExportClient.query_features_by_property_type")
-    def test_extract_srcfeatures_by_type(self, mock_query: unittest.mock.Mock):
-        # Tests that the feature table is only queried for certain feature types
+    def test_extract_top_level_features(self, mock_query: unittest.mock.Mock, mock_restore: unittest.mock.Mock):
+        # Tests that the top-level features are correctly queried
         self.assertIs(mock_query, self.client.query_features_by_property_type)
+        self.assertIs(mock_restore, self.client._restore_packed_residues)
 
         organism_entry = organism.Organism(genus="testgenus", species="testspecies", organism_id=44)
-        self.client._extract_srcfeatures_by_type(organism_entry, "contigs")
-        mock_query.assert_not_called()
-
-        self.client._extract_srcfeatures_by_type(organism_entry, "genes")
+        self.client._extract_top_level_features(organism_entry)
         mock_query.assert_called_with(44, 91)
+        mock_query.return_value.options.assert_not_called()
+        mock_restore.assert_called_with(mock_query.return_value.all.return_value)
+
+        mock_restore.reset_mock()
+        self.client._extract_top_level_features(organism_entry, False)
+        mock_query.return_value.options.assert_called()
+        mock_restore.assert_not_called()
+
+    @unittest.mock.patch("pychado.io.packing.load_packed_residues")
+    def test_restore_packed_residues(self, mock_load: unittest.mock.Mock):
+        # Tests that residues of features are filled in from the packed side table
+        self.assertIs(mock_load, packing.load_packed_residues)
+        feature_entries = [sequence.Feature(organism_id=1, type_id=2, uniquename="chr1", residues="ACGT", seqlen=4,
+                                            feature_id=11),
+                           sequence.Feature(organism_id=1, type_id=2, uniquename="chr2", seqlen=4, feature_id=12),
+                           sequence.Feature(organism_id=1, type_id=2, uniquename="chr3", feature_id=13)]
+        mock_load.return_value = {12: "TTTT"}
+        with unittest.mock.patch.object(self.client, "session", create=True) as mock_session:
+            self.client._restore_packed_residues(feature_entries)
+            mock_load.assert_called_with(mock_session, [12])
+        self.assertEqual([feature_entry.residues for feature_entry in feature_entries], ["ACGT", "TTTT", None])
+
+    @unittest.mock.patch("pychado.io.fasta.FastaExportClient._create_fasta_record")
+    @unittest.mock.patch("pychado.io.fasta.FastaExportClient._extract_residues_by_type")
+    @unittest.mock.patch("pychado.io.fasta.FastaExportClient.query_first")
+    @unittest.mock.patch("pychado.io.fasta.FastaExportClient._extract_features_by_type")
+    def test_create_fasta_records(self, mock_extract: unittest.mock.Mock, mock_query: unittest.mock.Mock,
+                                  mock_residues: unittest.mock.Mock, mock_record: unittest.mock.Mock):
+        # Tests the function creating the FASTA records for a sequence type
+        self.assertIs(mock_extract, self.client._extract_features_by_type)
+        self.assertIs(mock_query, self.client.query_first)
+        self.assertIs(mock_residues, self.client._extract_residues_by_type)
+        self.assertIs(mock_record, self.client._create_fasta_record)
+
+        organism_entry = organism.Organism(genus="testgenus", species="testspecies", organism_id=44)
+        top_level_entries = [sequence.Feature(organism_id=44, type_id=2, uniquename="chr2", feature_id=12),
+                             sequence.Feature(organism_id=44, type_id=2, uniquename="chr1", feature_id=11,
+                                              is_obsolete=True)]
+        mock_residues.return_value = "ACGT"
+        mock_record.side_effect = lambda feature, *args: SeqIO.SeqRecord("ACGT", id=feature.uniquename)
+
+        records = self.client._create_fasta_records(organism_entry, "contigs", top_level_entries, "v1", "", False)
+        mock_extract.assert_not_called()
+        mock_residues.assert_called_with(top_level_entries[1], [], "contigs")
+        self.assertEqual([record.id for record in records], ["chr2"])
+
+        records = self.client._create_fasta_records(organism_entry, "contigs", top_level_entries, "v1", "", True)
+        self.assertEqual([record.id for record in records], ["chr1", "chr2"])
+
+        gene_entry = sequence.Feature(organism_id=44, type_id=41, uniquename="gene1", feature_id=21)
+        mock_extract.return_value = [gene_entry]
+        records = self.client._create_fasta_records(organism_entry, "genes", top_level_entries, "v1", "", False)
+        mock_extract.assert_called_with(organism_entry, "genes")
+        mock_residues.assert_called_with(gene_entry, top_level_entries, "genes")
+        self.assertEqual([record.id for record in records], ["gene1"])
+
+    @unittest.mock.patch("pychado.io.fasta.FastaExportClient._create_protein_fasta_records")
+    @unittest.mock.patch("pychado.io.fasta.FastaExportClient._extract_features_by_type")
+    def test_create_fasta_records_proteins(self, mock_extract: unittest.mock.Mock,
+                                           mock_proteins: unittest.mock.Mock):
+        # Tests that protein records are created from a separate projected query
+        self.assertIs(mock_extract, self.client._extract_features_by_type)
+        self.assertIs(mock_proteins, self.client._create_protein_fasta_records)
+        organism_entry = organism.Organism(genus="testgenus", species="testspecies", organism_id=44)
+
+        self.client._create_fasta_records(organism_entry, "proteins", [], "v1", "testrelease", True)
+        mock_extract.assert_not_called()
+        mock_proteins.assert_called_with(organism_entry, "v1", "testrelease", True)
+
+    @unittest.mock.patch("pychado.io.fasta.FastaExportClient.query_protein_sequences")
+    def test_create_protein_fasta_records(self, mock_query: unittest.mock.Mock):
+        # Tests the creation of protein records from a projected query
+        self.assertIs(mock_query, self.client.query_protein_sequences)
+        organism_entry = organism.Organism(genus="testgenus", species="testspecies", organism_id=44)
+        mock_query.return_value = [("prot2", "name2", "polypeptide", "MAAK*", False),
+                                   ("prot1", None, "polypeptide", "MKKA", False),
+                                   ("prot3", None, "polypeptide", "MKKA", True),
+                                   ("prot4", None, "polypeptide", "AKKA", False)]
+
+        records = self.client._create_protein_fasta_records(organism_entry, "v1", "testrelease", False)
+        mock_query.assert_called_with(44, 41, 91, 92)
+        self.assertEqual([record.id for record in records], ["prot1", "prot2"])
+        self.assertEqual(str(records[0].seq), "MKKA")
+        self.assertEqual(records[1].description, "| organism=testgenus%20testspecies | sequence_type=polypeptide | "
+                                                 "sequence_name=name2 | genome_version=v1 | release=testrelease")
+
+        # The header must be the same as the one created for other sequence types
+        feature_entry = sequence.Feature(organism_id=44, type_id=43, uniquename="prot2", name="name2")
+        type_entry = cv.CvTerm(cv_id=4, dbxref_id=43, name="polypeptide", cvterm_id=43)
+        self.assertEqual(records[1].description, self.client._create_fasta_attributes(
+            organism_entry, feature_entry, type_entry, "v1", "testrelease"))
+
+        records = self.client._create_protein_fasta_records(organism_entry, "", "", True)
+        self.assertEqual([record.id for record in records], ["prot1", "prot2", "prot3"])
+        self.assertEqual(records[0].description, "| organism=testgenus%20testspecies | sequence_type=polypeptide")
+
+    @unittest.mock.patch("Bio.SeqIO.write")
+    @unittest.mock.patch("pychado.io.fasta.FastaExportClient._create_fasta_records")
+    @unittest.mock.patch("pychado.io.fasta.FastaExportClient._extract_top_level_features")
+    @unittest.mock.patch("pychado.io.fasta.FastaExportClient._extract_genome_version")
+    @unittest.mock.patch("pychado.io.fasta.FastaExportClient._load_organism")
+    def test_export(self, mock_organism: unittest.mock.Mock, mock_version: unittest.mock.Mock,
+                    mock_top_level: unittest.mock.Mock, mock_records: unittest.mock.Mock,
+                    mock_write: unittest.mock.Mock):
+        # Tests the export of one or several sequence types in a single pass
+        self.assertIs(mock_organism, self.client._load_organism)
+        self.assertIs(mock_version, self.client._extract_genome_version)
+        self.assertIs(mock_top_level, self.client._extract_top_level_features)
+        self.assertIs(mock_records, self.client._create_fasta_records)
+        self.assertIs(mock_write, SeqIO.write)
+
+        organism_entry = organism.Organism(genus="testgenus", species="testspecies", organism_id=44)
+        mock_organism.return_value = organism_entry
+        mock_version.return_value = "v1"
+        mock_top_level.return_value = ["chr1"]
+        mock_records.return_value = ["record"]
+
+        self.client.export("out.fa", "testorganism", "proteins", "testrelease")
+        mock_organism.assert_called_with("testorganism")
+        mock_top_level.assert_not_called()
+        mock_records.assert_called_with(organism_entry, "proteins", [], "v1", "testrelease", False)
+        mock_write.assert_called_with(["record"], "out.fa", "fasta")
+
+        mock_organism.reset_mock()
+        mock_records.reset_mock()
+        mock_write.reset_mock()
+        self.client.export("out.fa", "testorganism", "contigs,genes,proteins", "testrelease")
+        mock_organism.assert_called_once_with("testorganism")
+        mock_top_level.assert_called_once_with(organism_entry, True)
+        mock_records.assert_any_call(organism_entry, "contigs", ["chr1"], "v1", "testrelease", False)
+        mock_records.assert_any_call(organism_entry, "genes", ["chr1"], "v1", "testrelease", False)
+        mock_records.assert_any_call(organism_entry, "proteins", ["chr1"], "v1", "testrelease", False)
+        mock_write.assert_any_call(["record"], "out.contigs.fa", "fasta")
+        mock_write.assert_any_call(["record"], "out.genes.fa", "fasta")
+        mock_write.assert_any_call(["record"], "out.proteins.fa", "fasta")
+
+    def test_split_sequence_types(self):
+        # Tests the function splitting a comma-separated list of sequence types
+        self.assertEqual(fasta.split_sequence_types("genes"), ["genes"])
+        self.assertEqual(fasta.split_sequence_types("contigs, genes,contigs"), ["contigs", "genes"])
+
+    @unittest.mock.patch("multiprocessing.Pool")
+    @unittest.mock.patch("pychado.io.fasta.FastaExportClient")
+    def test_export_all_organisms(self, mock_client: unittest.mock.Mock, mock_pool: unittest.mock.Mock):
+        # Tests the export of sequences of all organisms with a pool of processes
+        self.assertIs(mock_client, fasta.FastaExportClient)
+        self.assertIs(mock_pool, multiprocessing.Pool)
+        mock_client.return_value._load_organism_names.return_value = ["org1", "org2"]
+
+        fasta.export_all_organisms("testuri", False, "out.fa", "genes,proteins", "testrelease", False, 2)
+        mock_client.assert_called_with("testuri", False)
+        mock_pool.assert_called_with(2)
+        mock_pool.return_value.__enter__.return_value.starmap.assert_called_with(fasta.export_organism, [
+            ("testuri", False, "out.org1.fa", "org1", "genes,proteins", "testrelease", False, None, 0),
+            ("testuri", False, "out.org2.fa", "org2", "genes,proteins", "testrelease", False, None, 0)])
 
     @unittest.mock.patch("pychado.io.fasta.FastaExportClient.query_protein_features")
     @unittest.mock.patch("pychado.io.fasta.FastaExportClient.query_features_by_property_type")
@@ -311,3 +533,103 @@ class TestFastaExport(unittest.TestCase):
         self.assertEqual(pair, "release=2019-01")
         pair = self.client._release_key_value_pair("2019:01")
         self.assertEqual(pair, "release=2019%3A01")
+
+
+class TestSequenceCache(unittest.TestCase):
+    """Tests the cache of memory-mapped sequences"""
+
+    def setUp(self):
+        self.cache_directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_directory)
+
+    def test_get(self):
+        # Tests that sequences are written to the cache and read from it
+        cache = fasta.SequenceCache(self.cache_directory, 100)
+        feature_entry = sequence.Feature(organism_id=1, type_id=2, uniquename="chr", residues="ACGT",
+                                         md5checksum="abc", feature_id=3)
+        mapped_residues = cache.get(feature_entry)
+        self.assertEqual(mapped_residues[:], b"ACGT")
+        self.assertIs(cache.get(feature_entry), mapped_residues)
+        cache.close()
+
+        other_cache = fasta.SequenceCache(self.cache_directory, 100)
+        feature_entry.residues = None
+        self.assertEqual(other_cache.get(feature_entry)[1:3], b"CG")
+        feature_entry.md5checksum = "def"
+        self.assertIsNone(other_cache.get(feature_entry))
+        other_cache.close()
+
+    def test_get_with_concurrent_eviction(self):
+        # Tests that a sequence remains accessible if its file is removed, and that a missing file is written anew
+        cache = fasta.SequenceCache(self.cache_directory, 100)
+        feature_entry = sequence.Feature(organism_id=1, type_id=2, uniquename="chr", residues="ACGT",
+                                         md5checksum="abc", feature_id=3)
+        mapped_residues = cache.get(feature_entry)
+        filename = os.path.join(self.cache_directory, "1_3_abc.seq")
+        os.remove(filename)
+        self.assertEqual(mapped_residues[:], b"ACGT")
+
+        other_cache = fasta.SequenceCache(self.cache_directory, 100)
+        self.assertEqual(other_cache.get(feature_entry)[:], b"ACGT")
+        self.assertTrue(os.path.exists(filename))
+        self.assertEqual([name for name in os.listdir(self.cache_directory)], ["1_3_abc.seq"])
+        cache.close()
+        other_cache.close()
+
+    def test_unmap(self):
+        # Tests that the least recently used memory maps are closed if they exceed the maximum size of the cache
+        cache = fasta.SequenceCache(self.cache_directory, 10)
+        for feature_id in range(1, 4):
+            feature_entry = sequence.Feature(organism_id=1, type_id=2, uniquename="chr", residues="ACGTAC",
+                                             md5checksum="abc", feature_id=feature_id)
+            cache.get(feature_entry)
+        self.assertEqual(list(cache.mapped_sequences), ["1_3_abc"])
+        self.assertEqual(cache.mapped_size, 6)
+        cache.close()
+        self.assertEqual(cache.mapped_size, 0)
+
+    def test_cache_key(self):
+        # Tests the creation of keys for the cache
+        feature_entry = sequence.Feature(organism_id=1, type_id=2, uniquename="chr", md5checksum="abc", feature_id=3)
+        self.assertEqual(fasta.SequenceCache.cache_key(feature_entry), "1_3_abc")
+        feature_entry.md5checksum = None
+        self.assertIsNone(fasta.SequenceCache.cache_key(feature_entry))
+        feature_entry.residues = "ACGT"
+        self.assertEqual(fasta.SequenceCache.cache_key(feature_entry), "1_3_" + utils.md5_checksum("ACGT"))
+
+    def test_get_with_changed_residues(self):
+        # Tests that a cached sequence is not reused after the residues of a feature have changed
+        cache = fasta.SequenceCache(self.cache_directory, 100)
+        feature_entry = sequence.Feature(organism_id=1, type_id=2, uniquename="chr", residues="ACGT", feature_id=3)
+        self.assertEqual(cache.get(feature_entry)[:], b"ACGT")
+        cache.close()
+
+        other_cache = fasta.SequenceCache(self.cache_directory, 100)
+        feature_entry.residues = "TTGCA"
+        self.assertEqual(other_cache.get(feature_entry)[:], b"TTGCA")
+        other_cache.close()
+
+        imported_entry = fasta.FastaImportClient._create_feature(fasta.FastaRecord(
+            id="chr", description="chr", seq="GGCC"), 1, 2)
+        imported_entry.feature_id = 3
+        other_cache = fasta.SequenceCache(self.cache_directory, 100)
+        self.assertEqual(other_cache.get(imported_entry)[:], b"GGCC")
+        imported_entry.residues = None
+        self.assertEqual(other_cache.get(imported_entry)[:], b"GGCC")
+        other_cache.close()
+
+    def test_evict(self):
+        # Tests that the least recently used files are removed if the cache exceeds its maximum size
+        cache = fasta.SequenceCache(self.cache_directory, 10)
+        for feature_id in range(1, 4):
+            feature_entry = sequence.Feature(organism_id=1, type_id=2, uniquename="chr", residues="ACGTAC",
+                                             md5checksum="abc", feature_id=feature_id)
+            cache.get(feature_entry)
+            os.utime(os.path.join(self.cache_directory, "1_" + str(feature_id) + "_abc.seq"), (feature_id, feature_id))
+        cache.close()
+        cache._evict()
+        self.assertFalse(os.path.exists(os.path.join(self.cache_directory, "1_1_abc.seq")))
+        self.assertFalse(os.path.exists(os.path.join(self.cache_directory, "1_2_abc.seq")))
+        self.assertTrue(os.path.exists(os.path.join(self.cache_directory, "1_3_abc.seq")))
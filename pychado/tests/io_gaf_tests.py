@@ -1,15 +1,78 @@
 import unittest.mock
+import collections
+import multiprocessing
 import os
+import gzip
 import tempfile
 import filecmp
 from .. import utils
-from ..io import iobase, gaf
+from ..io import iobase, gaf, lookup
 from ..orm import general, cv, pub, organism, sequence
 
 modules_dir = os.path.dirname(os.path.abspath(gaf.__file__))
 data_dir = os.path.abspath(os.path.join(modules_dir, '..', 'tests', 'data'))
 
 
+class TestGAFReader(unittest.TestCase):
+    """Tests the lightweight reader for GAF files"""
+
+    gaf_lines = "!gaf-version: 2.1\n" \
+                "!generated-by: testdb\n" \
+                "testdb\tgene1\tgenename\tNOT|colocalizes_with\tGO:0001\tPMID:1|GO_REF:0001\tIDA\t\tC\t" \
+                "someproduct\ts1|s2\tgene\ttaxon:123|taxon:456\t20200101\tsomedb\t\t\n" \
+                "\n" \
+                "testdb\tgene2\t\t\tGO:0002\tGO_REF:0002\tIEA\tInterPro:IPR1\tP\t\t\tgene\ttaxon:123\t" \
+                "20200102\tsomedb\tpart_of(GO:0003)\t\n"
+
+    def test_parse_gaf(self):
+        # Tests that the parser yields the same records as Biopython, also for gzipped input
+        filename = tempfile.mkstemp(suffix=".gaf.gz")[1]
+        with gzip.open(filename, "wt") as f:
+            f.write(self.gaf_lines)
+        records = list(gaf.parse_gaf(filename))
+        reference_records = list(gaf.parse_gaf_with_biopython(filename))
+        os.remove(filename)
+        self.assertEqual(len(records), 2)
+        self.assertEqual(records, reference_records)
+        self.assertEqual(records[0]["Qualifier"], ["NOT", "colocalizes_with"])
+        self.assertEqual(records[1]["Annotation_Extension"], "part_of(GO:0003)")
+
+    def test_parse_gaf_version(self):
+        # Tests that the parser reads GAF 2.2 files, which Biopython rejects, and fails for unknown versions
+        filename = tempfile.mkstemp()[1]
+        with open(filename, "w") as f:
+            f.write(self.gaf_lines.replace("2.1", "2.2"))
+        self.assertEqual(len(list(gaf.parse_gaf(filename))), 2)
+        with open(filename, "w") as f:
+            f.write(self.gaf_lines.replace("2.1", "3.0"))
+        with self.assertRaises(ValueError):
+            list(gaf.parse_gaf(filename))
+        os.remove(filename)
+
+    def test_open_gaf_file(self):
+        # Tests that plain and gzipped GAF files are opened for reading
+        filename = tempfile.mkstemp(suffix=".gaf.gz")[1]
+        with gzip.open(filename, "wt") as f:
+            f.write(self.gaf_lines)
+        with gaf.open_gaf_file(filename) as f:
+            self.assertEqual(f.readline(), "!gaf-version: 2.1\n")
+        os.remove(filename)
+        filename = tempfile.mkstemp(suffix=".gaf")[1]
+        with open(filename, "w") as f:
+            f.write(self.gaf_lines)
+        with gaf.open_gaf_file(filename) as f:
+            self.assertEqual(f.readline(), "!gaf-version: 2.1\n")
+        os.remove(filename)
+
+    def test_check_gaf_version(self):
+        # Tests the validation of the GAF version in a header line
+        gaf.check_gaf_version("!gaf-version: 1.0\n")
+        gaf.check_gaf_version("!gaf-version: 2.2\n")
+        gaf.check_gaf_version("!generated-by: testdb\n")
+        with self.assertRaises(ValueError):
+            gaf.check_gaf_version("!gaf-version: 3.0\n")
+
+
 class TestGAFImport(unittest.TestCase):
     """Tests various functions used to load a GFF file into a database"""
 
@@ -34,6 +97,83 @@ class TestGAFImport(unittest.TestCase):
                                    'DB_Object_Type': 'transcript', 'Taxon_ID': ['testtaxon'],
                                    'Date': 'testdate', 'Assigned_By': 'assigning_db'}
 
+    def test_group_gaf_records(self):
+        # Tests the function grouping GAF records by feature
+        gaf_records = [{"DB_Object_ID": name} for name in ["f1", "f1", "f2", "", "f3", "f1", "f4"]]
+        batches = list(self.client._group_gaf_records(gaf_records, 2))
+        self.assertEqual(len(batches), 3)
+        self.assertEqual(list(batches[0].keys()), ["f1", "f2"])
+        self.assertEqual(len(batches[0]["f1"]), 2)
+        self.assertEqual(list(batches[1].keys()), ["f3", "f1"])
+        self.assertEqual(list(batches[2].keys()), ["f4"])
+
+    def test_merge_synonyms(self):
+        # Tests the function combining the synonyms of several GAF records
+        merged_record = self.client._merge_synonyms([{"Synonym": ["S1", "S2"]}, {"Synonym": []},
+                                                     {"Synonym": ["S2", "S3"]}])
+        self.assertEqual(merged_record, {"Synonym": ["S1", "S2", "S3"]})
+
+    def test_add_new_entries(self):
+        # Tests the function keeping lists of existing entries up to date
+        existing_entry = sequence.FeatureCvTermPub(feature_cvterm_id=1, pub_id=2)
+        new_entry = sequence.FeatureCvTermPub(feature_cvterm_id=1, pub_id=3)
+        existing_entries = [existing_entry]
+        self.client._add_new_entries(existing_entries, [existing_entry, None, new_entry])
+        self.assertEqual(existing_entries, [existing_entry, new_entry])
+
+    @unittest.mock.patch("pychado.io.gaf.GAFImportClient._handle_publications")
+    @unittest.mock.patch("pychado.io.gaf.GAFImportClient._handle_crossrefs")
+    @unittest.mock.patch("pychado.io.gaf.GAFImportClient._handle_properties")
+    @unittest.mock.patch("pychado.io.gaf.GAFImportClient._handle_ontology_term")
+    @unittest.mock.patch("pychado.io.gaf.GAFImportClient._handle_product_term")
+    @unittest.mock.patch("pychado.io.gaf.GAFImportClient._query_entries_by_key")
+    @unittest.mock.patch("pychado.io.gaf.GAFImportClient._handle_synonyms")
+    @unittest.mock.patch("pychado.io.gaf.GAFImportClient._handle_name")
+    @unittest.mock.patch("pychado.io.gaf.GAFImportClient._extract_gene_of_feature")
+    @unittest.mock.patch("pychado.io.gaf.GAFImportClient._extract_requested_feature")
+    @unittest.mock.patch("pychado.io.gaf.GAFImportClient._load_features")
+    def test_load_gaf_batch(self, mock_load: unittest.mock.Mock, mock_requested: unittest.mock.Mock,
+                            mock_gene: unittest.mock.Mock, mock_name: unittest.mock.Mock,
+                            mock_synonyms: unittest.mock.Mock, mock_existing: unittest.mock.Mock,
+                            mock_product: unittest.mock.Mock, mock_ontology_term: unittest.mock.Mock,
+                            mock_properties: unittest.mock.Mock, mock_crossrefs: unittest.mock.Mock,
+                            mock_publications: unittest.mock.Mock):
+        # Tests the function importing the GAF records of a batch of features
+        self.assertIs(mock_load, self.client._load_features)
+        self.assertIs(mock_existing, self.client._query_entries_by_key)
+        feature_entry = sequence.Feature(organism_id=11, type_id=200, uniquename="testname", feature_id=12)
+        organism_entry = organism.Organism(genus="", species="", abbreviation="testorganism", organism_id=11)
+        other_record = dict(self.default_gaf_record, GO_ID="GO:67890", Synonym=["S2", "S3"])
+        grouped_records = {"testname": [self.default_gaf_record, other_record],
+                           "missingname": [self.default_gaf_record]}
+        mock_load.return_value = {"testname": feature_entry}
+        mock_requested.return_value = feature_entry
+        mock_gene.return_value = feature_entry
+        mock_existing.side_effect = lambda table, key, values: collections.defaultdict(list)
+        mock_ontology_term.side_effect = [
+            sequence.FeatureCvTerm(feature_id=12, cvterm_id=34, pub_id=1, feature_cvterm_id=101),
+            sequence.FeatureCvTerm(feature_id=12, cvterm_id=35, pub_id=1, feature_cvterm_id=102)]
+        mock_properties.return_value = []
+        mock_crossrefs.return_value = []
+        mock_publications.return_value = []
+        features_with_product = set()
+
+        self.client._load_gaf_batch(grouped_records, organism_entry, "default", features_with_product)
+        mock_load.assert_called_with(["testname", "missingname"], organism_entry)
+        self.assertEqual(mock_name.call_count, 2)
+        mock_synonyms.assert_called_once_with({"Synonym": ["S1", "S2", "S3"]}, feature_entry)
+        mock_product.assert_called_once_with(self.default_gaf_record, feature_entry)
+        self.assertEqual(features_with_product, {"testname"})
+        mock_ontology_term.assert_called_with(other_record, feature_entry)
+        self.assertEqual(mock_ontology_term.call_count, 2)
+        self.assertEqual(mock_existing.call_count, 3)
+        for table in [sequence.FeatureCvTermProp, sequence.FeatureCvTermDbxRef, sequence.FeatureCvTermPub]:
+            mock_existing.assert_any_call(table, "feature_cvterm_id", unittest.mock.ANY)
+        self.assertEqual(sorted(mock_existing.call_args[0][2]), [101, 102])
+        self.assertEqual(mock_properties.call_count, 2)
+        self.assertEqual(mock_crossrefs.call_count, 2)
+        self.assertEqual(mock_publications.call_count, 2)
+
     @unittest.mock.patch("pychado.io.gaf.GAFImportClient.query_first")
     def test_load_feature(self, mock_query: unittest.mock.Mock):
         # Tests the function loading the entry from the 'feature' table that corresponds to a GAF record
@@ -76,46 +216,82 @@ class TestGAFImport(unittest.TestCase):
         mock_feature_synonym.assert_any_call(synonym_id=99, feature_id=12, pub_id=33)
         self.assertEqual(len(all_feature_synonyms), 2)
 
-    @unittest.mock.patch("pychado.io.gaf.GAFImportClient._handle_feature_cvterm")
+    @unittest.mock.patch("pychado.io.gaf.GAFImportClient._handle_indexed_feature_cvterm")
     @unittest.mock.patch("pychado.orm.sequence.FeatureCvTerm")
     @unittest.mock.patch("pychado.io.gaf.GAFImportClient._handle_pub")
     @unittest.mock.patch("pychado.orm.pub.Pub")
     @unittest.mock.patch("pychado.io.gaf.GAFImportClient._extract_primary_publication")
-    @unittest.mock.patch("pychado.io.gaf.GAFImportClient.query_first")
-    @unittest.mock.patch("pychado.io.gaf.GAFImportClient.query_feature_cvterm_by_ontology")
-    def test_handle_ontology_term(self, mock_query: unittest.mock.Mock, mock_query_first: unittest.mock.Mock,
+    @unittest.mock.patch("pychado.io.gaf.GAFImportClient._load_ontology_terms")
+    @unittest.mock.patch("pychado.io.gaf.GAFImportClient._load_feature_cvterm_index")
+    def test_handle_ontology_term(self, mock_index: unittest.mock.Mock, mock_load: unittest.mock.Mock,
                                   mock_extract: unittest.mock.Mock,
                                   mock_pub: unittest.mock.Mock, mock_insert_pub: unittest.mock.Mock,
                                   mock_feature_cvterm: unittest.mock.Mock,
                                   mock_insert_feature_cvterm: unittest.mock.Mock):
         # Tests the function transferring data from a GAF record to the 'feature_cvterm' table
-        self.assertIs(mock_query, self.client.query_feature_cvterm_by_ontology)
-        self.assertIs(mock_query_first, self.client.query_first)
+        self.assertIs(mock_index, self.client._load_feature_cvterm_index)
+        self.assertIs(mock_load, self.client._load_ontology_terms)
         self.assertIs(mock_extract, self.client._extract_primary_publication)
         self.assertIs(mock_pub, pub.Pub)
         self.assertIs(mock_insert_pub, self.client._handle_pub)
         self.assertIs(mock_feature_cvterm, sequence.FeatureCvTerm)
-        self.assertIs(mock_insert_feature_cvterm, self.client._handle_feature_cvterm)
+        self.assertIs(mock_insert_feature_cvterm, self.client._handle_indexed_feature_cvterm)
 
         feature_entry = sequence.Feature(organism_id=11, type_id=200, uniquename="testname", feature_id=12)
         mock_extract.return_value = "PMID:12345"
-        mock_query_first.side_effect = [utils.EmptyObject(db_id=33),
-                                        utils.EmptyObject(dbxref_id=44),
-                                        utils.EmptyObject(cvterm_id=55, name="")]
+        mock_load.return_value = (utils.EmptyObject(db_id=33), {"12345": utils.EmptyObject(cvterm_id=55, name="")})
         mock_insert_pub.return_value = utils.EmptyObject(pub_id=66)
+        self.client._unresolved_ontologies.clear()
+        self.client._unresolved_ontology_terms.clear()
 
         ontology_term = self.client._handle_ontology_term(self.default_gaf_record, feature_entry)
-        mock_query_first.assert_any_call(general.DbxRef, db_id=33, accession="12345")
-        mock_query_first.assert_any_call(cv.CvTerm, dbxref_id=44)
-        self.assertEqual(mock_query_first.call_count, 3)
+        mock_load.assert_called_with("GO")
         mock_pub.assert_any_call(uniquename="PMID:12345", type_id=71)
         self.assertEqual(mock_insert_pub.call_count, 1)
-        mock_query.assert_called_with(12, 33)
+        mock_index.assert_called_with(11, 33)
         mock_feature_cvterm.assert_any_call(feature_id=12, cvterm_id=55, pub_id=66, is_not=False)
-        self.assertEqual(mock_insert_feature_cvterm.call_count, 1)
+        mock_insert_feature_cvterm.assert_called_once_with(mock_feature_cvterm.return_value, mock_index.return_value,
+                                                           "", "testname")
         self.assertIsNotNone(ontology_term)
 
-    @unittest.mock.patch("pychado.io.gaf.GAFImportClient._handle_feature_cvterm")
+        mock_load.return_value = (utils.EmptyObject(db_id=33), {})
+        ontology_term = self.client._handle_ontology_term(self.default_gaf_record, feature_entry)
+        self.assertIsNone(ontology_term)
+        self.assertEqual(self.client._unresolved_ontology_terms, {"GO:12345": 1})
+
+        mock_load.return_value = None
+        ontology_term = self.client._handle_ontology_term(self.default_gaf_record, feature_entry)
+        self.assertIsNone(ontology_term)
+        self.assertEqual(self.client._unresolved_ontologies, {"GO": 1})
+        self.assertEqual(mock_insert_feature_cvterm.call_count, 1)
+
+    @unittest.mock.patch("pychado.io.gaf.GAFImportClient._load_ontology_lookup")
+    @unittest.mock.patch("pychado.io.gaf.GAFImportClient.query_first")
+    def test_load_ontology_terms(self, mock_query_first: unittest.mock.Mock, mock_query: unittest.mock.Mock):
+        # Tests the function loading the CV terms of an ontology from the lookup tables
+        self.assertIs(mock_query_first, self.client.query_first)
+        self.assertIs(mock_query, self.client._load_ontology_lookup)
+        self.client._ontology_terms.clear()
+        mock_query_first.side_effect = [utils.EmptyObject(db_id=33), None]
+        mock_query.return_value = lookup.OntologyLookup(
+            [lookup.LookupTerm(55, "term1", "biological_process", "GO", "0001"),
+             lookup.LookupTerm(56, "term2", "molecular_function", "GO", "0002")], [])
+
+        (db_entry, cvterms) = self.client._load_ontology_terms("GO")
+        mock_query_first.assert_called_with(general.Db, name="GO")
+        mock_query.assert_called_with(db_authorities=["GO"], cache_directory="")
+        self.assertEqual(db_entry.db_id, 33)
+        self.assertEqual(cvterms["0002"].cvterm_id, 56)
+        self.assertIs(self.client._load_ontology_terms("GO")[1], cvterms)
+        self.assertEqual(mock_query_first.call_count, 1)
+
+        self.assertIsNone(self.client._load_ontology_terms("unknown"))
+        self.assertIsNone(self.client._load_ontology_terms("unknown"))
+        self.assertEqual(mock_query_first.call_count, 2)
+        self.assertEqual(mock_query.call_count, 1)
+        self.client._ontology_terms.clear()
+
+    @unittest.mock.patch("pychado.io.gaf.GAFImportClient._handle_indexed_feature_cvterm")
     @unittest.mock.patch("pychado.orm.sequence.FeatureCvTerm")
     @unittest.mock.patch("pychado.io.gaf.GAFImportClient._handle_pub")
     @unittest.mock.patch("pychado.orm.pub.Pub")
@@ -128,8 +304,8 @@ class TestGAFImport(unittest.TestCase):
     @unittest.mock.patch("pychado.io.gaf.GAFImportClient._handle_db")
     @unittest.mock.patch("pychado.orm.general.Db")
     @unittest.mock.patch("pychado.io.gaf.GAFImportClient._extract_primary_publication")
-    @unittest.mock.patch("pychado.io.gaf.GAFImportClient.query_feature_cvterm_by_ontology")
-    def test_handle_product_term(self, mock_query: unittest.mock.Mock, mock_extract: unittest.mock.Mock,
+    @unittest.mock.patch("pychado.io.gaf.GAFImportClient._load_feature_cvterm_index")
+    def test_handle_product_term(self, mock_index: unittest.mock.Mock, mock_extract: unittest.mock.Mock,
                                  mock_db: unittest.mock.Mock, mock_insert_db: unittest.mock.Mock,
                                  mock_dbxref: unittest.mock.Mock, mock_insert_dbxref: unittest.mock.Mock,
                                  mock_cv: unittest.mock.Mock, mock_insert_cv: unittest.mock.Mock,
@@ -138,7 +314,7 @@ class TestGAFImport(unittest.TestCase):
                                  mock_feature_cvterm: unittest.mock.Mock,
                                  mock_insert_feature_cvterm: unittest.mock.Mock):
         # Tests the function transferring data from a GAF record to the 'feature_cvterm' table
-        self.assertIs(mock_query, self.client.query_feature_cvterm_by_ontology)
+        self.assertIs(mock_index, self.client._load_feature_cvterm_index)
         self.assertIs(mock_extract, self.client._extract_primary_publication)
         self.assertIs(mock_db, general.Db)
         self.assertIs(mock_insert_db, self.client._handle_db)
@@ -151,7 +327,7 @@ class TestGAFImport(unittest.TestCase):
         self.assertIs(mock_pub, pub.Pub)
         self.assertIs(mock_insert_pub, self.client._handle_pub)
         self.assertIs(mock_feature_cvterm, sequence.FeatureCvTerm)
-        self.assertIs(mock_insert_feature_cvterm, self.client._handle_feature_cvterm)
+        self.assertIs(mock_insert_feature_cvterm, self.client._handle_indexed_feature_cvterm)
 
         feature_entry = sequence.Feature(organism_id=11, type_id=200, uniquename="testname", feature_id=12)
         mock_extract.return_value = "PMID:12345"
@@ -160,14 +336,15 @@ class TestGAFImport(unittest.TestCase):
         mock_insert_cv.return_value = utils.EmptyObject(cv_id=44, name="")
         mock_insert_cvterm.return_value = utils.EmptyObject(cvterm_id=55, name="")
         mock_insert_pub.return_value = utils.EmptyObject(pub_id=66)
+        self.client._dimension_entries.clear()
 
         product_term = self.client._handle_product_term(self.default_gaf_record, feature_entry)
         mock_db.assert_called_with(name="PRODUCT")
-        mock_dbxref.assert_called_with(db_id=22, accession="testproduct")
+        mock_dbxref.assert_called_with(db_id=22, accession="testproduct", version="")
         mock_cv.assert_called_with(name="genedb_products")
         mock_cvterm.assert_called_with(cv_id=44, dbxref_id=33, name="testproduct")
         mock_pub.assert_called_with(uniquename="PMID:12345", type_id=71)
-        mock_query.assert_called_with(12, 22)
+        mock_index.assert_called_with(11, 22)
         mock_feature_cvterm.assert_called_with(feature_id=12, cvterm_id=55, pub_id=66)
 
         mock_insert_db.assert_called()
@@ -178,6 +355,52 @@ class TestGAFImport(unittest.TestCase):
         mock_insert_feature_cvterm.assert_called()
         self.assertIsNotNone(product_term)
 
+        # Repeated products are resolved from the cache
+        self.client._handle_product_term(self.default_gaf_record, feature_entry)
+        self.assertEqual(mock_insert_db.call_count, 1)
+        self.assertEqual(mock_insert_dbxref.call_count, 1)
+        self.assertEqual(mock_insert_cv.call_count, 1)
+        self.assertEqual(mock_insert_cvterm.call_count, 1)
+        self.assertEqual(mock_insert_feature_cvterm.call_count, 2)
+        self.client._dimension_entries.clear()
+
+    @unittest.mock.patch("pychado.io.gaf.GAFImportClient.query_feature_cvterm_by_ontology_and_organism")
+    def test_load_feature_cvterm_index(self, mock_query: unittest.mock.Mock):
+        # Tests the function loading the existing feature_cvterms of an organism for an ontology once per import
+        self.assertIs(mock_query, self.client.query_feature_cvterm_by_ontology_and_organism)
+        mock_query.return_value.configure_mock(**{"all.return_value": [
+            sequence.FeatureCvTerm(feature_id=12, cvterm_id=55, pub_id=66, rank=0)]})
+        self.client._feature_cvterm_indices.clear()
+        index = self.client._load_feature_cvterm_index(11, 33)
+        mock_query.assert_called_once_with(11, 33)
+        self.assertIn((12, 55, 66, 0), index)
+        self.assertIs(self.client._load_feature_cvterm_index(11, 33), index)
+        self.client._load_feature_cvterm_index(11, 34)
+        self.assertEqual(mock_query.call_count, 2)
+        self.client._feature_cvterm_indices.clear()
+
+    @unittest.mock.patch("pychado.io.gaf.GAFImportClient.add_and_flush")
+    def test_handle_indexed_feature_cvterm(self, mock_add: unittest.mock.Mock):
+        # Tests the function inserting or updating a feature_cvterm entry that is looked up in an index
+        self.assertIs(mock_add, self.client.add_and_flush)
+        existing_entry = sequence.FeatureCvTerm(feature_id=12, cvterm_id=55, pub_id=66, is_not=False, rank=0)
+        index = gaf.FeatureCvTermIndex([existing_entry])
+
+        new_entry = sequence.FeatureCvTerm(feature_id=12, cvterm_id=55, pub_id=77, is_not=True)
+        entry = self.client._handle_indexed_feature_cvterm(new_entry, index)
+        self.assertIs(entry, existing_entry)
+        self.assertTrue(existing_entry.is_not)
+        mock_add.assert_not_called()
+
+        new_entry = sequence.FeatureCvTerm(feature_id=12, cvterm_id=56, pub_id=66)
+        entry = self.client._handle_indexed_feature_cvterm(new_entry, index)
+        self.assertIs(entry, new_entry)
+        mock_add.assert_called_once_with(new_entry)
+        self.assertIn((12, 56, 66, 0), index)
+        self.assertIs(self.client._handle_indexed_feature_cvterm(
+            sequence.FeatureCvTerm(feature_id=12, cvterm_id=56, pub_id=66), index), new_entry)
+        self.assertEqual(mock_add.call_count, 1)
+
     @unittest.mock.patch("pychado.io.gaf.GAFImportClient._handle_feature_cvtermprop")
     @unittest.mock.patch("pychado.orm.sequence.FeatureCvTermProp")
     @unittest.mock.patch("pychado.io.gaf.GAFImportClient.query_all")
@@ -227,6 +450,7 @@ class TestGAFImport(unittest.TestCase):
         mock_extract.return_value = ["evidencedb:evidenceaccession"]
         mock_insert_db.return_value = utils.EmptyObject(db_id=44, name="")
         mock_insert_dbxref.return_value = utils.EmptyObject(dbxref_id=55, accession="", version="")
+        self.client._dimension_entries.clear()
 
         all_crossrefs = self.client._handle_crossrefs(self.default_gaf_record, feature_cvterm_entry, feature_entry)
         mock_query.assert_called_with(sequence.FeatureCvTermDbxRef, feature_cvterm_id=4)
@@ -237,6 +461,7 @@ class TestGAFImport(unittest.TestCase):
         self.assertEqual(mock_insert_dbxref.call_count, 1)
         self.assertEqual(mock_insert_feature_cvterm_dbxref.call_count, 1)
         self.assertEqual(len(all_crossrefs), 1)
+        self.client._dimension_entries.clear()
 
     @unittest.mock.patch("pychado.io.gaf.GAFImportClient._handle_feature_cvterm_pub")
     @unittest.mock.patch("pychado.orm.sequence.FeatureCvTermPub")
@@ -315,6 +540,8 @@ class TestGAFExport(unittest.TestCase):
         cls.client._taxon_term = cv.CvTerm(cv_id=22, dbxref_id=93, name="taxonId", cvterm_id=93)
         cls.client._go_db = general.Db(name="GO", db_id=44)
         cls.client._product_db = general.Db(name="PRODUCT", db_id=55)
+        cls.client._part_of_term = cv.CvTerm(cv_id=33, dbxref_id=81, name="part_of", cvterm_id=81)
+        cls.client._derives_from_term = cv.CvTerm(cv_id=33, dbxref_id=82, name="derives_from", cvterm_id=82)
 
     @unittest.mock.patch("pychado.io.gaf.GAFExportClient.query_first")
     def test_extract_taxon_id(self, mock_query: unittest.mock.Mock):
@@ -331,79 +558,36 @@ class TestGAFExport(unittest.TestCase):
         taxon = self.client._extract_taxon_id(organism_entry)
         self.assertEqual(taxon, "taxon:12345")
 
-    def test_write_gaf(self):
-        # Tests the functions writing header and records to a GAF file
-        gaf_file = tempfile.mkstemp()[1]
-        gaf_file_handle = utils.open_file_write(gaf_file)
-        gaf_record = {"k1": "v1", "k2": ["v2.1", "v2.2"]}
-        self.client._write_gaf_header(gaf_file_handle)
-        self.client._print_gaf_record(gaf_file_handle, gaf_record)
-        utils.close(gaf_file_handle)
-        actual_gaf_file = os.path.join(data_dir, 'gaf_records.gaf')
-        self.assertTrue(filecmp.cmp(gaf_file, actual_gaf_file))
-        os.remove(gaf_file)
-
-    def test_stringify_gaf_attribute(self):
-        # Tests the function that converts a list into a pipe-separated string
-        string = self.client._stringify_gaf_attribute("bbb")
-        self.assertEqual(string, "bbb")
-        string = self.client._stringify_gaf_attribute(["a", "bbb"])
-        self.assertEqual(string, "a|bbb")
-
-    @unittest.mock.patch("pychado.io.gaf.GAFExportClient.query_feature_cvterm_ontology_terms")
-    def test_extract_feature_cvterm_ontology_term(self, mock_query: unittest.mock.Mock):
-        # Tests the function that extracts the ontology term associated with a feature_cvterm by a database query
-        self.assertIs(mock_query, self.client.query_feature_cvterm_ontology_terms)
-        feature_cvterm_entry = sequence.FeatureCvTerm(feature_id=12, cvterm_id=33, pub_id=44, feature_cvterm_id=77)
-        mock_query.return_value.configure_mock(**{"first.return_value": ("somedb", "someaccession")})
-        ontology_term = self.client._extract_feature_cvterm_ontology_term(feature_cvterm_entry)
-        mock_query.assert_called_with(77, 44)
-        self.assertEqual(ontology_term, "somedb:someaccession")
-
-    @unittest.mock.patch("pychado.io.gaf.GAFExportClient.query_feature_cvterm_properties")
-    def test_extract_feature_cvterm_properties(self, mock_query: unittest.mock.Mock):
-        # Tests the function that extracts the properties associated with a feature_cvterm by a database query
-        self.assertIs(mock_query, self.client.query_feature_cvterm_properties)
-        feature_cvterm_entry = sequence.FeatureCvTerm(feature_id=12, cvterm_id=33, pub_id=44, feature_cvterm_id=77)
-        mock_query.return_value.configure_mock(**{"all.return_value": [("k1", "v1"), ("k2", "v2")]})
-        properties = self.client._extract_feature_cvterm_properties(feature_cvterm_entry)
-        mock_query.assert_called_with(77)
-        self.assertEqual(properties, {"k1": "v1", "k2": "v2"})
-
-    @unittest.mock.patch("pychado.io.gaf.GAFExportClient.query_feature_cvterm_dbxrefs")
-    def test_extract_feature_cvterm_dbxrefs(self, mock_query: unittest.mock.Mock):
-        # Tests the function that extracts the cross references associated with a feature_cvterm by a database query
-        self.assertIs(mock_query, self.client.query_feature_cvterm_dbxrefs)
-        feature_cvterm_entry = sequence.FeatureCvTerm(feature_id=12, cvterm_id=33, pub_id=44, feature_cvterm_id=77)
-        mock_query.return_value.configure_mock(**{"all.return_value": [("somedb", "someacc"), ("otherdb", "otheracc")]})
-        dbxrefs = self.client._extract_feature_cvterm_dbxrefs(feature_cvterm_entry)
-        mock_query.assert_called_with(77)
-        self.assertEqual(dbxrefs, ["somedb:someacc", "otherdb:otheracc"])
-
-    @unittest.mock.patch("pychado.io.gaf.GAFExportClient.query_feature_cvterm_secondary_pubs")
-    @unittest.mock.patch("pychado.io.gaf.GAFExportClient.query_feature_cvterm_pubs")
-    def test_extract_feature_cvterm_publications(self, mock_query_primary: unittest.mock.Mock,
-                                                 mock_query_secondary: unittest.mock.Mock):
-        # Tests the function that extracts the publications associated with a feature_cvterm by a database query
-        self.assertIs(mock_query_primary, self.client.query_feature_cvterm_pubs)
-        self.assertIs(mock_query_secondary, self.client.query_feature_cvterm_secondary_pubs)
-        feature_cvterm_entry = sequence.FeatureCvTerm(feature_id=12, cvterm_id=33, pub_id=44, feature_cvterm_id=77)
-        mock_query_primary.return_value.configure_mock(**{"all.return_value": [("pub0",)]})
-        mock_query_secondary.return_value.configure_mock(**{"all.return_value": [("pub1",), ("pub2",)]})
-        publications = self.client._extract_feature_cvterm_publications(feature_cvterm_entry)
-        mock_query_primary.assert_called_with(77)
-        mock_query_secondary.assert_called_with(77)
-        self.assertEqual(publications, ["pub0", "pub1", "pub2"])
-
-    @unittest.mock.patch("pychado.io.gaf.GAFExportClient.query_cvterm_namespace")
-    def test_extract_go_namespace(self, mock_query: unittest.mock.Mock):
-        # Tests the function that extracts the namespace of a feature_cvterm by a database query
-        self.assertIs(mock_query, self.client.query_cvterm_namespace)
-        feature_cvterm_entry = sequence.FeatureCvTerm(feature_id=12, cvterm_id=33, pub_id=44, feature_cvterm_id=77)
-        mock_query.return_value.configure_mock(**{"scalar.return_value": "somecv"})
-        namespace = self.client._extract_go_namespace(feature_cvterm_entry)
-        mock_query.assert_called_with(33)
-        self.assertEqual(namespace, "somecv")
+    @unittest.mock.patch("pychado.io.gaf.GAFExportClient.query_feature_cvterm_properties_by_organism")
+    def test_extract_all_feature_cvterm_properties(self, mock_query: unittest.mock.Mock):
+        # Tests the function that extracts the properties of all feature_cvterms of an organism by a database query
+        self.assertIs(mock_query, self.client.query_feature_cvterm_properties_by_organism)
+        mock_query.return_value.configure_mock(**{"all.return_value": [(77, "k1", "v1"), (77, "k2", "v2"),
+                                                                       (78, "k1", "v3")]})
+        properties = self.client._extract_all_feature_cvterm_properties(11)
+        mock_query.assert_called_with(11, 44)
+        self.assertEqual(properties, {77: {"k1": "v1", "k2": "v2"}, 78: {"k1": "v3"}})
+
+    @unittest.mock.patch("pychado.io.gaf.GAFExportClient.query_feature_cvterm_dbxrefs_by_organism")
+    def test_extract_all_feature_cvterm_dbxrefs(self, mock_query: unittest.mock.Mock):
+        # Tests the function that extracts the cross references of all feature_cvterms of an organism by a database
+        # query
+        self.assertIs(mock_query, self.client.query_feature_cvterm_dbxrefs_by_organism)
+        mock_query.return_value.configure_mock(**{"all.return_value": [(77, "somedb", "someacc"),
+                                                                       (77, "otherdb", "otheracc")]})
+        dbxrefs = self.client._extract_all_feature_cvterm_dbxrefs(11)
+        mock_query.assert_called_with(11, 44)
+        self.assertEqual(dbxrefs, {77: ["somedb:someacc", "otherdb:otheracc"]})
+
+    @unittest.mock.patch("pychado.io.gaf.GAFExportClient.query_feature_cvterm_secondary_pubs_by_organism")
+    def test_extract_all_feature_cvterm_secondary_publications(self, mock_query: unittest.mock.Mock):
+        # Tests the function that extracts the secondary publications of all feature_cvterms of an organism by a
+        # database query
+        self.assertIs(mock_query, self.client.query_feature_cvterm_secondary_pubs_by_organism)
+        mock_query.return_value.configure_mock(**{"all.return_value": [(77, "pub1"), (78, "pub2"), (77, "pub3")]})
+        publications = self.client._extract_all_feature_cvterm_secondary_publications(11)
+        mock_query.assert_called_with(11, 44)
+        self.assertEqual(publications, {77: ["pub1", "pub3"], 78: ["pub2"]})
 
     def test_extract_feature_name(self):
         # Tests the function that extracts the name of a feature
@@ -413,39 +597,128 @@ class TestGAFExport(unittest.TestCase):
         feature_entry.name = "user_friendly_name"
         featurename = self.client._extract_feature_name(feature_entry)
         self.assertEqual(featurename, "user_friendly_name")
-
-    @unittest.mock.patch("pychado.io.gaf.GAFExportClient.query_feature_synonyms")
-    def test_extract_feature_synonyms(self, mock_query: unittest.mock.Mock):
-        # Tests the function that extracts the synonyms of a feature by a database query
-        self.assertIs(mock_query, self.client.query_feature_synonyms)
-        feature_entry = sequence.Feature(organism_id=11, type_id=200, uniquename="testname", feature_id=12)
-        mock_query.return_value.configure_mock(**{"all.return_value": [("synonym", "s1"), ("alias", "s2")]})
-        synonyms = self.client._extract_feature_synonyms(feature_entry)
-        mock_query.assert_called_with(12)
-        self.assertEqual(synonyms, ["s1", "s2"])
-
-    @unittest.mock.patch("pychado.io.gaf.GAFExportClient.query_first")
-    @unittest.mock.patch("pychado.io.gaf.GAFExportClient.query_feature_cvterm_by_ontology")
-    def test_extract_product_name(self, mock_query: unittest.mock.Mock, mock_query_first: unittest.mock.Mock):
-        # Tests the function that extracts the name of a gene product by a database query
-        self.assertIs(mock_query, self.client.query_feature_cvterm_by_ontology)
-        self.assertIs(mock_query_first, self.client.query_first)
-        feature_entry = sequence.Feature(organism_id=11, type_id=200, uniquename="testname", feature_id=12)
-        mock_query.return_value.configure_mock(**{"first.return_value": sequence.FeatureCvTerm(
-            feature_id=12, cvterm_id=44, pub_id=0)})
-        mock_query_first.return_value = cv.CvTerm(cv_id=1, dbxref_id=2, name="someproduct")
-        product_name = self.client._extract_product_name(feature_entry)
-        mock_query.assert_called_with(12, 55)
-        mock_query_first.assert_called_with(cv.CvTerm, cvterm_id=44)
-        self.assertEqual(product_name, "someproduct")
+        featurename = self.client._extract_feature_name(None)
+        self.assertEqual(featurename, "")
+
+    @unittest.mock.patch("pychado.io.gaf.GAFExportClient.query_feature_synonyms_by_organism")
+    def test_extract_all_feature_synonyms(self, mock_query: unittest.mock.Mock):
+        # Tests the function that extracts the synonyms of all features of an organism by a database query
+        self.assertIs(mock_query, self.client.query_feature_synonyms_by_organism)
+        mock_query.return_value.configure_mock(**{"all.return_value": [(12, "s1"), (12, "s2"), (13, "s3")]})
+        synonyms = self.client._extract_all_feature_synonyms(11)
+        mock_query.assert_called_with(11)
+        self.assertEqual(synonyms, {12: ["s1", "s2"], 13: ["s3"]})
+
+    @unittest.mock.patch("pychado.io.gaf.GAFExportClient.query_feature_cvterm_names_by_organism")
+    def test_extract_all_product_names(self, mock_query: unittest.mock.Mock):
+        # Tests the function that extracts the gene products of all features of an organism by a database query
+        self.assertIs(mock_query, self.client.query_feature_cvterm_names_by_organism)
+        mock_query.return_value.configure_mock(**{"all.return_value": [(12, "someproduct"), (12, "otherproduct"),
+                                                                       (13, "thirdproduct")]})
+        product_names = self.client._extract_all_product_names(11)
+        mock_query.assert_called_with(11, 55)
+        self.assertEqual(product_names, {12: "someproduct", 13: "thirdproduct"})
+
+    def test_find_related_features(self):
+        # Tests the functions that find the gene, transcript or polypeptide of a feature in preloaded relationships
+        features = self.default_features()
+        index = gaf.AnnotationLevelIndex([(3, "transcript1", 2, "gene1", 81),
+                                          (5, "polypeptide1", 3, "transcript1", 82)])
+        for feature_id in [2, 3, 5]:
+            feature = features[feature_id]
+            self.assertIs(self.client._find_related_feature(feature, "gene", features, index), features[2])
+            self.assertIs(self.client._find_related_feature(feature, "transcript", features, index), features[3])
+            self.assertIs(self.client._find_related_feature(feature, "protein", features, index), features[5])
+            self.assertIs(self.client._find_requested_feature(feature, "protein", features, index), features[5])
+            self.assertIs(self.client._find_requested_feature(feature, "default", features, index), feature)
+        self.assertIsNone(self.client._find_related_feature(features[1], "gene", features, index))
+        self.assertIsNone(self.client._find_related_feature(features[4], "protein", features, index))
+        self.assertIs(self.client._find_requested_feature(features[4], "protein", features, index), features[4])
+
+    @unittest.mock.patch("pychado.io.gaf.GAFExportClient._extract_all_product_names")
+    @unittest.mock.patch("pychado.io.gaf.GAFExportClient._extract_all_feature_synonyms")
+    @unittest.mock.patch("pychado.io.gaf.GAFExportClient._extract_all_feature_cvterm_secondary_publications")
+    @unittest.mock.patch("pychado.io.gaf.GAFExportClient._extract_all_feature_cvterm_dbxrefs")
+    @unittest.mock.patch("pychado.io.gaf.GAFExportClient._extract_all_feature_cvterm_properties")
+    @unittest.mock.patch("pychado.io.gaf.GAFExportClient._load_annotation_level_index")
+    @unittest.mock.patch("pychado.io.gaf.GAFExportClient.query_feature_cvterm_annotations_by_organism")
+    @unittest.mock.patch("pychado.io.gaf.GAFExportClient.query_features_by_organism")
+    def test_create_gaf_records(self, mock_features: unittest.mock.Mock, mock_annotations: unittest.mock.Mock,
+                                mock_relationships: unittest.mock.Mock, mock_properties: unittest.mock.Mock,
+                                mock_dbxrefs: unittest.mock.Mock, mock_publications: unittest.mock.Mock,
+                                mock_synonyms: unittest.mock.Mock, mock_products: unittest.mock.Mock):
+        # Tests the function that creates GAF records from information loaded once per organism
+        self.assertIs(mock_features, self.client.query_features_by_organism)
+        self.assertIs(mock_annotations, self.client.query_feature_cvterm_annotations_by_organism)
+        features = self.default_features()
+        mock_features.return_value.configure_mock(**{"all.return_value": list(features.values())})
+        annotation = collections.namedtuple("annotation", ["feature_cvterm_id", "feature_id", "is_not", "db",
+                                                           "accession", "namespace", "pub"])
+        mock_annotations.return_value.order_by.return_value.configure_mock(**{"all.return_value": [
+            annotation(77, 5, False, "GO", "0001", "biological_process", "PMID:1"),
+            annotation(78, 4, True, "GO", "0002", "cellular_component", "null"),
+            annotation(79, 1, False, "GO", "0003", "cellular_component", "null"),
+            annotation(80, 6, False, "GO", "0004", "cellular_component", "null"),
+            annotation(81, 3, False, "GO", "0005", "unknown_namespace", "null")]})
+        mock_relationships.return_value = gaf.AnnotationLevelIndex([(3, "transcript1", 2, "gene1", 81),
+                                                                    (5, "polypeptide1", 3, "transcript1", 82)])
+        mock_properties.return_value = {77: {"date": "20200101", "evidence": "IDA", "assigned_by": "somedb"}}
+        mock_dbxrefs.return_value = {77: ["GO_REF:0001", "InterPro:IPR1"]}
+        mock_publications.return_value = {77: ["PMID:2"]}
+        mock_synonyms.return_value = {2: ["s1", "s2"]}
+        mock_products.return_value = {5: "someproduct"}
+        organism_entry = organism.Organism(genus="", species="", abbreviation="testorganism", organism_id=11)
+
+        gaf_records = list(self.client._create_gaf_records(organism_entry, "testdb", "taxon:123", "gene", False))
+        mock_features.assert_called_with(11)
+        mock_annotations.assert_called_with(11, 44)
+        mock_relationships.assert_called_with(11)
+        self.assertEqual(len(gaf_records), 2)
+        self.assertEqual(gaf_records[0]["DB"], "testdb")
+        self.assertEqual(gaf_records[0]["DB_Object_ID"], "gene1")
+        self.assertEqual(gaf_records[0]["DB_Object_Symbol"], "genename")
+        self.assertIsNone(gaf_records[0]["Qualifier"])
+        self.assertEqual(gaf_records[0]["GO_ID"], "GO:0001")
+        self.assertEqual(gaf_records[0]["DB:Reference"], ["PMID:1", "PMID:2", "GO_REF:0001"])
+        self.assertEqual(gaf_records[0]["Evidence"], "IDA")
+        self.assertEqual(gaf_records[0]["With"], ["InterPro:IPR1"])
+        self.assertEqual(gaf_records[0]["Aspect"], "P")
+        self.assertEqual(gaf_records[0]["DB_Object_Name"], "someproduct")
+        self.assertEqual(gaf_records[0]["Synonym"], "s1|s2")
+        self.assertEqual(gaf_records[0]["DB_Object_Type"], "gene")
+        self.assertEqual(gaf_records[0]["Taxon_ID"], "taxon:123")
+        self.assertEqual(gaf_records[0]["Date"], "20200101")
+        self.assertEqual(gaf_records[0]["Assigned_By"], "somedb")
+        self.assertEqual(gaf_records[1]["DB_Object_ID"], "gene2")
+        self.assertEqual(gaf_records[1]["Qualifier"], "NOT")
+        self.assertEqual(gaf_records[1]["DB:Reference"], ["GO_REF:0000002"])
+        self.assertEqual(gaf_records[1]["Synonym"], "")
+
+        gaf_records = list(self.client._create_gaf_records(organism_entry, "testdb", "taxon:123", "gene", True))
+        self.assertEqual(len(gaf_records), 3)
+        self.assertEqual(gaf_records[2]["DB_Object_ID"], "gene3")
+
+    @staticmethod
+    def default_features() -> dict:
+        # Creates a set of feature rows as returned by 'query_features_by_organism'
+        feature = collections.namedtuple("feature", ["feature_id", "uniquename", "name", "type", "is_obsolete"])
+        return {
+            1: feature(1, "contig1", None, "contig", False),
+            2: feature(2, "gene1", "genename", "gene", False),
+            3: feature(3, "transcript1", None, "mRNA", False),
+            4: feature(4, "gene2", None, "gene", False),
+            5: feature(5, "polypeptide1", None, "polypeptide", False),
+            6: feature(6, "gene3", None, "gene", True)
+        }
 
     def test_create_gaf_record(self):
         # Tests the function that creates a GAF record
         feature_entry = sequence.Feature(organism_id=11, type_id=200, uniquename="testname", feature_id=12)
         feature_cvterm_entry = sequence.FeatureCvTerm(feature_id=12, cvterm_id=33, pub_id=44, is_not=True)
         gaf_record = self.client._create_gaf_record(feature_cvterm_entry, feature_entry, "testdb", "testtaxon")
-        self.assertEqual(len(gaf_record), 15)
+        self.assertEqual(len(gaf_record), 17)
         self.assertIn("Evidence", gaf_record)
+        self.assertIn("Gene_Product_Form_ID", gaf_record)
         self.assertEqual(gaf_record["DB"], "testdb")
         self.assertEqual(gaf_record["DB_Object_ID"], "testname")
         self.assertEqual(gaf_record["Taxon_ID"], "testtaxon")
@@ -536,6 +809,136 @@ class TestGAFExport(unittest.TestCase):
         self.assertEqual(gaf_record["Synonym"], ["s1", "s2"])
 
 
+class TestGAFExportOrganisms(unittest.TestCase):
+    """Tests the export of gene annotation data of several organisms with a pool of processes"""
+
+    @unittest.mock.patch("multiprocessing.Pool")
+    @unittest.mock.patch("pychado.io.gaf.GAFExportClient")
+    def test_export_organisms(self, mock_client: unittest.mock.Mock, mock_pool: unittest.mock.Mock):
+        # Tests the export of several organisms with a pool of processes
+        self.assertIs(mock_client, gaf.GAFExportClient)
+        self.assertIs(mock_pool, multiprocessing.Pool)
+        mock_client.return_value._load_organism_names.return_value = ["org1", "org2"]
+        mock_imap = mock_pool.return_value.__enter__.return_value.imap
+        mock_imap.return_value = [("org1", 1.5, ""), ("org2", 0.1, "Organism 'org2' not present in database")]
+
+        gaf.export_organisms("testuri", False, "out.gaf", [], "testdb", "gene", False, "2.2", 2)
+        mock_client.assert_called_with("testuri", False)
+        mock_pool.assert_called_with(2, gaf._initialise_export_worker, ("testuri", False))
+        mock_imap.assert_called_with(gaf._export_organism_in_worker, [
+            ("out.org1.gaf", "org1", "testdb", "gene", False, "2.2"),
+            ("out.org2.gaf", "org2", "testdb", "gene", False, "2.2")])
+
+        mock_client.reset_mock()
+        gaf.export_organisms("testuri", False, "out.gaf.gz", ["org3"], "testdb", "default")
+        mock_client.assert_not_called()
+        mock_imap.assert_called_with(gaf._export_organism_in_worker, [
+            ("out.org3.gaf.gz", "org3", "testdb", "default", False, "1.0")])
+
+    @unittest.mock.patch("pychado.io.gaf._worker_client")
+    def test_export_organism_in_worker(self, mock_client: unittest.mock.Mock):
+        # Tests the export of a single organism with the client of a worker process
+        self.assertIs(mock_client, gaf._worker_client)
+        arguments = ("out.org1.gaf", "org1", "testdb", "gene", False, "1.0")
+        organism_name, run_time, error_message = gaf._export_organism_in_worker(arguments)
+        mock_client.export.assert_called_with(*arguments)
+        self.assertEqual(organism_name, "org1")
+        self.assertGreaterEqual(run_time, 0)
+        self.assertEqual(error_message, "")
+
+        mock_client.export.side_effect = iobase.DatabaseError("Organism 'org1' not present in database")
+        organism_name, run_time, error_message = gaf._export_organism_in_worker(arguments)
+        mock_client.session.rollback.assert_called()
+        self.assertEqual(error_message, "Organism 'org1' not present in database")
+
+    @unittest.mock.patch("pychado.io.gaf.GAFExportClient")
+    def test_initialise_export_worker(self, mock_client: unittest.mock.Mock):
+        # Tests the creation of the client of a worker process
+        self.assertIs(mock_client, gaf.GAFExportClient)
+        gaf._initialise_export_worker("testuri", True)
+        mock_client.assert_called_with("testuri", True)
+        self.assertIs(gaf._worker_client, mock_client.return_value)
+        gaf._worker_client = None
+
+
+class TestGAFWriter(unittest.TestCase):
+    """Tests the streaming writer for GAF files"""
+
+    @staticmethod
+    def default_record() -> dict:
+        # Creates a GAF record with values for all columns of GAF 1.0
+        return {"DB": "testdb", "DB_Object_ID": "gene1", "DB_Object_Symbol": "genename", "Qualifier": None,
+                "GO_ID": "GO:0001", "DB:Reference": ["PMID:1", "GO_REF:0001"], "Evidence": "IDA",
+                "With": ["InterPro:IPR1"], "Aspect": "P", "DB_Object_Name": "someproduct", "Synonym": "s1|s2",
+                "DB_Object_Type": "gene", "Taxon_ID": "taxon:123", "Date": "20200101", "Assigned_By": "somedb"}
+
+    def test_write_gaf(self):
+        # Tests the functions writing header and records to a GAF file
+        gaf_file = tempfile.mkstemp()[1]
+        gaf_file_handle = utils.open_file_write(gaf_file)
+        writer = gaf.GAFWriter(gaf_file_handle, buffer_size=1)
+        writer.write_header("testdb")
+        writer.write_records([self.default_record()])
+        utils.close(gaf_file_handle)
+        actual_gaf_file = os.path.join(data_dir, 'gaf_records.gaf')
+        self.assertTrue(filecmp.cmp(gaf_file, actual_gaf_file))
+        os.remove(gaf_file)
+
+    def test_write_buffer(self):
+        # Tests that records are collected in a buffer and written to file when the buffer is full
+        file_handle = unittest.mock.Mock()
+        writer = gaf.GAFWriter(file_handle, buffer_size=2)
+        writer.write_record(self.default_record())
+        file_handle.write.assert_not_called()
+        writer.write_record(self.default_record())
+        file_handle.write.assert_called_once()
+        self.assertEqual(file_handle.write.call_args[0][0].count("\n"), 2)
+        file_handle.reset_mock()
+        writer.flush()
+        file_handle.write.assert_not_called()
+
+    def test_write_header(self):
+        # Tests the function writing the header of a GAF file
+        file_handle = unittest.mock.Mock()
+        gaf.GAFWriter(file_handle, "1.0").write_header("testdb")
+        file_handle.write.assert_called_with("!gaf-version: 1.0\n")
+        gaf.GAFWriter(file_handle, "2.2").write_header("testdb")
+        header = file_handle.write.call_args[0][0].splitlines()
+        self.assertEqual(header[:2], ["!gaf-version: 2.2", "!generated-by: testdb"])
+        self.assertTrue(header[2].startswith("!date-generated: "))
+        with self.assertRaises(ValueError):
+            gaf.GAFWriter(file_handle, "3.0")
+
+    def test_format_record(self):
+        # Tests the function that converts a GAF record into a line with the columns of a GAF version
+        gaf_record = self.default_record()
+        line = gaf.GAFWriter(None, "1.0").format_record(gaf_record)
+        self.assertEqual(line, "testdb\tgene1\tgenename\t\tGO:0001\tPMID:1|GO_REF:0001\tIDA\tInterPro:IPR1\tP\t"
+                               "someproduct\ts1|s2\tgene\ttaxon:123\t20200101\tsomedb\n")
+        line = gaf.GAFWriter(None, "2.1").format_record(gaf_record)
+        self.assertEqual(line.split("\t")[3], "")
+        self.assertTrue(line.endswith("\tsomedb\t\t\n"))
+        line = gaf.GAFWriter(None, "2.2").format_record(gaf_record)
+        self.assertEqual(line.split("\t")[3], "involved_in")
+        self.assertEqual(len(line.split("\t")), 17)
+        self.assertIsNone(gaf_record["Qualifier"])
+
+    def test_format_column(self):
+        # Tests the function that converts the value of a GAF column into a string
+        self.assertEqual(gaf.GAFWriter.format_column("bbb"), "bbb")
+        self.assertEqual(gaf.GAFWriter.format_column(["a", "bbb"]), "a|bbb")
+        self.assertEqual(gaf.GAFWriter.format_column([]), "")
+        self.assertEqual(gaf.GAFWriter.format_column(None), "")
+
+    def test_format_relation(self):
+        # Tests the function that creates the 'Qualifier' column of a GAF 2.2 record
+        writer = gaf.GAFWriter(None, "2.2")
+        self.assertEqual(writer.format_relation({"Qualifier": None, "Aspect": "F"}), "enables")
+        self.assertEqual(writer.format_relation({"Qualifier": "NOT", "Aspect": "C"}), "NOT|located_in")
+        self.assertEqual(writer.format_relation({"Qualifier": ["NOT", "part_of"], "Aspect": "C"}), "NOT|part_of")
+        self.assertEqual(writer.format_relation({"Qualifier": "contributes_to", "Aspect": "F"}), "contributes_to")
+
+
 class TestGAFFunctions(unittest.TestCase):
     """Tests various general functions used in connection with GAF import/export"""
 
@@ -552,11 +955,16 @@ class TestGAFFunctions(unittest.TestCase):
     def test_extract_feature_type(self, mock_query: unittest.mock.Mock):
         # Tests the function that extracts the type of a feature by a database query
         self.assertIs(mock_query, self.client.query_first)
+        self.client._feature_type_names.clear()
         feature_entry = sequence.Feature(organism_id=11, type_id=200, uniquename="testname", feature_id=12)
         mock_query.return_value = cv.CvTerm(cv_id=1, dbxref_id=2, name="sometype")
         featuretype = self.client._extract_feature_type(feature_entry)
         mock_query.assert_called_with(cv.CvTerm, cvterm_id=200)
         self.assertEqual(featuretype, "sometype")
+        mock_query.reset_mock()
+        featuretype = self.client._extract_feature_type(feature_entry)
+        mock_query.assert_not_called()
+        self.assertEqual(featuretype, "sometype")
 
     @unittest.mock.patch("pychado.io.gaf.GAFClient._extract_feature_type")
     def test_is_featuretype_valid(self, mock_extract: unittest.mock.Mock):
@@ -568,167 +976,125 @@ class TestGAFFunctions(unittest.TestCase):
         mock_extract.return_value = "chromosome"
         self.assertFalse(self.client._is_featuretype_valid(feature_entry))
 
-    @unittest.mock.patch("pychado.io.gaf.GAFClient._extract_polypeptide_of_feature")
-    @unittest.mock.patch("pychado.io.gaf.GAFClient._extract_transcript_of_feature")
-    @unittest.mock.patch("pychado.io.gaf.GAFClient._extract_gene_of_feature")
-    def test_extract_requested_feature(self, mock_gene: unittest.mock.Mock, mock_transcript: unittest.mock.Mock,
-                                       mock_polypeptide: unittest.mock.Mock):
+    @unittest.mock.patch("pychado.io.gaf.GAFClient._extract_related_feature")
+    def test_extract_requested_feature(self, mock_related: unittest.mock.Mock):
         # Tests the function that extracts a feature of a requested type from the database
-        self.assertIs(mock_gene, self.client._extract_gene_of_feature)
-        self.assertIs(mock_transcript, self.client._extract_transcript_of_feature)
-        self.assertIs(mock_polypeptide, self.client._extract_polypeptide_of_feature)
+        self.assertIs(mock_related, self.client._extract_related_feature)
         feature_entry = sequence.Feature(organism_id=11, type_id=200, uniquename="testname", feature_id=12)
+        other_feature_entry = sequence.Feature(organism_id=11, type_id=300, uniquename="othername", feature_id=13)
 
-        self.client._extract_requested_feature(feature_entry, "gene")
-        mock_gene.assert_called_with(feature_entry)
-        mock_transcript.assert_not_called()
-        mock_polypeptide.assert_not_called()
-
-        mock_gene.reset_mock()
-        self.client._extract_requested_feature(feature_entry, "transcript")
-        mock_gene.assert_not_called()
-        mock_transcript.assert_called_with(feature_entry)
-        mock_polypeptide.assert_not_called()
+        for annotation_level in ["gene", "transcript", "protein"]:
+            mock_related.reset_mock()
+            mock_related.return_value = other_feature_entry
+            requested_feature = self.client._extract_requested_feature(feature_entry, annotation_level)
+            mock_related.assert_called_with(feature_entry, annotation_level)
+            self.assertIs(requested_feature, other_feature_entry)
 
-        mock_transcript.reset_mock()
-        self.client._extract_requested_feature(feature_entry, "protein")
-        mock_gene.assert_not_called()
-        mock_transcript.assert_not_called()
-        mock_polypeptide.assert_called_with(feature_entry)
+        mock_related.return_value = None
+        requested_feature = self.client._extract_requested_feature(feature_entry, "gene")
+        self.assertIs(requested_feature, feature_entry)
 
-        mock_polypeptide.reset_mock()
+        mock_related.reset_mock()
         requested_feature = self.client._extract_requested_feature(feature_entry, "default")
-        mock_gene.assert_not_called()
-        mock_transcript.assert_not_called()
-        mock_polypeptide.assert_not_called()
+        mock_related.assert_not_called()
         self.assertIs(requested_feature, feature_entry)
 
-    @unittest.mock.patch("pychado.io.gaf.GAFClient.query_parent_features")
-    @unittest.mock.patch("pychado.io.gaf.GAFClient._extract_feature_type")
-    def test_extract_gene_of_feature(self, mock_type: unittest.mock.Mock, mock_parent: unittest.mock.Mock):
+    @unittest.mock.patch("pychado.io.gaf.GAFClient._extract_related_feature")
+    def test_extract_gene_of_feature(self, mock_related: unittest.mock.Mock):
         # Tests the function that extracts the gene associated with a feature from the database
-        self.assertIs(mock_type, self.client._extract_feature_type)
-        self.assertIs(mock_parent, self.client.query_parent_features)
+        self.assertIs(mock_related, self.client._extract_related_feature)
         feature_entry = sequence.Feature(organism_id=11, type_id=200, uniquename="testname", feature_id=12)
-        other_feature_entry = sequence.Feature(organism_id=11, type_id=300, uniquename="othername", feature_id=13)
+        self.client._extract_gene_of_feature(feature_entry)
+        mock_related.assert_called_with(feature_entry, "gene")
 
-        # Feature is a gene - return input
-        mock_type.return_value = "gene"
-        gene_entry = self.client._extract_gene_of_feature(feature_entry)
-        mock_type.assert_called_with(feature_entry)
-        mock_parent.assert_not_called()
-        self.assertIs(gene_entry, feature_entry)
-
-        # Feature is a transcript - return parent
-        mock_type.return_value = "tRNA"
-        mock_parent.reset_mock()
-        mock_parent.return_value.configure_mock(**{"first.return_value": other_feature_entry})
-        gene_entry = self.client._extract_gene_of_feature(feature_entry)
-        mock_parent.assert_called_with(12, [91])
-        self.assertIs(gene_entry, other_feature_entry)
-
-        # Feature is a polypeptide - return grandparent
-        mock_type.return_value = "polypeptide"
-        mock_parent.reset_mock()
-        gene_entry = self.client._extract_gene_of_feature(feature_entry)
-        mock_parent.assert_called_with(13, [91])
-        self.assertIn(unittest.mock.call(12, [92]), mock_parent.mock_calls)
-        self.assertIs(gene_entry, other_feature_entry)
-
-        # Feature is something else - return None
-        mock_type.return_value = "chromosome"
-        mock_parent.reset_mock()
-        gene_entry = self.client._extract_gene_of_feature(feature_entry)
-        mock_parent.assert_not_called()
-        self.assertIsNone(gene_entry)
-
-    @unittest.mock.patch("pychado.io.gaf.GAFClient.query_child_features")
-    @unittest.mock.patch("pychado.io.gaf.GAFClient.query_parent_features")
+    @unittest.mock.patch("pychado.io.gaf.GAFClient._load_feature_by_id")
+    @unittest.mock.patch("pychado.io.gaf.GAFClient._load_annotation_level_index")
     @unittest.mock.patch("pychado.io.gaf.GAFClient._extract_feature_type")
-    def test_extract_transcript_of_feature(self, mock_type: unittest.mock.Mock, mock_parent: unittest.mock.Mock,
-                                           mock_child: unittest.mock.Mock):
-        # Tests the function that extracts the transcript associated with a feature from the database
+    def test_extract_related_feature(self, mock_type: unittest.mock.Mock, mock_index: unittest.mock.Mock,
+                                     mock_load: unittest.mock.Mock):
+        # Tests the function that extracts the gene, transcript or polypeptide associated with a feature
         self.assertIs(mock_type, self.client._extract_feature_type)
-        self.assertIs(mock_parent, self.client.query_parent_features)
-        self.assertIs(mock_child, self.client.query_child_features)
+        self.assertIs(mock_index, self.client._load_annotation_level_index)
+        self.assertIs(mock_load, self.client._load_feature_by_id)
         feature_entry = sequence.Feature(organism_id=11, type_id=200, uniquename="testname", feature_id=12)
         other_feature_entry = sequence.Feature(organism_id=11, type_id=300, uniquename="othername", feature_id=13)
+        mock_index.return_value = gaf.AnnotationLevelIndex([(12, "testname", 13, "othername", 91)])
+        mock_load.return_value = other_feature_entry
+
+        # Feature is a transcript - return the transcript itself and the gene loaded from the database
+        mock_type.return_value = "mRNA"
+        self.assertIs(self.client._extract_related_feature(feature_entry, "transcript"), feature_entry)
+        mock_index.assert_called_with(11)
+        mock_load.assert_not_called()
+        self.assertIs(self.client._extract_related_feature(feature_entry, "gene"), other_feature_entry)
+        mock_load.assert_called_with(13)
+
+        # No polypeptide associated with the transcript - return None
+        mock_load.reset_mock()
+        self.assertIsNone(self.client._extract_related_feature(feature_entry, "protein"))
+        mock_load.assert_not_called()
+
+    def test_annotation_level_index(self):
+        # Tests the index of relationships between genes, transcripts and polypeptides
+        index = gaf.AnnotationLevelIndex([(13, "transcript_b", 11, "gene", 91), (12, "transcript_a", 11, "gene", 91),
+                                          (14, "polypeptide", 13, "transcript_b", 92)])
+        self.assertEqual(index.child(11, 91), 12)
+        self.assertEqual(index.parent(13, 91), 11)
+        self.assertEqual(index.child(13, 92), 14)
+        self.assertEqual(index.parent(14, 92), 13)
+        self.assertIsNone(index.child(11, 92))
+        self.assertIsNone(index.parent(11, 91))
+        self.assertIsNone(index.child(None, 91))
+
+    def test_feature_cvterm_index(self):
+        # Tests the index of existing feature_cvterm entries
+        first_entry = sequence.FeatureCvTerm(feature_id=12, cvterm_id=55, pub_id=66, rank=0)
+        second_entry = sequence.FeatureCvTerm(feature_id=12, cvterm_id=55, pub_id=67, rank=0)
+        index = gaf.FeatureCvTermIndex([first_entry, second_entry])
+        self.assertEqual(len(index), 2)
+        self.assertIn((12, 55, 67, 0), index)
+        self.assertNotIn((12, 55, 67, 1), index)
+        self.assertIs(index.find(sequence.FeatureCvTerm(feature_id=12, cvterm_id=55, pub_id=67)), second_entry)
+        self.assertIs(index.find(sequence.FeatureCvTerm(feature_id=12, cvterm_id=55, pub_id=68)), first_entry)
+        self.assertIsNone(index.find(sequence.FeatureCvTerm(feature_id=13, cvterm_id=55, pub_id=66)))
+
+    def test_find_related_feature_id(self):
+        # Tests the function that finds the gene, transcript or polypeptide of a feature in an annotation level index
+        index = gaf.AnnotationLevelIndex([(12, "transcript", 11, "gene", 91),
+                                          (13, "polypeptide", 12, "transcript", 92)])
+        for feature_id, featuretype in [(11, "gene"), (12, "tRNA"), (13, "polypeptide")]:
+            self.assertEqual(self.client._find_related_feature_id(index, feature_id, featuretype, "gene"), 11)
+            self.assertEqual(self.client._find_related_feature_id(index, feature_id, featuretype, "transcript"), 12)
+            self.assertEqual(self.client._find_related_feature_id(index, feature_id, featuretype, "protein"), 13)
+        self.assertIsNone(self.client._find_related_feature_id(index, 11, "chromosome", "gene"))
+        self.assertIsNone(self.client._find_related_feature_id(index, 14, "gene", "protein"))
+        self.assertIsNone(self.client._find_related_feature_id(index, 14, "polypeptide", "gene"))
+
+    @unittest.mock.patch("pychado.io.gaf.GAFClient.query_feature_relationships_by_organism")
+    def test_load_annotation_level_index(self, mock_query: unittest.mock.Mock):
+        # Tests the function that loads the relationships between genes, transcripts and polypeptides of an organism
+        self.assertIs(mock_query, self.client.query_feature_relationships_by_organism)
+        self.client._annotation_level_indices.clear()
+        mock_query.return_value.configure_mock(**{"all.return_value": [(12, "transcript", 11, "gene", 91)]})
+        index = self.client._load_annotation_level_index(21)
+        mock_query.assert_called_with(21, [91, 92])
+        self.assertEqual(index.parent(12, 91), 11)
+        mock_query.reset_mock()
+        self.assertIs(self.client._load_annotation_level_index(21), index)
+        mock_query.assert_not_called()
 
-        # Feature is a transcript - return input
-        mock_type.return_value = "tRNA"
-        transcript_entry = self.client._extract_transcript_of_feature(feature_entry)
-        mock_type.assert_called_with(feature_entry)
-        mock_parent.assert_not_called()
-        mock_child.assert_not_called()
-        self.assertIs(transcript_entry, feature_entry)
-
-        # Feature is a polypeptide - return parent
-        mock_type.return_value = "polypeptide"
-        mock_parent.reset_mock()
-        mock_child.reset_mock()
-        mock_parent.return_value.configure_mock(**{"first.return_value": other_feature_entry})
-        transcript_entry = self.client._extract_transcript_of_feature(feature_entry)
-        mock_parent.assert_called_with(12, [92])
-        mock_child.assert_not_called()
-        self.assertIs(transcript_entry, other_feature_entry)
-
-        # Feature is a gene - return child
-        mock_type.return_value = "gene"
-        mock_parent.reset_mock()
-        mock_child.reset_mock()
-        mock_child.return_value.configure_mock(**{"first.return_value": other_feature_entry})
-        transcript_entry = self.client._extract_transcript_of_feature(feature_entry)
-        mock_parent.assert_not_called()
-        mock_child.assert_called_with(12, 91)
-        self.assertIs(transcript_entry, other_feature_entry)
-
-        # Feature is something else - return None
-        mock_type.return_value = "chromosome"
-        mock_parent.reset_mock()
-        mock_child.reset_mock()
-        transcript_entry = self.client._extract_transcript_of_feature(feature_entry)
-        mock_parent.assert_not_called()
-        mock_child.assert_not_called()
-        self.assertIsNone(transcript_entry)
-
-    @unittest.mock.patch("pychado.io.gaf.GAFClient.query_child_features")
-    @unittest.mock.patch("pychado.io.gaf.GAFClient._extract_feature_type")
-    def test_extract_polypeptide_of_feature(self, mock_type: unittest.mock.Mock, mock_child: unittest.mock.Mock):
-        # Tests the function that extracts the polypeptide associated with a feature from the database
-        self.assertIs(mock_type, self.client._extract_feature_type)
-        self.assertIs(mock_child, self.client.query_child_features)
+    @unittest.mock.patch("pychado.io.gaf.GAFClient.query_first")
+    def test_load_feature_by_id(self, mock_query: unittest.mock.Mock):
+        # Tests the function that loads a feature from the database, unless done before
+        self.assertIs(mock_query, self.client.query_first)
+        self.client._feature_entries.clear()
         feature_entry = sequence.Feature(organism_id=11, type_id=200, uniquename="testname", feature_id=12)
-        other_feature_entry = sequence.Feature(organism_id=11, type_id=300, uniquename="othername", feature_id=13)
-
-        # Feature is a polypeptide - return input
-        mock_type.return_value = "polypeptide"
-        protein_entry = self.client._extract_polypeptide_of_feature(feature_entry)
-        mock_type.assert_called_with(feature_entry)
-        mock_child.assert_not_called()
-        self.assertIs(protein_entry, feature_entry)
-
-        # Feature is a transcript - return child
-        mock_type.return_value = "tRNA"
-        mock_child.reset_mock()
-        mock_child.return_value.configure_mock(**{"first.return_value": other_feature_entry})
-        protein_entry = self.client._extract_polypeptide_of_feature(feature_entry)
-        mock_child.assert_called_with(12, 92)
-        self.assertIs(protein_entry, other_feature_entry)
-
-        # Feature is a gene - return grandchild
-        mock_type.return_value = "gene"
-        mock_child.reset_mock()
-        protein_entry = self.client._extract_polypeptide_of_feature(feature_entry)
-        mock_child.assert_called_with(13, 92)
-        self.assertIn(unittest.mock.call(12, 91), mock_child.mock_calls)
-        self.assertIs(protein_entry, other_feature_entry)
-
-        # Feature is something else - return None
-        mock_type.return_value = "chromosome"
-        mock_child.reset_mock()
-        protein_entry = self.client._extract_polypeptide_of_feature(feature_entry)
-        mock_child.assert_not_called()
-        self.assertIsNone(protein_entry)
+        mock_query.return_value = feature_entry
+        self.assertIs(self.client._load_feature_by_id(12), feature_entry)
+        mock_query.assert_called_with(sequence.Feature, feature_id=12)
+        mock_query.reset_mock()
+        self.assertIs(self.client._load_feature_by_id(12), feature_entry)
+        mock_query.assert_not_called()
 
     def test_convert_evidence_code(self):
         # Tests the function converting a GO evidence code abbreviation into the spelled-out form
@@ -541,6 +541,7 @@ class TestGFFImport(unittest.TestCase):
         self.assertEqual(feature.name, "testname")
         self.assertEqual(feature.residues, "MCRA")
         self.assertEqual(feature.seqlen, 4)
+        self.assertEqual(feature.md5checksum, utils.md5_checksum("MCRA"))
 
     def test_create_featureloc(self):
         # Tests the function that creates an entry for the 'featureloc' table
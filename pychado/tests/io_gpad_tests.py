@@ -0,0 +1,255 @@
+import unittest.mock
+import os
+import io
+import tempfile
+from contextlib import redirect_stdout
+from .. import utils
+from ..io import gaf, gpad
+
+
+class TestGPADReader(unittest.TestCase):
+    """Tests the readers for GPAD and GPI files"""
+
+    gpad_lines = "!gpad-version: 1.1\n" \
+                 "testdb\tgene1\tNOT|enables\tGO:0001\tPMID:1|GO_REF:0001\tECO:0000314\t\t\t20200101\tsomedb\t\t" \
+                 "go_evidence=IDA|contributor=someone\n" \
+                 "\n" \
+                 "testdb\tgene2\tinvolved_in\tGO:0002\tGO_REF:0002\tECO:0000501\tInterPro:IPR1\t\t20200102\tsomedb\n"
+
+    gpi_lines = "!gpi-version: 1.2\n" \
+                "testdb\tgene1\tgenename\tsomeproduct\ts1|s2\tprotein\ttaxon:123\t\t\t\n"
+
+    def write_file(self, content: str) -> str:
+        # Writes a temporary file with the given content and returns its name
+        filename = tempfile.mkstemp()[1]
+        with open(filename, "w") as f:
+            f.write(content)
+        self.addCleanup(os.remove, filename)
+        return filename
+
+    def test_parse_gpad(self):
+        # Tests that the lines of a GPAD file are converted into dictionaries, padding missing trailing columns
+        records = list(gpad.parse_gpad(self.write_file(self.gpad_lines)))
+        self.assertEqual(len(records), 2)
+        self.assertEqual(records[0]["Qualifier"], ["NOT", "enables"])
+        self.assertEqual(records[0]["DB:Reference"], ["PMID:1", "GO_REF:0001"])
+        self.assertEqual(records[0]["With"], [])
+        self.assertEqual(records[0]["Annotation_Properties"], ["go_evidence=IDA", "contributor=someone"])
+        self.assertEqual(records[1]["With"], ["InterPro:IPR1"])
+        self.assertEqual(records[1]["Annotation_Extension"], "")
+        self.assertEqual(records[1]["Annotation_Properties"], [])
+
+    def test_parse_gpi(self):
+        # Tests that the lines of a GPI file are converted into dictionaries
+        records = list(gpad.parse_gpi(self.write_file(self.gpi_lines)))
+        self.assertEqual(len(records), 1)
+        self.assertEqual(records[0]["DB_Object_Symbol"], "genename")
+        self.assertEqual(records[0]["Synonym"], ["s1", "s2"])
+        self.assertEqual(records[0]["Taxon_ID"], "taxon:123")
+        self.assertEqual(records[0]["DB_Xref"], [])
+
+    def test_check_version(self):
+        # Tests that unsupported versions of GPAD and GPI files are rejected
+        gpad.check_version("!gpad-version: 1.1\n", "gpad")
+        gpad.check_version("!gpi-version: 2.0\n", "gpad")
+        with self.assertRaises(ValueError):
+            gpad.check_version("!gpad-version: 2.0\n", "gpad")
+        with self.assertRaises(ValueError):
+            gpad.check_version("!gpi-version: 2.0\n", "gpi")
+
+    def test_parse_properties(self):
+        # Tests the conversion of 'key=value' pairs into a dictionary
+        properties = gpad.parse_properties(["go_evidence=IDA", "invalid", "go_evidence=IEA", "id = 1"])
+        self.assertEqual(properties, {"go_evidence": "IDA", "id": "1"})
+
+    def test_evidence_codes(self):
+        # Tests that all GO evidence codes are mapped to distinct ECO terms
+        self.assertEqual(set(gpad.EVIDENCE_CODES_TO_ECO_TERMS),
+                         set(gaf.GAFClient._abbreviations_to_evidence_codes()))
+        self.assertEqual(len(gpad.ECO_TERMS_TO_EVIDENCE_CODES), len(gpad.EVIDENCE_CODES_TO_ECO_TERMS))
+
+
+class TestGPADWriter(unittest.TestCase):
+    """Tests the streaming writers for GPAD and GPI files"""
+
+    def test_write_header(self):
+        # Tests the functions writing the headers of GPAD and GPI files
+        file_handle = unittest.mock.Mock()
+        gpad.GPADWriter(file_handle).write_header("testdb")
+        header = file_handle.write.call_args[0][0].splitlines()
+        self.assertEqual(header[:2], ["!gpad-version: 1.1", "!generated-by: testdb"])
+        gpad.GPIWriter(file_handle).write_header("testdb")
+        header = file_handle.write.call_args[0][0].splitlines()
+        self.assertEqual(header[:2], ["!gpi-version: 1.2", "!generated-by: testdb"])
+        with self.assertRaises(ValueError):
+            gpad.GPADWriter(file_handle, "2.0")
+
+    def test_format_record(self):
+        # Tests the functions that convert records into lines of GPAD and GPI files
+        record = {"DB": "testdb", "DB_Object_ID": "gene1", "Qualifier": "NOT", "GO_ID": "GO:0001",
+                  "DB:Reference": ["PMID:1"], "Evidence": "ECO:0000314", "With": [], "Date": "20200101",
+                  "Assigned_By": "somedb", "Annotation_Properties": "go_evidence=IDA", "Aspect": "C",
+                  "DB_Object_Symbol": "genename", "Synonym": "s1|s2", "DB_Object_Type": "protein"}
+        line = gpad.GPADWriter(None).format_record(record)
+        self.assertEqual(line, "testdb\tgene1\tNOT|located_in\tGO:0001\tPMID:1\tECO:0000314\t\t\t20200101\tsomedb"
+                               "\t\tgo_evidence=IDA\n")
+        line = gpad.GPIWriter(None).format_record(record)
+        self.assertEqual(line, "testdb\tgene1\tgenename\t\ts1|s2\tprotein\t\t\t\t\n")
+
+
+class TestGPADImport(unittest.TestCase):
+    """Tests various functions used to load GPAD/GPI files into a database"""
+
+    @classmethod
+    def setUpClass(cls):
+        # Creates an instance of the class to be tested
+        cls.client = gpad.GPADImportClient("testuri", test_environment=True)
+        cls.client.printer = utils.VerbosePrinter(False)
+
+    def setUp(self):
+        # Creates a default GPAD record
+        self.default_gpad_record = {"DB": "testdb", "DB_Object_ID": "gene1", "Qualifier": ["NOT", "enables"],
+                                    "GO_ID": "GO:0001", "DB:Reference": ["PMID:1"], "Evidence": "ECO:0000314",
+                                    "With": ["InterPro:IPR1"], "Interacting_Taxon_ID": "", "Date": "20200101",
+                                    "Assigned_By": "somedb", "Annotation_Extension": "",
+                                    "Annotation_Properties": []}
+
+    @unittest.mock.patch("pychado.io.gpad.GPADImportClient._load_gaf_records")
+    @unittest.mock.patch("pychado.io.gpad.parse_gpad")
+    @unittest.mock.patch("pychado.io.gpad.GPADImportClient._load_gpi_entities")
+    def test_load(self, mock_entities: unittest.mock.Mock, mock_parse: unittest.mock.Mock,
+                  mock_load: unittest.mock.Mock):
+        # Tests that the GPI entities are loaded once and the merged records are imported like GAF records
+        self.assertIs(mock_entities, gpad.GPADImportClient._load_gpi_entities)
+        self.assertIs(mock_parse, gpad.parse_gpad)
+        self.assertIs(mock_load, gpad.GPADImportClient._load_gaf_records)
+        mock_entities.return_value = {("testdb", "gene1"): {"DB_Object_Symbol": "genename"}}
+        mock_parse.return_value = [self.default_gpad_record]
+        self.client.load("testgpad", "testgpi", "testorganism", "protein", 100)
+        mock_entities.assert_called_once_with("testgpi")
+        mock_parse.assert_called_once_with("testgpad")
+        mock_load.assert_called_once()
+        gaf_records, organism_name, annotation_level, batch_size, cache_directory = mock_load.call_args[0]
+        self.assertEqual(list(gaf_records)[0]["DB_Object_Symbol"], "genename")
+        self.assertEqual((organism_name, annotation_level, batch_size, cache_directory),
+                         ("testorganism", "protein", 100, ""))
+
+    @unittest.mock.patch("pychado.io.gpad.parse_gpi")
+    def test_load_gpi_entities(self, mock_parse: unittest.mock.Mock):
+        # Tests that GPI entities are keyed by database authority and object ID
+        self.assertIs(mock_parse, gpad.parse_gpi)
+        mock_parse.return_value = [{"DB": "testdb", "DB_Object_ID": "gene1", "DB_Object_Symbol": "a"},
+                                   {"DB": "testdb", "DB_Object_ID": "gene1", "DB_Object_Symbol": "b"},
+                                   {"DB": "otherdb", "DB_Object_ID": "gene1", "DB_Object_Symbol": "c"}]
+        entities = self.client._load_gpi_entities("testgpi")
+        self.assertEqual(len(entities), 2)
+        self.assertEqual(entities[("testdb", "gene1")]["DB_Object_Symbol"], "a")
+        self.assertEqual(self.client._load_gpi_entities(""), {})
+        mock_parse.assert_called_once_with("testgpi")
+
+    def test_convert_gpad_records(self):
+        # Tests the conversion of GPAD records into GAF records with the information of the GPI entities
+        entities = {("testdb", "gene1"): {"DB_Object_Symbol": "genename", "DB_Object_Name": "someproduct",
+                                          "Synonym": ["s1", "s2"], "DB_Object_Type": "protein",
+                                          "Taxon_ID": "taxon:123"}}
+        other_record = dict(self.default_gpad_record, DB_Object_ID="gene2")
+        gaf_records = list(self.client._convert_gpad_records([self.default_gpad_record, other_record], entities))
+        self.assertEqual(len(gaf_records), 2)
+        self.assertEqual(gaf_records[0]["DB_Object_Symbol"], "genename")
+        self.assertEqual(gaf_records[0]["DB_Object_Name"], "someproduct")
+        self.assertEqual(gaf_records[0]["Synonym"], ["s1", "s2"])
+        self.assertEqual(gaf_records[0]["Taxon_ID"], "taxon:123")
+        self.assertEqual(gaf_records[0]["Evidence"], "IDA")
+        self.assertEqual(gaf_records[0]["Qualifier"], ["NOT", "enables"])
+        self.assertEqual(gaf_records[0]["With"], ["InterPro:IPR1"])
+        self.assertEqual(gaf_records[1]["DB_Object_Symbol"], "")
+        self.assertEqual(gaf_records[1]["Synonym"], [])
+
+    def test_extract_evidence_code(self):
+        # Tests the extraction of the GO evidence code from a GPAD record
+        self.assertEqual(self.client._extract_evidence_code(self.default_gpad_record), "IDA")
+        self.default_gpad_record["Annotation_Properties"] = ["go_evidence=IEA"]
+        self.assertEqual(self.client._extract_evidence_code(self.default_gpad_record), "IEA")
+        self.default_gpad_record["Annotation_Properties"] = []
+        self.default_gpad_record["Evidence"] = "ECO:9999999"
+        self.assertEqual(self.client._extract_evidence_code(self.default_gpad_record), "")
+
+    def test_convert_gpad_records_with_unmapped_evidence(self):
+        # Tests that records with an ECO term without corresponding GO evidence code are skipped and counted
+        unmapped_record = dict(self.default_gpad_record, DB_Object_ID="gene2", Evidence="ECO:9999999")
+        with redirect_stdout(io.StringIO()) as output:
+            gaf_records = list(self.client._convert_gpad_records([self.default_gpad_record, unmapped_record,
+                                                                  unmapped_record], {}))
+        self.assertEqual([gaf_record["DB_Object_ID"] for gaf_record in gaf_records], ["gene1"])
+        self.assertEqual(self.client._unmapped_evidence_terms, {"ECO:9999999": 2})
+        self.assertIn("Skipped 2 records", output.getvalue())
+
+
+class TestGPADExport(unittest.TestCase):
+    """Tests various functions used to export GPAD/GPI files from a database"""
+
+    @classmethod
+    def setUpClass(cls):
+        # Creates an instance of the class to be tested
+        cls.client = gpad.GPADExportClient("testuri", test_environment=True)
+        cls.client.printer = utils.VerbosePrinter(False)
+
+    def setUp(self):
+        # Creates a default GAF record
+        self.default_gaf_record = {"DB": "testdb", "DB_Object_ID": "gene1", "DB_Object_Symbol": "genename",
+                                   "Qualifier": None, "GO_ID": "GO:0001", "DB:Reference": ["PMID:1"],
+                                   "Evidence": "IDA", "With": [], "Aspect": "P", "DB_Object_Name": "someproduct",
+                                   "Synonym": "s1|s2", "DB_Object_Type": "gene", "Taxon_ID": "taxon:123",
+                                   "Date": "20200101", "Assigned_By": "somedb", "Annotation_Extension": None,
+                                   "Gene_Product_Form_ID": None}
+
+    @unittest.mock.patch("pychado.io.gpad.GPADExportClient._create_gaf_records_of_organism")
+    def test_export_gpad(self, mock_records: unittest.mock.Mock):
+        # Tests the export of GO annotations to a GPAD file
+        self.assertIs(mock_records, gpad.GPADExportClient._create_gaf_records_of_organism)
+        mock_records.return_value = iter([self.default_gaf_record])
+        gpad_file = tempfile.mkstemp()[1]
+        self.client.export_gpad(gpad_file, "testorganism", "testdb", "gene", True)
+        mock_records.assert_called_once_with("testorganism", "testdb", "gene", True)
+        with open(gpad_file) as f:
+            lines = f.read().splitlines()
+        os.remove(gpad_file)
+        self.assertEqual(lines[0], "!gpad-version: 1.1")
+        self.assertEqual(lines[-1], "testdb\tgene1\tinvolved_in\tGO:0001\tPMID:1\tECO:0000314\t\t\t20200101\tsomedb"
+                                    "\t\tgo_evidence=IDA")
+
+    @unittest.mock.patch("pychado.io.gpad.GPADExportClient._create_gaf_records_of_organism")
+    def test_export_gpi(self, mock_records: unittest.mock.Mock):
+        # Tests the export of annotated gene products to a GPI file
+        self.assertIs(mock_records, gpad.GPADExportClient._create_gaf_records_of_organism)
+        mock_records.return_value = iter([self.default_gaf_record, self.default_gaf_record])
+        gpi_file = tempfile.mkstemp()[1]
+        self.client.export_gpi(gpi_file, "testorganism", "testdb", "default")
+        mock_records.assert_called_once_with("testorganism", "testdb", "default", False)
+        with open(gpi_file) as f:
+            lines = f.read().splitlines()
+        os.remove(gpi_file)
+        self.assertEqual(lines[0], "!gpi-version: 1.2")
+        self.assertEqual(lines[-1], "testdb\tgene1\tgenename\tsomeproduct\ts1|s2\tgene\ttaxon:123\t\t\t")
+        self.assertEqual(len([line for line in lines if not line.startswith("!")]), 1)
+
+    def test_create_gpad_record(self):
+        # Tests the conversion of a GAF record into a GPAD record
+        gpad_record = self.client._create_gpad_record(self.default_gaf_record)
+        self.assertEqual(gpad_record["Evidence"], "ECO:0000314")
+        self.assertEqual(gpad_record["Annotation_Properties"], "go_evidence=IDA")
+        self.assertEqual(gpad_record["Aspect"], "P")
+        self.assertIsNone(gpad_record["Interacting_Taxon_ID"])
+        self.assertEqual(gpad_record["DB:Reference"], ["PMID:1"])
+
+    def test_create_gpi_records(self):
+        # Tests that a GPI record is created for each distinct gene product
+        other_record = dict(self.default_gaf_record, DB_Object_ID="gene2")
+        gpi_records = list(self.client._create_gpi_records([self.default_gaf_record, other_record,
+                                                             self.default_gaf_record]))
+        self.assertEqual([record["DB_Object_ID"] for record in gpi_records], ["gene1", "gene2"])
+        self.assertEqual(set(gpi_records[0]), set(gpad.GPI12FIELDS))
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2, buffer=True)
@@ -0,0 +1,117 @@
+import os
+import shutil
+import tempfile
+import unittest
+import unittest.mock
+from .. import dbutils, utils
+from ..io import iobase, lookup, essentials
+from ..orm import base, general, cv
+
+
+class TestOntologyLookup(unittest.TestCase):
+    """Tests the lookup tables for CV terms"""
+
+    def test_lookup(self):
+        # Tests the lookup of CV terms by ID, name and accession, and of their relationships
+        terms = [lookup.LookupTerm(11, "root", "testcv", "testdb", "0001"),
+                 lookup.LookupTerm(12, "leaf", "testcv", "testdb", "0002"),
+                 lookup.LookupTerm(13, "leaf", "othercv", "otherdb", "0002")]
+        ontology_lookup = lookup.OntologyLookup(terms, [(12, 11, 1), (13, 11, 2)])
+        self.assertEqual(len(ontology_lookup), 3)
+        self.assertEqual(ontology_lookup.term(12), terms[1])
+        self.assertIsNone(ontology_lookup.term(14))
+        self.assertEqual(ontology_lookup.term_id("leaf", "othercv"), 13)
+        self.assertIsNone(ontology_lookup.term_id("leaf", "nonexistent_cv"))
+        self.assertEqual(ontology_lookup.accession_id("testdb", "0002"), 12)
+        self.assertIsNone(ontology_lookup.accession_id("testdb", "0003"))
+        self.assertEqual(ontology_lookup.terms_of_db("otherdb"), {"0002": terms[2]})
+        self.assertEqual(ontology_lookup.terms_of_db("nonexistent_db"), {})
+        self.assertEqual(ontology_lookup.parents(12), [(11, 1)])
+        self.assertEqual(ontology_lookup.parents(11), [])
+        self.assertEqual(ontology_lookup.children(11), [(12, 1), (13, 2)])
+
+    def test_lookup_cache(self):
+        # Tests that lookup tables are only read from a cache file with matching signature
+        cache_directory = tempfile.mkdtemp()
+        filename = os.path.join(cache_directory, "lookup.pickle")
+        ontology_lookup = lookup.OntologyLookup([lookup.LookupTerm(11, "root", "testcv", "testdb", "0001")], [])
+        self.assertIsNone(lookup.read_lookup_cache(filename, (1, 11, 0, None)))
+        lookup.write_lookup_cache(filename, (1, 11, 0, None), ontology_lookup)
+        cached_lookup = lookup.read_lookup_cache(filename, (1, 11, 0, None))
+        self.assertEqual(cached_lookup.term_id("root", "testcv"), 11)
+        self.assertIsNone(lookup.read_lookup_cache(filename, (2, 12, 0, None)))
+        with open(filename, "wb") as cache:
+            cache.write(b"corrupted")
+        self.assertIsNone(lookup.read_lookup_cache(filename, (1, 11, 0, None)))
+        shutil.rmtree(cache_directory)
+
+
+class TestLoadLookup(unittest.TestCase):
+    """Tests building lookup tables from the CV terms of a database"""
+
+    connection_parameters = utils.parse_yaml(dbutils.default_configuration_file())
+    connection_uri = dbutils.random_database_uri(connection_parameters)
+
+    @classmethod
+    def setUpClass(cls):
+        # Creates a database, establishes a connection, creates tables and populates them with essential entries
+        dbutils.create_database(cls.connection_uri)
+        schema_metadata = base.PublicBase.metadata
+        essentials_client = essentials.EssentialsClient(cls.connection_uri)
+        schema_metadata.create_all(essentials_client.engine, tables=schema_metadata.sorted_tables)
+        essentials_client.load()
+        cls.client = iobase.ChadoClient(cls.connection_uri)
+
+    @classmethod
+    def tearDownClass(cls):
+        # Drops the database
+        del cls.client
+        dbutils.drop_database(cls.connection_uri, True)
+
+    def test_load_lookup(self):
+        # Tests that lookup tables are built once, cached on disk, and rebuilt after a change of the CV terms
+        cache_directory = tempfile.mkdtemp()
+        db_entry = self.client.find_or_insert(general.Db, name="testdb")
+        cv_entry = self.client.find_or_insert(cv.Cv, name="testcv")
+        cvterm_ids = []
+        for accession in ["root", "leaf"]:
+            dbxref_entry = self.client.find_or_insert(general.DbxRef, db_id=db_entry.db_id, accession=accession)
+            cvterm_entry = self.client.find_or_insert(cv.CvTerm, cv_id=cv_entry.cv_id, name=accession,
+                                                      dbxref_id=dbxref_entry.dbxref_id)
+            cvterm_ids.append(cvterm_entry.cvterm_id)
+        is_a_term = self.client._load_cvterm_from_cv("is_a", "relationship")
+        self.client.find_or_insert(cv.CvTermRelationship, subject_id=cvterm_ids[1], object_id=cvterm_ids[0],
+                                   type_id=is_a_term.cvterm_id)
+        self.client.session.commit()
+
+        ontology_lookup = self.client._load_ontology_lookup(["testcv"], cache_directory=cache_directory)
+        self.assertEqual(len(ontology_lookup), 2)
+        self.assertEqual(ontology_lookup.term_id("leaf", "testcv"), cvterm_ids[1])
+        self.assertEqual(ontology_lookup.accession_id("testdb", "root"), cvterm_ids[0])
+        self.assertEqual(ontology_lookup.parents(cvterm_ids[1]), [(cvterm_ids[0], is_a_term.cvterm_id)])
+        self.assertIs(self.client._load_ontology_lookup(["testcv"], cache_directory=cache_directory), ontology_lookup)
+        self.assertEqual(len(self.client._load_ontology_lookup(db_authorities=["testdb"])), 2)
+        self.assertEqual(len(os.listdir(cache_directory)), 1)
+
+        # Start cold, as a new process would, and check that the tables are read from the cache
+        lookup._lookups.clear()
+        with unittest.mock.patch("pychado.io.lookup.build_lookup") as mock_build:
+            self.assertIs(mock_build, lookup.build_lookup)
+            cached_lookup = self.client._load_ontology_lookup(["testcv"], cache_directory=cache_directory)
+            mock_build.assert_not_called()
+        self.assertEqual(cached_lookup.term_id("leaf", "testcv"), cvterm_ids[1])
+
+        # Add a CV term, and check that the tables are rebuilt
+        dbxref_entry = self.client.find_or_insert(general.DbxRef, db_id=db_entry.db_id, accession="new")
+        self.client.find_or_insert(cv.CvTerm, cv_id=cv_entry.cv_id, name="new", dbxref_id=dbxref_entry.dbxref_id)
+        self.client.session.commit()
+        updated_lookup = self.client._load_ontology_lookup(["testcv"], cache_directory=cache_directory)
+        self.assertIsNot(updated_lookup, cached_lookup)
+        self.assertEqual(len(updated_lookup), 3)
+        lookup._lookups.clear()
+        self.assertEqual(len(self.client._load_ontology_lookup(["testcv"], cache_directory=cache_directory)), 3)
+        shutil.rmtree(cache_directory)
+
+
+if __name__ == '__main__':
+    unittest.main(buffer=True)
@@ -1,5 +1,10 @@
+import io
 import os
+import json
+import shutil
+import tempfile
 import unittest
+import unittest.mock
 import pronto
 from .. import dbutils, utils
 from ..io import iobase, essentials, ontology
@@ -108,6 +113,138 @@ class TestOntology(unittest.TestCase):
         self.assertEqual(term.other["namespace"][0], "animals")
         self.assertEqual(len(term.relations), 1)
 
+    def test_read_obo_file(self):
+        # Checks if an OBO file is parsed correctly by the streaming reader
+        filename = os.path.join(self.data_dir, "io_obo_example.obo")
+        (default_namespace, terms, typedefs) = ontology.read_obo_file(filename, "test")
+        self.assertEqual(default_namespace, "test_ontology")
+        self.assertEqual(typedefs, [])
+        self.assertEqual(len(terms), 2)
+        self.assertEqual(terms[0].id, "test:0000001")
+        self.assertEqual(terms[0].name, "diplodocus")
+        self.assertEqual(terms[0].definition, "definition of a diplodocus")
+        self.assertEqual(terms[0].relationships, [("is_a", "GO:123457")])
+        self.assertEqual(terms[1].synonyms, [("homo sapiens", "EXACT")])
+        self.assertEqual(ontology.read_obo_file(filename, "GO")[1], [])
+
+    def test_read_ontology_file(self):
+        # Checks that an OBO file is read into the same terms by the streaming reader and by pronto
+        filename = os.path.join(self.data_dir, "io_obo_example.obo")
+        (default_namespace, terms, typedefs) = ontology.read_ontology_file(filename, "obo", "test", True)
+        (pronto_namespace, pronto_terms, pronto_typedefs) = ontology.read_ontology_file(filename, "obo", "test")
+        self.assertEqual(default_namespace, pronto_namespace)
+        self.assertEqual(typedefs, pronto_typedefs)
+        self.assertEqual([term.id for term in terms], [term.id for term in pronto_terms])
+        self.assertEqual(ontology.read_ontology_file(filename, "obo", "GO")[1], [])
+
+    def test_read_owl_file(self):
+        # Checks if an OWL file is parsed correctly by the streaming reader
+        filename = os.path.join(self.data_dir, "io_owl_example.owl")
+        (default_namespace, terms, typedefs) = ontology.read_owl_file(filename, "test")
+        self.assertEqual(default_namespace, "test_ontology")
+        self.assertEqual(typedefs, ["part_of"])
+        self.assertEqual(len(terms), 3)
+        self.assertEqual(terms[0], ontology.OntologyTerm(
+            "test:0000001", "diplodocus", "animals", "definition of a diplodocus", "", [], ["Wikipedia:Diplodocus"],
+            [("is_a", "GO:123457")], False))
+        self.assertEqual(terms[1].synonyms, [("homo sapiens", "EXACT")])
+        self.assertEqual(terms[1].relationships, [("is_a", "test:123456"), ("part_of", "test:0000003")])
+        self.assertTrue(terms[2].is_obsolete)
+        self.assertEqual(ontology.read_owl_file(filename, "GO")[1], [])
+
+        (pronto_namespace, pronto_terms, pronto_typedefs) = ontology.read_ontology_file(filename, "owl", "test")
+        self.assertEqual([term.id for term in terms], [term.id for term in pronto_terms])
+        self.assertEqual([term.name for term in terms], [term.name for term in pronto_terms])
+        self.assertEqual(ontology.read_ontology_file(filename, "owl", "test", True), (default_namespace, terms,
+                                                                                      typedefs))
+
+    def test_convert_owl_iri(self):
+        # Tests the conversion of IRIs of OWL entities into OBO-style identifiers
+        self.assertEqual(ontology.convert_owl_iri("http://purl.obolibrary.org/obo/GO_0005575"), "GO:0005575")
+        self.assertEqual(ontology.convert_owl_iri("http://purl.obolibrary.org/obo/test.owl#part_of"), "part_of")
+        self.assertEqual(ontology.convert_owl_iri("http://purl.obolibrary.org/obo/NCBITaxon_3_1"), "NCBITaxon:3_1")
+
+    def test_read_manifest(self):
+        # Checks that a manifest listing ontologies is parsed correctly
+        filename = tempfile.mkstemp(suffix=".yml")[1]
+        with open(filename, "w") as manifest:
+            manifest.write("- database_authority: GO\n  url: http://purl.obolibrary.org/obo/go.obo\n"
+                           "- database_authority: test\n  file: test.owl\n  format: owl\n")
+        entries = ontology.read_manifest(filename)
+        self.assertEqual(entries, [ontology.ManifestEntry("GO", "", "http://purl.obolibrary.org/obo/go.obo", "obo"),
+                                   ontology.ManifestEntry("test", "test.owl", "", "owl")])
+
+        for content in ["database_authority: GO\n", "- database_authority: GO\n", "- file: test.obo\n",
+                        "- database_authority: GO\n  file: test.obo\n  url: testurl\n",
+                        "- database_authority: GO\n  file: test.obo\n  format: json\n"]:
+            with open(filename, "w") as manifest:
+                manifest.write(content)
+            with self.assertRaises(iobase.InputFileError):
+                ontology.read_manifest(filename)
+        os.remove(filename)
+
+    def test_read_data_version(self):
+        # Checks that the version of an ontology is read from the header of an OBO or OWL file
+        filename = os.path.join(self.data_dir, "io_obo_example.obo")
+        self.assertEqual(ontology.read_data_version(filename, "obo"), "")
+        filename = tempfile.mkstemp(suffix=".obo")[1]
+        with open(filename, "w") as obo_file:
+            obo_file.write("format-version: 1.2\ndata-version: releases/2019-07-01\n\n[Term]\nid: test:1\n")
+        self.assertEqual(ontology.read_data_version(filename, "obo"), "releases/2019-07-01")
+        with open(filename, "w") as owl_file:
+            owl_file.write('<?xml version="1.0"?>\n<rdf:RDF xmlns:rdf="' + ontology.RDF_NAMESPACE[1:-1]
+                           + '" xmlns:owl="' + ontology.OWL_NAMESPACE[1:-1] + '">\n<owl:Ontology>\n'
+                           + '<owl:versionIRI rdf:resource="http://test.org/releases/2019-07-01/test.owl"/>\n'
+                           + '</owl:Ontology>\n</rdf:RDF>\n')
+        self.assertEqual(ontology.read_data_version(filename, "owl"),
+                         "http://test.org/releases/2019-07-01/test.owl")
+        os.remove(filename)
+
+    def test_iterate_obo_stanzas(self):
+        # Checks the splitting of an OBO file into stanzas, skipping terms of other database authorities
+        filename = os.path.join(self.data_dir, "io_obo_example.obo")
+        stanzas = list(ontology.iterate_obo_stanzas(filename))
+        self.assertEqual(len(stanzas), 3)
+        self.assertEqual(stanzas[0][0], "")
+        self.assertIn(("default-namespace", "test_ontology"), stanzas[0][1])
+        self.assertEqual(stanzas[1][0], "Term")
+        self.assertEqual(stanzas[1][1][0], ("id", "test:0000001"))
+        self.assertIn(("is_a", "GO:123457 ! reptile"), stanzas[1][1])
+        stanzas = list(ontology.iterate_obo_stanzas(filename, "other"))
+        self.assertEqual(len(stanzas), 1)
+
+    def test_create_term_from_obo(self):
+        # Checks the conversion of the tag-value pairs of an OBO stanza into an ontology term
+        tag_values = [("id", "test:001"), ("name", "some term ! with comment"), ("namespace", "testspace"),
+                      ("def", '"a \\"quoted\\" definition" [PMID:1]'), ("comment", "some \\! comment"),
+                      ("synonym", '"first synonym" EXACT []'), ("exact_synonym", '"second synonym" []'),
+                      ("synonym", '"third synonym" []'), ("xref", 'EXT:1 "description"'), ("alt_id", "test:002"),
+                      ("is_a", "test:003 {is_inferred=\"true\"} ! parent"), ("relationship", "part_of test:004"),
+                      ("is_obsolete", "true")]
+        term = ontology.create_term_from_obo(tag_values)
+        self.assertEqual(term.id, "test:001")
+        self.assertEqual(term.name, "some term")
+        self.assertEqual(term.namespace, "testspace")
+        self.assertEqual(term.definition, 'a "quoted" definition')
+        self.assertEqual(term.comment, "some ! comment")
+        self.assertEqual(term.synonyms, [("first synonym", "EXACT"), ("second synonym", "EXACT"),
+                                         ("third synonym", "RELATED")])
+        self.assertEqual(term.xrefs, ["test:002", "EXT:1"])
+        self.assertEqual(term.relationships, [("is_a", "test:003"), ("part_of", "test:004")])
+        self.assertTrue(term.is_obsolete)
+
+        term = ontology.create_term_from_obo([("id", "test:001")])
+        self.assertEqual(term.name, "")
+        self.assertIsNone(term.definition)
+        self.assertFalse(term.is_obsolete)
+
+    def test_parse_obo_quoted_string(self):
+        # Checks the extraction of quoted strings from OBO tag values
+        self.assertEqual(ontology.parse_obo_quoted_string('"text" EXACT []'), ("text", "EXACT []"))
+        self.assertEqual(ontology.parse_obo_quoted_string('"a \\"b\\"\\nc" []'), ('a "b"\nc', "[]"))
+        self.assertEqual(ontology.parse_obo_quoted_string('"unterminated'), ("unterminated", ""))
+        self.assertEqual(ontology.parse_obo_quoted_string("unquoted ! comment"), ("unquoted", ""))
+
     def test_get_default_namespace(self):
         # Checks if the default namespace is correctly extracted from an ontology
         ont = pronto.Ontology()
@@ -128,6 +265,21 @@ class TestOntology(unittest.TestCase):
         self.assertIn("test:001:abc", filtered_ontology)
         self.assertEqual(filtered_ontology["test:002"].id, "test:002")
 
+    def test_convert_term(self):
+        # Tests the conversion of an ontology term into its compact representation
+        filename = os.path.join(self.data_dir, "io_obo_example.obo")
+        content = ontology.parse_ontology(filename)
+        term = ontology.convert_term(content["test:0000002"])
+        self.assertEqual(term.id, "test:0000002")
+        self.assertEqual(term.name, "human")
+        self.assertEqual(term.namespace, "animals")
+        self.assertEqual(term.definition, "definition of a human")
+        self.assertEqual(term.comment, "")
+        self.assertEqual(term.synonyms, [("homo sapiens", "EXACT")])
+        self.assertEqual(term.xrefs, [])
+        self.assertEqual(term.relationships, [("is_a", "test:123456")])
+        self.assertFalse(term.is_obsolete)
+
     def test_extract_comments(self):
         # Tests the extraction of comments from an ontology term
         term = pronto.Term("testid")
@@ -450,6 +602,38 @@ class TestOntology(unittest.TestCase):
                                                           accession="otheraccession")
         self.assertEqual(corresponding_dbxref.dbxref_id, third_crossrefs[0].dbxref_id)
 
+    def test_handle_synonyms_and_cross_references_in_batch(self):
+        # Tests the insertion and deletion of synonyms and cross references for a batch of CV terms
+        other_dbxref = general.DbxRef(db_id=self.default_db.db_id, accession="otheraccession")
+        self.client.add_and_flush(other_dbxref)
+        other_cvterm = cv.CvTerm(cv_id=self.default_cv.cv_id, dbxref_id=other_dbxref.dbxref_id, name="otherterm")
+        self.client.add_and_flush(other_cvterm)
+        self.client.add_and_flush(cv.CvTermSynonym(cvterm_id=other_cvterm.cvterm_id, synonym="outdated_name",
+                                                   type_id=self.client._synonym_type_terms["exact"].cvterm_id))
+        term = pronto.Term("defaultdb:defaultaccession")
+        term.synonyms = {pronto.Synonym("another_name", "EXACT"), pronto.Synonym("another_name", "BROAD")}
+        term.other = {"xref": ["otherdb:sharedaccession", "newdb:newaccession"]}
+        other_term = pronto.Term("defaultdb:otheraccession")
+        other_term.synonyms = {pronto.Synonym("yet_another_name", "NARROW")}
+        other_term.other = {"alt_id": ["otherdb:sharedaccession"]}
+        batch = [(term, self.default_cvterm), (other_term, other_cvterm)]
+        self.client._synonym_deletes = 0
+        self.client._crossref_inserts = 0
+
+        synonyms = self.client._handle_synonyms_in_batch(batch)
+        self.assertEqual([synonym.synonym for synonym in synonyms[self.default_cvterm.cvterm_id]], ["another_name"])
+        self.assertEqual([synonym.synonym for synonym in synonyms[other_cvterm.cvterm_id]], ["yet_another_name"])
+        self.assertIsNone(self.client.query_table(cv.CvTermSynonym, synonym="outdated_name").first())
+        self.assertEqual(self.client._synonym_deletes, 1)
+
+        crossrefs = self.client._handle_cross_references_in_batch(batch)
+        self.assertEqual(len(crossrefs[self.default_cvterm.cvterm_id]), 2)
+        self.assertEqual(crossrefs[self.default_cvterm.cvterm_id][0].dbxref_id,
+                         crossrefs[other_cvterm.cvterm_id][0].dbxref_id)
+        self.assertIsNotNone(self.client.query_table(general.Db, name="newdb").first())
+        self.assertEqual(self.client.query_table(cv.CvTermDbxRef, cvterm_id=other_cvterm.cvterm_id).count(), 1)
+        self.assertEqual(self.client._crossref_inserts, 3)
+
     def test_handle_relationships(self):
         # Tests the insertion, update and deletion of relationships between CV terms
 
@@ -483,6 +667,191 @@ class TestOntology(unittest.TestCase):
         self.assertEqual(len(third_relationships), 1)
         self.assertEqual(third_relationships[0].type_id, self.client._relationship_terms["is_a"].cvterm_id)
 
+    def test_merge_dbxref(self):
+        # Tests the lookup, update and creation of database cross references in a snapshot
+        snapshot = ontology.OntologySnapshot("testdb")
+        snapshot.db_ids["testdb"] = 1
+        existing_dbxref = ontology.DbxRefRecord("testdb", "001", "", 10)
+        snapshot.add_dbxref(existing_dbxref)
+        changes = ontology.OntologyChanges()
+
+        dbxref = self.client._merge_dbxref("testdb", "001", "", snapshot, changes)
+        self.assertIs(dbxref, existing_dbxref)
+        self.assertEqual(len(changes.dbxref_updates), 0)
+
+        dbxref = self.client._merge_dbxref("testdb", "001", "2", snapshot, changes)
+        self.assertIs(dbxref, existing_dbxref)
+        self.assertEqual(dbxref.version, "2")
+        self.assertTrue(dbxref.is_modified())
+        self.assertEqual(changes.dbxref_updates, [existing_dbxref])
+
+        dbxref = self.client._merge_dbxref("otherdb", "002", "", snapshot, changes)
+        self.assertIsNone(dbxref.dbxref_id)
+        self.assertEqual(str(dbxref), "otherdb:002")
+        self.assertEqual(changes.dbxref_inserts, [dbxref])
+        self.assertEqual(changes.db_inserts, ["otherdb"])
+
+    def test_assign_cvterm_keys(self):
+        # Tests that CV terms get unique names, and that CV terms not present in the file are marked as obsolete
+        snapshot = ontology.OntologySnapshot("testdb")
+        first_cvterm = ontology.CvTermRecord("testcv", ontology.DbxRefRecord("testdb", "001", "", 1), "alpha",
+                                             cvterm_id=1)
+        second_cvterm = ontology.CvTermRecord("testcv", ontology.DbxRefRecord("testdb", "002", "", 2), "beta",
+                                              cvterm_id=2)
+        missing_cvterm = ontology.CvTermRecord("testcv", ontology.DbxRefRecord("testdb", "003", "", 3), "gamma",
+                                               cvterm_id=3)
+        foreign_cvterm = ontology.CvTermRecord("testcv", None, "delta", cvterm_id=4)
+        obsolete_cvterm = ontology.CvTermRecord("testcv", None, "obsolete gamma", is_obsolete=1, cvterm_id=5)
+        snapshot.cvterms.extend([first_cvterm, second_cvterm, missing_cvterm])
+        snapshot.foreign_cvterms[foreign_cvterm.key()] = foreign_cvterm
+        snapshot.foreign_cvterms[obsolete_cvterm.key()] = obsolete_cvterm
+
+        # Swap names, and take the name of a CV term from another database
+        first_cvterm.name = "beta"
+        second_cvterm.name = "alpha"
+        new_cvterm = ontology.CvTermRecord("testcv", ontology.DbxRefRecord("testdb", "004", ""), "delta")
+        marked_cvterms = self.client._assign_cvterm_keys([first_cvterm, second_cvterm, new_cvterm], snapshot)
+        self.assertEqual(marked_cvterms, [missing_cvterm, foreign_cvterm])
+        self.assertEqual(missing_cvterm.key(), ("testcv", "obsolete gamma", 2))
+        self.assertEqual(foreign_cvterm.key(), ("testcv", "obsolete delta", 1))
+        self.assertEqual(first_cvterm.key(), ("testcv", "beta", 0))
+        self.assertTrue(first_cvterm.is_modified())
+        self.assertEqual(new_cvterm.original_key(), None)
+
+        # Check that duplicate names in the file are detected
+        second_cvterm.name = "beta"
+        with self.assertRaises(iobase.DatabaseError):
+            self.client._assign_cvterm_keys([first_cvterm, second_cvterm], snapshot)
+
+    def test_load_terms_in_bulk(self):
+        # Tests the import of ontology terms via a snapshot of the database
+        filename = os.path.join(self.data_dir, "io_obo_example.obo")
+        content = ontology.parse_ontology(filename)
+        terms = [ontology.convert_term(term) for term in content]
+        self.client._load_terms_in_bulk(terms, ["part_of"], "test_ontology", "test")
+
+        # Check that the CV terms and dependent entries have been inserted
+        db_entry = self.client.query_table(general.Db, name="test").first()
+        self.assertIsNotNone(db_entry)
+        cv_entry = self.client.query_table(cv.Cv, name="animals").first()
+        self.assertIsNotNone(cv_entry)
+        human_cvterm = self.client.query_table(cv.CvTerm, name="human").first()
+        self.assertEqual(human_cvterm.cv_id, cv_entry.cv_id)
+        self.assertEqual(human_cvterm.definition, "definition of a human")
+        human_dbxref = self.client.query_table(general.DbxRef, dbxref_id=human_cvterm.dbxref_id).first()
+        self.assertEqual(human_dbxref.db_id, db_entry.db_id)
+        self.assertEqual(human_dbxref.accession, "0000002")
+        synonyms = self.client.query_table(cv.CvTermSynonym, cvterm_id=human_cvterm.cvterm_id).all()
+        self.assertEqual(len(synonyms), 1)
+        self.assertEqual(synonyms[0].synonym, "homo sapiens")
+        self.assertEqual(synonyms[0].type_id, self.client._synonym_type_terms["exact"].cvterm_id)
+
+        # Load a modified version of the terms, and check that the database is updated
+        terms = [terms[0]._replace(is_obsolete=True), terms[1]._replace(synonyms=[], comment="a comment")]
+        cvterm_inserts = self.client._cvterm_inserts
+        synonym_deletes = self.client._synonym_deletes
+        self.client._load_terms_in_bulk(terms, [], "test_ontology", "test")
+        self.assertEqual(self.client._cvterm_inserts, cvterm_inserts)
+        self.assertEqual(self.client._synonym_deletes, synonym_deletes + 1)
+        self.client.session.expire_all()
+        diplodocus_cvterm = self.client.query_table(cv.CvTerm, name="obsolete diplodocus").first()
+        self.assertEqual(diplodocus_cvterm.is_obsolete, 1)
+        self.assertEqual(self.client.query_table(cv.CvTermSynonym, cvterm_id=human_cvterm.cvterm_id).count(), 0)
+        comments = self.client.query_table(cv.CvTermProp, cvterm_id=human_cvterm.cvterm_id).all()
+        self.assertEqual(len(comments), 1)
+        self.assertEqual(comments[0].value, "a comment")
+
+    def test_dry_run(self):
+        # Tests that a dry run reports the changes of an import without writing them to the database
+        filename = os.path.join(self.data_dir, "io_obo_example.obo")
+        report_file = tempfile.mkstemp(suffix=".json")[1]
+        client = ontology.OntologyClient(self.connection_uri)
+        client.load(filename, "obo", "test", dry_run=True, report_file=report_file)
+        with open(report_file) as report_handle:
+            report = json.load(report_handle)
+        os.remove(report_file)
+        self.assertEqual(report["database_authority"], "test")
+        self.assertEqual(set(report["timings"]), {"parse", "snapshot", "diff"})
+        self.assertEqual(report["statistics"]["CV terms"]["insertions"], 2)
+        self.assertEqual(report["changes"]["cvterms"]["inserted"], [{"id": "test:0000001", "name": "diplodocus"},
+                                                                    {"id": "test:0000002", "name": "human"}])
+        self.assertEqual(report["changes"]["synonyms"]["inserted"], [{"term": "test:0000002",
+                                                                      "synonym": "homo sapiens"}])
+        self.assertIsNone(client.query_table(general.Db, name="test").first())
+        self.assertIsNone(client.query_table(cv.CvTerm, name="human").first())
+        del client
+
+        # Without report file, the report is written to stdout, and progress messages to stderr
+        client = ontology.OntologyClient(self.connection_uri, verbose=True)
+        with unittest.mock.patch("sys.stdout", new_callable=io.StringIO) as mock_stdout, \
+                unittest.mock.patch("sys.stderr", new_callable=io.StringIO) as mock_stderr:
+            client.load(filename, "obo", "test", dry_run=True)
+        self.assertEqual(json.loads(mock_stdout.getvalue())["database_authority"], "test")
+        self.assertIn("Parsing ontology file ...", mock_stderr.getvalue())
+        self.assertIsNone(client.printer.file)
+        del client
+
+    def test_report_changes(self):
+        # Tests the listing of the changes computed for a modified version of imported ontology terms
+        filename = os.path.join(self.data_dir, "io_obo_example.obo")
+        (default_namespace, terms, typedefs) = ontology.read_obo_file(filename, "test")
+        terms.append(ontology.OntologyTerm("test:123456", "mammal", "", None, "", [], [], [], False))
+        self.client._load_terms_in_bulk(terms, [], default_namespace, "test")
+
+        # A CV term of another database authority blocks the new name of a CV term, and is marked as obsolete
+        animals_cv = self.client.query_table(cv.Cv, name="animals").first()
+        blocking_dbxref = general.DbxRef(db_id=self.default_db.db_id, accession="blockingaccession")
+        self.client.add_and_flush(blocking_dbxref)
+        blocking_cvterm = cv.CvTerm(cv_id=animals_cv.cv_id, dbxref_id=blocking_dbxref.dbxref_id, name="homo")
+        self.client.add_and_flush(blocking_cvterm)
+
+        terms = [terms[0]._replace(is_obsolete=True), terms[1]._replace(name="homo", synonyms=[], relationships=[]),
+                 terms[2]]
+        (snapshot, changes) = self.client._diff_terms(terms, [], default_namespace, "test", {})
+        report = self.client._report_changes(changes, snapshot)
+        self.assertEqual(report["cvterms"], {
+            "inserted": [], "renamed": [{"id": "test:0000002", "old_name": "human", "new_name": "homo"}],
+            "obsoleted": [{"id": "test:0000001", "name": "diplodocus"},
+                          {"id": "cvterm_id:" + str(blocking_cvterm.cvterm_id), "name": "homo"}]})
+        self.assertNotIn("None", json.dumps(report))
+        self.assertEqual(report["synonyms"]["deleted"], [{"term": "test:0000002", "synonym": "homo sapiens"}])
+        self.assertEqual(report["relationships"]["deleted"], [{"subject": "test:0000002", "type": "is_a",
+                                                               "object": "test:123456"}])
+
+    def test_load_parsed_files(self):
+        # Tests the import of ontology terms of one database authority, read from several files
+        filename = os.path.join(self.data_dir, "io_obo_example.obo")
+        (default_namespace, terms, typedefs) = ontology.read_obo_file(filename, "test")
+        parsed_files = [(default_namespace, terms[:1], ["part_of"]),
+                        ("plants", [terms[1]._replace(namespace=""), terms[0]._replace(name="duplicate")], [])]
+        self.client._load_parsed_files("test", parsed_files)
+
+        animals_cv = self.client.query_table(cv.Cv, name="animals").first()
+        plants_cv = self.client.query_table(cv.Cv, name="plants").first()
+        self.assertIsNotNone(self.client.query_table(cv.CvTerm, name="diplodocus", cv_id=animals_cv.cv_id).first())
+        self.assertIsNotNone(self.client.query_table(cv.CvTerm, name="human", cv_id=plants_cv.cv_id).first())
+        self.assertIsNone(self.client.query_table(cv.CvTerm, name="duplicate").first())
+
+    def test_data_version(self):
+        # Tests that the version of an imported ontology is recorded, and that importing it again is skipped
+        self.assertEqual(self.client._load_data_version("defaultdb"), "")
+        self.client._store_data_version("defaultdb", "v1")
+        self.assertEqual(self.client._load_data_version("defaultdb"), "v1")
+        self.client._store_data_version("defaultdb", "v2")
+        self.assertEqual(self.client._load_data_version("defaultdb"), "v2")
+        self.assertEqual(self.client.query_table(general.DbProp, db_id=self.default_db.db_id).count(), 1)
+
+        filename = tempfile.mkstemp(suffix=".obo")[1]
+        with open(filename, "w") as obo_file:
+            obo_file.write("format-version: 1.2\ndata-version: v2\n")
+        with unittest.mock.patch.object(self.client, "_load_obo_file") as mock_load, \
+                unittest.mock.patch.object(self.client.session, "commit"):
+            self.client.load(filename, "obo", "defaultdb", streaming=True)
+            mock_load.assert_not_called()
+            self.client.load(filename, "obo", "defaultdb", streaming=True, force=True)
+            mock_load.assert_called_with(filename, "defaultdb")
+        os.remove(filename)
+
     def test_mark_obsolete_terms(self):
         # Populate the database with essentials
         other_dbxref = general.DbxRef(db_id=self.default_db.db_id, accession="otheraccession")
@@ -497,6 +866,149 @@ class TestOntology(unittest.TestCase):
         self.assertIn(marked_cvterms[0].cvterm_id, [self.default_cvterm.cvterm_id, other_cvterm.cvterm_id])
         self.assertIn(marked_cvterms[1].cvterm_id, [self.default_cvterm.cvterm_id, other_cvterm.cvterm_id])
 
+        # Check that terms present in the file are left alone, and that already obsolete terms remain unchanged
+        marked_cvterms = self.client._mark_obsolete_terms({"defaultdb:otheraccession": pronto.Term("")},
+                                                          self.default_db)
+        self.assertEqual(marked_cvterms, [])
+
+    def test_mark_obsolete_terms_after_failure(self):
+        # Check that the temporary table is removed if the computation fails, so that the session can be reused
+        with unittest.mock.patch("psycopg2.extras.execute_values", side_effect=ValueError):
+            with self.assertRaises(ValueError):
+                self.client._mark_obsolete_terms({}, self.default_db)
+        marked_cvterms = self.client._mark_obsolete_terms({}, self.default_db)
+        self.assertEqual([cvterm.cvterm_id for cvterm in marked_cvterms], [self.default_cvterm.cvterm_id])
+
+    def test_mark_obsolete_terms_with_collisions(self):
+        # Populate the database with CV terms whose obsolete names collide with each other and with further terms
+        entries = []
+        for accession, name, is_obsolete in [("present", "obsolete testterm", 1), ("first", "obsolete foo", 2),
+                                             ("second", "foo", 0)]:
+            dbxref_entry = general.DbxRef(db_id=self.default_db.db_id, accession=accession)
+            self.client.add_and_flush(dbxref_entry)
+            cvterm_entry = cv.CvTerm(cv_id=self.default_cv.cv_id, dbxref_id=dbxref_entry.dbxref_id, name=name,
+                                     is_obsolete=is_obsolete)
+            self.client.add_and_flush(cvterm_entry)
+            entries.append(cvterm_entry)
+
+        # Check that the CV terms take the lowest free values of 'is_obsolete', even if taken over from each other
+        ontology_terms = {"defaultdb:present": pronto.Term("")}
+        marked_cvterms = self.client._mark_obsolete_terms(ontology_terms, self.default_db)
+        self.assertEqual([(entry.name, entry.is_obsolete) for entry in marked_cvterms],
+                         [("obsolete testterm", 2), ("obsolete foo", 1), ("obsolete foo", 2)])
+        self.assertEqual([entry.cvterm_id for entry in marked_cvterms],
+                         [self.default_cvterm.cvterm_id, entries[1].cvterm_id, entries[2].cvterm_id])
+        self.assertEqual(self.client.query_table(cv.CvTerm, cvterm_id=entries[0].cvterm_id).first().is_obsolete, 1)
+
+
+class TestOntologyManifest(unittest.TestCase):
+    """Tests the import of several ontologies listed in a manifest"""
+
+    connection_parameters = utils.parse_yaml(dbutils.default_configuration_file())
+    connection_uri = dbutils.random_database_uri(connection_parameters)
+
+    @classmethod
+    def setUpClass(cls):
+        # Creates a database, establishes a connection, creates tables and populates them with essential entries
+        dbutils.create_database(cls.connection_uri)
+        schema_metadata = base.PublicBase.metadata
+        essentials_client = essentials.EssentialsClient(cls.connection_uri)
+        schema_metadata.create_all(essentials_client.engine, tables=schema_metadata.sorted_tables)
+        essentials_client.load()
+        essentials_client._load_further_relationship_entries()
+        cls.client = ontology.OntologyClient(cls.connection_uri)
+
+    @classmethod
+    def tearDownClass(cls):
+        # Drops the database
+        del cls.client
+        dbutils.drop_database(cls.connection_uri, True)
+
+    def setUp(self):
+        # Creates a directory for the manifest and the ontology files
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        # Removes the manifest and the ontology files
+        shutil.rmtree(self.directory)
+
+    def write_obo_file(self, name: str, data_version: str, terms: list) -> str:
+        # Writes an OBO file with terms given as tuples of ID and name, and returns its path
+        filename = os.path.join(self.directory, name)
+        with open(filename, "w") as obo_file:
+            obo_file.write("format-version: 1.2\ndata-version: " + data_version + "\ndefault-namespace: manifest\n")
+            for term_id, term_name in terms:
+                obo_file.write("\n[Term]\nid: " + term_id + "\nname: " + term_name + "\n")
+        return filename
+
+    def write_manifest(self, entries: list) -> str:
+        # Writes a manifest listing files given as tuples of database authority and path, and returns its path
+        filename = os.path.join(self.directory, "manifest.yml")
+        with open(filename, "w") as manifest:
+            for db_authority, file in entries:
+                manifest.write("- database_authority: " + db_authority + "\n  file: " + file + "\n")
+        return filename
+
+    def load_cvterm(self, db_authority: str, accession: str) -> cv.CvTerm:
+        # Loads the CV term with a given database authority and accession from the database
+        self.client.session.expire_all()
+        return self.client.query_table(cv.CvTerm).join(general.DbxRef).join(general.Db)\
+            .filter(general.Db.name == db_authority, general.DbxRef.accession == accession).first()
+
+    def test_load_manifest(self):
+        # Tests that all files of a database authority are merged together, and that failures are isolated
+        manifest = self.write_manifest([
+            ("multi", self.write_obo_file("multi1.obo", "v1", [("multi:1", "first term")])),
+            ("multi", self.write_obo_file("multi2.obo", "v1", [("multi:2", "second term")])),
+            ("partial", self.write_obo_file("partial.obo", "v1", [("partial:1", "partial term")])),
+            ("partial", os.path.join(self.directory, "missing.obo")),
+            ("broken", self.write_obo_file("broken.obo", "v1", [("broken:1", "broken term")])),
+            ("single", self.write_obo_file("single.obo", "v1", [("single:1", "single term")]))])
+        load_parsed_files = ontology.OntologyClient._load_parsed_files
+
+        def load_parsed_files_unless_broken(client, db_authority, parsed_files):
+            if db_authority == "broken":
+                raise iobase.DatabaseError("Broken database authority")
+            load_parsed_files(client, db_authority, parsed_files)
+
+        with unittest.mock.patch.object(ontology.OntologyClient, "_load_parsed_files", autospec=True,
+                                        side_effect=load_parsed_files_unless_broken), \
+                unittest.mock.patch("builtins.print") as mock_print:
+            failed_authorities = ontology.load_manifest(self.connection_uri, False, manifest, processes=2)
+        self.assertEqual(failed_authorities, {"partial", "broken"})
+        mock_print.assert_any_call("Imported ontologies into the database, except for database authorities "
+                                   "broken, partial.")
+
+        # The terms of both files of an authority are imported together, so that none is marked as obsolete
+        self.assertEqual(self.load_cvterm("multi", "1").is_obsolete, 0)
+        self.assertEqual(self.load_cvterm("multi", "2").is_obsolete, 0)
+        self.assertIsNotNone(self.load_cvterm("single", "1"))
+        self.assertIsNone(self.load_cvterm("partial", "1"))
+        self.assertIsNone(self.load_cvterm("broken", "1"))
+
+        # Versions are recorded for authorities with a single file only
+        self.assertEqual(self.client._load_data_version("single"), "v1")
+        self.assertEqual(self.client._load_data_version("multi"), "")
+
+    def test_load_manifest_with_unchanged_version(self):
+        # Tests that a file is skipped if its version has been imported before, unless the import is forced
+        filename = self.write_obo_file("versioned.obo", "v1", [("versioned:1", "old name")])
+        manifest = self.write_manifest([("versioned", filename)])
+        with unittest.mock.patch("builtins.print") as mock_print:
+            self.assertEqual(ontology.load_manifest(self.connection_uri, False, manifest, processes=1), set())
+        mock_print.assert_any_call("Successfully imported all ontologies of the manifest into the database.")
+        self.assertEqual(self.load_cvterm("versioned", "1").name, "old name")
+
+        self.write_obo_file("versioned.obo", "v1", [("versioned:1", "new name")])
+        with unittest.mock.patch("builtins.print") as mock_print:
+            ontology.load_manifest(self.connection_uri, False, manifest, processes=1)
+        mock_print.assert_any_call("Ontology version 'v1' of database authority versioned has already been imported.")
+        self.assertEqual(self.load_cvterm("versioned", "1").name, "old name")
+
+        with unittest.mock.patch("builtins.print"):
+            ontology.load_manifest(self.connection_uri, False, manifest, processes=1, force=True)
+        self.assertEqual(self.load_cvterm("versioned", "1").name, "new name")
+
 
 if __name__ == '__main__':
     unittest.main(verbosity=2, buffer=True)
@@ -0,0 +1,138 @@
+import os
+import tempfile
+import unittest
+import unittest.mock
+import sqlalchemy
+from .. import dbutils, utils
+from ..io import packing, essentials, fasta
+from ..orm import base, cv, organism, sequence
+
+
+class TestPacking(unittest.TestCase):
+    """Tests the functions packing residues into 2 bits per nucleotide"""
+
+    def test_pack_residues(self):
+        # Tests the packing of a sequence of nucleotides
+        packed_residues = packing.pack_residues("ACGTTGCAnnGTRYacgT")
+        self.assertEqual(packed_residues.seqlen, 18)
+        self.assertEqual(packed_residues.packed, bytes([0b00011011, 0b11100100, 0b00001011, 0b00000001,
+                                                        0b10110000]))
+        self.assertEqual(packed_residues.exception_starts, [8, 12])
+        self.assertEqual(packed_residues.exception_residues, ["NN", "RY"])
+        self.assertEqual(packed_residues.lowercase_starts, [8, 14])
+        self.assertEqual(packed_residues.lowercase_ends, [10, 17])
+        for residues in ["ACGÄ", "acgtß", "ACGT\u2013N"]:
+            with self.assertRaises(ValueError):
+                packing.pack_residues(residues)
+
+    def test_unpack_residues(self):
+        # Tests that packed sequences are restored correctly
+        for residues in ["", "A", "ACGTTGCAnnGTRYacgT", "NNNNN", "acgtn" * 101, "ACGT-*ACG\nT"]:
+            self.assertEqual(packing.unpack_residues(packing.pack_residues(residues)), residues)
+
+    def test_overlay_runs(self):
+        # Tests the function replacing parts of a sequence
+        self.assertEqual(packing.overlay_runs("AAAAAAA", [(5, "NN"), (0, "C")]), "CAAAANN")
+        self.assertEqual(packing.overlay_runs("AAAA", []), "AAAA")
+
+
+class TestResiduePackingClient(unittest.TestCase):
+    """Tests moving residues between the feature table and the packed side table"""
+
+    connection_parameters = utils.parse_yaml(dbutils.default_configuration_file())
+    connection_uri = dbutils.random_database_uri(connection_parameters)
+
+    @classmethod
+    def setUpClass(cls):
+        # Creates a database, establishes a connection, creates tables and populates them with essential entries
+        dbutils.create_database(cls.connection_uri)
+        schema_metadata = base.PublicBase.metadata
+        essentials_client = essentials.EssentialsClient(cls.connection_uri)
+        schema_metadata.create_all(essentials_client.engine, tables=schema_metadata.sorted_tables)
+        essentials_client.load()
+        cls.client = packing.ResiduePackingClient(cls.connection_uri)
+
+    @classmethod
+    def tearDownClass(cls):
+        # Drops the database
+        del cls.client
+        dbutils.drop_database(cls.connection_uri, True)
+
+    def test_pack_and_unpack(self):
+        # Tests that residues can be moved to the side table and back, and read by the export
+        organism_entry = organism.Organism(genus="testgenus", species="testspecies", abbreviation="testorganism")
+        self.client.add_and_flush(organism_entry)
+        type_entry = self.client.query_first(cv.CvTerm, name="top_level_seq")
+        residues = "ACGTNNNNacgtRYKMA" * 50
+        feature_entry = sequence.Feature(organism_id=organism_entry.organism_id, type_id=type_entry.cvterm_id,
+                                         uniquename="chr1", residues=residues, seqlen=len(residues))
+        self.client.add_and_flush(feature_entry)
+        self.client.add_and_flush(sequence.FeatureProp(feature_id=feature_entry.feature_id,
+                                                       type_id=type_entry.cvterm_id, value="true"))
+        self.client.session.commit()
+
+        self.client.pack("testorganism")
+        self.assertIsNone(self.client.query_first(sequence.Feature, feature_id=feature_entry.feature_id).residues)
+        self.assertTrue(packing.packed_residues_exist(self.client.session))
+        view_residues = self.client.session.execute(sqlalchemy.text(
+            "SELECT residues FROM public.feature_residues WHERE feature_id = :feature_id"),
+            {"feature_id": feature_entry.feature_id}).scalar()
+        self.assertEqual(view_residues, residues)
+        loaded_residues = packing.load_packed_residues(self.client.session, [feature_entry.feature_id])
+        self.assertEqual(loaded_residues, {feature_entry.feature_id: residues})
+
+        export_client = fasta.FastaExportClient(self.connection_uri, test_environment=True)
+        export_client.session = self.client.session
+        export_client._top_level_term = type_entry
+        self.client.session.expire_all()
+        top_level_entries = export_client._extract_top_level_features(organism_entry)
+        self.assertEqual(top_level_entries[0].residues, residues)
+        self.assertFalse(self.client.session.dirty)
+
+        self.client.unpack("testorganism")
+        self.assertEqual(self.client.query_first(sequence.Feature, feature_id=feature_entry.feature_id).residues,
+                         residues)
+        self.assertEqual(packing.load_packed_residues(self.client.session, [feature_entry.feature_id]), {})
+
+    def test_unpack_after_import(self):
+        # Tests that residues imported after packing supersede the packed copy
+        organism_entry = organism.Organism(genus="testgenus", species="otherspecies", abbreviation="otherorganism")
+        self.client.add_and_flush(organism_entry)
+        type_entry = self.client.query_first(cv.CvTerm, name="top_level_seq")
+        feature_entries = []
+        for uniquename in ["contig1", "contig2"]:
+            feature_entry = sequence.Feature(organism_id=organism_entry.organism_id, type_id=type_entry.cvterm_id,
+                                             uniquename=uniquename, residues="AAAACCCC", seqlen=8)
+            self.client.add_and_flush(feature_entry)
+            self.client.add_and_flush(sequence.FeatureProp(feature_id=feature_entry.feature_id,
+                                                           type_id=type_entry.cvterm_id, value="true"))
+            feature_entries.append(feature_entry)
+        self.client.session.commit()
+        self.client.pack("otherorganism")
+
+        # New residues for the first feature, imported from a FASTA file
+        (file_handle, filename) = tempfile.mkstemp()
+        with os.fdopen(file_handle, "w") as f:
+            f.write(">contig1\nGGGGTTTT\n")
+        import_client = fasta.FastaImportClient(self.connection_uri, test_environment=True)
+        import_client.session = self.client.session
+        import_client.printer = self.client.printer
+        import_client._sequence_terms = {"contig": type_entry}
+        import_client._top_level_term = type_entry
+        import_client.load(filename, "otherorganism", "contig")
+        os.remove(filename)
+        self.client.session.expire_all()
+        self.assertEqual(packing.load_packed_residues(self.client.session, [feature_entries[0].feature_id]), {})
+
+        # New residues for the second feature, written without removing the packed copy
+        feature_entries[1].residues = "TTTTGGGG"
+        self.client.session.commit()
+
+        self.client.unpack("otherorganism")
+        self.client.session.expire_all()
+        self.assertEqual(self.client.query_first(sequence.Feature, feature_id=feature_entries[0].feature_id).residues,
+                         "GGGGTTTT")
+        self.assertEqual(self.client.query_first(sequence.Feature, feature_id=feature_entries[1].feature_id).residues,
+                         "TTTTGGGG")
+        self.assertEqual(packing.load_packed_residues(self.client.session, [entry.feature_id
+                                                                            for entry in feature_entries]), {})
@@ -413,6 +413,46 @@ class TestPublic(unittest.TestCase):
         with self.assertRaises(sqlalchemy.exc.IntegrityError):
             self.client.add_and_flush(obj)
 
+    # Test suite for the Chado 'dbprop' table
+    def add_dbprop_object(self) -> general.DbProp:
+        # Insert a random entry into the 'dbprop' table
+        db_obj = self.add_db_object()
+        type_obj = self.add_cvterm_object()
+        dbprop_obj = general.DbProp(db_id=db_obj.db_id, type_id=type_obj.cvterm_id, value=utils.random_string(10),
+                               rank=utils.random_integer(100))
+        self.client.add_and_flush(dbprop_obj)
+        return dbprop_obj
+
+    def test_dbprop(self):
+        # Test adding a new 'dbprop' object to the database
+        existing_obj = self.add_dbprop_object()
+        self.assertIsNotNone(existing_obj.dbprop_id)
+        self.assertEqual(existing_obj.__tablename__, 'dbprop')
+
+    def test_dbprop_db_id_fkey(self):
+        # Test foreign key constraint on 'dbprop.db_id'
+        existing_obj = self.add_dbprop_object()
+        obj = general.DbProp(db_id=(existing_obj.db_id+100), type_id=existing_obj.type_id,
+                        value=utils.random_string(10), rank=utils.random_integer(100))
+        with self.assertRaises(sqlalchemy.exc.IntegrityError):
+            self.client.add_and_flush(obj)
+
+    def test_dbprop_type_id_fkey(self):
+        # Test foreign key constraint on 'dbprop.type_id'
+        existing_obj = self.add_dbprop_object()
+        obj = general.DbProp(db_id=existing_obj.db_id, type_id=(existing_obj.type_id+100),
+                        value=utils.random_string(10), rank=utils.random_integer(100))
+        with self.assertRaises(sqlalchemy.exc.IntegrityError):
+            self.client.add_and_flush(obj)
+
+    def test_dbprop_c1(self):
+        # Test unique constraint on 'dbprop.db_id', 'dbprop.type_id', 'dbprop.rank'
+        existing_obj = self.add_dbprop_object()
+        obj = general.DbProp(db_id=existing_obj.db_id, type_id=existing_obj.type_id, value=utils.random_string(10),
+                        rank=existing_obj.rank)
+        with self.assertRaises(sqlalchemy.exc.IntegrityError):
+            self.client.add_and_flush(obj)
+
     # Test suite for the Chado 'organism' table
     def add_organism_object(self) -> organism.Organism:
         # Insert a random entry into the 'organism' table
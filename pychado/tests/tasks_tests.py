@@ -1,6 +1,7 @@
+import io
 import unittest.mock
 from .. import chado_tools, tasks, queries, dbutils, utils, ddl
-from ..io import direct, essentials, ontology, fasta, gff, gaf
+from ..io import direct, essentials, ontology, fasta, gff, gaf, gpad, packing, cvtermpath
 
 
 class TestTasks(unittest.TestCase):
@@ -227,6 +228,31 @@ class TestTasks(unittest.TestCase):
         mock_backup_schema_client.assert_called_with(self.uri)
         self.assertIn(unittest.mock.call().execute_backup_function("testdate"), mock_backup_schema_client.mock_calls)
 
+    @unittest.mock.patch('pychado.io.packing.ResiduePackingClient')
+    def test_execute_pack_residues(self, mock_client):
+        # Checks that the functions (un)packing residues are correctly called
+        self.assertIs(mock_client, packing.ResiduePackingClient)
+        args = ["chado", "execute", "pack_residues", "-a", "testorganism", "testdb"]
+        parsed_args = chado_tools.parse_arguments(args)
+        tasks.run_execute_command(args[2], parsed_args, self.uri)
+        mock_client.assert_called_with(self.uri, False)
+        self.assertIn(unittest.mock.call().pack("testorganism"), mock_client.mock_calls)
+
+        args = ["chado", "execute", "unpack_residues", "-a", "testorganism", "testdb"]
+        parsed_args = chado_tools.parse_arguments(args)
+        tasks.run_execute_command(args[2], parsed_args, self.uri)
+        self.assertIn(unittest.mock.call().unpack("testorganism"), mock_client.mock_calls)
+
+    @unittest.mock.patch('pychado.io.cvtermpath.CvTermPathClient')
+    def test_execute_cvtermpath(self, mock_client):
+        # Checks that the function computing the transitive closure of a vocabulary is correctly called
+        self.assertIs(mock_client, cvtermpath.CvTermPathClient)
+        args = ["chado", "execute", "cvtermpath", "--vocabulary", "testcv", "testdb"]
+        parsed_args = chado_tools.parse_arguments(args)
+        tasks.run_execute_command(args[2], parsed_args, self.uri)
+        mock_client.assert_called_with(self.uri, False)
+        self.assertIn(unittest.mock.call().compute("testcv"), mock_client.mock_calls)
+
     @unittest.mock.patch('pychado.tasks.run_select_command')
     def test_run_select(self, mock_run):
         # Checks that database queries are correctly run
@@ -469,16 +495,67 @@ class TestTasks(unittest.TestCase):
         tasks.run_import_command(args[2], parsed_args, self.uri)
         mock_download.assert_not_called()
         mock_client.assert_called_with(self.uri, False)
-        self.assertIn(unittest.mock.call().load("testfile", "owl", "testauthority"), mock_client.mock_calls)
+        self.assertIn(unittest.mock.call().load("testfile", "owl", "testauthority", False, False, False, False, ""),
+                      mock_client.mock_calls)
 
         mock_client.reset_mock()
         mock_download.return_value = "downloaded_file"
-        args = ["chado", "import", "ontology", "-V", "-u", "testurl", "-A", "testauthority", "testdb"]
+        args = ["chado", "import", "ontology", "-V", "-u", "testurl", "-A", "testauthority", "--bulk", "--streaming",
+                "testdb"]
         parsed_args = chado_tools.parse_arguments(args)
         tasks.run_import_command(args[2], parsed_args, self.uri)
         mock_download.assert_called_with("testurl")
         mock_client.assert_called_with(self.uri, True)
-        self.assertIn(unittest.mock.call().load("downloaded_file", "obo", "testauthority"), mock_client.mock_calls)
+        self.assertIn(unittest.mock.call().load("downloaded_file", "obo", "testauthority", True, True, False,
+                                                False, ""),
+                      mock_client.mock_calls)
+
+        mock_client.reset_mock()
+        args = ["chado", "import", "ontology", "-f", "testfile", "-A", "testauthority", "--dry_run", "--report_file",
+                "testreport", "testdb"]
+        parsed_args = chado_tools.parse_arguments(args)
+        tasks.run_import_command(args[2], parsed_args, self.uri)
+        self.assertIn(unittest.mock.call().load("testfile", "obo", "testauthority", False, False, False, True,
+                                                "testreport"), mock_client.mock_calls)
+
+        # Messages about the download go to stderr if the report of a dry run is written to stdout
+        mock_download.side_effect = lambda url: print("Downloading file from URL " + url + " ...")
+        args = ["chado", "import", "ontology", "-u", "testurl", "-A", "testauthority", "--dry_run", "testdb"]
+        parsed_args = chado_tools.parse_arguments(args)
+        with unittest.mock.patch("sys.stdout", new_callable=io.StringIO) as mock_stdout, \
+                unittest.mock.patch("sys.stderr", new_callable=io.StringIO) as mock_stderr:
+            tasks.run_import_command(args[2], parsed_args, self.uri)
+        self.assertEqual(mock_stdout.getvalue(), "")
+        self.assertEqual(mock_stderr.getvalue(), "Downloading file from URL testurl ...\n")
+
+    @unittest.mock.patch('pychado.io.ontology.load_manifest')
+    def test_import_ontology_manifest(self, mock_load):
+        # Checks that the function importing the ontologies listed in a manifest is correctly called
+        self.assertIs(mock_load, ontology.load_manifest)
+        args = ["chado", "import", "ontology", "--manifest", "testmanifest", "--streaming", "--processes", "4",
+                "testdb"]
+        parsed_args = chado_tools.parse_arguments(args)
+        tasks.run_import_command(args[2], parsed_args, self.uri)
+        mock_load.assert_called_with(self.uri, False, "testmanifest", True, 4, "", False)
+
+    @unittest.mock.patch('pychado.utils.download_file_with_cache')
+    @unittest.mock.patch('pychado.utils.download_file')
+    @unittest.mock.patch('pychado.io.ontology.OntologyClient')
+    def test_import_ontology_with_cache(self, mock_client, mock_download, mock_cached_download):
+        # Checks that an ontology is downloaded into the cache directory, if given
+        self.assertIs(mock_client, ontology.OntologyClient)
+        self.assertIs(mock_download, utils.download_file)
+        self.assertIs(mock_cached_download, utils.download_file_with_cache)
+        mock_cached_download.return_value = "cached_file"
+        args = ["chado", "import", "ontology", "-u", "testurl", "-A", "testauthority", "--cache_directory",
+                "testcache", "--force", "testdb"]
+        parsed_args = chado_tools.parse_arguments(args)
+        tasks.run_import_command(args[2], parsed_args, self.uri)
+        mock_download.assert_not_called()
+        mock_cached_download.assert_called_with("testurl", "testcache")
+        self.assertIn(unittest.mock.call().load("cached_file", "obo", "testauthority", False, False, True,
+                                                False, ""),
+                      mock_client.mock_calls)
 
     @unittest.mock.patch('pychado.io.gff.GFFImportClient')
     def test_import_gff(self, mock_client):
@@ -510,7 +587,27 @@ class TestTasks(unittest.TestCase):
         parsed_args = chado_tools.parse_arguments(args)
         tasks.run_import_command(args[2], parsed_args, self.uri)
         mock_client.assert_called_with(self.uri, False)
-        self.assertIn(unittest.mock.call().load("testfile", "testorganism", "protein"), mock_client.mock_calls)
+        self.assertIn(unittest.mock.call().load("testfile", "testorganism", "protein", 0, cache_directory=""),
+                      mock_client.mock_calls)
+
+        args = ["chado", "import", "gaf", "-f", "testfile", "-a", "testorganism", "--batch_size", "500",
+                "--cache_directory", "testcache", "testdb"]
+        parsed_args = chado_tools.parse_arguments(args)
+        tasks.run_import_command(args[2], parsed_args, self.uri)
+        self.assertIn(unittest.mock.call().load("testfile", "testorganism", "default", 500,
+                                                cache_directory="testcache"), mock_client.mock_calls)
+
+    @unittest.mock.patch('pychado.io.gpad.GPADImportClient')
+    def test_import_gpad(self, mock_client):
+        # Checks that the function importing GPAD/GPI files into the database is correctly called
+        self.assertIs(mock_client, gpad.GPADImportClient)
+        args = ["chado", "import", "gpad", "-f", "testfile", "--gpi_file", "testgpi", "-a", "testorganism",
+                "-L", "protein", "testdb"]
+        parsed_args = chado_tools.parse_arguments(args)
+        tasks.run_import_command(args[2], parsed_args, self.uri)
+        mock_client.assert_called_with(self.uri, False)
+        self.assertIn(unittest.mock.call().load("testfile", "testgpi", "testorganism", "protein", 0, ""),
+                      mock_client.mock_calls)
 
     @unittest.mock.patch('pychado.tasks.run_export_command')
     def test_run_export(self, mock_run):
@@ -533,6 +630,29 @@ class TestTasks(unittest.TestCase):
         self.assertIn(unittest.mock.call().export("testfile", "testorganism", "proteins", "testrelease", False),
                       mock_client.mock_calls)
 
+    @unittest.mock.patch('pychado.io.fasta.export_all_organisms')
+    def test_export_fasta_all_organisms(self, mock_export):
+        # Checks that the function exporting sequences of all organisms to FASTA files is correctly called
+        self.assertIs(mock_export, fasta.export_all_organisms)
+        args = ["chado", "export", "fasta", "-f", "testfile", "--all_organisms", "-t", "contigs,proteins",
+                "--processes", "3", "testdb"]
+        parsed_args = chado_tools.parse_arguments(args)
+        tasks.run_export_command(args[2], parsed_args, self.uri)
+        mock_export.assert_called_with(self.uri, False, "testfile", "contigs,proteins", None, False, 3, None,
+                                       1024 * 1024 * 1024)
+
+    @unittest.mock.patch('pychado.io.fasta.FastaExportClient')
+    def test_export_fasta_with_cache(self, mock_client):
+        # Checks that the sequence cache is enabled for the FASTA export if requested
+        self.assertIs(mock_client, fasta.FastaExportClient)
+        args = ["chado", "export", "fasta", "-f", "testfile", "-a", "testorganism", "-t", "genes",
+                "--cache_directory", "testdir", "--cache_size", "10", "testdb"]
+        parsed_args = chado_tools.parse_arguments(args)
+        tasks.run_export_command(args[2], parsed_args, self.uri)
+        self.assertIn(unittest.mock.call().use_sequence_cache("testdir", 10 * 1024 * 1024), mock_client.mock_calls)
+        self.assertIn(unittest.mock.call().export("testfile", "testorganism", "genes", None, False),
+                      mock_client.mock_calls)
+
     @unittest.mock.patch('pychado.io.gff.GFFExportClient')
     def test_export_gff(self, mock_client):
         # Checks that the function exporting genomic data from the database to a GFF file is correctly called
@@ -550,11 +670,48 @@ class TestTasks(unittest.TestCase):
         # Checks that the function exporting gene annotation data from the database to a GAF file is correctly called
         self.assertIs(mock_client, gaf.GAFExportClient)
         args = ["chado", "export", "gaf", "-f", "testfile", "-a", "testorganism", "-A", "testauthority",
+                "-L", "protein", "--gaf_version", "2.2", "testdb"]
+        parsed_args = chado_tools.parse_arguments(args)
+        tasks.run_export_command(args[2], parsed_args, self.uri)
+        mock_client.assert_called_with(self.uri, False)
+        self.assertIn(unittest.mock.call().export("testfile", "testorganism", "testauthority", "protein", False,
+                                                  "2.2"), mock_client.mock_calls)
+
+    @unittest.mock.patch('pychado.io.gaf.export_organisms')
+    def test_export_gaf_organisms(self, mock_export):
+        # Checks that the function exporting gene annotation data of several organisms is correctly called
+        self.assertIs(mock_export, gaf.export_organisms)
+        args = ["chado", "export", "gaf", "-f", "testfile", "--all_organisms", "-A", "testauthority",
+                "--processes", "3", "testdb"]
+        parsed_args = chado_tools.parse_arguments(args)
+        tasks.run_export_command(args[2], parsed_args, self.uri)
+        mock_export.assert_called_with(self.uri, False, "testfile", None, "testauthority", "default", False, "1.0", 3)
+
+        args = ["chado", "export", "gaf", "-f", "testfile", "--organisms", "org1,org2", "-A", "testauthority",
+                "testdb"]
+        parsed_args = chado_tools.parse_arguments(args)
+        tasks.run_export_command(args[2], parsed_args, self.uri)
+        mock_export.assert_called_with(self.uri, False, "testfile", ["org1", "org2"], "testauthority", "default",
+                                       False, "1.0", None)
+
+    @unittest.mock.patch('pychado.io.gpad.GPADExportClient')
+    def test_export_gpad(self, mock_client):
+        # Checks that the functions exporting gene annotation data from the database to GPAD/GPI files are correctly
+        # called
+        self.assertIs(mock_client, gpad.GPADExportClient)
+        args = ["chado", "export", "gpad", "-f", "testfile", "-a", "testorganism", "-A", "testauthority",
                 "-L", "protein", "testdb"]
         parsed_args = chado_tools.parse_arguments(args)
         tasks.run_export_command(args[2], parsed_args, self.uri)
         mock_client.assert_called_with(self.uri, False)
-        self.assertIn(unittest.mock.call().export("testfile", "testorganism", "testauthority", "protein", False),
+        self.assertIn(unittest.mock.call().export_gpad("testfile", "testorganism", "testauthority", "protein", False),
+                      mock_client.mock_calls)
+
+        args = ["chado", "export", "gpi", "-f", "testfile", "-a", "testorganism", "-A", "testauthority",
+                "--include_obsolete", "testdb"]
+        parsed_args = chado_tools.parse_arguments(args)
+        tasks.run_export_command(args[2], parsed_args, self.uri)
+        self.assertIn(unittest.mock.call().export_gpi("testfile", "testorganism", "testauthority", "default", True),
                       mock_client.mock_calls)
 
 
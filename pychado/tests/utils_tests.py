@@ -5,7 +5,12 @@ import subprocess
 import string
 import io
 import filecmp
+import shutil
+import hashlib
 import tempfile
+import urllib.error
+import urllib.request
+import unittest.mock
 from contextlib import redirect_stdout
 from .. import utils
 
@@ -147,6 +152,80 @@ class TestUtils(unittest.TestCase):
         with self.assertRaises(AttributeError):
             utils.list_to_dict(persons, "age")
 
+    def test_split_into_chunks(self):
+        # checks if a function correctly splits a list into chunks of a given maximum size
+        chunks = utils.split_into_chunks([1, 2, 3, 4, 5], 2)
+        self.assertEqual(chunks, [[1, 2], [3, 4], [5]])
+        self.assertEqual(utils.split_into_chunks([], 2), [])
+
+    @unittest.mock.patch('urllib.request.urlopen')
+    def test_download_file_with_cache(self, mock_urlopen):
+        # checks that a downloaded file is stored in a cache, and only fetched again if the server has a new version
+        self.assertIs(mock_urlopen, urllib.request.urlopen)
+        cache_directory = tempfile.mkdtemp()
+        url = "http://testserver/ontologies/test.obo.gz"
+        response = unittest.mock.MagicMock()
+        response.__enter__.return_value = response
+        response.read.side_effect = [b"first content", b""]
+        response.headers = {"ETag": "\"v1\"", "Last-Modified": "Mon, 01 Jan 2024 00:00:00 GMT"}
+        mock_urlopen.return_value = response
+        with redirect_stdout(io.StringIO()):
+            cached_file = utils.download_file_with_cache(url, cache_directory)
+        self.assertTrue(cached_file.endswith(".obo.gz"))
+        with open(cached_file, "rb") as cached_handle:
+            self.assertEqual(cached_handle.read(), b"first content")
+        self.assertIsNone(mock_urlopen.call_args[0][0].get_header("If-none-match"))
+
+        # Server reports that the file is unchanged
+        mock_urlopen.side_effect = urllib.error.HTTPError(url, 304, "Not Modified", {}, None)
+        with redirect_stdout(io.StringIO()):
+            self.assertEqual(utils.download_file_with_cache(url, cache_directory), cached_file)
+        self.assertEqual(mock_urlopen.call_args[0][0].get_header("If-none-match"), "\"v1\"")
+        self.assertEqual(mock_urlopen.call_args[0][0].get_header("If-modified-since"),
+                         "Mon, 01 Jan 2024 00:00:00 GMT")
+
+        # Another URL with identical content shares the cached copy
+        other_url = "http://otherserver/test.obo.gz"
+        mock_urlopen.side_effect = None
+        response.read.side_effect = [b"first content", b""]
+        with redirect_stdout(io.StringIO()):
+            self.assertEqual(utils.download_file_with_cache(other_url, cache_directory), cached_file)
+
+        # Server sends a new version; the old copy is kept as long as another URL refers to it
+        response.read.side_effect = [b"second content", b""]
+        with redirect_stdout(io.StringIO()):
+            new_cached_file = utils.download_file_with_cache(url, cache_directory)
+        self.assertNotEqual(new_cached_file, cached_file)
+        self.assertTrue(os.path.exists(cached_file))
+        self.assertTrue(utils.is_referenced_in_cache(cache_directory, os.path.basename(cached_file)))
+
+        response.read.side_effect = [b"second content", b""]
+        with redirect_stdout(io.StringIO()):
+            self.assertEqual(utils.download_file_with_cache(other_url, cache_directory), new_cached_file)
+        self.assertFalse(os.path.exists(cached_file))
+        self.assertEqual(utils.file_checksum(new_cached_file), hashlib.sha256(b"second content").hexdigest())
+
+        # A corrupted copy is fetched unconditionally
+        with open(new_cached_file, "wb") as cached_handle:
+            cached_handle.write(b"corrupted")
+        response.read.side_effect = [b"second content", b""]
+        with redirect_stdout(io.StringIO()):
+            self.assertEqual(utils.download_file_with_cache(url, cache_directory), new_cached_file)
+        self.assertIsNone(mock_urlopen.call_args[0][0].get_header("If-none-match"))
+        self.assertEqual(utils.file_checksum(new_cached_file), hashlib.sha256(b"second content").hexdigest())
+        shutil.rmtree(cache_directory)
+
+    def test_insert_into_filename(self):
+        # Tests the function inserting a string into a filename
+        self.assertEqual(utils.insert_into_filename("out.fa", "genes"), "out.genes.fa")
+        self.assertEqual(utils.insert_into_filename("dir/out.fa.gz", "genes"), "dir/out.genes.fa.gz")
+        self.assertEqual(utils.insert_into_filename("out", "genes"), "out.genes")
+
+    def test_md5_checksum(self):
+        # Tests the computation of MD5 checksums of strings
+        self.assertEqual(utils.md5_checksum("ACGT"), "f1f8f4bf413b16ad135722aa4591043e")
+        self.assertEqual(utils.md5_checksum(""), "d41d8cd98f00b204e9800998ecf8427e")
+
     def test_random_string(self):
         # tests if a function generates a random string of lowercase letters
         string1 = utils.random_string(8)
@@ -189,6 +268,11 @@ class TestUtils(unittest.TestCase):
             printed = f.getvalue()
         self.assertEqual(printed, "AAA-BBB\n")
 
+        f = io.StringIO()
+        printer = utils.VerbosePrinter(True, file=f)
+        printer.print("AAA")
+        self.assertEqual(f.getvalue(), "AAA\n")
+
 
 if __name__ == '__main__':
     unittest.main(verbosity=2, buffer=True)
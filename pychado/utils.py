@@ -1,7 +1,12 @@
 import sys
 import os
 import datetime
+import json
+import hashlib
+import tempfile
 import subprocess
+import urllib.error
+import urllib.parse
 import urllib.request
 import string
 import random
@@ -18,19 +23,20 @@ class EmptyObject:
 class VerbosePrinter:
     """Class printing messages if verbose argument is set"""
 
-    def __init__(self, verbose: bool, separator=";"):
+    def __init__(self, verbose: bool, separator=";", file=None):
         """Constructor"""
         self.verbose = verbose
         self.separator = separator
+        self.file = file
 
     def print(self, message):
         """Prints a message if set to verbose. If the message is a list, the method prints all elements,
-        separated by the set separator"""
+        separated by the set separator. Messages go to the set file, or to stdout by default."""
         if self.verbose:
             if isinstance(message, list):
-                print(*message, sep=self.separator)
+                print(*message, sep=self.separator, file=self.file)
             else:
-                print(message)
+                print(message, file=self.file)
 
 
 def open_file_read(filename: str):
@@ -99,6 +105,15 @@ def write_csv(filename: str, delimiter: str, content: list) -> None:
     close(file)
 
 
+def insert_into_filename(filename: str, infix: str) -> str:
+    """Inserts a string into a filename, in front of the file extension"""
+    root, extension = os.path.splitext(filename)
+    if extension == ".gz":
+        root, inner_extension = os.path.splitext(root)
+        extension = inner_extension + extension
+    return root + "." + infix + extension
+
+
 def parse_yaml(filename: str) -> dict:
     """Function parsing a YAML file"""
     stream = open_file_read(filename)
@@ -200,6 +215,11 @@ def list_to_dict(entries: list, key: str) -> dict:
     return dictionary
 
 
+def split_into_chunks(entries: list, chunk_size: int) -> list:
+    """Splits a list into consecutive chunks of a given maximum size"""
+    return [entries[start:start + chunk_size] for start in range(0, len(entries), chunk_size)]
+
+
 def random_string(n: int) -> str:
     """Generates a random string of n lowercase letters"""
     return "".join(random.choices(string.ascii_lowercase, k=n))
@@ -230,3 +250,82 @@ def download_file(url: str) -> str:
     print("Downloading file from URL " + url + " ...")
     file, headers = urllib.request.urlretrieve(url)
     return file
+
+
+def download_file_with_cache(url: str, cache_directory: str) -> str:
+    """Downloads a file from the internet into a local cache directory, and returns the path to the cached copy.
+    The server is asked for a new version only if the ETag or Last-Modified value stored with the copy is outdated."""
+    os.makedirs(cache_directory, exist_ok=True)
+    index_file = os.path.join(cache_directory, hashlib.sha256(url.encode()).hexdigest() + ".json")
+    metadata = {}
+    if os.path.exists(index_file):
+        with open(index_file) as index_handle:
+            metadata = json.load(index_handle)
+    cached_file = os.path.join(cache_directory, metadata.get("filename", ""))
+    is_cached = bool(metadata) and os.path.isfile(cached_file) and file_checksum(cached_file) == metadata["checksum"]
+
+    # Send a conditional request, if a valid copy is available
+    request = urllib.request.Request(url)
+    if is_cached and metadata.get("etag"):
+        request.add_header("If-None-Match", metadata["etag"])
+    if is_cached and metadata.get("last_modified"):
+        request.add_header("If-Modified-Since", metadata["last_modified"])
+    try:
+        response = urllib.request.urlopen(request)
+    except urllib.error.HTTPError as err:
+        if err.code == 304 and is_cached:
+            print("File from URL " + url + " is up to date in cache " + cached_file)
+            return cached_file
+        raise
+
+    # Store the content under its checksum, keeping the file extension(s) of the URL
+    print("Downloading file from URL " + url + " ...")
+    handle, temporary_file = tempfile.mkstemp(dir=cache_directory)
+    checksum = hashlib.sha256()
+    with response, os.fdopen(handle, "wb") as file_handle:
+        for chunk in iter(lambda: response.read(1024 * 1024), b""):
+            checksum.update(chunk)
+            file_handle.write(chunk)
+    (stem, extension) = os.path.splitext(os.path.basename(urllib.parse.urlparse(url).path))
+    if extension == ".gz":
+        extension = os.path.splitext(stem)[1] + extension
+    filename = checksum.hexdigest() + extension
+    os.replace(temporary_file, os.path.join(cache_directory, filename))
+    new_metadata = {"url": url, "filename": filename, "checksum": checksum.hexdigest(),
+                    "etag": response.headers.get("ETag", ""),
+                    "last_modified": response.headers.get("Last-Modified", "")}
+    with open(index_file, "w") as index_handle:
+        json.dump(new_metadata, index_handle)
+    if metadata.get("filename") and metadata["filename"] != filename and os.path.isfile(cached_file) \
+            and not is_referenced_in_cache(cache_directory, metadata["filename"]):
+        os.remove(cached_file)
+    return os.path.join(cache_directory, filename)
+
+
+def is_referenced_in_cache(cache_directory: str, filename: str) -> bool:
+    """Checks if a file in a download cache is referenced by the metadata of any URL"""
+    for entry in os.scandir(cache_directory):
+        if not entry.name.endswith(".json"):
+            continue
+        try:
+            with open(entry.path) as index_handle:
+                metadata = json.load(index_handle)
+        except (OSError, ValueError):
+            continue
+        if isinstance(metadata, dict) and metadata.get("filename") == filename:
+            return True
+    return False
+
+
+def md5_checksum(the_string: str) -> str:
+    """Computes the MD5 checksum of a string, e.g. of the residues of a feature"""
+    return hashlib.md5(the_string.encode()).hexdigest()
+
+
+def file_checksum(filename: str) -> str:
+    """Computes the SHA-256 checksum of a file"""
+    checksum = hashlib.sha256()
+    with open(filename, "rb") as file_handle:
+        for chunk in iter(lambda: file_handle.read(1024 * 1024), b""):
+            checksum.update(chunk)
+    return checksum.hexdigest()